@@ -1,88 +1,22 @@
-import yt_dlp
-import os
-import configparser
+import sys
 import threading
 from tkinter import messagebox
-import sys
-import re
-import shutil
-import zipfile
-import requests
-from io import BytesIO
-
-CONFIG_FILE = "config.ini"
-config = configparser.ConfigParser()
-
-# Expresión regular para eliminar códigos ANSI
-ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-
-# Excepción personalizada para manejar la cancelación de la descarga
-class DownloadCancelledError(Exception):
-    pass
-
-# --- NUEVA CLASE: GESTOR DE FFMPEG ---
-class FFmpegManager:
-    """Se encarga de verificar y descargar FFmpeg de forma portable."""
-    
-    # URL oficial de las builds recomendadas para yt-dlp
-    FFMPEG_URL = "https://github.com/yt-dlp/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip"
-    
-    def __init__(self):
-        # Carpeta local 'bin' donde guardaremos los ejecutables dentro del proyecto
-        self.bin_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
-        self.ffmpeg_exe = os.path.join(self.bin_dir, 'ffmpeg.exe')
-        self.ffprobe_exe = os.path.join(self.bin_dir, 'ffprobe.exe')
-
-    def get_ffmpeg_path(self):
-        """
-        Retorna la ruta del directorio que contiene ffmpeg.exe si existe localmente.
-        Si no, retorna None (para que el sistema use el PATH global).
-        """
-        if os.path.exists(self.ffmpeg_exe):
-            return self.bin_dir
-        return None
-
-    def is_installed(self):
-        """Verifica si FFmpeg está en la carpeta local o en el sistema."""
-        local_check = os.path.exists(self.ffmpeg_exe)
-        system_check = shutil.which("ffmpeg") is not None
-        return local_check or system_check
-
-    def install_ffmpeg(self, progress_callback=None):
-        """Descarga y extrae ffmpeg en la carpeta local 'bin'."""
-        try:
-            if not os.path.exists(self.bin_dir):
-                os.makedirs(self.bin_dir)
-
-            if progress_callback:
-                progress_callback("Descargando herramientas necesarias (FFmpeg)...")
-
-            # Descargar ZIP en memoria
-            response = requests.get(self.FFMPEG_URL, stream=True)
-            response.raise_for_status()
-            
-            # Extraer solo los .exe necesarios
-            if progress_callback:
-                progress_callback("Instalando componentes...")
-
-            with zipfile.ZipFile(BytesIO(response.content)) as zf:
-                for file in zf.namelist():
-                    filename = os.path.basename(file)
-                    # Buscamos ffmpeg.exe y ffprobe.exe dentro del zip (pueden estar en subcarpetas)
-                    if filename.lower() == "ffmpeg.exe":
-                        with open(self.ffmpeg_exe, 'wb') as f_out:
-                            f_out.write(zf.read(file))
-                    elif filename.lower() == "ffprobe.exe":
-                        with open(self.ffprobe_exe, 'wb') as f_out:
-                            f_out.write(zf.read(file))
-            
-            return True, "Instalación completada."
+from progress_bus import ProgressBus, MAIN_JOB
+from format_planner import PERFILES
 
-        except Exception as e:
-            return False, f"Error al descargar componentes: {str(e)}"
+# Arranque rápido: este módulo no importa el motor. download_engine trae yt-dlp (con
+# sus extractores), requests y el resto de la pila de descarga, y al crearse lee
+# config.ini, la cola y las cachés; todo eso se hace en un hilo (iniciar_motor)
+# mientras la ventana ya se muestra.
 
 
 class AppLogic:
+    """
+    Adaptador entre la interfaz de Tkinter y el DownloadEngine: lee las variables
+    de la ventana, muestra los diálogos y delega el trabajo en el motor. El motor
+    se crea en segundo plano con `iniciar_motor`; hasta entonces `engine` espera.
+    """
+
     def __init__(self, estado_descarga_var, progress_bar_widget, ruta_descarga_var, entrada_url_var, es_playlist_var, playlist_start_var, playlist_end_var, root_window, cancel_event):
         self.estado_descarga_var = estado_descarga_var
         self.progress_bar_widget = progress_bar_widget
@@ -94,161 +28,107 @@ class AppLogic:
         self.root_window = root_window
         self.cancel_event = cancel_event
 
-        self.total_playlist_videos = 0
-        self.playlist_title = ""
-        
-        # Inicializamos el gestor de FFmpeg
-        self.ffmpeg_manager = FFmpegManager()
+        # Resultado de la última verificación de URL (lo usa descargar_video_task)
+        self.url_info = None
+
+        # El bus existe desde el principio: la ventana lo consulta antes de que haya motor
+        self.progress_bus = ProgressBus()
+        self._engine = None
+        self._error_motor = None
+        self._motor_listo = threading.Event()
 
-        self.cargar_configuracion()
+    def iniciar_motor(self, on_ready=None):
+        """
+        Importa y crea el DownloadEngine en un hilo aparte. Al terminar (bien o mal)
+        llama a `on_ready()` en el hilo de la interfaz.
+        """
+        def crear():
+            try:
+                from download_engine import DownloadEngine
+                self._engine = DownloadEngine(self.progress_bus, on_queue_change=self._notificar_cola)
+            except Exception as e:
+                self._error_motor = e
+                print(f"No se pudo iniciar el motor de descargas: {e}", file=sys.stderr)
+            finally:
+                self._motor_listo.set()
+            if on_ready:
+                self.root_window.after(0, on_ready)
+        threading.Thread(target=crear, name="motor", daemon=True).start()
+
+    @property
+    def motor_listo(self):
+        return self._motor_listo.is_set()
+
+    @property
+    def engine(self):
+        """El DownloadEngine. Si todavía se está creando, espera a que termine."""
+        self._motor_listo.wait()
+        if self._engine is None:
+            raise RuntimeError(f"No se pudo iniciar el motor de descargas: {self._error_motor}")
+        return self._engine
+
+    @property
+    def download_queue(self):
+        return self.engine.download_queue
+
+    @property
+    def total_playlist_videos(self):
+        return self.url_info['num_videos'] if self.url_info else 0
+
+    @property
+    def playlist_title(self):
+        return self.url_info['playlist_title'] if self.url_info else ""
 
     def cargar_configuracion(self):
-        config.read(CONFIG_FILE)
-        if 'Settings' in config and 'last_download_path' in config['Settings']:
-            self.ruta_descarga_var.set(
-                config['Settings']['last_download_path'])
+        path = self.engine.get_last_download_path()
+        if path:
+            self.ruta_descarga_var.set(path)
 
     def guardar_configuracion(self, path):
-        if 'Settings' not in config:
-            config['Settings'] = {}
-        config['Settings']['last_download_path'] = path
-        with open(CONFIG_FILE, 'w') as f:
-            config.write(f)
+        self.engine.guardar_configuracion(path)
 
     def get_user_videos_dir(self):
-        home = os.path.expanduser("~")
-        video_dirs = [
-            os.path.join(home, "Videos"),
-            os.path.join(home, "Vídeos"),
-            os.path.join(home, "My Videos")
-        ]
-        for d in video_dirs:
-            if os.path.isdir(d):
-                return d
-        return os.path.join(home, "Videos")
-    
+        return self.engine.get_user_videos_dir()
+
     # Función auxiliar para limpiar los caracteres de escape ANSI
     def _clean_ansi(self, text):
-        return ANSI_ESCAPE.sub('', text)
+        return self.engine._clean_ansi(text)
+
+    def publicar_estado(self, mensaje, progreso=None, job_id=MAIN_JOB):
+        self.engine.publicar_estado(mensaje, progreso, job_id)
+
+    def texto_estado(self, state):
+        return self.engine.texto_estado(state)
 
-    # --- FUNCIÓN DE LIMPIEZA DE ARCHIVOS TEMPORALES ---
-    def _limpiar_archivos_temporales(self, carpeta_destino, es_playlist=False, playlist_title=""):
-        try:
-            target_dir = os.path.join(carpeta_destino, playlist_title) if es_playlist and playlist_title else carpeta_destino
-            
-            # Buscar y eliminar archivos temporales
-            if os.path.exists(target_dir):
-                for filename in os.listdir(target_dir):
-                    if filename.endswith(".part") or filename.endswith(".ytdl"):
-                        file_path = os.path.join(target_dir, filename)
-                        os.remove(file_path)
-                        print(f"Archivo temporal eliminado: {file_path}")
-            
-            # Si es una playlist, también eliminar la carpeta vacía si no tiene archivos completos
-            if es_playlist and playlist_title and os.path.exists(target_dir) and not os.listdir(target_dir):
-                os.rmdir(target_dir)
-                print(f"Directorio de playlist vacío eliminado: {target_dir}")
-        except Exception as e:
-            print(f"Error al limpiar archivos temporales: {e}")
-    
     def check_url_type_blocking(self, url):
-        self.root_window.after(0, lambda: self.estado_descarga_var.set("Verificando tipo de URL..."))
-        
+        from yt_dlp.utils import DownloadError
+        self.publicar_estado("Verificando tipo de URL...")
+
         try:
-            ydl_opts = {
-                'quiet': True,
-                'extract_flat': True,
-                'force_generic_extractor': False,
-                'verbose': False,
-                'logtostderr': False,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-
-                if info.get('_type') == 'playlist':
-                    entries = info.get('entries', [])
-                    num_videos = len(entries) if entries else 0
-                    self.total_playlist_videos = num_videos
-
-                    self.playlist_title = info.get('title', 'Unknown_Playlist').strip()
-                    self.playlist_title = re.sub(r'[\\/:*?"<>|]', '', self.playlist_title)
-                    self.playlist_title = self.playlist_title.replace(' ', '_')
-                    self.playlist_title = self.playlist_title.replace('__', '_')
-                    self.playlist_title = self.playlist_title.strip('_')
-
-                    return True, num_videos
-                else:
-                    self.total_playlist_videos = 0
-                    self.playlist_title = ""
-                    return False, 0
-        except yt_dlp.utils.DownloadError as e:
+            self.url_info = self.engine.check_url_type(url)
+            return self.url_info['es_playlist'], self.url_info['num_videos']
+        except DownloadError as e:
+            self.url_info = None
             error_msg = f"Error al verificar URL (inválida/inaccesible): {self._clean_ansi(str(e))}"
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(error_msg))
+            self.publicar_estado(error_msg)
             self.root_window.after(0, lambda: messagebox.showerror("Error de URL", error_msg))
-            self.root_window.after(0, self.root_window.habilitar_interfaz) 
+            self.root_window.after(0, self.root_window.habilitar_interfaz)
             return False, 0
         except Exception as e:
+            self.url_info = None
             error_msg = f"Error inesperado al verificar URL: {self._clean_ansi(str(e))}"
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(error_msg))
+            self.publicar_estado(error_msg)
             self.root_window.after(0, lambda: messagebox.showerror("Error", error_msg))
             self.root_window.after(0, self.root_window.habilitar_interfaz)
             return False, 0
 
-    def hook_progreso(self, d):
-        # Levantamos la excepción personalizada si se ha solicitado la cancelación
-        if self.cancel_event.is_set():
-            raise DownloadCancelledError("Descarga cancelada por el usuario.")
-            
-        if d['status'] == 'downloading':
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            downloaded_bytes = d.get('downloaded_bytes')
-
-            if total_bytes and downloaded_bytes is not None:
-                progress_value = (downloaded_bytes / total_bytes)
-                self.root_window.after(0, lambda: self.progress_bar_widget.set(progress_value))
-            
-            p_raw = d.get('_percent_str', 'N/A')
-            s_raw = d.get('_speed_str', 'N/A')
-            e_raw = d.get('_eta_str', 'N/A')
-
-            p = self._clean_ansi(p_raw)
-            s = self._clean_ansi(s_raw)
-            e = self._clean_ansi(e_raw)
-
-            playlist_info = ""
-            if self.es_playlist_var.get() and self.total_playlist_videos > 0:
-                current_index = d.get('info_dict', {}).get('playlist_index')
-                if current_index:
-                    playlist_info = f" ({current_index} de {self.total_playlist_videos})"
-
-            video_title = d.get('info_dict', {}).get('title', '...')
-            display_title = self._clean_ansi(video_title)
-            
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(f"Descargando{playlist_info}: '{display_title}' - {p} a {s} ETA: {e}"))
-        
-        elif d['status'] == 'finished':
-            video_title = d.get('info_dict', {}).get('title', 'video')
-            playlist_finished_info = ""
-            if self.es_playlist_var.get() and self.total_playlist_videos > 0:
-                current_index = d.get('info_dict', {}).get('playlist_index')
-                if current_index:
-                    playlist_finished_info = f" ({current_index} de {self.total_playlist_videos})"
-
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(f"Post-procesando '{video_title}'{playlist_finished_info} (esto puede tardar)..."))
-            self.root_window.after(0, lambda: self.progress_bar_widget.set(1.0))
-            
-        elif d['status'] == 'error':
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(
-                f"Error durante la descarga: {self._clean_ansi(d.get('error', 'Desconocido'))}"))
-            self.root_window.after(0, lambda: self.progress_bar_widget.set(0.0))
-
     def descargar_video_task(self):
+        from yt_dlp.utils import DownloadError
+        from download_engine import DownloadCancelledError, DependencyError, parse_playlist_range
         url = self.entrada_url_var.get()
         carpeta_destino = self.ruta_descarga_var.get()
         es_playlist = self.es_playlist_var.get()
-        playlist_start = self.playlist_start_var.get()
-        playlist_end = self.playlist_end_var.get()
-        
+
         if not url:
             self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", "Por favor, introduce una URL de YouTube."))
             return "habilitar_interfaz"
@@ -256,103 +136,113 @@ class AppLogic:
             self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", "Por favor, selecciona una carpeta de destino."))
             return "habilitar_interfaz"
 
-        # --- VERIFICACIÓN E INSTALACIÓN DE FFMPEG ---
-        if not self.ffmpeg_manager.is_installed():
-            self.root_window.after(0, lambda: self.estado_descarga_var.set("Descargando componentes necesarios (FFmpeg)..."))
-            
-            # Callback para actualizar el texto del estado desde el hilo
-            def update_status(msg):
-                self.root_window.after(0, lambda: self.estado_descarga_var.set(msg))
-
-            exito, mensaje = self.ffmpeg_manager.install_ffmpeg(progress_callback=update_status)
-            
-            if not exito:
-                self.root_window.after(0, lambda: messagebox.showerror("Error de Dependencias", mensaje))
-                return "habilitar_interfaz"
-
-        # Obtenemos la ruta local si existe, o None si usa la del sistema
-        ffmpeg_local_path = self.ffmpeg_manager.get_ffmpeg_path()
-        # ---------------------------------------------
-
-        self.root_window.after(0, lambda: self.estado_descarga_var.set(f"Preparando descarga ({'Playlist' if es_playlist else 'Video'})..."))
-        self.root_window.after(0, lambda: self.progress_bar_widget.set(0.0))
-
-        ydl_opts = {
-            'outtmpl': os.path.join(carpeta_destino, '%(title)s.%(ext)s'),
-            'progress_hooks': [self.hook_progreso],
-            'restrictfilenames': True,
-            'postprocessors': [],
-            'verbose': False,
-            'logtostderr': False,
-            'noplaylist': not es_playlist,
-            'compat_opts': set(),
-            'embed_thumbnail': True,
-            'embed_metadata': True,
-            # 'ffmpeg_location': YA NO ESTÁ HARDCODEADO AQUÍ
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best',
-            'merge_output_format': 'mp4',
-            'ignoreerrors': True, # Se mantiene siempre en True para manejar videos eliminados.
-        }
-
-        # Si estamos usando nuestra versión portable, le decimos a yt-dlp dónde está
-        if ffmpeg_local_path:
-            ydl_opts['ffmpeg_location'] = ffmpeg_local_path
-
+        playlist_start = playlist_end = None
         if es_playlist:
             try:
-                start_num = int(playlist_start) if playlist_start else None
-                end_num = int(playlist_end) if playlist_end else None
-
-                if start_num is not None and start_num <= 0:
-                    self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", "El número de inicio de la playlist debe ser mayor que 0."))
-                    return "habilitar_interfaz"
-                if end_num is not None and end_num <= 0:
-                    self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", "El número de fin de la playlist debe ser mayor que 0."))
-                    return "habilitar_interfaz"
-                if start_num is not None and end_num is not None and start_num > end_num:
-                    self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", "El número de inicio no puede ser mayor que el de fin."))
-                    return "habilitar_interfaz"
-            except ValueError:
-                self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", "El rango de la playlist debe ser un número válido."))
+                playlist_start, playlist_end = parse_playlist_range(self.playlist_start_var.get(), self.playlist_end_var.get())
+            except ValueError as e:
+                mensaje = str(e)
+                self.root_window.after(0, lambda: messagebox.showwarning("Advertencia", mensaje))
                 return "habilitar_interfaz"
-            
-            ydl_opts['playlist_start'] = start_num
-            ydl_opts['playlist_end'] = end_num
-            # Aquí se define el outtmpl para las playlists
-            ydl_opts['outtmpl'] = os.path.join(carpeta_destino, self.playlist_title, '%(title)s.%(ext)s')
-            
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
 
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(
-                f"¡Descarga completa! Archivo(s) guardado(s) en: {carpeta_destino}"))
+        # Si el usuario eligió no tratarla como playlist, se descarga solo el video
+        url_info = self.url_info
+        if url_info is not None and not es_playlist:
+            if url_info['entries'] is not None:
+                url_info['entries'].close()
+            url_info = dict(url_info, es_playlist=False, entries=None)
+
+        try:
+            self.engine.descargar(url, carpeta_destino, self.cancel_event, url_info, playlist_start, playlist_end)
             self.root_window.after(0, lambda: self.entrada_url_var.set(""))
             self.guardar_configuracion(carpeta_destino)
-            return "habilitar_interfaz"
-        
+        except DependencyError as e:
+            mensaje = str(e)
+            self.root_window.after(0, lambda: messagebox.showerror("Error de Dependencias", mensaje))
         except DownloadCancelledError:
-            self.root_window.after(0, lambda: self.estado_descarga_var.set("Descarga cancelada."))
-            self.root_window.after(0, lambda: self.progress_bar_widget.set(0.0))
-            return "habilitar_interfaz"
-        
-        except yt_dlp.utils.DownloadError as e:
-            error_message = f"Error de descarga: {self._clean_ansi(str(e))}"
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(error_message))
+            pass
+        except DownloadError as e:
+            error_message = self.engine.mensaje_error(e)
             self.root_window.after(0, lambda: messagebox.showerror("Error de Descarga", error_message))
-            print(error_message, file=sys.stderr)
-            return "habilitar_interfaz"
-        
         except Exception as e:
-            error_message = f"Ocurrió un error inesperado: {self._clean_ansi(str(e))}"
-            self.root_window.after(0, lambda: self.estado_descarga_var.set(error_message))
+            error_message = self.engine.mensaje_error(e)
             self.root_window.after(0, lambda: messagebox.showerror("Error", error_message))
-            print(error_message, file=sys.stderr)
-            return "habilitar_interfaz"
-        finally:
-            # --- Lógica de limpieza en el bloque `finally` ---
-            self._limpiar_archivos_temporales(
-                carpeta_destino, 
-                es_playlist=es_playlist,
-                playlist_title=self.playlist_title
-            )
\ No newline at end of file
+        return "habilitar_interfaz"
+
+    # --- COLA DE DESCARGAS ---
+    def iniciar_cola(self):
+        self.engine.iniciar_cola()
+
+    def detener_cola(self):
+        self.engine.detener_cola()
+
+    def cerrar(self):
+        # Si el motor no terminó de arrancar no hay nada que cerrar (el hilo es daemon)
+        if self._engine is not None:
+            self._engine.cerrar()
+
+    def encolar_urls(self, text, carpeta_destino):
+        return self.engine.encolar_urls(text, carpeta_destino)
+
+    def encolar_archivo(self, path, carpeta_destino):
+        return self.engine.encolar_archivo(path, carpeta_destino)
+
+    # --- SUSCRIPCIONES ---
+    def iniciar_suscripciones(self):
+        self.engine.iniciar_suscripciones()
+
+    def suscribir_urls(self, text, carpeta_destino):
+        """Suscribe cada URL del texto con la carpeta y el perfil de formato actuales. Retorna cuántas."""
+        from download_queue import parse_url_list
+        urls = parse_url_list(text)
+        for url in urls:
+            self.engine.suscribir(url, carpeta_destino)
+        if urls:
+            self.publicar_estado(f"{len(urls)} suscripción(es) guardadas: sus videos nuevos se bajan solos.")
+        return len(urls)
+
+    def reintentar_fallidos(self):
+        cantidad = self.engine.reintentar_fallidos()
+        self.publicar_estado(f"{cantidad} descarga(s) fallida(s) de nuevo en la cola." if cantidad
+                             else "No hay descargas fallidas para reintentar.")
+        return cantidad
+
+    # --- LÍMITE DE VELOCIDAD ---
+    def get_limite_velocidad(self):
+        """Límite global actual como texto para la interfaz ("" = sin límite)."""
+        from bandwidth import format_rate
+        rate = self.engine.bandwidth.global_rate
+        return format_rate(rate) if rate else ""
+
+    def ajustar_limite_velocidad(self, texto):
+        """Aplica y guarda el límite global escrito por el usuario. Retorna False si no es válido."""
+        from bandwidth import parse_rate, format_rate
+        try:
+            rate = parse_rate(texto.replace("/s", "").replace("iB", ""))
+        except ValueError as e:
+            messagebox.showwarning("Advertencia", str(e))
+            return False
+        self.engine.ajustar_limites_velocidad(global_rate=rate)
+        self.publicar_estado(f"Velocidad máxima: {format_rate(rate)}.")
+        return True
+
+    # --- PERFIL DE FORMATO ---
+    def get_perfil_formato(self):
+        """Descripción del perfil de formatos actual, como la muestra la interfaz."""
+        return PERFILES[self.engine.format_profile]
+
+    def ajustar_perfil_formato(self, descripcion):
+        perfil = next(clave for clave, texto in PERFILES.items() if texto == descripcion)
+        self.engine.ajustar_perfil_formato(perfil)
+        self.publicar_estado(f"Formato: {descripcion}.")
+
+    def nombre_trabajo(self, job_id, state):
+        """Título (o URL) de un trabajo de la cola para el panel de trabajos."""
+        job = self.engine.download_queue.jobs.get(job_id) if self.motor_listo else None
+        if job is not None:
+            return job.get('titulo') or (state.title if state is not None else None) or job['url']
+        return (state.title if state is not None else None) or job_id[:8]
+
+    def _notificar_cola(self, resumen):
+        if hasattr(self.root_window, 'actualizar_estado_cola'):
+            self.root_window.after(0, lambda: self.root_window.actualizar_estado_cola(resumen))
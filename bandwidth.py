@@ -0,0 +1,180 @@
+import time
+import threading
+from yt_dlp.utils import parse_bytes
+
+# Reparto del ancho de banda entre los trabajos de descarga (el interactivo, los de
+# la cola y los hilos de una playlist). Cada trabajo tiene un token bucket cuya tasa
+# se recalcula según los trabajos activos: un límite global que se reparte por peso
+# (los trabajos que no usan su parte se la ceden a los demás) y un límite opcional
+# por trabajo. Una tasa de 0 significa "sin límite".
+
+# Un trabajo cuenta como activo si leyó datos en este último intervalo (segundos)
+ACTIVE_WINDOW = 1.0
+# Ráfaga máxima acumulable, en segundos de la tasa del trabajo
+BURST_SECONDS = 0.5
+# Tramo máximo de espera, para aplicar enseguida los cambios de límites
+MAX_SLEEP = 0.1
+
+DEFAULT_WEIGHT = 1.0
+
+
+def parse_rate(value):
+    """
+    Convierte un límite escrito por el usuario ("2M", "500K", "1048576", "" o "0")
+    a bytes por segundo. Vacío o 0 es sin límite. Lanza ValueError si no se entiende.
+    """
+    if value is None:
+        return 0
+    value = str(value).strip()
+    if not value or value == '0':
+        return 0
+    rate = parse_bytes(value)
+    if rate is None or rate < 0:
+        raise ValueError(f"Límite de velocidad no válido: {value!r} (ejemplos: 500K, 2M)")
+    return int(rate)
+
+
+def format_rate(rate):
+    if not rate:
+        return "sin límite"
+    if rate >= 1024 * 1024:
+        return f"{rate / (1024 * 1024):.1f} MiB/s"
+    return f"{rate / 1024:.0f} KiB/s"
+
+
+class _Trabajo:
+    __slots__ = ('weight', 'cap', 'rate', 'tokens', 'ultima_recarga', 'ultima_lectura')
+
+    def __init__(self, weight=DEFAULT_WEIGHT, cap=0):
+        self.weight = weight
+        self.cap = cap
+        self.rate = 0
+        self.tokens = 0.0
+        self.ultima_recarga = time.monotonic()
+        self.ultima_lectura = 0.0
+
+    def recargar(self, ahora):
+        if self.rate:
+            self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (ahora - self.ultima_recarga) * self.rate)
+        self.ultima_recarga = ahora
+
+
+class BandwidthManager:
+    """
+    Limitador de velocidad compartido por todas las descargas del motor.
+
+    `consume(job_id, n)` se llama después de leer `n` bytes y bloquea lo necesario
+    para que el trabajo no supere su tasa. Los trabajos se crean solos la primera
+    vez que consumen; `configure_job` fija su peso y su límite propio, y
+    `set_global_rate` cambia el límite total en cualquier momento.
+    """
+
+    def __init__(self, global_rate=0, default_job_rate=0):
+        self._lock = threading.Lock()
+        self.global_rate = global_rate
+        self.default_job_rate = default_job_rate
+        self._trabajos = {}
+        self._ultimo_reparto = 0.0
+
+    def set_global_rate(self, rate):
+        with self._lock:
+            self.global_rate = max(0, int(rate or 0))
+            self._repartir(time.monotonic())
+
+    def set_default_job_rate(self, rate):
+        with self._lock:
+            anterior = self.default_job_rate
+            self.default_job_rate = max(0, int(rate or 0))
+            for trabajo in self._trabajos.values():
+                if trabajo.cap == anterior:
+                    trabajo.cap = self.default_job_rate
+            self._repartir(time.monotonic())
+
+    def configure_job(self, job_id, weight=None, rate=None):
+        """Cambia el peso y/o el límite propio (bytes/s, 0 = sin límite) de un trabajo."""
+        with self._lock:
+            trabajo = self._obtener(job_id)
+            if weight is not None:
+                trabajo.weight = max(0.01, float(weight))
+            if rate is not None:
+                trabajo.cap = max(0, int(rate))
+            self._repartir(time.monotonic())
+
+    def remove_job(self, job_id):
+        with self._lock:
+            self._trabajos.pop(job_id, None)
+            self._repartir(time.monotonic())
+
+    def job_rate(self, job_id):
+        """Tasa asignada ahora al trabajo (0 = sin límite)."""
+        with self._lock:
+            trabajo = self._trabajos.get(job_id)
+            return trabajo.rate if trabajo else 0
+
+    def _obtener(self, job_id):
+        trabajo = self._trabajos.get(job_id)
+        if trabajo is None:
+            trabajo = self._trabajos[job_id] = _Trabajo(cap=self.default_job_rate)
+        return trabajo
+
+    def _repartir(self, ahora):
+        """
+        Reparto max-min ponderado ("water-filling") del límite global entre los
+        trabajos activos: a los que tienen un límite propio menor que su parte se
+        les da ese límite y el sobrante se reparte entre el resto según su peso.
+        """
+        self._ultimo_reparto = ahora
+        activos = [t for t in self._trabajos.values() if ahora - t.ultima_lectura < ACTIVE_WINDOW]
+        for trabajo in self._trabajos.values():
+            trabajo.recargar(ahora)
+            if trabajo not in activos:
+                trabajo.rate = trabajo.cap
+
+        if not self.global_rate:
+            for trabajo in activos:
+                trabajo.rate = trabajo.cap
+            return
+
+        restante = self.global_rate
+        pendientes = list(activos)
+        while pendientes:
+            peso_total = sum(t.weight for t in pendientes)
+            limitados = [t for t in pendientes if t.cap and t.cap < restante * t.weight / peso_total]
+            if not limitados:
+                for trabajo in pendientes:
+                    trabajo.rate = max(1, int(restante * trabajo.weight / peso_total))
+                return
+            for trabajo in limitados:
+                trabajo.rate = trabajo.cap
+                restante -= trabajo.cap
+                pendientes.remove(trabajo)
+
+    def consume(self, job_id, nbytes, cancel_event=None):
+        """
+        Descuenta `nbytes` del trabajo y espera hasta que su bucket vuelva a tener
+        saldo. Retorna antes si se activa `cancel_event`.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            trabajo = self._obtener(job_id)
+            era_activo = ahora - trabajo.ultima_lectura < ACTIVE_WINDOW
+            trabajo.ultima_lectura = ahora
+            if not era_activo or ahora - self._ultimo_reparto > ACTIVE_WINDOW / 2:
+                # Un trabajo empezó (o alguno pudo dejar de leer): se recalcula el reparto
+                self._repartir(ahora)
+            if not self.global_rate and not trabajo.cap:
+                return
+            trabajo.recargar(ahora)
+            trabajo.tokens -= nbytes
+
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                trabajo.recargar(ahora)
+                trabajo.ultima_lectura = ahora
+                if not trabajo.rate or trabajo.tokens >= 0:
+                    return
+                espera = -trabajo.tokens / trabajo.rate
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            time.sleep(min(espera, MAX_SLEEP))
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Clasificación de muchas URLs a la vez (listas pegadas, archivos .txt/.csv, spool del
+# daemon). extract_info es bloqueante, así que cada URL corre en un hilo del pool y un
+# bucle asyncio reparte el trabajo con un semáforo que limita cuántas hay en vuelo.
+# YoutubeDL no es seguro entre hilos, pero sí se puede reutilizar: cada hilo del pool
+# crea su instancia una sola vez (con su pool de conexiones HTTP) y la usa para todas
+# las URLs que le tocan, en lugar de crear una nueva por URL.
+
+DEFAULT_CONCURRENCY = 16
+
+# Tipos de resultado
+VIDEO = "video"
+PLAYLIST = "playlist"
+ERROR = "error"
+CANCELADO = "cancelled"
+
+# Campos de cada formato que se conservan en el resumen
+CAMPOS_FORMATO = ('format_id', 'ext', 'width', 'height', 'fps', 'vcodec', 'acodec', 'tbr', 'filesize', 'filesize_approx')
+
+
+def resumen_formatos(info):
+    """Lista reducida de los formatos disponibles de un video (el propio video si no trae 'formats')."""
+    formatos = info.get('formats') or ([info] if info.get('url') else [])
+    return [{campo: f.get(campo) for campo in CAMPOS_FORMATO if f.get(campo) is not None} for f in formatos]
+
+
+def resumen_url(url, info):
+    """
+    Resultado de clasificar `url` a partir de su info plana (extract_info con process=False):
+    {'url', 'tipo', 'titulo', 'num_videos', 'duracion', 'formatos', 'error'}.
+    En las playlists 'num_videos' es None si el sitio no informa el total y el
+    listado no se recorrió; 'formatos' solo se llena en los videos.
+    """
+    if info.get('_type') == 'playlist':
+        entries = info.get('entries')
+        return {
+            'url': url,
+            'tipo': PLAYLIST,
+            'titulo': info.get('title'),
+            'num_videos': len(entries) if isinstance(entries, list) else info.get('playlist_count'),
+            'duracion': None,
+            'formatos': None,
+            'error': None,
+        }
+    return {
+        'url': url,
+        'tipo': VIDEO,
+        'titulo': info.get('title'),
+        'num_videos': 1,
+        'duracion': info.get('duration'),
+        'formatos': resumen_formatos(info),
+        'error': None,
+    }
+
+
+def resultado_error(url, error, transitorio=False, tipo=ERROR):
+    return {'url': url, 'tipo': tipo, 'titulo': None, 'num_videos': None, 'duracion': None,
+            'formatos': None, 'error': error, 'transitorio': transitorio}
+
+
+class BatchClassifier:
+    """
+    Clasifica listas de URLs en paralelo.
+
+    `crear_ydl()` crea una instancia de YoutubeDL solo para información y
+    `clasificar(ydl, url)` retorna el resultado de una URL usando esa instancia
+    (el motor se encarga de la caché y de la extracción). Las instancias se crean
+    una por hilo y se reutilizan hasta `close()`.
+    """
+
+    def __init__(self, crear_ydl, clasificar, concurrency=DEFAULT_CONCURRENCY):
+        self.crear_ydl = crear_ydl
+        self.clasificar = clasificar
+        self.concurrency = max(1, int(concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="clasificador")
+        self._local = threading.local()
+        self._instancias = []
+        self._lock = threading.Lock()
+
+    def _ydl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = self.crear_ydl()
+            with self._lock:
+                self._instancias.append(ydl)
+        return ydl
+
+    def _clasificar_en_hilo(self, url, cancel_event):
+        if cancel_event is not None and cancel_event.is_set():
+            return resultado_error(url, "Cancelado", tipo=CANCELADO)
+        try:
+            return self.clasificar(self._ydl(), url)
+        except Exception as e:
+            return resultado_error(url, str(e))
+
+    async def clasificar_async(self, urls, on_result=None, cancel_event=None):
+        """
+        Clasifica `urls` con a lo sumo `concurrency` extracciones en curso. Llama a
+        `on_result(resultado)` a medida que terminan y retorna los resultados en el
+        orden de `urls`.
+        """
+        loop = asyncio.get_running_loop()
+        semaforo = asyncio.Semaphore(self.concurrency)
+
+        async def una(url):
+            async with semaforo:
+                resultado = await loop.run_in_executor(self._executor, self._clasificar_en_hilo, url, cancel_event)
+            if on_result:
+                on_result(resultado)
+            return resultado
+
+        return await asyncio.gather(*(una(url) for url in urls))
+
+    def clasificar_lote(self, urls, on_result=None, cancel_event=None):
+        """Versión bloqueante de clasificar_async (corre su propio bucle de eventos)."""
+        return asyncio.run(self.clasificar_async(urls, on_result, cancel_event))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            instancias, self._instancias = self._instancias, []
+        for ydl in instancias:
+            ydl.close()
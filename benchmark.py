@@ -0,0 +1,658 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import functools
+import tempfile
+import resource
+import statistics
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import OnDemandPagedList
+import download_engine
+from download_engine import DownloadEngine
+from metadata_cache import MetadataCache
+from postprocess_pipeline import PipelinedYoutubeDL
+from bandwidth import parse_rate
+from output_index import OutputIndex, OUTPUT_INDEX_FILE
+from media_store import MediaStore
+from postprocess_pipeline import StoreMediaPP
+
+# Benchmark del camino de descarga (el mismo DownloadEngine que usa AppLogic) contra un
+# origen falso local: una "API" de playlist/videos y archivos de medios sintéticos.
+# Funciona sin conexión y escribe los resultados en JSON para comparar corridas:
+#   python benchmark.py --videos 8 --size-mib 16 --output base.json
+#   python benchmark.py --videos 8 --size-mib 16 --parallel-workers 1 --compare base.json
+#   python benchmark.py --startup --startup-budget-ms 1000
+
+BLOCK = bytes(range(256)) * 1024  # 256 KiB de contenido determinista
+MIB = 1024 * 1024
+
+
+# --- ORIGEN FALSO ---
+class FakeOrigin:
+    """
+    Servidor HTTP local con:
+      /api/playlist?page=P -> {"title", "videos": [...]} (páginas de `page_size` videos)
+      /api/video/<n>    -> {"id", "title", "url", "filesize"}
+      /media/<n>.mp4    -> `size` bytes sintéticos (acepta Range)
+    `extract_latency` demora las respuestas de la API (simula la extracción),
+    `latency` demora el primer byte de los medios y `rate` limita los bytes/s por conexión.
+    Con `fault_rate`, esa fracción de las peticiones de medios falla: mitad con un
+    503 y mitad cortando la conexión a mitad de la transferencia (un enlace inestable).
+    Habla HTTP/1.1 con keep-alive y cuenta las conexiones TCP que recibe, para ver
+    cuántas se reutilizan.
+    """
+
+    def __init__(self, videos, size, latency=0.0, extract_latency=0.0, rate=0, page_size=50, fault_rate=0.0, seed=0):
+        self.videos = videos
+        self.page_size = page_size
+        self.size = size
+        self.latency = latency
+        self.extract_latency = extract_latency
+        self.rate = rate
+        self.fault_rate = fault_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.primer_byte = None
+        self.peticiones = 0
+        self.conexiones = 0
+        self.fallas = 0
+
+        origen = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with origen._lock:
+                    origen.conexiones += 1
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    # El cliente cerró una conexión keep-alive que ya no usaba
+                    pass
+
+            def do_GET(self):
+                origen._atender(self)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._hilo = threading.Thread(target=self.server.serve_forever, name="fake-origin", daemon=True)
+
+    def start(self):
+        self._hilo.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.primer_byte = None
+            self.peticiones = 0
+            self.conexiones = 0
+            self.fallas = 0
+
+    def _json(self, handler, data):
+        time.sleep(self.extract_latency)
+        body = json.dumps(data).encode('utf-8')
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _atender(self, handler):
+        with self._lock:
+            self.peticiones += 1
+        path, _, query = handler.path.partition('?')
+        if path == '/api/playlist':
+            pagina = int(query.split('page=')[1]) if 'page=' in query else 0
+            primero = pagina * self.page_size + 1
+            videos = list(range(primero, min(primero + self.page_size, self.videos + 1)))
+            return self._json(handler, {'title': 'Benchmark', 'videos': videos})
+        mobj = re.fullmatch(r'/api/video/(\d+)', path)
+        if mobj:
+            n = int(mobj.group(1))
+            return self._json(handler, {
+                'id': f'v{n}',
+                'title': f'Video {n}',
+                'url': f'{self.base_url}/media/{n}.mp4',
+                'filesize': self.size,
+            })
+        if re.fullmatch(r'/media/\d+\.mp4', path):
+            return self._enviar_medio(handler)
+        handler.send_error(404)
+
+    def _falla(self):
+        with self._lock:
+            if not self.fault_rate or self._random.random() >= self.fault_rate:
+                return None
+            self.fallas += 1
+            return self._random.choice(('503', 'corte'))
+
+    def _enviar_medio(self, handler):
+        inicio, fin = 0, self.size - 1
+        rango = re.fullmatch(r'bytes=(\d+)-(\d*)', handler.headers.get('Range') or '')
+        if rango:
+            inicio = int(rango.group(1))
+            fin = min(int(rango.group(2)), fin) if rango.group(2) else fin
+            if inicio > fin:
+                handler.send_response(416)
+                handler.send_header('Content-Range', f'bytes */{self.size}')
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+                return
+
+        falla = self._falla()
+        if falla == '503':
+            handler.send_error(503)
+            return
+        # Con un corte se envía la mitad de lo anunciado y se cierra la conexión
+        ultimo = inicio + (fin - inicio) // 2 if falla == 'corte' else fin
+
+        time.sleep(self.latency)
+        handler.send_response(206 if rango else 200)
+        handler.send_header('Content-Type', 'video/mp4')
+        handler.send_header('Accept-Ranges', 'bytes')
+        handler.send_header('Content-Length', str(fin - inicio + 1))
+        if rango:
+            handler.send_header('Content-Range', f'bytes {inicio}-{fin}/{self.size}')
+        handler.end_headers()
+
+        with self._lock:
+            if self.primer_byte is None:
+                self.primer_byte = time.monotonic()
+        enviado_desde = time.monotonic()
+        posicion, enviados = inicio, 0
+        try:
+            while posicion <= ultimo:
+                desde = posicion % len(BLOCK)
+                bloque = BLOCK[desde:desde + min(len(BLOCK) - desde, ultimo - posicion + 1)]
+                handler.wfile.write(bloque)
+                posicion += len(bloque)
+                enviados += len(bloque)
+                if self.rate:
+                    # Limitación simple por conexión: no adelantarse a `rate` bytes/s
+                    adelanto = enviados / self.rate - (time.monotonic() - enviado_desde)
+                    if adelanto > 0:
+                        time.sleep(adelanto)
+        except (BrokenPipeError, ConnectionResetError):
+            handler.close_connection = True
+        if falla == 'corte':
+            handler.close_connection = True
+
+
+# --- MEDICIONES ---
+class BenchmarkStats:
+    """Contadores compartidos entre el extractor, los hooks de progreso y el motor."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.extracciones = []
+            self.hook_llamadas = 0
+            self.hook_segundos = 0.0
+
+    def registrar_extraccion(self, segundos):
+        with self._lock:
+            self.extracciones.append(segundos)
+
+    def medir_hook(self, hook):
+        def medido(d):
+            inicio = time.perf_counter()
+            try:
+                return hook(d)
+            finally:
+                duracion = time.perf_counter() - inicio
+                with self._lock:
+                    self.hook_llamadas += 1
+                    self.hook_segundos += duracion
+        return medido
+
+
+class BenchmarkIE(InfoExtractor):
+    IE_NAME = 'benchmark'
+    _VALID_URL = r'(?P<base>https?://127\.0\.0\.1:\d+)/(?:(?P<playlist>playlist)|watch/(?P<id>\d+))'
+
+    def __init__(self, stats, downloader=None):
+        super().__init__(downloader)
+        self.stats = stats
+
+    def _real_extract(self, url):
+        mobj = self._match_valid_url(url)
+        base = mobj.group('base')
+        inicio = time.perf_counter()
+        if mobj.group('playlist'):
+            # Listado paginado y bajo demanda, como el de los canales grandes
+            data = self._download_json(f'{base}/api/playlist?page=0', 'playlist')
+            entries = OnDemandPagedList(functools.partial(self._pagina, base), len(data['videos']) or 1)
+            result = self.playlist_result(entries, 'benchmark', data['title'])
+        else:
+            data = self._download_json(f"{base}/api/video/{mobj.group('id')}", mobj.group('id'))
+            result = {
+                'id': data['id'],
+                'title': data['title'],
+                'url': data['url'],
+                'ext': 'mp4',
+                'filesize': data['filesize'],
+            }
+        self.stats.registrar_extraccion(time.perf_counter() - inicio)
+        return result
+
+    def _pagina(self, base, pagina):
+        inicio = time.perf_counter()
+        data = self._download_json(f'{base}/api/playlist?page={pagina}', f'página {pagina}')
+        self.stats.registrar_extraccion(time.perf_counter() - inicio)
+        for n in data['videos']:
+            yield self.url_result(f'{base}/watch/{n}', BenchmarkIE.ie_key(), f'v{n}', f'Video {n}')
+
+
+class PausaPP(PostProcessor):
+    """Post-procesado simulado (ocupa `segundos` como lo haría un merge de FFmpeg)."""
+
+    def __init__(self, segundos, downloader=None):
+        super().__init__(downloader)
+        self.segundos = segundos
+
+    def run(self, info):
+        time.sleep(self.segundos)
+        return [], info
+
+
+class BenchmarkEngine(DownloadEngine):
+    """
+    DownloadEngine con el extractor falso, sin FFmpeg real y con los hooks de
+    progreso cronometrados. El resto del camino (caché, playlists en paralelo,
+    segmentos, post-procesado en paralelo) es el mismo que usa la aplicación.
+    """
+
+    def __init__(self, stats, postprocess_delay=0.0, archive=False):
+        super().__init__()
+        self.stats = stats
+        self.postprocess_delay = postprocess_delay
+        self.metadata_cache = MetadataCache(os.path.abspath('metadata_cache'))
+        if not archive:
+            self.download_archive = None
+
+    def _asegurar_ffmpeg(self, progress_callback=None):
+        return True, ""
+
+    def _preparar(self, ydl):
+        ydl.add_info_extractor(BenchmarkIE(self.stats))
+        return ydl
+
+    def _crear_ydl_info(self, ydl_opts):
+        return self._preparar(self.network.attach(yt_dlp.YoutubeDL(ydl_opts, auto_init=False)))
+
+    def _crear_ydl(self, ydl_opts, pipeline=None, job_id=None, cancel_event=None, perfil=None):
+        perfil = perfil or self.format_profile
+        opts = dict(ydl_opts, quiet=True, noprogress=True)
+        media_lookup = None
+        if self.media_store is not None:
+            media_lookup = self._buscar_en_almacen(os.path.dirname(opts['outtmpl']), self._formato_almacen(perfil), job_id)
+        ydl = PipelinedYoutubeDL(opts, pipeline=pipeline, connections=self.get_segment_connections(),
+                                 throttle=self._throttle(job_id, cancel_event), auto_init=False,
+                                 format_plan=self._plan_formato(perfil), media_lookup=media_lookup)
+        self.network.attach(ydl)
+        self._seguir_archivos(ydl, job_id)
+        if self.postprocess_delay:
+            ydl.add_post_processor(PausaPP(self.postprocess_delay), when='post_process')
+        if self.media_store is not None:
+            ydl.add_post_processor(StoreMediaPP(self.media_store, self._formato_almacen(perfil)), when='after_move')
+        self._instrumentar(ydl, job_id)
+        ydl._progress_hooks = [self.stats.medir_hook(hook) for hook in ydl._progress_hooks]
+        return self._preparar(ydl)
+
+
+def _peak_rss_mib():
+    # ru_maxrss está en KiB en Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def _medir_salida(carpeta):
+    videos, total = 0, 0
+    for raiz, _, archivos in os.walk(carpeta):
+        for nombre in archivos:
+            if nombre.endswith('.mp4'):
+                videos += 1
+                total += os.path.getsize(os.path.join(raiz, nombre))
+    return videos, total
+
+
+def ejecutar_corrida(engine, origen, stats, numero, playlist_start=None, playlist_end=None, relleno=0):
+    """
+    Descarga la playlist completa una vez y retorna las métricas de la corrida. Con
+    `relleno`, la carpeta de la playlist ya tiene esa cantidad de archivos (como una
+    carpeta de archivo grande) antes de empezar.
+    """
+    carpeta = os.path.abspath('salida')
+    shutil.rmtree(carpeta, ignore_errors=True)
+    os.makedirs(carpeta)
+    if relleno:
+        carpeta_playlist = os.path.join(carpeta, engine._limpiar_titulo_playlist('Benchmark'))
+        os.makedirs(carpeta_playlist)
+        for n in range(relleno):
+            open(os.path.join(carpeta_playlist, f"archivo {n}.bin"), 'wb').close()
+    stats.reset()
+    origen.reset()
+    engine.metrics.reset()
+    engine.dead_letter.clear()
+
+    inicio = time.monotonic()
+    fallidos = engine.descargar(f"{origen.base_url}/playlist", carpeta, threading.Event(),
+                                playlist_start=playlist_start, playlist_end=playlist_end)
+    duracion = time.monotonic() - inicio
+
+    videos, total = _medir_salida(carpeta)
+    extracciones = [s * 1000 for s in stats.extracciones]
+    return {
+        'run': numero,
+        'wall_s': round(duracion, 3),
+        'videos': videos,
+        'failed': fallidos,
+        'bytes': total,
+        'videos_per_s': round(videos / duracion, 3) if duracion else None,
+        'mib_per_s': round(total / MIB / duracion, 2) if duracion else None,
+        'ttfb_s': round(origen.primer_byte - inicio, 4) if origen.primer_byte else None,
+        'origin_requests': origen.peticiones,
+        'origin_connections': origen.conexiones,
+        'origin_faults': origen.fallas,
+        'dead_letter': len(engine.dead_letter),
+        'extraction': {
+            'count': len(extracciones),
+            'mean_ms': round(sum(extracciones) / len(extracciones), 2) if extracciones else None,
+            'p95_ms': round(_percentil(extracciones, 0.95), 2) if extracciones else None,
+        },
+        'progress_hooks': {
+            'calls': stats.hook_llamadas,
+            'total_ms': round(stats.hook_segundos * 1000, 2),
+            'mean_us': round(stats.hook_segundos * 1e6 / stats.hook_llamadas, 2) if stats.hook_llamadas else None,
+            'share_of_wall': round(stats.hook_segundos / duracion, 5) if duracion else None,
+        },
+        'peak_rss_mib': _peak_rss_mib(),
+        'metrics': engine.metrics.snapshot(),
+    }
+
+
+def medir_clasificacion(engine, origen, cantidad, muestra):
+    """
+    Clasifica `cantidad` URLs de videos (más la playlist) con clasificar_urls y compara
+    con check_url_type de a una sobre las primeras `muestra`, siempre con la caché vacía.
+    """
+    urls = [f"{origen.base_url}/playlist"] + [f"{origen.base_url}/watch/{n}" for n in range(1, cantidad + 1)]
+    muestra = urls[:max(1, min(muestra, len(urls)))]
+
+    engine.metadata_cache.clear()
+    inicio = time.monotonic()
+    for url in muestra:
+        url_info = engine.check_url_type(url)
+        if url_info['es_playlist']:
+            url_info['entries'].close()
+    por_url = (time.monotonic() - inicio) / len(muestra)
+
+    engine.metadata_cache.clear()
+    origen.reset()
+    inicio = time.monotonic()
+    resultados = engine.clasificar_urls(urls)
+    duracion = time.monotonic() - inicio
+
+    return {
+        'urls': len(urls),
+        'concurrency': engine.get_classify_concurrency(),
+        'batch_s': round(duracion, 3),
+        'urls_per_s': round(len(urls) / duracion, 1) if duracion else None,
+        'errors': sum(1 for r in resultados if r['error']),
+        'origin_requests': origen.peticiones,
+        'origin_connections': origen.conexiones,
+        'sequential_sample': len(muestra),
+        'sequential_ms_per_url': round(por_url * 1000, 2),
+        'sequential_estimate_s': round(por_url * len(urls), 2),
+        'speedup': round(por_url * len(urls) / duracion, 1) if duracion else None,
+    }
+
+
+# --- ARRANQUE ---
+# Módulos que la ventana no debe importar al abrirse: los carga el hilo del motor
+MODULOS_PESADOS = ('yt_dlp', 'requests', 'download_engine', 'ffmpeg_manager')
+
+# Cada medición corre en un intérprete nuevo (importaciones en frío, sin las de este
+# benchmark) y escribe un JSON en la salida estándar.
+SCRIPT_VENTANA = """
+import sys, json, time
+t = time.perf_counter()
+import gui_components
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({'import_ms': ms, 'pesados': [m for m in %r if m in sys.modules]}))
+""" % (MODULOS_PESADOS,)
+
+SCRIPT_MOTOR = """
+import json, time
+t = time.perf_counter()
+import download_engine
+from progress_bus import ProgressBus
+importado = time.perf_counter()
+engine = download_engine.DownloadEngine(ProgressBus())
+creado = time.perf_counter()
+engine.cerrar(wait=True)
+print(json.dumps({'import_ms': (importado - t) * 1000, 'init_ms': (creado - importado) * 1000}))
+"""
+
+
+def _medir_script(script, carpeta):
+    """Corre `script` en un intérprete nuevo; retorna su JSON y el tiempo total del proceso en ms."""
+    entorno = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    t = time.perf_counter()
+    salida = subprocess.run([sys.executable, '-c', script], cwd=carpeta, env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    total = (time.perf_counter() - t) * 1000
+    datos = json.loads(salida.strip().splitlines()[-1])
+    datos['process_ms'] = total
+    return datos
+
+
+def medir_arranque(repeticiones, presupuesto_ms):
+    """
+    Mide el arranque en frío: lo que tarda en importarse la ventana (y que no arrastre
+    los módulos pesados) y lo que tarda el motor que se arma en segundo plano.
+    Retorna (resultado, ok); ok es False si la ventana supera `presupuesto_ms`.
+    """
+    carpeta = tempfile.mkdtemp(prefix="ytdl-startup-")
+    try:
+        ventana = [_medir_script(SCRIPT_VENTANA, carpeta) for _ in range(repeticiones)]
+        motor = [_medir_script(SCRIPT_MOTOR, carpeta) for _ in range(repeticiones)]
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    def mediana(muestras, clave):
+        return round(statistics.median(m[clave] for m in muestras), 1)
+
+    pesados = sorted({m for muestra in ventana for m in muestra['pesados']})
+    resultado = {
+        'runs': repeticiones,
+        'budget_ms': presupuesto_ms,
+        'window': {
+            'import_ms': mediana(ventana, 'import_ms'),
+            'process_ms': mediana(ventana, 'process_ms'),
+            'eager_heavy_modules': pesados,
+        },
+        'engine': {
+            'import_ms': mediana(motor, 'import_ms'),
+            'init_ms': mediana(motor, 'init_ms'),
+            'process_ms': mediana(motor, 'process_ms'),
+        },
+    }
+    ok = True
+    if pesados:
+        print(f"La ventana importa al abrirse: {', '.join(pesados)}", file=sys.stderr)
+        ok = False
+    if resultado['window']['process_ms'] > presupuesto_ms:
+        print(f"Arranque de la ventana: {resultado['window']['process_ms']} ms (presupuesto {presupuesto_ms} ms)",
+              file=sys.stderr)
+        ok = False
+    return resultado, ok
+
+
+def comparar(resultado, base_path, tolerancia):
+    """Compara la última corrida con la de un JSON anterior. Retorna False si hay una regresión."""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)['runs'][-1]
+    actual = resultado['runs'][-1]
+    ok = True
+    for clave, mayor_es_mejor in (('videos_per_s', True), ('mib_per_s', True), ('ttfb_s', False), ('peak_rss_mib', False)):
+        antes, ahora = base.get(clave), actual.get(clave)
+        if not antes or ahora is None:
+            continue
+        cambio = (ahora - antes) / antes
+        print(f"{clave}: {antes} -> {ahora} ({cambio:+.1%})", file=sys.stderr)
+        if clave == 'videos_per_s' and cambio < -tolerancia:
+            ok = False
+    return ok
+
+
+def _escribir_resultado(resultado, output):
+    texto = json.dumps(resultado, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del camino de descarga contra un origen local falso.")
+    parser.add_argument('--videos', type=int, default=8, help="Videos de la playlist falsa.")
+    parser.add_argument('--size-mib', type=float, default=16, help="Tamaño de cada video en MiB.")
+    parser.add_argument('--page-size', type=int, default=50, help="Videos por página del listado de la playlist.")
+    parser.add_argument('--playlist-start', type=int, help="Primer video a descargar (1 = el primero).")
+    parser.add_argument('--playlist-end', type=int, help="Último video a descargar.")
+    parser.add_argument('--runs', type=int, default=2, help="Corridas seguidas (la caché queda caliente después de la primera).")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Demora del primer byte de cada medio.")
+    parser.add_argument('--extract-latency-ms', type=float, default=20, help="Demora de cada respuesta de la API.")
+    parser.add_argument('--rate-mib', type=float, default=0, help="Límite de MiB/s por conexión (0 = sin límite).")
+    parser.add_argument('--fault-rate', type=float, default=0, help="Fracción de peticiones de medios que fallan (503 o corte).")
+    parser.add_argument('--postprocess-delay-ms', type=float, default=0, help="Post-procesado simulado por video.")
+    parser.add_argument('--parallel-workers', type=int, help="Sobrescribe 'parallel_workers'.")
+    parser.add_argument('--segment-connections', type=int, help="Sobrescribe 'segment_connections'.")
+    parser.add_argument('--postprocess-workers', type=int, help="Sobrescribe 'postprocess_workers'.")
+    parser.add_argument('--no-shared-session', action='store_true',
+                        help="Cada instancia de YoutubeDL con sus propias conexiones (como antes de la red compartida).")
+    parser.add_argument('--retries', type=int, help="Sobrescribe 'retries' (reintentos de cada video y segmento).")
+    parser.add_argument('--classify-urls', type=int, default=0,
+                        help="Además, clasifica esta cantidad de URLs en lote y la compara con la verificación de a una.")
+    parser.add_argument('--classify-sample', type=int, default=50,
+                        help="URLs verificadas de a una para estimar el tiempo secuencial de --classify-urls.")
+    parser.add_argument('--classify-concurrency', type=int, help="Sobrescribe 'classify_concurrency'.")
+    parser.add_argument('--limit-rate', help="Límite global de velocidad del motor (p. ej. 5M).")
+    parser.add_argument('--job-limit-rate', help="Límite de velocidad por trabajo (p. ej. 2M).")
+    parser.add_argument('--filler-files', type=int, default=0,
+                        help="Archivos que ya hay en la carpeta de la playlist antes de cada corrida (mide la limpieza en carpetas grandes).")
+    parser.add_argument('--output-index', action='store_true', help="Usa el índice de los archivos de salida ('output_index').")
+    parser.add_argument('--media-store', action='store_true',
+                        help="Usa el almacén de medios (desde la segunda corrida los videos se enlazan sin bajarlos).")
+    parser.add_argument('--archive', action='store_true', help="Usa el archivo de descargas (las corridas siguientes omiten todo).")
+    parser.add_argument('--startup', action='store_true',
+                        help="Solo mide el arranque en frío de la ventana y del motor (falla si supera --startup-budget-ms).")
+    parser.add_argument('--startup-runs', type=int, default=5, help="Repeticiones de --startup (se informa la mediana).")
+    parser.add_argument('--startup-budget-ms', type=float, default=1000, help="Tiempo máximo de arranque de la ventana.")
+    parser.add_argument('--output', help="Archivo JSON de resultados (por defecto, la salida estándar).")
+    parser.add_argument('--compare', help="JSON de una corrida anterior para detectar regresiones.")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Caída de videos/s tolerada con --compare (0.1 = 10%%).")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        resultado, ok = medir_arranque(max(1, args.startup_runs), args.startup_budget_ms)
+        _escribir_resultado(resultado, args.output)
+        return 0 if ok else 1
+
+    settings = {
+        'parallel_workers': args.parallel_workers,
+        'segment_connections': args.segment_connections,
+        'postprocess_workers': args.postprocess_workers,
+        'classify_concurrency': args.classify_concurrency,
+    }
+    origen = FakeOrigin(args.videos, int(args.size_mib * MIB), args.latency_ms / 1000,
+                        args.extract_latency_ms / 1000, int(args.rate_mib * MIB), args.page_size,
+                        args.fault_rate).start()
+    stats = BenchmarkStats()
+    directorio_original = os.getcwd()
+    trabajo = tempfile.mkdtemp(prefix="ytdl-benchmark-")
+    engine = None
+    try:
+        # config.ini, caché, cola y archivo de descargas quedan aislados en la carpeta temporal
+        os.chdir(trabajo)
+        engine = BenchmarkEngine(stats, args.postprocess_delay_ms / 1000, archive=args.archive)
+        if 'Settings' not in download_engine.config:
+            download_engine.config['Settings'] = {}
+        for clave, valor in settings.items():
+            if valor is not None:
+                download_engine.config['Settings'][clave] = str(valor)
+        engine.ajustar_limites_velocidad(parse_rate(args.limit_rate), parse_rate(args.job_limit_rate), guardar=False)
+        if args.retries is not None:
+            engine.retry_policy.retries = args.retries
+        if args.no_shared_session:
+            # Con la sesión cerrada, attach() deja cada instancia con su propio director
+            engine.network.close()
+        if args.output_index:
+            engine.output_index = OutputIndex(os.path.abspath(OUTPUT_INDEX_FILE))
+        if args.media_store:
+            engine.media_store = MediaStore(os.path.abspath('media_store'), engine.get_media_store_link())
+
+        resultado = {
+            'config': dict(vars(args), effective={
+                'parallel_workers': engine.get_parallel_workers(),
+                'segment_connections': engine.get_segment_connections(),
+                'postprocess_workers': engine.get_postprocess_workers(),
+                'max_download_rate': engine.bandwidth.global_rate,
+                'job_download_rate': engine.bandwidth.default_job_rate,
+                'retries': engine.retry_policy.retries,
+                'classify_concurrency': engine.get_classify_concurrency(),
+            }),
+            'runs': [ejecutar_corrida(engine, origen, stats, n, args.playlist_start, args.playlist_end, args.filler_files)
+                     for n in range(1, args.runs + 1)],
+        }
+        if args.classify_urls:
+            resultado['classify'] = medir_clasificacion(engine, origen, args.classify_urls, args.classify_sample)
+    finally:
+        if engine is not None:
+            engine.cerrar(wait=True)
+        os.chdir(directorio_original)
+        shutil.rmtree(trabajo, ignore_errors=True)
+        origen.stop()
+
+    _escribir_resultado(resultado, args.output)
+
+    if args.compare and not comparar(resultado, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
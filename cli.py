@@ -0,0 +1,504 @@
+import os
+import sys
+import time
+import signal
+import json
+import argparse
+import threading
+from download_engine import DownloadEngine, DownloadCancelledError, DependencyError, parse_playlist_range
+from download_queue import parse_url_list, load_url_file, PENDIENTE, EN_CURSO, FALLIDO
+from bandwidth import parse_rate, format_rate
+from format_planner import PERFILES
+from ffmpeg_manager import PERFILES_POSTPROCESO
+from job_broker import abrir_broker
+
+# Modo sin interfaz gráfica. Este módulo (y todo lo que importa) no debe importar
+# tkinter ni customtkinter, para poder correr en servidores sin display.
+
+# Cada cuántos segundos se revisa la carpeta spool en modo daemon
+SPOOL_POLL_SECONDS = 5
+# Archivos de la carpeta spool que se leen como listas de URLs (el resto se ignora,
+# por ejemplo los .tmp que todavía se están escribiendo)
+SPOOL_EXTENSIONS = ('.txt', '.csv', '.url')
+SPOOL_DONE_DIR = "procesados"
+
+# Comandos que el daemon acepta por la entrada estándar para cambiar la velocidad en caliente
+LIMIT_COMMANDS = {'limit': 'global_rate', 'job-limit': 'job_rate'}
+# Comando del daemon para volver a encolar todas las descargas fallidas
+RETRY_COMMAND = 'retry'
+# Cada cuántos segundos se revisa si la cola terminó (--retry-failed sin daemon)
+QUEUE_POLL_SECONDS = 0.5
+# Cada cuántos segundos el coordinador (--distribute) consulta el avance de sus tareas
+DISTRIBUTE_POLL_SECONDS = 5
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Descarga videos y playlists sin interfaz gráfica. Sin argumentos se abre la GUI.")
+    parser.add_argument("urls", nargs="*", help="URLs a descargar")
+    parser.add_argument("-o", "--output", help="carpeta de destino (por defecto, la última usada o ~/Videos)")
+    parser.add_argument("--stdin", action="store_true",
+                        help="leer URLs desde la entrada estándar (con --daemon también acepta 'limit 5M', 'job-limit 2M' y 'retry')")
+    parser.add_argument("--playlist-start", help="primer video de la playlist a descargar")
+    parser.add_argument("--playlist-end", help="último video de la playlist a descargar")
+    parser.add_argument("--daemon", action="store_true",
+                        help="quedarse en ejecución procesando la cola persistente")
+    parser.add_argument("--spool", help="(daemon) carpeta a vigilar: cada .txt/.csv/.url se agrega a la cola")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="volver a intentar de una vez todas las descargas fallidas (cola y lista de fallidos)")
+    parser.add_argument("--classify", action="store_true",
+                        help="no descargar: clasificar las URLs en paralelo e imprimir un JSON por línea (tipo, título, videos, formatos)")
+    parser.add_argument("--broker",
+                        help="broker del modo distribuido: sqlite:///ruta.db o redis://host:6379/0 (por defecto, 'broker' de config.ini)")
+    parser.add_argument("--distribute", action="store_true",
+                        help="no descargar: publicar en el broker una tarea por video y seguir su avance hasta que los workers terminen")
+    parser.add_argument("--worker", action="store_true",
+                        help="tomar tareas del broker y descargarlas hasta recibir SIGINT/SIGTERM (con -o, en esa carpeta)")
+    parser.add_argument("--worker-slots", type=int, help="(worker) tareas a la vez (por defecto, 'queue_concurrency')")
+    parser.add_argument("--broker-status", action="store_true", help="mostrar cuántas tareas hay en cada estado en el broker")
+    parser.add_argument("--subscribe", action="store_true",
+                        help="suscribirse a los canales/playlists indicados: el daemon (o --sync) baja solo sus videos nuevos en -o")
+    parser.add_argument("--only-new", action="store_true",
+                        help="(subscribe) no bajar lo que ya está publicado, solo lo que aparezca desde ahora")
+    parser.add_argument("--full-listing", action="store_true",
+                        help="(subscribe) recorrer el listado completo en cada sondeo (playlists que agregan los videos al final)")
+    parser.add_argument("--interval", type=float, metavar="HORAS",
+                        help="(subscribe) horas entre dos sondeos (por defecto, 'subscription_interval' de config.ini)")
+    parser.add_argument("--unsubscribe", action="store_true", help="quitar las suscripciones indicadas (por URL o ID)")
+    parser.add_argument("--subscriptions", action="store_true", help="listar las suscripciones, un JSON por línea")
+    parser.add_argument("--sync", action="store_true",
+                        help="sondear ya todas las suscripciones y bajar lo nuevo (con --daemon, además se siguen sondeando solas)")
+    parser.add_argument("--format-profile", choices=list(PERFILES),
+                        help="qué formato elegir: compatible (mp4, por defecto), fastest, smallest, archive o audio")
+    parser.add_argument("--postprocess", choices=list(PERFILES_POSTPROCESO),
+                        help="qué hacer con cada archivo descargado: remux (a mp4 sin recodificar), mp3 u opus (solo el audio) o transcode (H.264/AAC)")
+    parser.add_argument("--limit-rate", help="velocidad máxima total, p. ej. 5M o 500K (por defecto, la de config.ini)")
+    parser.add_argument("--job-limit-rate", help="velocidad máxima de cada descarga, p. ej. 2M")
+    parser.add_argument("--metrics-log", help="agrega a este archivo un evento JSON por cada etapa de cada descarga")
+    parser.add_argument("--metrics-file", help="escribe las métricas en formato Prometheus en este archivo")
+    parser.add_argument("--metrics-port", type=int, help="sirve las métricas en http://127.0.0.1:PUERTO/metrics")
+    parser.add_argument("--profile", metavar="CARPETA", help="guarda en CARPETA un perfil de CPU y memoria de cada descarga")
+    parser.add_argument("--quiet", action="store_true", help="no mostrar el progreso")
+    return parser
+
+
+def _imprimir_progreso(engine, stop_event, intervalo=0.5):
+    """Consume el bus de progreso y muestra un resumen por trabajo cada `intervalo` segundos."""
+    version = 0
+    ultimo = {}
+    while True:
+        detener = stop_event.is_set()
+        version, cambios = engine.progress_bus.changes_since(version)
+        for state in cambios:
+            texto = engine.texto_estado(state)
+            if ultimo.get(state.job_id) != texto:
+                ultimo[state.job_id] = texto
+                print(f"[{state.job_id[:8]}] {texto}", file=sys.stderr)
+        if detener:
+            return
+        stop_event.wait(intervalo)
+
+
+def run_once(engine, urls, carpeta_destino, playlist_start=None, playlist_end=None):
+    """Descarga las URLs una tras otra. Retorna el código de salida del proceso."""
+    cancel_event = threading.Event()
+    resultado = {'errores': 0}
+
+    def tarea():
+        for url in urls:
+            if cancel_event.is_set():
+                return
+            try:
+                fallidos = engine.descargar(url, carpeta_destino, cancel_event,
+                                            playlist_start=playlist_start, playlist_end=playlist_end)
+                if fallidos:
+                    resultado['errores'] += 1
+            except DownloadCancelledError:
+                return
+            except DependencyError as e:
+                print(f"Error de dependencias: {e}", file=sys.stderr)
+                resultado['errores'] += 1
+                return
+            except Exception:
+                # El motor ya publicó y mostró el error; se sigue con la siguiente URL
+                resultado['errores'] += 1
+
+    hilo = threading.Thread(target=tarea, name="descarga")
+    hilo.start()
+    try:
+        while hilo.is_alive():
+            hilo.join(0.2)
+    except KeyboardInterrupt:
+        print("Cancelando descarga...", file=sys.stderr)
+        cancel_event.set()
+        hilo.join()
+        return 130
+    return 1 if resultado['errores'] else 0
+
+
+def run_classify(engine, urls):
+    """
+    Clasifica las URLs sin descargarlas e imprime un resultado JSON por línea en la
+    salida estándar a medida que terminan. Retorna el código de salida del proceso.
+    """
+    cancel_event = threading.Event()
+    inicio = time.perf_counter()
+
+    def imprimir(resultado):
+        print(json.dumps(resultado, ensure_ascii=False), flush=True)
+
+    try:
+        resultados = engine.clasificar_urls(urls, on_result=imprimir, cancel_event=cancel_event)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        return 130
+    finally:
+        engine.metrics.flush()
+    errores = sum(1 for r in resultados if r['error'])
+    print(f"{len(resultados)} URL(s) clasificadas en {time.perf_counter() - inicio:.1f} s ({errores} con error)", file=sys.stderr)
+    return 1 if errores else 0
+
+
+def _reintentar_fallidos(engine):
+    cantidad = engine.reintentar_fallidos()
+    if cantidad:
+        print(f"{cantidad} descarga(s) fallida(s) de nuevo en la cola.", file=sys.stderr)
+    else:
+        print("No hay descargas fallidas para reintentar.", file=sys.stderr)
+    return cantidad
+
+
+def run_retry_failed(engine, urls, carpeta_destino):
+    """
+    Reintenta en una tanda todo lo que falló (más las `urls` nuevas, si hay) y espera
+    a que la cola termine. Retorna el código de salida del proceso.
+    """
+    if urls:
+        engine.encolar_lista(urls, carpeta_destino)
+    if not _reintentar_fallidos(engine) and not urls:
+        return 0
+    return _esperar_cola(engine)
+
+
+def _esperar_cola(engine):
+    """
+    Procesa la cola hasta que no quede nada pendiente. Retorna el código de salida del
+    proceso: 1 si falló alguno de los trabajos de esta ejecución (los que fallaron en
+    sesiones anteriores y siguen en el journal no cuentan).
+    """
+    cola = engine.download_queue
+    de_esta_ejecucion = [job['id'] for job in list(cola.jobs.values()) if job['estado'] in (PENDIENTE, EN_CURSO)]
+    engine.iniciar_cola()
+    try:
+        while True:
+            resumen = cola.resumen()
+            if not resumen[PENDIENTE] and not resumen[EN_CURSO]:
+                break
+            time.sleep(QUEUE_POLL_SECONDS)
+    except KeyboardInterrupt:
+        print("Deteniendo la cola...", file=sys.stderr)
+        engine.detener_cola(wait=True)
+        return 130
+    engine.detener_cola(wait=True)
+    # Una playlist se completa aunque alguna entrada haya ido a la lista de fallidos
+    fallidos = [job for job in (cola.jobs.get(job_id) for job_id in de_esta_ejecucion)
+                if job and (job['estado'] == FALLIDO or job.get('entradas_fallidas'))]
+    return 1 if fallidos else 0
+
+
+def run_subscribe(engine, urls, carpeta_destino, perfil=None, horas=None, solo_nuevos=False, completo=False):
+    """Agrega (o actualiza) una suscripción por URL. Retorna el código de salida del proceso."""
+    intervalo = horas * 3600 if horas else None
+    for url in urls:
+        sub = engine.suscribir(url, carpeta_destino, perfil, intervalo, solo_nuevos, completo)
+        print(f"Suscripción {sub['id'][:8]}: {url} -> {carpeta_destino} ({sub['perfil']})", file=sys.stderr)
+    return 0
+
+
+def run_unsubscribe(engine, claves):
+    errores = 0
+    for clave in claves:
+        if engine.desuscribir(clave):
+            print(f"Suscripción quitada: {clave}", file=sys.stderr)
+        else:
+            print(f"No hay ninguna suscripción {clave}", file=sys.stderr)
+            errores += 1
+    return 1 if errores else 0
+
+
+def run_sync(engine):
+    """Sondea ya todas las suscripciones y espera a que la cola baje lo nuevo."""
+    if not len(engine.suscripciones):
+        print("No hay suscripciones (usa --subscribe).", file=sys.stderr)
+        return 0
+    if not engine.sincronizar_suscripciones():
+        print("No hay videos nuevos.", file=sys.stderr)
+        return 0
+    return _esperar_cola(engine)
+
+
+def _sumar_resumenes(resumenes):
+    total = {}
+    for resumen in resumenes:
+        for estado, cantidad in resumen.items():
+            total[estado] = total.get(estado, 0) + cantidad
+    return total
+
+
+def run_distribute(engine, broker, urls, carpeta_destino, playlist_start=None, playlist_end=None):
+    """
+    Coordinador: publica una tarea por video de cada URL y espera a que los workers
+    terminen, mostrando el avance. Retorna el código de salida del proceso.
+    """
+    cancel_event = threading.Event()
+    lotes = []
+    try:
+        for url in urls:
+            try:
+                lote, cantidad = engine.publicar_en_broker(broker, url, carpeta_destino, cancel_event,
+                                                           playlist_start, playlist_end)
+            except Exception as e:
+                print(f"No se pudo publicar {url}: {engine.mensaje_error(e)}", file=sys.stderr)
+                continue
+            lotes.append(lote)
+            print(f"{cantidad} tarea(s) publicadas para {url} (lote {lote})", file=sys.stderr)
+        if not lotes:
+            return 1
+
+        anterior = None
+        while True:
+            resumen = _sumar_resumenes(broker.resumen(lote) for lote in lotes)
+            if resumen != anterior:
+                anterior = resumen
+                print(f"Tareas: {resumen['pending']} pendientes, {resumen['running']} en curso, "
+                      f"{resumen['done']} completadas, {resumen['error']} con error", file=sys.stderr)
+            if not resumen['pending'] and not resumen['running']:
+                break
+            time.sleep(DISTRIBUTE_POLL_SECONDS)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        print("Coordinador detenido; las tareas publicadas siguen en el broker.", file=sys.stderr)
+        return 130
+    return 1 if resumen['error'] else 0
+
+
+def run_worker(engine, broker, carpeta_destino=None, slots=None):
+    """Toma y descarga tareas del broker hasta recibir SIGINT/SIGTERM."""
+    stop_event = threading.Event()
+
+    def detener(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, detener)
+    signal.signal(signal.SIGTERM, detener)
+
+    worker = engine.crear_worker(broker, slots=slots, carpeta_destino=carpeta_destino)
+    worker.start()
+    print(f"Worker {worker.worker_id} iniciado con {worker.slots} hilo(s).", file=sys.stderr)
+    stop_event.wait()
+    print("Deteniendo el worker (las tareas en curso vuelven al broker)...", file=sys.stderr)
+    worker.stop(wait=True)
+    return 0
+
+
+def _procesar_spool(engine, spool_dir, carpeta_destino):
+    """Agrega a la cola las URLs de cada archivo nuevo de la carpeta spool y lo mueve a 'procesados'."""
+    done_dir = os.path.join(spool_dir, SPOOL_DONE_DIR)
+    archivos = [e for e in os.scandir(spool_dir) if e.is_file() and e.name.lower().endswith(SPOOL_EXTENSIONS)]
+    for entry in sorted(archivos, key=lambda e: e.stat().st_mtime):
+        try:
+            urls = load_url_file(entry.path)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"No se pudo leer {entry.path}: {e}", file=sys.stderr)
+            continue
+        engine.encolar_lista(urls, carpeta_destino)
+        os.makedirs(done_dir, exist_ok=True)
+        os.replace(entry.path, os.path.join(done_dir, entry.name))
+        print(f"{len(urls)} URL(s) agregadas desde {entry.name}", file=sys.stderr)
+
+
+def _comando_limite(engine, linea):
+    """
+    Atiende una línea "limit 5M" o "job-limit 2M" (0 = sin límite) de la entrada
+    estándar del daemon. Retorna False si la línea no es un comando.
+    """
+    partes = linea.split()
+    if len(partes) != 2 or partes[0].lower() not in LIMIT_COMMANDS:
+        return False
+    try:
+        rate = parse_rate(partes[1])
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return True
+    engine.ajustar_limites_velocidad(**{LIMIT_COMMANDS[partes[0].lower()]: rate}, guardar=False)
+    print(f"Límite {partes[0].lower()}: {format_rate(rate)}", file=sys.stderr)
+    return True
+
+
+def run_daemon(engine, urls, carpeta_destino, spool_dir=None, read_stdin=False, retry_failed=False, sync=False):
+    """Procesa la cola persistente y sondea las suscripciones hasta recibir SIGINT/SIGTERM."""
+    stop_event = threading.Event()
+
+    def detener(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, detener)
+    signal.signal(signal.SIGTERM, detener)
+
+    if urls:
+        engine.encolar_lista(urls, carpeta_destino)
+    if retry_failed:
+        _reintentar_fallidos(engine)
+
+    if read_stdin:
+        def leer_stdin():
+            for linea in sys.stdin:
+                if _comando_limite(engine, linea):
+                    continue
+                if linea.strip().lower() == RETRY_COMMAND:
+                    _reintentar_fallidos(engine)
+                    continue
+                nuevas = parse_url_list(linea)
+                if nuevas:
+                    engine.encolar_lista(nuevas, carpeta_destino)
+        threading.Thread(target=leer_stdin, name="stdin", daemon=True).start()
+
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+
+    engine.iniciar_cola()
+    if sync:
+        engine.sincronizar_suscripciones()
+    engine.iniciar_suscripciones()
+    print(f"Daemon iniciado. Destino: {carpeta_destino}" + (f" | Spool: {spool_dir}" if spool_dir else "")
+          + f" | Suscripciones: {len(engine.suscripciones)}", file=sys.stderr)
+    while not stop_event.is_set():
+        if spool_dir:
+            _procesar_spool(engine, spool_dir, carpeta_destino)
+        stop_event.wait(SPOOL_POLL_SECONDS)
+
+    print("Deteniendo la cola (los trabajos en curso se retoman en el próximo arranque)...", file=sys.stderr)
+    engine.detener_suscripciones()
+    engine.detener_cola(wait=True)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    def mostrar_cola(resumen):
+        if not args.quiet:
+            print(f"Cola: {resumen['pending']} pendientes, {resumen['running']} en curso, "
+                  f"{resumen['done']} completados, {resumen['error']} con error", file=sys.stderr)
+
+    engine = DownloadEngine(on_queue_change=mostrar_cola)
+    try:
+        return _ejecutar(engine, args)
+    finally:
+        # Libera las conexiones compartidas y el resto de lo que vive con el motor
+        engine.cerrar()
+
+
+def _ejecutar(engine, args):
+    carpeta_destino = args.output or engine.get_last_download_path() or engine.get_user_videos_dir()
+    os.makedirs(carpeta_destino, exist_ok=True)
+
+    try:
+        playlist_start, playlist_end = parse_playlist_range(args.playlist_start, args.playlist_end)
+        # Los límites de la línea de comandos valen para esta ejecución (no se guardan)
+        engine.ajustar_limites_velocidad(
+            parse_rate(args.limit_rate) if args.limit_rate is not None else None,
+            parse_rate(args.job_limit_rate) if args.job_limit_rate is not None else None,
+            guardar=False)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.format_profile:
+        engine.ajustar_perfil_formato(args.format_profile, guardar=False)
+    if args.postprocess:
+        engine.ajustar_perfil_postproceso(args.postprocess, guardar=False)
+    if args.metrics_log:
+        engine.metrics.log_path = args.metrics_log
+    if args.metrics_file:
+        engine.metrics.prometheus_path = args.metrics_file
+    if args.profile:
+        engine.profile_dir = args.profile
+    if args.metrics_port and engine.metrics_server is None:
+        engine.iniciar_servidor_metricas(args.metrics_port)
+
+    urls = list(args.urls)
+    if args.stdin and not args.daemon:
+        urls += parse_url_list(sys.stdin.read())
+
+    broker = None
+    if args.distribute or args.worker or args.broker_status:
+        url_broker = args.broker or engine.get_broker_url()
+        if not url_broker:
+            print("Falta el broker (--broker o 'broker' en config.ini).", file=sys.stderr)
+            return 2
+        try:
+            broker = abrir_broker(url_broker)
+        except Exception as e:
+            print(f"No se pudo abrir el broker: {e}", file=sys.stderr)
+            return 2
+    try:
+        return _ejecutar_modo(engine, args, urls, carpeta_destino, playlist_start, playlist_end, broker)
+    finally:
+        if broker is not None:
+            broker.close()
+
+
+def _ejecutar_modo(engine, args, urls, carpeta_destino, playlist_start, playlist_end, broker):
+    if args.broker_status:
+        print(json.dumps(broker.resumen()))
+        return 0
+
+    if args.subscriptions:
+        for sub in engine.suscripciones.entries():
+            print(json.dumps(sub, ensure_ascii=False))
+        return 0
+    if args.subscribe or args.unsubscribe:
+        if not urls:
+            print("No se indicaron URLs de canales o playlists.", file=sys.stderr)
+            return 2
+        if args.unsubscribe:
+            return run_unsubscribe(engine, urls)
+        return run_subscribe(engine, urls, carpeta_destino, args.format_profile, args.interval,
+                             args.only_new, args.full_listing)
+
+    if args.classify:
+        if not urls:
+            print("No se indicaron URLs para clasificar.", file=sys.stderr)
+            return 2
+        return run_classify(engine, urls)
+    if args.retry_failed and not args.daemon:
+        return run_retry_failed(engine, urls, carpeta_destino)
+    if args.distribute and not urls:
+        print("No se indicaron URLs para distribuir.", file=sys.stderr)
+        return 2
+    if not args.daemon and not args.worker and not args.sync and not urls:
+        print("No se indicaron URLs (usa argumentos, --stdin, --daemon, --sync o --worker).", file=sys.stderr)
+        return 2
+
+    stop_progreso = threading.Event()
+    hilo_progreso = threading.Thread(target=_imprimir_progreso, args=(engine, stop_progreso), name="progreso", daemon=True)
+    if not args.quiet:
+        hilo_progreso.start()
+
+    try:
+        if args.distribute:
+            return run_distribute(engine, broker, urls, carpeta_destino, playlist_start, playlist_end)
+        if args.worker:
+            return run_worker(engine, broker, args.output, args.worker_slots)
+        if args.daemon:
+            return run_daemon(engine, urls, carpeta_destino, args.spool, args.stdin, args.retry_failed, args.sync)
+        if args.sync:
+            return run_sync(engine)
+        return run_once(engine, urls, carpeta_destino, playlist_start, playlist_end)
+    finally:
+        # Último vaciado del bus para no perder el mensaje final
+        stop_progreso.set()
+        if hilo_progreso.is_alive():
+            hilo_progreso.join()
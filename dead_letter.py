@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import time
+import threading
+
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+
+
+class DeadLetterList:
+    """
+    Lista persistente de las entradas que fallaron después de agotar los reintentos
+    (o con un error permanente), para volver a intentarlas todas juntas más tarde.
+
+    Se guarda como JSON por líneas (una por URL, la última gana), igual que el
+    journal de la cola: agregar es una escritura al final y `_compactar` reescribe
+    el archivo de forma atómica al quitar entradas.
+    """
+
+    def __init__(self, path=DEAD_LETTER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entradas = None
+
+    def _cargar(self):
+        if self._entradas is None:
+            entradas = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for linea in f:
+                        linea = linea.strip()
+                        if not linea:
+                            continue
+                        try:
+                            registro = json.loads(linea)
+                        except ValueError:
+                            continue
+                        entradas[registro['url']] = registro
+            self._entradas = entradas
+        return self._entradas
+
+    def _compactar(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for registro in self._entradas.values():
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cargar())
+
+    def entries(self):
+        with self._lock:
+            return list(self._cargar().values())
+
+    def add(self, url, carpeta, error, tipo, intentos=1, titulo=None, playlist=None):
+        """Registra (o actualiza) una entrada fallida. `tipo` es 'transient' o 'permanent'."""
+        with self._lock:
+            anterior = self._cargar().get(url) or {}
+            registro = {
+                'url': url,
+                'carpeta': carpeta,
+                'titulo': titulo or anterior.get('titulo'),
+                'playlist': playlist or anterior.get('playlist'),
+                'error': error,
+                'tipo': tipo,
+                'intentos': anterior.get('intentos', 0) + intentos,
+                'fallado': time.time(),
+            }
+            self._entradas[url] = registro
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"No se pudo guardar {self.path}: {e}", file=sys.stderr)
+
+    def remove(self, urls):
+        with self._lock:
+            entradas = self._cargar()
+            quitadas = [url for url in urls if entradas.pop(url, None) is not None]
+            if quitadas:
+                self._compactar()
+            return len(quitadas)
+
+    def clear(self):
+        with self._lock:
+            self._cargar().clear()
+            self._compactar()
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import socket
+import threading
+from job_broker import DEFAULT_LEASE_SECONDS
+
+# Cada cuántos segundos un worker sin tareas vuelve a preguntarle al broker
+POLL_SECONDS = 2
+
+
+def default_worker_id():
+    """Identificador del worker en el broker: máquina y proceso."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DistributedWorker:
+    """
+    Toma tareas de un broker (ver job_broker) con hasta `slots` hilos a la vez.
+
+    `runner(tarea, cancel_event)` hace la descarga y lanza una excepción si falla;
+    `on_error(error)` dice si el error se puede reintentar en otro worker.
+    Mientras corre, un hilo renueva el lease cada tercio de `lease` y de paso informa
+    `progreso(tarea)` -> (fracción o None, mensaje). Si el broker responde que la tarea
+    ya no es de este worker (el lease venció y la tomó otro), se cancela la descarga.
+    Al detenerse, las tareas en curso se devuelven al broker sin gastar un intento.
+    """
+
+    def __init__(self, broker, runner, worker_id=None, slots=1, lease=DEFAULT_LEASE_SECONDS, progreso=None, on_error=None):
+        self.broker = broker
+        self.runner = runner
+        self.worker_id = worker_id or default_worker_id()
+        self.slots = max(1, int(slots))
+        self.lease = lease
+        self.progreso = progreso
+        self.on_error = on_error
+        self.stop_event = threading.Event()
+        self._hilos = []
+
+    def start(self):
+        """Arranca los hilos (no bloquea)."""
+        if self._hilos:
+            return
+        self.stop_event.clear()
+        for i in range(self.slots):
+            hilo = threading.Thread(target=self._worker, name=f"worker-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def stop(self, wait=False):
+        self.stop_event.set()
+        if wait:
+            for hilo in self._hilos:
+                hilo.join()
+        self._hilos = []
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            try:
+                tarea = self.broker.tomar(self.worker_id, self.lease)
+            except Exception as e:
+                # Broker caído o bloqueado: se vuelve a intentar en un rato
+                print(f"No se pudo tomar una tarea del broker: {e}", file=sys.stderr)
+                tarea = None
+            if tarea is None:
+                self.stop_event.wait(POLL_SECONDS)
+                continue
+            self._ejecutar(tarea)
+
+    def _renovar(self, tarea, cancel_event, terminado):
+        proxima = time.monotonic() + self.lease / 3
+        while not terminado.wait(min(POLL_SECONDS, self.lease / 3)):
+            if self.stop_event.is_set():
+                # Si el worker se detiene, la descarga en curso también
+                cancel_event.set()
+            if time.monotonic() < proxima:
+                continue
+            proxima = time.monotonic() + self.lease / 3
+            fraccion, mensaje = self.progreso(tarea) if self.progreso else (None, None)
+            try:
+                vigente = self.broker.renovar(tarea, self.lease, fraccion, mensaje)
+            except Exception as e:
+                print(f"No se pudo renovar el lease de {tarea['id']}: {e}", file=sys.stderr)
+                continue
+            if not vigente:
+                print(f"La tarea {tarea['id']} pasó a otro worker; se cancela aquí.", file=sys.stderr)
+                cancel_event.set()
+                return
+
+    def _ejecutar(self, tarea):
+        cancel_event = threading.Event()
+        terminado = threading.Event()
+        renovador = threading.Thread(target=self._renovar, args=(tarea, cancel_event, terminado),
+                                     name=f"lease-{tarea['id'][:8]}", daemon=True)
+        renovador.start()
+
+        error = None
+        try:
+            self.runner(tarea, cancel_event)
+        except Exception as e:
+            error = e
+        finally:
+            terminado.set()
+            renovador.join()
+
+        try:
+            if error is None:
+                self.broker.completar(tarea)
+            elif self.stop_event.is_set():
+                # Cierre del worker: otro la retoma (lo bajado se continúa si comparten la carpeta)
+                self.broker.liberar(tarea)
+            elif not cancel_event.is_set():
+                # Si se canceló porque la tomó otro worker, el resultado lo informa ese
+                reintentar = self.on_error(error) if self.on_error else False
+                self.broker.completar(tarea, str(error)[:500], reintentar=reintentar)
+        except Exception as e:
+            print(f"No se pudo informar el resultado de {tarea['id']} al broker: {e}", file=sys.stderr)
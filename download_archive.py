@@ -0,0 +1,76 @@
+import os
+import threading
+
+DOWNLOAD_ARCHIVE_FILE = "download_archive.txt"
+
+
+def archive_id(info):
+    """
+    Clave de un video en el archivo de descargas ("extractor id", igual que el
+    --download-archive de yt-dlp). Sirve tanto para entradas planas de una
+    playlist ('ie_key') como para diccionarios de info completos ('extractor_key').
+    Retorna None si no se puede determinar sin extraer.
+    """
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    video_id = info.get('id')
+    if not extractor or not video_id:
+        return None
+    return f"{extractor.lower()} {video_id}"
+
+
+class DownloadArchive:
+    """
+    Índice persistente de los videos ya descargados.
+
+    El archivo (una clave por línea, compatible con yt-dlp) se lee una sola vez a
+    un set, así cada consulta es O(1). Las claves nuevas se agregan al final con
+    una única escritura por línea, que el sistema operativo hace de forma atómica.
+
+    Implementa `in` y `add`, por lo que se puede pasar directamente como
+    'download_archive' en las opciones de yt-dlp y compartir entre hilos.
+    """
+
+    def __init__(self, path=DOWNLOAD_ARCHIVE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = None
+
+    def _cargar(self):
+        if self._ids is None:
+            ids = set()
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for linea in f:
+                        linea = linea.strip()
+                        if linea:
+                            ids.add(linea)
+            self._ids = ids
+        return self._ids
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            return vid_id in self._cargar()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cargar())
+
+    def contains_entry(self, info):
+        """True si la entrada (plana o completa) ya figura como descargada."""
+        vid_id = archive_id(info)
+        return vid_id is not None and vid_id in self
+
+    def add(self, vid_id):
+        """Registra un video descargado (yt-dlp lo llama al terminar el post-procesado)."""
+        with self._lock:
+            ids = self._cargar()
+            if vid_id in ids:
+                return
+            directorio = os.path.dirname(self.path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(vid_id + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            ids.add(vid_id)
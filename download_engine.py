@@ -0,0 +1,1511 @@
+import yt_dlp
+import os
+import configparser
+import threading
+import time
+import sys
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager, nullcontext
+from ffmpeg_manager import FFmpegManager, PERFILES_POSTPROCESO, DEFAULT_POSTPROCESS_PROFILE, default_ffmpeg_processes
+from download_queue import DownloadQueue, DEFAULT_DONE_RETENTION, parse_url_list, load_url_file
+from metadata_cache import MetadataCache, DEFAULT_TTL
+from progress_bus import ProgressBus, describe, MAIN_JOB
+from progress_history import ERROR as LOG_ERROR
+from download_archive import DownloadArchive, DOWNLOAD_ARCHIVE_FILE, archive_id
+from segmented_download import DEFAULT_CONNECTIONS
+from postprocess_pipeline import PostProcessPipeline, PipelinedYoutubeDL, FFmpegProfilePP, StoreMediaPP, default_postprocess_workers
+from playlist_stream import PlaylistStream
+from bandwidth import BandwidthManager, parse_rate
+from metrics import Metrics, JobProfiler
+from retry_policy import RetryPolicy, clasificar_error, TRANSITORIO, DEFAULT_RETRIES, DEFAULT_FRAGMENT_RETRIES, DEFAULT_BACKOFF_BASE, DEFAULT_BACKOFF_MAX
+from dead_letter import DeadLetterList, DEAD_LETTER_FILE
+from resume_manifest import find_partials, group_partials, prune_groups, DEFAULT_MAX_AGE_DAYS
+from output_index import JobFiles, OutputIndex
+from media_store import MediaStore, MODOS_ENLACE, AUTO as ENLACE_AUTO
+from job_broker import nueva_tarea, DEFAULT_LEASE_SECONDS
+from distributed_worker import DistributedWorker
+from subscriptions import SubscriptionList, SubscriptionScheduler, SUBSCRIPTIONS_FILE, STOP_AFTER_SEEN, DEFAULT_INTERVAL as DEFAULT_SUBSCRIPTION_INTERVAL
+from network_session import SharedSession, DEFAULT_POOL_SIZE
+from format_planner import FormatPlanner, PERFILES, DEFAULT_PROFILE, FORMAT_PLANS_FILE, merge_output_format, format_spec
+from batch_classifier import (BatchClassifier, resumen_url, resultado_error, VIDEO, ERROR as ERROR_CLASIFICACION,
+                              CANCELADO as CLASIFICACION_CANCELADA, DEFAULT_CONCURRENCY as DEFAULT_CLASSIFY_CONCURRENCY)
+
+# Motor de descargas independiente de la interfaz: no importa tkinter ni customtkinter,
+# así puede usarse tanto desde la GUI (app_logic.AppLogic) como desde la CLI (cli.py).
+
+CONFIG_FILE = "config.ini"
+config = configparser.ConfigParser()
+
+# Número de descargas simultáneas por defecto en el modo playlist paralelo.
+# Se puede cambiar con 'parallel_workers' en la sección [Settings] de config.ini
+# (un valor de 1 descarga los videos de a uno).
+DEFAULT_PARALLEL_WORKERS = 3
+
+# Trabajos de la cola que se ejecutan a la vez ('queue_concurrency' en config.ini)
+DEFAULT_QUEUE_CONCURRENCY = 2
+
+# Peso del trabajo interactivo frente a cada trabajo de la cola al repartir el límite
+# global de velocidad ('interactive_weight' en config.ini)
+DEFAULT_INTERACTIVE_WEIGHT = 2.0
+
+# Opciones de las instancias de YoutubeDL que solo obtienen información
+INFO_YDL_OPTS = {
+    'quiet': True,
+    'extract_flat': True,
+    'force_generic_extractor': False,
+    'verbose': False,
+    'logtostderr': False,
+}
+
+# Segundos entre dos barridos de los parciales abandonados de una misma carpeta (los
+# que dejaron trabajos anteriores): un parcial recién se abandona a los días, así que
+# no hace falta buscarlos al terminar cada trabajo
+PARTIAL_SWEEP_INTERVAL = 3600
+
+# Tareas que el coordinador publica juntas en el broker mientras lista una playlist: los
+# workers empiezan con la primera tanda sin esperar el listado completo
+BROKER_PUBLISH_BATCH = 50
+
+# Expresión regular para eliminar códigos ANSI
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+# Excepción personalizada para manejar la cancelación de la descarga.
+# Hereda de DownloadCancelled para que yt-dlp la propague aunque 'ignoreerrors' esté activo.
+class DownloadCancelledError(yt_dlp.utils.DownloadCancelled):
+    pass
+
+# No se pudo instalar FFmpeg
+class DependencyError(Exception):
+    pass
+
+
+def parse_playlist_range(playlist_start, playlist_end):
+    """
+    Convierte el rango de la playlist (textos, posiblemente vacíos) a enteros o None.
+    Lanza ValueError con un mensaje para el usuario si el rango no es válido.
+    """
+    try:
+        start_num = int(playlist_start) if playlist_start else None
+        end_num = int(playlist_end) if playlist_end else None
+    except ValueError:
+        raise ValueError("El rango de la playlist debe ser un número válido.")
+
+    if start_num is not None and start_num <= 0:
+        raise ValueError("El número de inicio de la playlist debe ser mayor que 0.")
+    if end_num is not None and end_num <= 0:
+        raise ValueError("El número de fin de la playlist debe ser mayor que 0.")
+    if start_num is not None and end_num is not None and start_num > end_num:
+        raise ValueError("El número de inicio no puede ser mayor que el de fin.")
+    return start_num, end_num
+
+
+class DownloadEngine:
+    """
+    Núcleo de descarga. La comunicación hacia afuera es por eventos:
+    - el progreso y los mensajes de estado se publican en `progress_bus`
+      (por trabajo, identificado con job_id);
+    - los errores se lanzan como excepciones a quien inició la descarga;
+    - los cambios de la cola se notifican con `on_queue_change(resumen)`.
+    """
+
+    def __init__(self, progress_bus=None, on_queue_change=None):
+        # Los hilos de descarga publican aquí; la interfaz (o la CLI) lo consume a su ritmo
+        self.progress_bus = progress_bus or ProgressBus()
+
+        self.cargar_configuracion()
+
+        # Conexiones HTTP y cookies compartidas por todas las instancias de YoutubeDL
+        # (verificación, descargas) y por la instalación de FFmpeg. Se cierran con cerrar().
+        self.network = SharedSession(self.get_http_pool_size())
+
+        # Inicializamos el gestor de FFmpeg, que también corre los perfiles de post-procesado
+        self.ffmpeg_manager = FFmpegManager(session=self.network.http, max_processes=self.get_ffmpeg_processes(),
+                                            hardware=self.get_ffmpeg_hardware())
+        self.postprocess_profile = self.get_postprocess_profile()
+        self._ffmpeg_lock = threading.Lock()
+
+        # Caché en disco de los resultados de extract_info (evita extraer dos veces)
+        self.metadata_cache = MetadataCache(ttl=self.get_metadata_cache_ttl())
+
+        # Índice de videos ya descargados: se omiten sin volver a extraerlos
+        archive_path = self.get_download_archive_path()
+        self.download_archive = DownloadArchive(archive_path) if archive_path else None
+
+        # Almacén de medios: un archivo por video y formato, enlazado en cada playlist que lo
+        # incluye ('media_store' en config.ini; vacío, el valor por defecto, lo desactiva)
+        store_path = self.get_media_store_path()
+        self.media_store = MediaStore(store_path, self.get_media_store_link()) if store_path else None
+
+        # Archivos que toca cada trabajo (la limpieza mira solo esos) y el índice opcional
+        # del árbol de salida ('output_index' en config.ini)
+        self._archivos_trabajos = {}
+        self._archivos_lock = threading.Lock()
+        self._ultimo_barrido = {}
+        indice = self.get_output_index_path()
+        self.output_index = OutputIndex(indice) if indice else None
+
+        # Límite de velocidad global y por trabajo, compartido por todas las descargas
+        self.bandwidth = BandwidthManager(self.get_max_download_rate(), self.get_job_download_rate())
+
+        # Telemetría: tiempos por etapa y contadores (ver metrics.py)
+        self.metrics = Metrics(config.get('Settings', 'metrics_log', fallback="").strip(),
+                               config.get('Settings', 'metrics_file', fallback="").strip())
+        self.profile_dir = config.get('Settings', 'profile_dir', fallback="").strip() or None
+        self._perfiles = {}
+        self.metrics_server = None
+        puerto = self.get_metrics_port()
+        if puerto:
+            self.iniciar_servidor_metricas(puerto)
+
+        # Elección de formatos según el perfil, con la decisión de cada canal guardada
+        self.format_planner = FormatPlanner(config.get('Settings', 'format_plans_file', fallback=FORMAT_PLANS_FILE))
+        self.format_profile = self.get_format_profile()
+
+        # Clasificador en lote de las URLs (se crea al usarlo por primera vez)
+        self._batch_classifier = None
+        self._clasificador_lock = threading.Lock()
+
+        # Reintentos con espera exponencial y lista de entradas que fallaron igual
+        self.retry_policy = RetryPolicy(*self.get_retry_settings())
+        self.dead_letter = DeadLetterList(config.get('Settings', 'dead_letter_file', fallback=DEAD_LETTER_FILE))
+
+        # Cola persistente de descargas (se arranca con iniciar_cola)
+        self.download_queue = DownloadQueue(
+            self.ejecutar_trabajo_cola,
+            max_concurrent=self.get_queue_concurrency(),
+            on_change=on_queue_change,
+            retry_policy=self.retry_policy,
+            done_retention=self.get_queue_done_retention()
+        )
+
+        # Canales y playlists que se sincronizan solos (el planificador se arranca con
+        # iniciar_suscripciones)
+        self.suscripciones = SubscriptionList(config.get('Settings', 'subscriptions_file', fallback=SUBSCRIPTIONS_FILE))
+        self._planificador = None
+
+    # --- CONFIGURACIÓN ---
+    def cargar_configuracion(self):
+        config.read(CONFIG_FILE)
+
+    def get_last_download_path(self):
+        return config.get('Settings', 'last_download_path', fallback="")
+
+    def guardar_configuracion(self, path):
+        self._guardar_ajustes(last_download_path=path)
+
+    def _guardar_ajustes(self, **valores):
+        if 'Settings' not in config:
+            config['Settings'] = {}
+        for clave, valor in valores.items():
+            config['Settings'][clave] = str(valor)
+        with open(CONFIG_FILE, 'w') as f:
+            config.write(f)
+
+    def _get_rate(self, clave):
+        try:
+            return parse_rate(config.get('Settings', clave, fallback=""))
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 0
+
+    def get_max_download_rate(self):
+        """Límite total en bytes/s ('max_download_rate' en config.ini, p. ej. 5M; vacío = sin límite)."""
+        return self._get_rate('max_download_rate')
+
+    def get_job_download_rate(self):
+        """Límite de cada trabajo en bytes/s ('job_download_rate' en config.ini; vacío = sin límite)."""
+        return self._get_rate('job_download_rate')
+
+    def get_interactive_weight(self):
+        try:
+            return max(0.01, float(config.get('Settings', 'interactive_weight', fallback=DEFAULT_INTERACTIVE_WEIGHT)))
+        except ValueError:
+            return DEFAULT_INTERACTIVE_WEIGHT
+
+    def get_retry_settings(self):
+        """
+        (reintentos, espera base, espera máxima) de config.ini: 'retries',
+        'retry_backoff' y 'retry_backoff_max' (segundos).
+        """
+        try:
+            return (int(config.get('Settings', 'retries', fallback=DEFAULT_RETRIES)),
+                    float(config.get('Settings', 'retry_backoff', fallback=DEFAULT_BACKOFF_BASE)),
+                    float(config.get('Settings', 'retry_backoff_max', fallback=DEFAULT_BACKOFF_MAX)))
+        except ValueError:
+            return DEFAULT_RETRIES, DEFAULT_BACKOFF_BASE, DEFAULT_BACKOFF_MAX
+
+    def get_fragment_retries(self):
+        """Reintentos dentro de un archivo: por conexión, segmento o fragmento ('fragment_retries' en config.ini)."""
+        try:
+            return max(0, int(config.get('Settings', 'fragment_retries', fallback=DEFAULT_FRAGMENT_RETRIES)))
+        except ValueError:
+            return DEFAULT_FRAGMENT_RETRIES
+
+    def get_partial_max_age(self):
+        """Segundos tras los que se borra un parcial sin tocar ('partial_max_age_days'; 0 = nunca)."""
+        try:
+            dias = float(config.get('Settings', 'partial_max_age_days', fallback=DEFAULT_MAX_AGE_DAYS))
+        except ValueError:
+            dias = DEFAULT_MAX_AGE_DAYS
+        return max(0.0, dias) * 24 * 3600
+
+    def get_partial_max_size(self):
+        """Espacio máximo de los parciales de una carpeta ('partial_max_size', p. ej. 20G; vacío = sin límite)."""
+        valor = config.get('Settings', 'partial_max_size', fallback="").strip()
+        return (yt_dlp.utils.parse_bytes(valor) or 0) if valor else 0
+
+    def get_output_index_path(self):
+        """Ruta del índice de los archivos de salida ('output_index' en config.ini; vacío, el valor por defecto, lo desactiva)."""
+        return config.get('Settings', 'output_index', fallback="").strip()
+
+    def get_metrics_port(self):
+        """Puerto del endpoint /metrics en 127.0.0.1 ('metrics_port' en config.ini; 0 = desactivado)."""
+        try:
+            return max(0, int(config.get('Settings', 'metrics_port', fallback=0)))
+        except ValueError:
+            return 0
+
+    def ajustar_limites_velocidad(self, global_rate=None, job_rate=None, guardar=True):
+        """
+        Cambia en caliente los límites de velocidad (bytes/s, 0 = sin límite); las
+        descargas en curso los aplican en su próxima lectura. Con `guardar` se
+        recuerdan en config.ini.
+        """
+        ajustes = {}
+        if global_rate is not None:
+            self.bandwidth.set_global_rate(global_rate)
+            ajustes['max_download_rate'] = global_rate
+        if job_rate is not None:
+            self.bandwidth.set_default_job_rate(job_rate)
+            ajustes['job_download_rate'] = job_rate
+        if guardar and ajustes:
+            self._guardar_ajustes(**ajustes)
+
+    def get_parallel_workers(self):
+        """Retorna el número de hilos para descargar playlists (mínimo 1)."""
+        try:
+            workers = int(config.get('Settings', 'parallel_workers', fallback=DEFAULT_PARALLEL_WORKERS))
+        except ValueError:
+            workers = DEFAULT_PARALLEL_WORKERS
+        return max(1, workers)
+
+    def get_queue_concurrency(self):
+        """Retorna cuántos trabajos de la cola pueden ejecutarse a la vez (mínimo 1)."""
+        try:
+            concurrency = int(config.get('Settings', 'queue_concurrency', fallback=DEFAULT_QUEUE_CONCURRENCY))
+        except ValueError:
+            concurrency = DEFAULT_QUEUE_CONCURRENCY
+        return max(1, concurrency)
+
+    def get_queue_done_retention(self):
+        """Segundos que se conservan los trabajos completados de la cola ('queue_done_retention' en config.ini; 0 = siempre)."""
+        try:
+            return max(0, int(config.get('Settings', 'queue_done_retention', fallback=DEFAULT_DONE_RETENTION)))
+        except ValueError:
+            return DEFAULT_DONE_RETENTION
+
+    def get_metadata_cache_ttl(self):
+        """Segundos que se conserva la info extraída ('metadata_cache_ttl' en config.ini)."""
+        try:
+            return max(0, int(config.get('Settings', 'metadata_cache_ttl', fallback=DEFAULT_TTL)))
+        except ValueError:
+            return DEFAULT_TTL
+
+    def get_format_profile(self):
+        """Perfil de formatos ('format_profile' en config.ini): compatible, fastest, smallest, archive o audio."""
+        perfil = config.get('Settings', 'format_profile', fallback=DEFAULT_PROFILE).strip().lower()
+        return perfil if perfil in PERFILES else DEFAULT_PROFILE
+
+    def ajustar_perfil_formato(self, perfil, guardar=True):
+        """Cambia el perfil de formatos de las próximas descargas. Lanza ValueError si no existe."""
+        if perfil not in PERFILES:
+            raise ValueError(f"Perfil de formato desconocido: {perfil} (opciones: {', '.join(PERFILES)})")
+        self.format_profile = perfil
+        if guardar:
+            self._guardar_ajustes(format_profile=perfil)
+
+    def get_http_pool_size(self):
+        """Conexiones keep-alive por servidor de la red compartida ('http_pool_size' en config.ini)."""
+        try:
+            return max(1, int(config.get('Settings', 'http_pool_size', fallback=DEFAULT_POOL_SIZE)))
+        except ValueError:
+            return DEFAULT_POOL_SIZE
+
+    def get_classify_concurrency(self):
+        """URLs que se clasifican a la vez en clasificar_urls ('classify_concurrency' en config.ini)."""
+        try:
+            concurrency = int(config.get('Settings', 'classify_concurrency', fallback=DEFAULT_CLASSIFY_CONCURRENCY))
+        except ValueError:
+            concurrency = DEFAULT_CLASSIFY_CONCURRENCY
+        return max(1, concurrency)
+
+    def get_download_archive_path(self):
+        """Ruta del archivo de descargas ('download_archive' en config.ini; vacío lo desactiva)."""
+        return config.get('Settings', 'download_archive', fallback=DOWNLOAD_ARCHIVE_FILE).strip()
+
+    def get_media_store_path(self):
+        """Carpeta del almacén de medios sin duplicados ('media_store' en config.ini; vacío lo desactiva)."""
+        return config.get('Settings', 'media_store', fallback="").strip()
+
+    def get_media_store_link(self):
+        """Cómo se enlazan los archivos del almacén ('media_store_link': auto, hardlink, reflink o symlink)."""
+        modo = config.get('Settings', 'media_store_link', fallback=ENLACE_AUTO).strip().lower()
+        return modo if modo in MODOS_ENLACE else ENLACE_AUTO
+
+    def _formato_almacen(self, perfil=None):
+        """Parte de la clave del almacén que depende del formato: el perfil de formatos y el de post-procesado."""
+        perfil = perfil or self.format_profile
+        if self.postprocess_profile == 'none':
+            return perfil
+        return f"{perfil}+{self.postprocess_profile}"
+
+    def _buscar_en_almacen(self, carpeta, formato, job_id=None):
+        """
+        Función que recibe la info (plana o completa) de un video y, si ya está en el
+        almacén con `formato`, lo enlaza en `carpeta` y retorna True (no hay que bajarlo).
+        El enlace queda en el historial de `job_id`.
+        """
+        def buscar(info):
+            vid_id = archive_id(info)
+            if vid_id is None:
+                return False
+            try:
+                destino = self.media_store.enlazar(vid_id, formato, carpeta)
+            except OSError as e:
+                print(f"No se pudo enlazar desde el almacén de medios: {e}", file=sys.stderr)
+                return False
+            if destino is None:
+                return False
+            self.metrics.count('media_store_hits')
+            if job_id is not None:
+                self.progress_bus.log(job_id, f"Enlazado desde el almacén de medios: {destino}")
+            return True
+        return buscar
+
+    def get_broker_url(self):
+        """Broker del modo distribuido ('broker' en config.ini: sqlite:///ruta.db o redis://host:6379/0)."""
+        return config.get('Settings', 'broker', fallback="").strip()
+
+    def get_broker_lease(self):
+        """Segundos sin noticias de un worker tras los que su tarea pasa a otro ('broker_lease')."""
+        try:
+            lease = float(config.get('Settings', 'broker_lease', fallback=DEFAULT_LEASE_SECONDS))
+        except ValueError:
+            lease = DEFAULT_LEASE_SECONDS
+        return max(10.0, lease)
+
+    def get_subscription_interval(self):
+        """Segundos entre dos sondeos de cada suscripción ('subscription_interval' en config.ini)."""
+        try:
+            intervalo = float(config.get('Settings', 'subscription_interval', fallback=DEFAULT_SUBSCRIPTION_INTERVAL))
+        except ValueError:
+            intervalo = DEFAULT_SUBSCRIPTION_INTERVAL
+        return max(60.0, intervalo)
+
+    def get_subscription_window(self):
+        """Segundos en los que se reparten los sondeos ('subscription_window'; por defecto, el intervalo)."""
+        intervalo = self.get_subscription_interval()
+        try:
+            ventana = float(config.get('Settings', 'subscription_window', fallback=intervalo))
+        except ValueError:
+            ventana = intervalo
+        return min(max(0.0, ventana), intervalo)
+
+    def get_segment_connections(self):
+        """Conexiones simultáneas por archivo ('segment_connections' en config.ini; 1 = una sola)."""
+        try:
+            connections = int(config.get('Settings', 'segment_connections', fallback=DEFAULT_CONNECTIONS))
+        except ValueError:
+            connections = DEFAULT_CONNECTIONS
+        return max(1, connections)
+
+    def get_postprocess_workers(self):
+        """Hilos de post-procesado para playlists ('postprocess_workers' en config.ini; 0 = en el hilo de descarga)."""
+        try:
+            workers = int(config.get('Settings', 'postprocess_workers', fallback=default_postprocess_workers()))
+        except ValueError:
+            workers = default_postprocess_workers()
+        return max(0, workers)
+
+    def get_ffmpeg_processes(self):
+        """Procesos de FFmpeg que corren a la vez los perfiles de post-procesado ('ffmpeg_processes' en config.ini)."""
+        try:
+            procesos = int(config.get('Settings', 'ffmpeg_processes', fallback=default_ffmpeg_processes()))
+        except ValueError:
+            procesos = default_ffmpeg_processes()
+        return max(1, procesos)
+
+    def get_ffmpeg_hardware(self):
+        """Si las recodificaciones usan el codificador por hardware cuando hay uno ('ffmpeg_hardware' en config.ini)."""
+        return config.get('Settings', 'ffmpeg_hardware', fallback='true').strip().lower() not in ('0', 'false', 'no', 'off')
+
+    def get_postprocess_profile(self):
+        """Perfil de post-procesado ('postprocess_profile' en config.ini): none, remux, mp3, opus o transcode."""
+        perfil = config.get('Settings', 'postprocess_profile', fallback=DEFAULT_POSTPROCESS_PROFILE).strip().lower()
+        return perfil if perfil in PERFILES_POSTPROCESO else DEFAULT_POSTPROCESS_PROFILE
+
+    def ajustar_perfil_postproceso(self, perfil, guardar=True):
+        """Cambia el perfil de post-procesado de las próximas descargas. Lanza ValueError si no existe."""
+        if perfil not in PERFILES_POSTPROCESO:
+            raise ValueError(f"Perfil de post-procesado desconocido: {perfil} (opciones: {', '.join(PERFILES_POSTPROCESO)})")
+        self.postprocess_profile = perfil
+        if guardar:
+            self._guardar_ajustes(postprocess_profile=perfil)
+
+    def _crear_pipeline(self):
+        """Pool de post-procesado para una playlist, o None si está desactivado."""
+        workers = self.get_postprocess_workers()
+        return PostProcessPipeline(workers) if workers > 0 else None
+
+    def _terminar_pipeline(self, pipeline, job_id=MAIN_JOB):
+        """Espera los post-procesados pendientes. Retorna cuántos fallaron."""
+        if pipeline is None:
+            return 0
+        if pipeline.pending:
+            self.publicar_estado("Terminando post-procesado...", job_id=job_id)
+        errores = len(pipeline.wait())
+        if errores:
+            self.metrics.count('errors', errores, stage='postprocess')
+        return errores
+
+    def get_user_videos_dir(self):
+        home = os.path.expanduser("~")
+        video_dirs = [
+            os.path.join(home, "Videos"),
+            os.path.join(home, "Vídeos"),
+            os.path.join(home, "My Videos")
+        ]
+        for d in video_dirs:
+            if os.path.isdir(d):
+                return d
+        return os.path.join(home, "Videos")
+
+    # --- UTILIDADES ---
+    # Función auxiliar para limpiar los caracteres de escape ANSI
+    def _clean_ansi(self, text):
+        return ANSI_ESCAPE.sub('', text)
+
+    # Convierte el título de una playlist en un nombre de carpeta válido
+    def _limpiar_titulo_playlist(self, title):
+        title = (title or 'Unknown_Playlist').strip()
+        title = re.sub(r'[\\/:*?"<>|]', '', title)
+        title = title.replace(' ', '_')
+        title = title.replace('__', '_')
+        return title.strip('_')
+
+    def mensaje_error(self, e):
+        """Texto para el usuario a partir de una excepción de descarga."""
+        if isinstance(e, yt_dlp.utils.DownloadError):
+            return f"Error de descarga: {self._clean_ansi(str(e))}"
+        return f"Ocurrió un error inesperado: {self._clean_ansi(str(e))}"
+
+    # --- FUNCIÓN DE LIMPIEZA DE ARCHIVOS TEMPORALES ---
+    def _archivos_de(self, job_id):
+        """JobFiles del trabajo `job_id` (se crea con la primera instancia de YoutubeDL del trabajo)."""
+        with self._archivos_lock:
+            return self._archivos_trabajos.setdefault(job_id, JobFiles())
+
+    def _seguir_archivos(self, ydl, job_id):
+        """Anota en el JobFiles del trabajo los archivos que crea `ydl`."""
+        if job_id is not None:
+            archivos = self._archivos_de(job_id)
+            ydl.add_progress_hook(archivos.hook_progreso)
+            ydl.add_postprocessor_hook(archivos.hook_postproceso)
+        return ydl
+
+    def _limpiar_archivos_temporales(self, carpeta_destino, es_playlist=False, playlist_title="", job_id=MAIN_JOB):
+        """
+        Limpia lo que dejó el trabajo `job_id` mirando solo los archivos que anotaron sus
+        hooks (ver output_index.JobFiles), sin listar la carpeta: borra los temporales de
+        FFmpeg de un post-procesado fallido y los restos de descargas terminadas. Los
+        parciales que se pueden continuar se conservan para retomarlos al repetir la URL;
+        los abandonados por trabajos anteriores se barren aparte (ver _barrer_parciales).
+        """
+        with self._archivos_lock:
+            archivos = self._archivos_trabajos.pop(job_id, None) or JobFiles()
+        try:
+            target_dir = os.path.join(carpeta_destino, playlist_title) if es_playlist and playlist_title else carpeta_destino
+            rutas = archivos.rutas()
+
+            # Solo los derivados de cada archivo final: un título puede terminar en ".temp"
+            for path in archivos.temporales_ffmpeg():
+                if os.path.exists(path):
+                    os.remove(path)
+                    print(f"Temporal de post-procesado eliminado: {path}")
+            for grupo in prune_groups(group_partials(rutas), self.get_partial_max_age()):
+                print(f"Descarga parcial abandonada eliminada: {grupo['part']}")
+            rutas.update(self._barrer_parciales(target_dir))
+
+            if self.output_index is not None:
+                self.output_index.actualizar(rutas, archivos.videos())
+
+            # Si es una playlist, también eliminar la carpeta vacía si no tiene archivos completos
+            if es_playlist and playlist_title and os.path.isdir(target_dir):
+                with os.scandir(target_dir) as entradas:
+                    vacia = next(entradas, None) is None
+                if vacia:
+                    os.rmdir(target_dir)
+                    print(f"Directorio de playlist vacío eliminado: {target_dir}")
+        except Exception as e:
+            print(f"Error al limpiar archivos temporales: {e}")
+
+    def _barrer_parciales(self, carpeta):
+        """
+        Borra los parciales abandonados de `carpeta` (ver resume_manifest.prune_groups), a
+        lo sumo una vez cada PARTIAL_SWEEP_INTERVAL. Con el índice los toma de ahí en
+        lugar de listar la carpeta. Retorna las rutas borradas.
+        """
+        ahora = time.time()
+        with self._archivos_lock:
+            if ahora - self._ultimo_barrido.get(carpeta, 0) < PARTIAL_SWEEP_INTERVAL:
+                return []
+            self._ultimo_barrido[carpeta] = ahora
+
+        if self.output_index is not None:
+            grupos = group_partials(self.output_index.parciales(carpeta))
+        else:
+            grupos = find_partials(carpeta)
+        borrados = prune_groups(grupos, self.get_partial_max_age(), self.get_partial_max_size(), ahora)
+        for grupo in borrados:
+            print(f"Descarga parcial abandonada eliminada: {grupo['part']}")
+        return [path for grupo in borrados for path in grupo['files']]
+
+    # --- PROGRESO ---
+    def publicar_estado(self, mensaje, progreso=None, job_id=MAIN_JOB):
+        """Publica un mensaje de estado en el bus (opcionalmente con el valor de la barra)."""
+        self.progress_bus.publish(job_id, status='info', message=mensaje, progress=progreso)
+
+    def registrar_error(self, texto, job_id=MAIN_JOB):
+        """Muestra un error en stderr y lo deja en el historial del trabajo (lo ve el panel de la ventana)."""
+        print(texto, file=sys.stderr)
+        self.progress_bus.log(job_id, texto, LOG_ERROR)
+
+    def texto_estado(self, state):
+        """Texto para mostrar un estado del bus de progreso."""
+        return self._clean_ansi(describe(state))
+
+    def _publicar_hook(self, job_id, d, playlist_count=None):
+        """Traslada un callback de progreso de yt-dlp al bus. Solo se guardan valores crudos."""
+        status = d['status']
+        info_dict = d.get('info_dict') or {}
+        if status == 'downloading':
+            self.progress_bus.publish(
+                job_id,
+                status=status,
+                title=info_dict.get('title'),
+                downloaded_bytes=d.get('downloaded_bytes'),
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+                playlist_index=info_dict.get('playlist_index'),
+                playlist_count=playlist_count,
+                progress=None,
+            )
+        elif status == 'finished':
+            self.progress_bus.publish(job_id, status=status, title=info_dict.get('title'), progress=1.0)
+        elif status == 'error':
+            self.progress_bus.publish(job_id, status=status, message=str(d.get('error', 'Desconocido')), progress=0.0)
+
+    def crear_hook_progreso(self, job_id, cancel_event, playlist_count=None):
+        """Crea el progress hook de yt-dlp de un trabajo: publica en el bus y atiende la cancelación."""
+        def hook_progreso(d):
+            # Levantamos la excepción personalizada si se ha solicitado la cancelación
+            if cancel_event.is_set():
+                raise DownloadCancelledError("Descarga cancelada por el usuario.")
+            self._publicar_hook(job_id, d, playlist_count)
+        return hook_progreso
+
+    # --- MÉTRICAS Y PERFILES ---
+    def iniciar_servidor_metricas(self, puerto):
+        try:
+            self.metrics_server = self.metrics.serve(puerto)
+        except OSError as e:
+            print(f"No se pudo abrir el endpoint de métricas en el puerto {puerto}: {e}", file=sys.stderr)
+
+    @contextmanager
+    def _perfilar(self, job_id):
+        """Perfil de CPU y memoria del trabajo si 'profile_dir' está configurado."""
+        if not self.profile_dir:
+            yield
+            return
+        with JobProfiler(job_id, self.profile_dir) as profiler:
+            self._perfiles[job_id] = profiler
+            try:
+                yield
+            finally:
+                self._perfiles.pop(job_id, None)
+
+    def _perfilar_hilo(self, job_id):
+        """Suma al perfil del trabajo un hilo auxiliar (p. ej. los de una playlist en paralelo)."""
+        profiler = self._perfiles.get(job_id)
+        return profiler.hilo() if profiler is not None else nullcontext()
+
+    def _instrumentar(self, ydl, job_id):
+        """Agrega a `ydl` los hooks que miden la descarga y el post-procesado de cada archivo."""
+        inicios = {}
+
+        def hook_descarga(d):
+            archivo = d.get('filename') or d.get('tmpfilename')
+            if d['status'] == 'downloading':
+                inicios.setdefault(archivo, time.perf_counter())
+            elif d['status'] == 'finished':
+                inicio = inicios.pop(archivo, None)
+                segundos = d.get('elapsed')
+                if segundos is None:
+                    segundos = time.perf_counter() - inicio if inicio is not None else 0.0
+                self.metrics.observe('download', segundos, job_id,
+                                     bytes=d.get('total_bytes') or d.get('downloaded_bytes'),
+                                     file=os.path.basename(archivo or ''))
+            elif d['status'] == 'error':
+                inicios.pop(archivo, None)
+                self.metrics.count('errors', stage='download')
+
+        def hook_postproceso(d):
+            clave = (d.get('postprocessor'), threading.get_ident())
+            if d['status'] == 'started':
+                inicios[clave] = time.perf_counter()
+            elif d['status'] == 'finished' and clave in inicios:
+                self.metrics.observe('postprocess', time.perf_counter() - inicios.pop(clave), job_id, pp=d.get('postprocessor'))
+
+        ydl.add_progress_hook(hook_descarga)
+        ydl.add_postprocessor_hook(hook_postproceso)
+        return ydl
+
+    # --- VERIFICACIÓN DE URL ---
+    def check_url_type(self, url):
+        """
+        Obtiene la info plana de la URL (usando la caché si está) y retorna un diccionario con
+        'es_playlist', 'num_videos', 'playlist_title', 'entries' e 'info'.
+
+        En las playlists, 'entries' es un PlaylistStream: solo se pide la primera página
+        del listado y el resto se obtiene mientras se descarga. 'num_videos' es el total
+        que informa el sitio, o None si no se conoce todavía.
+        Lanza yt_dlp.utils.DownloadError si la URL no es válida o no es accesible.
+        """
+        info = self.metadata_cache.get_url(url)
+        ydl = None
+        if info is None:
+            ydl = self._crear_ydl_info(dict(INFO_YDL_OPTS))
+            try:
+                with self.metrics.medir('classify', url=url):
+                    info = self._extraer_plano(ydl, url)
+            except BaseException:
+                ydl.close()
+                raise
+
+            guardada = self._guardar_info_plana(url, info)
+            if guardada is not None:
+                ydl.close()
+                ydl = None
+                info = guardada
+        else:
+            self.metrics.count('metadata_cache_hits', stage='classify')
+
+        if info.get('_type') == 'playlist':
+            datos = {k: v for k, v in info.items() if k != 'entries'}
+            guardar = None
+            if ydl is not None:
+                # Al recorrer la playlist completa se guarda en la caché como si fuera una lista
+                guardar = lambda entradas: self.metadata_cache.put_url(url, self._sanitizar(dict(datos, entries=entradas)))
+            stream = PlaylistStream(info.get('entries'), total=info.get('playlist_count'), ydl=ydl, on_complete=guardar)
+            return {
+                'es_playlist': True,
+                'num_videos': stream.total,
+                'playlist_title': self._limpiar_titulo_playlist(info.get('title', 'Unknown_Playlist')),
+                'entries': stream,
+                'info': datos,
+            }
+        return {'es_playlist': False, 'num_videos': 0, 'playlist_title': "", 'entries': None, 'info': info}
+
+    def _extraer_plano(self, ydl, url):
+        """extract_info sin procesar, siguiendo las URLs que solo redirigen a otro extractor."""
+        # process=False deja las entradas de la playlist sin recorrer (páginas bajo demanda)
+        info = ydl.extract_info(url, download=False, process=False)
+        while info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, ie_key=info.get('ie_key'), process=False)
+        return info
+
+    def _guardar_info_plana(self, url, info):
+        """
+        Guarda en la caché la info de un video o de una playlist ya listada completa y
+        la retorna sanitizada. Retorna None si es una playlist con páginas sin pedir
+        (no se puede guardar todavía).
+        """
+        if info.get('_type') == 'playlist' and not isinstance(info.get('entries'), list):
+            return None
+        info = self._sanitizar(info)
+        self.metadata_cache.put_url(url, info)
+        return info
+
+    def _sanitizar(self, info):
+        return yt_dlp.YoutubeDL.sanitize_info(info)
+
+    # --- CLASIFICACIÓN EN LOTE ---
+    def _clasificar_con(self, ydl, url):
+        """Resultado de clasificar_urls para una URL, con una instancia de YoutubeDL ya creada."""
+        info = self.metadata_cache.get_url(url)
+        if info is not None:
+            self.metrics.count('metadata_cache_hits', stage='classify')
+        else:
+            try:
+                with self.metrics.medir('classify', url=url, batch=True):
+                    info = self._extraer_plano(ydl, url)
+            except Exception as e:
+                return resultado_error(url, self._clean_ansi(str(e)), clasificar_error(e) == TRANSITORIO)
+            # Queda en la caché: la descarga (o el diálogo de la playlist) ya no vuelve a extraerla
+            self._guardar_info_plana(url, info)
+        resumen = resumen_url(url, info)
+        if resumen['tipo'] == VIDEO:
+            # Lo que se bajaría con el perfil actual (la decisión del canal queda guardada)
+            resumen['plan'] = self.format_planner.plan(info, self.format_profile)
+        return resumen
+
+    def _clasificador(self):
+        with self._clasificador_lock:
+            if self._batch_classifier is None:
+                self._batch_classifier = BatchClassifier(
+                    lambda: self._crear_ydl_info(dict(INFO_YDL_OPTS)),
+                    self._clasificar_con,
+                    concurrency=self.get_classify_concurrency())
+            return self._batch_classifier
+
+    def clasificar_urls(self, urls, on_result=None, cancel_event=None):
+        """
+        Clasifica muchas URLs en paralelo sin descargarlas. Retorna, en el mismo orden,
+        un diccionario por URL con 'tipo' (video, playlist o error), 'titulo',
+        'num_videos', 'formatos' y 'error' (ver batch_classifier.resumen_url), y en
+        los videos 'plan': lo que se bajaría con el perfil de formato actual.
+        """
+        return self._clasificador().clasificar_lote(urls, on_result, cancel_event)
+
+    # --- PREPARACIÓN COMÚN DE LAS DESCARGAS ---
+    def _asegurar_ffmpeg(self, progress_callback=None):
+        """Instala FFmpeg si hace falta. Un lock evita instalaciones simultáneas desde la cola."""
+        with self._ffmpeg_lock:
+            if self.ffmpeg_manager.is_installed():
+                return True, ""
+            if progress_callback:
+                progress_callback("Descargando componentes necesarios (FFmpeg)...")
+            return self.ffmpeg_manager.install_ffmpeg(progress_callback=progress_callback)
+
+    def _construir_ydl_opts(self, carpeta_destino, es_playlist, progress_hooks, perfil=None):
+        ydl_opts = {
+            'outtmpl': os.path.join(carpeta_destino, '%(title)s.%(ext)s'),
+            'progress_hooks': progress_hooks,
+            'restrictfilenames': True,
+            'postprocessors': [],
+            'verbose': False,
+            'logtostderr': False,
+            'noplaylist': not es_playlist,
+            'compat_opts': set(),
+            'embed_thumbnail': True,
+            'embed_metadata': True,
+            # 'ffmpeg_location': YA NO ESTÁ HARDCODEADO AQUÍ
+            # Sin 'format', el formato de cada video lo elige el planificador (ver _plan_formato);
+            # las uniones van al primer contenedor que acepte los códecs, sin recodificar
+            'format': None,
+            'merge_output_format': merge_output_format(perfil or self.format_profile),
+            # El error de cada video llega a quien lo descarga (las playlists van entrada por
+            # entrada, ver descargar_playlist_paralela) para reintentarlo o dejarlo en la
+            # lista de fallidos
+            'ignoreerrors': False,
+            # Un corte no reinicia el archivo: yt-dlp (y SegmentedHttpFD) continúan desde el
+            # byte o fragmento donde quedaron, con espera exponencial entre intentos
+            'retries': self.get_fragment_retries(),
+            'fragment_retries': self.get_fragment_retries(),
+            'retry_sleep_functions': self.retry_policy.sleep_functions(),
+            # Las playlists se recorren a medida que se descargan, sin listarlas completas antes
+            'lazy_playlist': es_playlist,
+        }
+
+        # Obtenemos la ruta local si existe, o None si usa la del sistema.
+        # Si estamos usando nuestra versión portable, le decimos a yt-dlp dónde está
+        ffmpeg_local_path = self.ffmpeg_manager.get_ffmpeg_path()
+        if ffmpeg_local_path:
+            ydl_opts['ffmpeg_location'] = ffmpeg_local_path
+
+        # Los formatos DASH/HLS bajan varios fragmentos a la vez; los HTTP directos se
+        # dividen en rangos con SegmentedYoutubeDL (ver _crear_ydl)
+        ydl_opts['concurrent_fragment_downloads'] = self.get_segment_connections()
+
+        # yt-dlp consulta el archivo antes de extraer cada entrada y agrega los IDs al terminar
+        if self.download_archive is not None:
+            ydl_opts['download_archive'] = self.download_archive
+        return ydl_opts
+
+    def _crear_ydl_info(self, ydl_opts):
+        """Instancia de YoutubeDL solo para obtener información (sin descargar)."""
+        return self.network.attach(yt_dlp.YoutubeDL(ydl_opts))
+
+    def _crear_ydl(self, ydl_opts, pipeline=None, job_id=None, cancel_event=None, perfil=None):
+        """
+        Instancia de YoutubeDL para descargar, con descarga por segmentos si está activada.
+        Con `pipeline`, el post-procesado de cada video corre en ese pool mientras se
+        descarga el siguiente. Con `job_id`, todo lo que lee cuenta para el límite de
+        velocidad de ese trabajo. `perfil` es el perfil de formatos (por defecto, el actual).
+        """
+        perfil = perfil or self.format_profile
+        media_lookup = None
+        if self.media_store is not None:
+            media_lookup = self._buscar_en_almacen(os.path.dirname(ydl_opts['outtmpl']), self._formato_almacen(perfil), job_id)
+        ydl = PipelinedYoutubeDL(ydl_opts, pipeline=pipeline, connections=self.get_segment_connections(),
+                                 throttle=self._throttle(job_id, cancel_event),
+                                 format_plan=self._plan_formato(perfil), media_lookup=media_lookup)
+        if self.postprocess_profile != 'none':
+            # Después de la unión: el archivo final pasa por el pool de procesos de FFmpeg
+            ydl.add_post_processor(FFmpegProfilePP(self.ffmpeg_manager, self.postprocess_profile), when='post_process')
+        if self.media_store is not None:
+            # Ya en su carpeta y con el perfil aplicado: el archivo final pasa al almacén
+            ydl.add_post_processor(StoreMediaPP(self.media_store, self._formato_almacen(perfil)), when='after_move')
+        self._seguir_archivos(ydl, job_id)
+        return self._instrumentar(self.network.attach(ydl), job_id)
+
+    def _plan_formato(self, perfil):
+        """Función que decide la cadena de formatos de cada video con el perfil `perfil`."""
+        def plan(info):
+            elegido = self.format_planner.plan(info, perfil)
+            if elegido is None:
+                return None
+            self.metrics.count('format_plans', profile=perfil, channel_cache='true' if elegido['canal'] else 'false')
+            return format_spec(elegido, perfil)
+        return plan
+
+    def _throttle(self, job_id, cancel_event=None):
+        """Función que recibe cada lectura de la red: cuenta los bytes y aplica el límite del trabajo."""
+        if job_id is None:
+            return None
+
+        def throttle(nbytes):
+            self.metrics.count('bytes_downloaded', nbytes)
+            self.progress_bus.add_bytes(job_id, nbytes)
+            self.bandwidth.consume(job_id, nbytes, cancel_event)
+        return throttle
+
+    def _descargar_con_reintentos(self, ydl, url, cancel_event, job_id=None, extractor_key=None, video_id=None, etiqueta=""):
+        """_descargar_con_cache reintentando los errores transitorios con espera exponencial."""
+        def on_retry(error, reintento, espera):
+            self.metrics.count('retries', stage='download')
+            aviso = f"Reintentando {etiqueta or 'la descarga'} en {espera:.1f} s ({reintento}/{self.retry_policy.retries})"
+            self.publicar_estado(f"{aviso}: {self.mensaje_error(error)}", job_id=job_id)
+            self.registrar_error(f"{aviso}: {self._clean_ansi(str(error))}", job_id or MAIN_JOB)
+
+        self.retry_policy.ejecutar(
+            lambda: self._descargar_con_cache(ydl, url, extractor_key, video_id, job_id),
+            cancel_event, on_retry)
+
+    def _registrar_fallido(self, url, carpeta, error, titulo=None, playlist=None):
+        """Agrega la URL a la lista de fallidos (salvo cancelaciones)."""
+        if isinstance(error, yt_dlp.utils.DownloadCancelled):
+            return
+        self.dead_letter.add(url, carpeta, self._clean_ansi(str(error)).replace('\r', '')[:500], clasificar_error(error),
+                             titulo=titulo, playlist=playlist)
+
+    def reintentar_fallidos(self):
+        """
+        Vuelve a poner en la cola, de una vez, los trabajos de la cola que fallaron y
+        las entradas de la lista de fallidos (que salen de la lista). Retorna cuántos.
+        """
+        entradas = self.dead_letter.entries()
+        por_carpeta = {}
+        for entrada in entradas:
+            por_carpeta.setdefault(entrada['carpeta'], []).append(entrada['url'])
+        for carpeta, urls in por_carpeta.items():
+            self.download_queue.add_urls(urls, carpeta)
+        self.dead_letter.remove([entrada['url'] for entrada in entradas])
+        return len(entradas) + self.download_queue.retry_failed()
+
+    def _descargar_con_cache(self, ydl, url, extractor_key=None, video_id=None, job_id=None):
+        """
+        Descarga reutilizando la info ya extraída (por ID de video o por URL) si está
+        en la caché; si no, la extrae, la guarda y la descarga.
+        """
+        if video_id:
+            info = self.metadata_cache.get_video(extractor_key, video_id)
+        else:
+            info = self.metadata_cache.get_url(url)
+        if info is not None:
+            self.metrics.count('metadata_cache_hits', stage='extract')
+        else:
+            # Extracción y descarga por separado (lo mismo que hace extract_info) para medir cada etapa
+            with self.metrics.medir('extract', job_id, url=url) as medicion:
+                info = ydl.extract_info(url, download=False, process=False)
+                if info is None:
+                    # Con 'ignoreerrors' yt-dlp informa el error y retorna None
+                    medicion['result'] = 'error'
+                    return
+            if info.get('_type', 'video') == 'video' and info.get('id'):
+                self.metadata_cache.put_url(url, ydl.sanitize_info(info))
+        ydl.process_ie_result(info, download=True)
+
+    # --- DESCARGA ---
+    def descargar(self, url, carpeta_destino, cancel_event, url_info=None, playlist_start=None, playlist_end=None, job_id=MAIN_JOB):
+        """
+        Descarga un video o una playlist completa (según `url_info`, el resultado de
+        check_url_type; si no se pasa, se obtiene aquí). Publica el progreso en el bus
+        con `job_id` y retorna el número de entradas de la playlist que fallaron.
+        Lanza DependencyError, DownloadCancelledError o el error de la descarga.
+        """
+        try:
+            with self._perfilar(job_id), self.metrics.medir('job', job_id, url=url):
+                return self._descargar(url, carpeta_destino, cancel_event, url_info, playlist_start, playlist_end, job_id)
+        finally:
+            self.metrics.flush()
+
+    def _descargar(self, url, carpeta_destino, cancel_event, url_info, playlist_start, playlist_end, job_id):
+        if url_info is None:
+            try:
+                url_info = self.retry_policy.ejecutar(lambda: self.check_url_type(url), cancel_event)
+            except Exception as e:
+                self._registrar_fallido(url, carpeta_destino, e)
+                raise
+        es_playlist = url_info['es_playlist']
+        playlist_title = url_info['playlist_title']
+
+        # --- VERIFICACIÓN E INSTALACIÓN DE FFMPEG ---
+        exito, mensaje = self._asegurar_ffmpeg(lambda msg: self.publicar_estado(msg, job_id=job_id))
+        if not exito:
+            raise DependencyError(mensaje)
+        # ---------------------------------------------
+
+        self.publicar_estado(f"Preparando descarga ({'Playlist' if es_playlist else 'Video'})...", 0.0, job_id)
+
+        hook = self.crear_hook_progreso(job_id, cancel_event, url_info['num_videos'] if es_playlist else None)
+        ydl_opts = self._construir_ydl_opts(carpeta_destino, es_playlist, [hook])
+
+        if es_playlist:
+            # Nombres de las opciones de yt-dlp (None equivale a "desde el primero"/"hasta el último")
+            if playlist_start:
+                ydl_opts['playliststart'] = playlist_start
+            if playlist_end:
+                ydl_opts['playlistend'] = playlist_end
+            # Aquí se define el outtmpl para las playlists
+            ydl_opts['outtmpl'] = os.path.join(carpeta_destino, playlist_title, '%(title)s.%(ext)s')
+
+        # El trabajo interactivo tiene más peso al repartir el límite global con la cola
+        if job_id == MAIN_JOB:
+            self.bandwidth.configure_job(job_id, weight=self.get_interactive_weight())
+
+        # Solo las playlists se benefician: con un único video no hay nada que solapar
+        pipeline = self._crear_pipeline() if es_playlist else None
+        try:
+            fallidos = 0
+            if es_playlist and url_info['entries'] is not None:
+                # Las entradas se van obteniendo página a página mientras se descargan las primeras
+                workers = self.get_parallel_workers()
+                fallidos = self.descargar_playlist_paralela(
+                    ydl_opts, url_info['entries'], cancel_event, playlist_start, playlist_end,
+                    max_workers=workers, job_id=job_id, pipeline=pipeline)
+            else:
+                # Reutiliza la info obtenida en check_url_type en vez de extraerla otra vez
+                with self._crear_ydl(ydl_opts, pipeline, job_id, cancel_event) as ydl:
+                    self._descargar_con_reintentos(ydl, url, cancel_event, job_id)
+            fallidos += self._terminar_pipeline(pipeline, job_id)
+
+            if fallidos:
+                self.publicar_estado(f"Descarga terminada con {fallidos} video(s) fallido(s); se pueden reintentar "
+                                     f"con 'Reintentar fallidos'. Archivos en: {carpeta_destino}", job_id=job_id)
+            else:
+                self.publicar_estado(f"¡Descarga completa! Archivo(s) guardado(s) en: {carpeta_destino}", job_id=job_id)
+            return fallidos
+
+        except DownloadCancelledError:
+            if pipeline is not None:
+                pipeline.cancel_pending()
+            self.publicar_estado("Descarga cancelada. Lo descargado se conserva y se continúa al repetir la URL.", 0.0, job_id)
+            raise
+
+        except Exception as e:
+            if not es_playlist:
+                self._registrar_fallido(url, carpeta_destino, e)
+            error_message = self.mensaje_error(e)
+            self.publicar_estado(error_message, job_id=job_id)
+            self.registrar_error(error_message, job_id)
+            raise
+        finally:
+            self.bandwidth.remove_job(job_id)
+            if es_playlist and url_info['entries'] is not None:
+                url_info['entries'].close()
+            # El post-procesado en curso usa los temporales: se espera antes de limpiar
+            if pipeline is not None:
+                pipeline.shutdown()
+            # --- Lógica de limpieza en el bloque `finally` ---
+            with self.metrics.medir('cleanup', job_id):
+                self._limpiar_archivos_temporales(
+                    carpeta_destino,
+                    es_playlist=es_playlist,
+                    playlist_title=playlist_title,
+                    job_id=job_id
+                )
+
+    # --- DESCARGA PARALELA DE PLAYLISTS ---
+    def _url_de_entrada(self, entry):
+        """Obtiene una URL descargable a partir de una entrada plana de la playlist."""
+        if not entry:
+            return None
+        return entry.get('url') or entry.get('webpage_url') or entry.get('id')
+
+    def descargar_playlist_paralela(self, ydl_opts, entries, cancel_event, playlist_start=None, playlist_end=None, max_workers=DEFAULT_PARALLEL_WORKERS, job_id=MAIN_JOB, pipeline=None, perfil=None):
+        """
+        Descarga las entradas planas de una playlist (el PlaylistStream de check_url_type)
+        usando un pool de hilos. Las entradas se piden a medida que se necesitan: los
+        primeros videos empiezan mientras se obtienen las páginas siguientes, y nunca
+        hay más de 2 * max_workers entradas esperando un hilo.
+        Cada hilo crea su propia instancia de YoutubeDL y reporta su progreso por
+        separado; cancel_event detiene a todos. Con `pipeline`, los hilos pasan al
+        siguiente video sin esperar su post-procesado (quien llama lo espera).
+        `perfil` es el perfil de formatos (por defecto, el actual).
+        Retorna el número de entradas que fallaron.
+        """
+        lock = threading.Lock()
+        progreso = {}  # índice de la entrada -> fracción descargada (0.0 - 1.0)
+        estado = {'encolados': 0, 'omitidos': 0, 'completados': 0, 'fallidos': 0}
+
+        def total_estimado():
+            # Mientras se sigue listando la playlist el total crece; si el sitio informa
+            # el tamaño se usa como estimación
+            encolados = estado['encolados']
+            if entries.completo or not entries.total:
+                return encolados, entries.completo
+            fin = min(entries.total, playlist_end) if playlist_end else entries.total
+            return max(encolados, fin - (playlist_start or 1) + 1 - estado['omitidos']), False
+
+        def actualizar_ui(mensaje):
+            with lock:
+                total, exacto = total_estimado()
+                hechos = estado['completados'] + estado['fallidos']
+                valor = (sum(progreso.values()) + hechos) / total if total else 0.0
+                en_curso = len(progreso)
+                omitidos = estado['omitidos']
+            total_txt = f"{total}" if exacto else f"~{total}"
+            omitidos_info = f" ({omitidos} ya descargados)" if omitidos else ""
+            self.publicar_estado(f"[{hechos} de {total_txt}{omitidos_info} | {en_curso} en curso] {mensaje}", valor, job_id)
+
+        def crear_hook(indice):
+            def hook(d):
+                if cancel_event.is_set():
+                    raise DownloadCancelledError("Descarga cancelada por el usuario.")
+                titulo = self._clean_ansi(d.get('info_dict', {}).get('title', '...'))
+                if d['status'] == 'downloading':
+                    total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
+                    downloaded_bytes = d.get('downloaded_bytes')
+                    if total_bytes and downloaded_bytes is not None:
+                        with lock:
+                            progreso[indice] = min(downloaded_bytes / total_bytes, 1.0)
+                    s = self._clean_ansi(d.get('_speed_str', 'N/A'))
+                    actualizar_ui(f"#{indice} '{titulo}' a {s}")
+                elif d['status'] == 'finished':
+                    actualizar_ui(f"Post-procesando #{indice} '{titulo}'...")
+            return hook
+
+        def worker(indice, entry_url, entry):
+            if cancel_event.is_set():
+                raise DownloadCancelledError("Descarga cancelada por el usuario.")
+            opts = dict(ydl_opts)
+            opts['noplaylist'] = True
+            # El error llega hasta aquí para reintentarlo o dejarlo en la lista de fallidos
+            opts['ignoreerrors'] = False
+            opts.pop('playliststart', None)
+            opts.pop('playlistend', None)
+            opts['progress_hooks'] = [crear_hook(indice)]
+            with lock:
+                progreso[indice] = 0.0
+            try:
+                with self._perfilar_hilo(job_id), self._crear_ydl(opts, pipeline, job_id, cancel_event, perfil) as ydl:
+                    self._descargar_con_reintentos(ydl, entry_url, cancel_event, job_id,
+                                                   entry.get('ie_key'), entry.get('id'), f"#{indice}")
+            except Exception:
+                if cancel_event.is_set():
+                    raise DownloadCancelledError("Descarga cancelada por el usuario.")
+                raise
+            finally:
+                with lock:
+                    progreso.pop(indice, None)
+            if cancel_event.is_set():
+                raise DownloadCancelledError("Descarga cancelada por el usuario.")
+
+        def recoger(terminados):
+            for future in terminados:
+                indice, entry_url, entry = futures.pop(future)
+                try:
+                    future.result()
+                    with lock:
+                        estado['completados'] += 1
+                except DownloadCancelledError:
+                    raise
+                except Exception as e:
+                    # Igual que con 'ignoreerrors': se registra y se sigue con el resto
+                    with lock:
+                        estado['fallidos'] += 1
+                    self.metrics.count('errors', stage='entry')
+                    self._registrar_fallido(entry_url, carpeta_entradas, e, entry.get('title'), playlist_titulo)
+                    self.registrar_error(f"Error en la entrada #{indice}: {self._clean_ansi(str(e))}", job_id)
+                actualizar_ui("Descargando...")
+
+        # Las entradas que fallen se podrán reintentar como videos sueltos en la misma carpeta
+        carpeta_entradas = os.path.dirname(ydl_opts['outtmpl'])
+        playlist_titulo = os.path.basename(carpeta_entradas)
+        en_almacen = self._buscar_en_almacen(carpeta_entradas, self._formato_almacen(perfil), job_id) if self.media_store is not None else None
+        futures = {}
+        max_en_espera = 2 * max_workers
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="playlist") as pool:
+            try:
+                for indice, entry in entries.entradas(playlist_start, playlist_end):
+                    if cancel_event.is_set():
+                        raise DownloadCancelledError("Descarga cancelada por el usuario.")
+                    entry_url = self._url_de_entrada(entry)
+                    if not entry_url:
+                        continue
+                    # Los videos ya descargados se descartan aquí, sin ninguna consulta de red: los
+                    # que están en el almacén se enlazan en la carpeta de esta playlist
+                    if en_almacen is not None and en_almacen(entry):
+                        with lock:
+                            estado['omitidos'] += 1
+                        continue
+                    if self.download_archive is not None and self.download_archive.contains_entry(entry):
+                        with lock:
+                            estado['omitidos'] += 1
+                        continue
+
+                    # Contrapresión: no se sigue listando mientras haya demasiadas entradas esperando
+                    while len(futures) >= max_en_espera:
+                        terminados, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        recoger(terminados)
+                    with lock:
+                        estado['encolados'] += 1
+                    futures[pool.submit(worker, indice, entry_url, entry)] = (indice, entry_url, entry)
+
+                while futures:
+                    terminados, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    recoger(terminados)
+            except DownloadCancelledError:
+                # Los hilos en curso se detienen en su próximo hook; los pendientes no arrancan
+                cancel_event.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+        if estado['encolados'] == 0 and estado['omitidos']:
+            self.publicar_estado(f"Los {estado['omitidos']} videos ya estaban descargados.", 1.0, job_id)
+        return estado['fallidos']
+
+    # --- MODO DISTRIBUIDO ---
+    def publicar_en_broker(self, broker, url, carpeta_destino, cancel_event=None, playlist_start=None, playlist_end=None):
+        """
+        Coordinador: publica en `broker` una tarea por video de `url` (una sola si no es
+        una playlist), por tandas a medida que se listan las páginas de la playlist.
+        Retorna (lote, cantidad de tareas publicadas).
+        """
+        cancel_event = cancel_event or threading.Event()
+        url_info = self.retry_policy.ejecutar(lambda: self.check_url_type(url), cancel_event)
+        lote = uuid.uuid4().hex
+        if not url_info['es_playlist']:
+            info = url_info['info']
+            broker.publicar([nueva_tarea(lote, url, carpeta_destino, titulo=info.get('title'), video=archive_id(info))])
+            return lote, 1
+
+        playlist_title = url_info['playlist_title']
+        tanda = []
+        publicadas = 0
+        try:
+            for indice, entry in url_info['entries'].entradas(playlist_start, playlist_end):
+                if cancel_event.is_set():
+                    break
+                entry_url = self._url_de_entrada(entry)
+                if not entry_url:
+                    continue
+                tanda.append(nueva_tarea(lote, entry_url, carpeta_destino, playlist_title, entry.get('title'),
+                                         archive_id(entry), indice))
+                if len(tanda) >= BROKER_PUBLISH_BATCH:
+                    broker.publicar(tanda)
+                    publicadas += len(tanda)
+                    self.publicar_estado(f"{publicadas} tarea(s) de '{playlist_title}' publicadas...")
+                    tanda = []
+            broker.publicar(tanda)
+            publicadas += len(tanda)
+        finally:
+            url_info['entries'].close()
+        return lote, publicadas
+
+    def ejecutar_tarea(self, tarea, cancel_event, carpeta_destino=None):
+        """
+        Worker: descarga el video de una tarea del broker con el mismo camino que una
+        descarga local (archivo de descargas, almacén, reintentos, post-procesado). Los
+        archivos van a `carpeta_destino` (o a la del coordinador) más la de la playlist.
+        """
+        raiz = carpeta_destino or tarea['carpeta']
+        carpeta = os.path.join(raiz, tarea['subcarpeta']) if tarea.get('subcarpeta') else raiz
+        url_info = {'es_playlist': False, 'num_videos': 0, 'playlist_title': "", 'entries': None, 'info': None}
+        try:
+            self.descargar(tarea['url'], carpeta, cancel_event, url_info=url_info, job_id=tarea['id'])
+        finally:
+            self.progress_bus.remove(tarea['id'])
+
+    def progreso_tarea(self, tarea):
+        """(fracción, texto) del último estado de la tarea en el bus, para informarlo al broker."""
+        state = self.progress_bus.get(tarea['id'])
+        if state is None:
+            return None, None
+        return state.fraction(), self.texto_estado(state)
+
+    def crear_worker(self, broker, worker_id=None, slots=None, carpeta_destino=None):
+        """DistributedWorker que descarga las tareas de `broker` con este motor (se arranca con start())."""
+        return DistributedWorker(
+            broker,
+            lambda tarea, cancel_event: self.ejecutar_tarea(tarea, cancel_event, carpeta_destino),
+            worker_id=worker_id,
+            slots=slots or self.get_queue_concurrency(),
+            lease=self.get_broker_lease(),
+            progreso=self.progreso_tarea,
+            on_error=lambda error: clasificar_error(error) == TRANSITORIO,
+        )
+
+    # --- SUSCRIPCIONES ---
+    def suscribir(self, url, carpeta_destino, perfil=None, intervalo=None, solo_nuevos=False, completo=False):
+        """
+        Agrega (o actualiza) una suscripción: sus videos nuevos irán a
+        carpeta_destino/titulo_del_canal con el perfil de formato `perfil` (por defecto,
+        el actual). Lanza ValueError si el perfil no existe.
+        """
+        perfil = perfil or self.format_profile
+        if perfil not in PERFILES:
+            raise ValueError(f"Perfil de formato desconocido: {perfil} (opciones: {', '.join(PERFILES)})")
+        sub = self.suscripciones.add(url, carpeta_destino, perfil, intervalo, solo_nuevos, completo)
+        if self._planificador is not None:
+            self._planificador.despertar()
+        return sub
+
+    def desuscribir(self, clave):
+        """Quita la suscripción con ese ID o esa URL. Retorna False si no existe."""
+        sub = self.suscripciones.buscar(clave)
+        return sub is not None and self.suscripciones.remove(sub['id'])
+
+    def sondear_suscripcion(self, sub):
+        """
+        Sincroniza una suscripción: lista el canal o la playlist desde las entradas más
+        nuevas (sin la caché de metadatos: se busca justamente lo que cambió) y deja de
+        pedir páginas al encontrar STOP_AFTER_SEEN videos ya vistos seguidos. Los videos
+        nuevos se encolan, del más viejo al más nuevo. Retorna cuántos se encolaron.
+        """
+        vistos = self.suscripciones.seen(sub['id'])
+        # Con pocos vistos (un canal con pocos videos) alcanza con encontrarlos todos
+        corte = min(STOP_AFTER_SEEN, len(vistos)) if vistos and not sub.get('completo') else None
+
+        ydl = self._crear_ydl_info(dict(INFO_YDL_OPTS))
+        try:
+            with self.metrics.medir('subscription', url=sub['url']):
+                info = self.retry_policy.ejecutar(lambda: self._extraer_plano(ydl, sub['url']))
+        except BaseException:
+            ydl.close()
+            raise
+
+        nuevos = []
+        if info.get('_type') == 'playlist':
+            titulo = self._limpiar_titulo_playlist(info.get('title', 'Unknown_Playlist'))
+            stream = PlaylistStream(info.get('entries'), total=info.get('playlist_count'), ydl=ydl)
+            try:
+                seguidos = 0
+                for _, entry in stream.entradas():
+                    vid_id = archive_id(entry) or self._url_de_entrada(entry)
+                    if not vid_id:
+                        continue
+                    if vid_id in vistos:
+                        seguidos += 1
+                        if corte is not None and seguidos >= corte:
+                            break
+                        continue
+                    seguidos = 0
+                    nuevos.append((vid_id, self._url_de_entrada(entry)))
+            finally:
+                stream.close()
+            carpeta = os.path.join(sub['carpeta'], titulo)
+        else:
+            # Una URL de un solo video: se baja una vez y después no cambia más
+            ydl.close()
+            titulo = info.get('title')
+            vid_id = archive_id(info) or sub['url']
+            if vid_id not in vistos:
+                nuevos.append((vid_id, sub['url']))
+            carpeta = sub['carpeta']
+
+        encolados = 0
+        if nuevos and not sub.get('solo_nuevos'):
+            urls = [url for _, url in reversed(nuevos) if url]
+            self.encolar_lista(urls, carpeta, perfil=sub['perfil'], suscripcion=sub['id'])
+            encolados = len(urls)
+            self.metrics.count('subscription_videos', encolados)
+        # Ya en la cola (persistente): si fallan, quedan como fallidos en lugar de volver a encolarse
+        self.suscripciones.mark_seen(sub['id'], [vid_id for vid_id, _ in nuevos])
+        self.suscripciones.update(sub['id'], titulo=titulo, solo_nuevos=False, ultimo_sondeo=time.time(), error=None)
+        if encolados:
+            print(f"{encolados} video(s) nuevo(s) de '{titulo}' en la cola.", file=sys.stderr)
+        return encolados
+
+    def sincronizar_suscripciones(self):
+        """Sondea ya todas las suscripciones. Retorna cuántos videos se encolaron."""
+        total = 0
+        for sub in self.suscripciones.entries():
+            try:
+                total += self.sondear_suscripcion(sub)
+            except Exception as e:
+                print(f"No se pudo sincronizar {sub['url']}: {self.mensaje_error(e)}", file=sys.stderr)
+                self.suscripciones.update(sub['id'], error=str(e)[:500])
+        return total
+
+    def iniciar_suscripciones(self):
+        """Arranca el planificador que sondea cada suscripción cuando le toca (no bloquea)."""
+        if self._planificador is None:
+            self._planificador = SubscriptionScheduler(self.suscripciones, self.sondear_suscripcion,
+                                                       self.get_subscription_interval(), self.get_subscription_window())
+            self._planificador.start()
+
+    def detener_suscripciones(self, wait=False):
+        planificador, self._planificador = self._planificador, None
+        if planificador is not None:
+            planificador.stop(wait=wait)
+
+    # --- COLA DE DESCARGAS ---
+    def iniciar_cola(self):
+        self.download_queue.start()
+
+    def detener_cola(self, wait=False):
+        self.download_queue.stop(wait=wait)
+
+    # --- CIERRE ---
+    def cerrar(self, wait=False):
+        """
+        Detiene la cola y las suscripciones y libera lo que vive mientras vive el motor: el clasificador,
+        los procesos de FFmpeg y las conexiones compartidas.
+        """
+        self.detener_suscripciones(wait=wait)
+        self.detener_cola(wait=wait)
+        with self._clasificador_lock:
+            clasificador, self._batch_classifier = self._batch_classifier, None
+        if clasificador is not None:
+            clasificador.close()
+        self.ffmpeg_manager.close()
+        self.network.close()
+
+    def encolar_lista(self, urls, carpeta_destino, **campos):
+        """Agrega las URLs a la cola y las clasifica en segundo plano. Retorna los IDs de los trabajos."""
+        ids = self.download_queue.add_urls(urls, carpeta_destino, **campos)
+        if ids:
+            self._preclasificar(ids)
+        return ids
+
+    def encolar_urls(self, text, carpeta_destino):
+        """Agrega a la cola todas las URLs de un texto pegado. Retorna cuántas se agregaron."""
+        urls = parse_url_list(text)
+        self.encolar_lista(urls, carpeta_destino)
+        return len(urls)
+
+    def encolar_archivo(self, path, carpeta_destino):
+        """Agrega a la cola las URLs de un archivo .txt o .csv. Retorna cuántas se agregaron."""
+        urls = load_url_file(path)
+        self.encolar_lista(urls, carpeta_destino)
+        return len(urls)
+
+    def _preclasificar(self, job_ids):
+        """
+        Clasifica en lote los trabajos recién encolados mientras la cola avanza: la info
+        queda en la caché (cada trabajo ya no la extrae al empezar), los trabajos se
+        anotan con tipo, título y cantidad de videos, y los que tienen un error
+        permanente (video eliminado, URL no soportada) se marcan fallidos sin ocupar la cola.
+        """
+        trabajos = {}
+        for job_id in job_ids:
+            job = self.download_queue.jobs.get(job_id)
+            if job is not None:
+                trabajos.setdefault(job['url'], []).append(job_id)
+
+        def anotar(resultado):
+            for job_id in trabajos.get(resultado['url'], ()):
+                if resultado['tipo'] == ERROR_CLASIFICACION:
+                    if not resultado.get('transitorio'):
+                        self.download_queue.fail_pending(job_id, resultado['error'])
+                elif resultado['tipo'] != CLASIFICACION_CANCELADA:
+                    self.download_queue.annotate(job_id, tipo=resultado['tipo'], titulo=resultado['titulo'],
+                                                 num_videos=resultado['num_videos'])
+
+        threading.Thread(target=self.clasificar_urls, args=(list(trabajos),),
+                         kwargs={'on_result': anotar, 'cancel_event': self.download_queue.stop_event},
+                         name="preclasificacion", daemon=True).start()
+
+    def ejecutar_trabajo_cola(self, job, stop_event):
+        """
+        Descarga un trabajo de la cola sin interacción con el usuario: detecta si es
+        una playlist y la descarga completa. Lanza una excepción si falla.
+        """
+        if job.get('intentos', 0) > 1:
+            self.metrics.count('retries', stage='queue')
+        try:
+            with self._perfilar(job['id']), self.metrics.medir('job', job['id'], url=job['url'], queue=True):
+                self._ejecutar_trabajo_cola(job, stop_event)
+        except DownloadCancelledError:
+            raise
+        except Exception as e:
+            # El estado del trabajo ya se quitó del bus; el error queda en su historial
+            self.progress_bus.log(job['id'], self.mensaje_error(e), LOG_ERROR)
+            raise
+        finally:
+            self.metrics.flush()
+
+    def _ejecutar_trabajo_cola(self, job, stop_event):
+        exito, mensaje = self._asegurar_ffmpeg()
+        if not exito:
+            raise DependencyError(mensaje)
+
+        def hook_cola(d):
+            if stop_event.is_set():
+                raise DownloadCancelledError("Cola detenida.")
+            self._publicar_hook(job['id'], d)
+
+        url = job['url']
+        carpeta_destino = job['carpeta']
+        # Los trabajos de una suscripción llevan su propio perfil de formato
+        perfil = job.get('perfil')
+        url_info = self.check_url_type(url)
+        es_playlist = url_info['es_playlist']
+
+        ydl_opts = self._construir_ydl_opts(carpeta_destino, es_playlist, [hook_cola], perfil)
+        ydl_opts['quiet'] = True
+        if es_playlist:
+            ydl_opts['outtmpl'] = os.path.join(carpeta_destino, url_info['playlist_title'], '%(title)s.%(ext)s')
+
+        pipeline = self._crear_pipeline() if es_playlist else None
+        try:
+            if es_playlist:
+                # Igual que en la ventana: cada entrada se reintenta por separado y las que
+                # fallan quedan en la lista de fallidos
+                fallidos = self.descargar_playlist_paralela(
+                    ydl_opts, url_info['entries'], stop_event, max_workers=self.get_parallel_workers(),
+                    job_id=job['id'], pipeline=pipeline, perfil=perfil)
+                fallidos_pp = self._terminar_pipeline(pipeline, job['id'])
+                if fallidos_pp:
+                    raise yt_dlp.utils.PostProcessingError(f"Falló el post-procesado de {fallidos_pp} video(s).")
+                # Las entradas que fallaron ya están en la lista de fallidos y se reintentan
+                # desde ahí: el trabajo queda completado (si quedara con error, 'Reintentar
+                # fallidos' volvería a bajar la playlist entera junto con esas entradas)
+                self.download_queue.annotate(job['id'], entradas_fallidas=fallidos)
+                if fallidos:
+                    self.progress_bus.log(job['id'], f"Terminado con {fallidos} video(s) fallido(s); se pueden "
+                                                     f"reintentar con 'Reintentar fallidos'.", LOG_ERROR)
+            else:
+                # Los reintentos del trabajo los maneja la cola (con espera entre intentos)
+                with self._crear_ydl(ydl_opts, pipeline, job['id'], stop_event, perfil) as ydl:
+                    self._descargar_con_cache(ydl, url, job_id=job['id'])
+        except DownloadCancelledError:
+            if pipeline is not None:
+                pipeline.cancel_pending()
+            raise
+        finally:
+            if es_playlist:
+                url_info['entries'].close()
+            if pipeline is not None:
+                pipeline.shutdown()
+            self.bandwidth.remove_job(job['id'])
+            self.progress_bus.remove(job['id'])
+            # Solo se borran parciales abandonados: los de otros trabajos de la cola en la
+            # misma carpeta, y los de este para continuar al reintentar, se conservan
+            self._limpiar_archivos_temporales(carpeta_destino, es_playlist, url_info['playlist_title'], job['id'])
@@ -0,0 +1,314 @@
+import os
+import csv
+import json
+import time
+import uuid
+import threading
+from collections import deque
+
+QUEUE_FILE = "download_queue.jsonl"
+
+# Estados posibles de un trabajo de la cola
+PENDIENTE = "pending"
+EN_CURSO = "running"
+COMPLETADO = "done"
+FALLIDO = "error"
+
+# Segundos que un trabajo completado sigue en el journal antes de que la compactación
+# lo descarte ('queue_done_retention' en config.ini; 0 los conserva todos)
+DEFAULT_DONE_RETENTION = 7 * 24 * 3600
+
+
+def parse_url_list(text):
+    """
+    Extrae las URLs de un texto pegado (una por línea, o separadas por espacios,
+    comas o punto y coma). Ignora líneas vacías y comentarios que empiezan con '#'.
+    Conserva el orden y elimina duplicados.
+    """
+    urls = []
+    vistos = set()
+    for linea in text.splitlines():
+        linea = linea.strip()
+        if not linea or linea.startswith('#'):
+            continue
+        for parte in linea.replace(',', ' ').replace(';', ' ').split():
+            if parte.startswith(('http://', 'https://')) and parte not in vistos:
+                vistos.add(parte)
+                urls.append(parte)
+    return urls
+
+
+def load_url_file(path):
+    """Lee URLs desde un archivo de texto o CSV (se toma cualquier celda que sea una URL)."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if not path.lower().endswith('.csv'):
+            return parse_url_list(f.read())
+        celdas = [celda.strip() for fila in csv.reader(f) for celda in fila]
+    return parse_url_list("\n".join(celdas))
+
+
+class DownloadQueue:
+    """
+    Cola persistente de descargas.
+
+    Cada cambio de estado se agrega como una línea JSON al journal, de modo que al
+    reiniciar se reconstruye el último estado de cada trabajo. Los trabajos que
+    quedaron 'running' por un cierre inesperado vuelven a 'pending' y se retoman.
+
+    `runner(job, stop_event)` es la función que realiza la descarga; debe lanzar una
+    excepción si falla. Se ejecuta en hasta `max_concurrent` hilos a la vez.
+
+    Con `retry_policy` (ver retry_policy.RetryPolicy), un trabajo que falla con un
+    error transitorio vuelve a la cola después de una espera exponencial en lugar
+    de quedar 'error'; mientras espera figura como 'pending'.
+
+    Los trabajos completados hace más de `done_retention` segundos se descartan al
+    compactar el journal (al abrir la cola), así no crece con cada sesión.
+    """
+
+    def __init__(self, runner, journal_path=QUEUE_FILE, max_concurrent=2, on_change=None, retry_policy=None,
+                 done_retention=DEFAULT_DONE_RETENTION):
+        self.runner = runner
+        self.journal_path = journal_path
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.on_change = on_change
+        self.retry_policy = retry_policy
+        self.done_retention = done_retention
+
+        self.jobs = {}
+        self._pendientes = deque()
+        self._en_curso = set()  # IDs que algún hilo está ejecutando ahora
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self._hilos = []
+
+        self._cargar_journal()
+
+    # --- Persistencia ---
+    def _cargar_journal(self):
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    linea = linea.strip()
+                    if not linea:
+                        continue
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        # Última línea truncada por un corte: se descarta
+                        continue
+                    self.jobs.setdefault(registro['id'], {}).update(registro)
+
+        if self.done_retention:
+            limite = time.time() - self.done_retention
+            viejos = [job_id for job_id, job in self.jobs.items()
+                      if job.get('estado') == COMPLETADO and job.get('actualizado', job.get('creado', 0)) < limite]
+            for job_id in viejos:
+                del self.jobs[job_id]
+
+        for job in self.jobs.values():
+            if job.get('estado') == EN_CURSO:
+                job['estado'] = PENDIENTE
+            if job.get('estado') == PENDIENTE:
+                self._pendientes.append(job['id'])
+
+        self._compactar_journal()
+
+    def _compactar_journal(self):
+        """Reescribe el journal con una sola línea por trabajo (escritura atómica)."""
+        tmp_path = self.journal_path + ".tmp"
+        with self._journal_lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for job in self.jobs.values():
+                    f.write(json.dumps(job, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def _registrar(self, job):
+        job['actualizado'] = time.time()
+        with self._journal_lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(job, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        if self.on_change:
+            self.on_change(self.resumen())
+
+    # --- API pública ---
+    def add_urls(self, urls, carpeta_destino, **campos):
+        """
+        Agrega trabajos pendientes a la cola y retorna sus IDs. `campos` se guardan en
+        cada trabajo (por ejemplo 'perfil', el perfil de formato con que se descarga).
+        """
+        ids = []
+        with self._cond:
+            for url in urls:
+                job = {
+                    'id': uuid.uuid4().hex,
+                    'url': url,
+                    'carpeta': carpeta_destino,
+                    'estado': PENDIENTE,
+                    'intentos': 0,
+                    'error': None,
+                    'creado': time.time(),
+                }
+                job.update(campos)
+                self.jobs[job['id']] = job
+                self._pendientes.append(job['id'])
+                self._registrar(job)
+                ids.append(job['id'])
+            self._cond.notify_all()
+        return ids
+
+    def retry_failed(self):
+        """Vuelve a poner en la cola todos los trabajos fallidos."""
+        with self._cond:
+            fallidos = [job for job in self.jobs.values() if job['estado'] == FALLIDO]
+            for job in fallidos:
+                job['estado'] = PENDIENTE
+                job['error'] = None
+                # Cada tanda manual vuelve a tener todos sus reintentos automáticos
+                job['intentos'] = 0
+                self._pendientes.append(job['id'])
+                self._registrar(job)
+            self._cond.notify_all()
+        return len(fallidos)
+
+    def annotate(self, job_id, **campos):
+        """Agrega datos a un trabajo (p. ej. título y tipo ya clasificados) y lo registra."""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job.update(campos)
+            self._registrar(job)
+
+    def fail_pending(self, job_id, error):
+        """
+        Marca como fallido un trabajo que todavía no empezó (se sabe de antemano que no
+        se puede descargar). Retorna False si ya no estaba pendiente.
+        """
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job['estado'] != PENDIENTE or job_id not in self._pendientes:
+                return False
+            self._pendientes.remove(job_id)
+            job['estado'] = FALLIDO
+            job['error'] = error
+            self._registrar(job)
+            return True
+
+    def resumen(self):
+        """Retorna un diccionario con la cantidad de trabajos en cada estado."""
+        conteo = {PENDIENTE: 0, EN_CURSO: 0, COMPLETADO: 0, FALLIDO: 0}
+        for job in list(self.jobs.values()):
+            conteo[job['estado']] = conteo.get(job['estado'], 0) + 1
+        return conteo
+
+    # --- Planificador ---
+    def start(self):
+        """
+        Arranca los hilos del planificador (no bloquea). Al volver a arrancar después de
+        stop() retoma, igual que al abrir el journal, los trabajos interrumpidos y los
+        reintentos cuya espera terminó mientras estaba detenida.
+        """
+        if self._hilos:
+            return
+        self.stop_event.clear()
+        self._retomar()
+        for i in range(self.max_concurrent):
+            hilo = threading.Thread(target=self._worker, name=f"cola-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def stop(self, wait=False):
+        """
+        Detiene el planificador. Los trabajos en curso reciben stop_event y, si se
+        interrumpen, quedan 'running' en el journal para retomarse en el próximo arranque.
+        """
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if wait:
+            for hilo in self._hilos:
+                hilo.join()
+        self._hilos = []
+
+    def _retomar(self):
+        ahora = time.time()
+        with self._cond:
+            for job in self.jobs.values():
+                if job['estado'] == EN_CURSO and job['id'] not in self._en_curso:
+                    job['estado'] = PENDIENTE
+                    self._registrar(job)
+                if job['estado'] != PENDIENTE or job['id'] in self._pendientes or job['id'] in self._en_curso:
+                    continue
+                espera = job.get('reintentar_en', 0) - ahora
+                if espera > 0:
+                    # Todavía esperando su reintento: el timer anterior pudo vencer con la cola detenida
+                    timer = threading.Timer(espera, self._reencolar, args=(job['id'],))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    self._pendientes.append(job['id'])
+            self._cond.notify_all()
+
+    def _siguiente(self):
+        with self._cond:
+            while not self._pendientes and not self.stop_event.is_set():
+                self._cond.wait()
+            if self.stop_event.is_set():
+                return None
+            job = self.jobs[self._pendientes.popleft()]
+            self._en_curso.add(job['id'])
+            job['estado'] = EN_CURSO
+            job['intentos'] += 1
+            self._registrar(job)
+            return job
+
+    def _reencolar(self, job_id):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if self.stop_event.is_set() or job is None or job['estado'] != PENDIENTE or job_id in self._pendientes:
+                return
+            self._pendientes.append(job_id)
+            self._cond.notify_all()
+
+    def _programar_reintento(self, job, error):
+        """Si el error es transitorio y quedan reintentos, deja el trabajo esperando su turno. Retorna True si lo hizo."""
+        reintento = job['intentos'] - 1
+        if self.retry_policy is None or not self.retry_policy.reintentable(error, reintento):
+            return False
+        espera = self.retry_policy.espera(reintento)
+        job['estado'] = PENDIENTE
+        job['error'] = str(error)
+        job['reintentar_en'] = time.time() + espera
+        timer = threading.Timer(espera, self._reencolar, args=(job['id'],))
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def _worker(self):
+        while True:
+            job = self._siguiente()
+            if job is None:
+                return
+            try:
+                self.runner(job, self.stop_event)
+            except Exception as e:
+                if self.stop_event.is_set():
+                    # Cierre de la aplicación: el trabajo se retoma en el próximo arranque
+                    with self._cond:
+                        self._en_curso.discard(job['id'])
+                    return
+                if not self._programar_reintento(job, e):
+                    job['estado'] = FALLIDO
+                    job['error'] = str(e)
+            else:
+                job['estado'] = COMPLETADO
+                job['error'] = None
+            with self._cond:
+                self._en_curso.discard(job['id'])
+                self._registrar(job)
@@ -0,0 +1,485 @@
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import hashlib
+import platform
+import tarfile
+import zipfile
+import threading
+import subprocess
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from format_planner import contenedor_para
+
+# Tamaño de los bloques al descargar, verificar y extraer (la memoria usada no depende del tamaño del archivo)
+CHUNK_SIZE = 1024 * 1024
+
+# Capacidades del binario de FFmpeg (versión, codificadores, aceleración por hardware),
+# guardadas en 'bin' para no volver a examinarlo en cada arranque
+CAPABILITIES_FILE = "ffmpeg_capabilities.json"
+# Segundos que se espera a cada comando del examen
+PROBE_TIMEOUT = 30
+
+# Perfiles de post-procesado que se aplican al archivo final de cada video
+# ('postprocess_profile' en config.ini) y su descripción para la interfaz
+PERFILES_POSTPROCESO = {
+    'none': "Sin post-procesado",
+    'remux': "Reempaquetar a MP4 (sin recodificar)",
+    'mp3': "Extraer audio MP3",
+    'opus': "Extraer audio Opus",
+    'transcode': "Recodificar a H.264/AAC (MP4)",
+}
+DEFAULT_POSTPROCESS_PROFILE = 'none'
+
+# Codificadores H.264 por hardware en orden de preferencia, con sus opciones antes y
+# después de '-i'. Que FFmpeg los liste no alcanza (las builds estáticas traen NVENC
+# aunque no haya GPU): al examinar el binario se prueba cada uno con un cuadro.
+ENCODERS_HARDWARE = {
+    'h264_nvenc': ([], ['-c:v', 'h264_nvenc', '-preset', 'p4', '-cq', '23']),
+    'h264_qsv': ([], ['-c:v', 'h264_qsv', '-global_quality', '23']),
+    'h264_videotoolbox': ([], ['-c:v', 'h264_videotoolbox', '-q:v', '65']),
+    'h264_amf': ([], ['-c:v', 'h264_amf', '-quality', 'balanced']),
+    'h264_vaapi': (['-vaapi_device', '/dev/dri/renderD128'], ['-vf', 'format=nv12,hwupload', '-c:v', 'h264_vaapi', '-qp', '23']),
+}
+ENCODER_SOFTWARE = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23']
+
+# Sin ventana de consola por cada proceso de FFmpeg en Windows
+_SIN_VENTANA = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+
+def default_ffmpeg_processes():
+    """Procesos de FFmpeg a la vez: la mitad de los núcleos, cada uno con su parte de los hilos."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _ultima_linea(texto):
+    lineas = [linea.strip() for linea in (texto or "").splitlines() if linea.strip()]
+    return lineas[-1] if lineas else "sin detalles"
+
+
+# --- GESTOR DE FFMPEG ---
+class FFmpegManager:
+    """
+    Se encarga de verificar y descargar FFmpeg de forma portable, y de correr los
+    perfiles de post-procesado en un pool de a lo sumo `max_processes` procesos de
+    FFmpeg a la vez (cada recodificación limitada a su parte de los núcleos).
+    """
+
+    # Releases oficiales de las builds recomendadas para yt-dlp
+    FFMPEG_BASE_URL = "https://github.com/yt-dlp/FFmpeg-Builds/releases/download/latest"
+    CHECKSUMS_FILE = "checksums.sha256"
+
+    # Archivo de la build según el sistema operativo y la arquitectura
+    BUILDS = {
+        ('windows', 'x86_64'): "ffmpeg-master-latest-win64-gpl.zip",
+        ('windows', 'arm64'): "ffmpeg-master-latest-winarm64-gpl.zip",
+        ('linux', 'x86_64'): "ffmpeg-master-latest-linux64-gpl.tar.xz",
+        ('linux', 'arm64'): "ffmpeg-master-latest-linuxarm64-gpl.tar.xz",
+    }
+
+    def __init__(self, bin_dir=None, base_url=None, system=None, machine=None, session=None, max_processes=None, hardware=True):
+        # Carpeta local 'bin' donde guardaremos los ejecutables dentro del proyecto
+        self.bin_dir = bin_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+        self.base_url = (base_url or self.FFMPEG_BASE_URL).rstrip('/')
+        self.system = (system or platform.system()).lower()
+        self.machine = self._normalizar_arquitectura(machine or platform.machine())
+        # Sesión HTTP compartida (requests.Session); sin ella, cada petición abre su conexión
+        self.session = session or requests
+
+        exe_suffix = '.exe' if self.system == 'windows' else ''
+        self.ffmpeg_exe = os.path.join(self.bin_dir, 'ffmpeg' + exe_suffix)
+        self.ffprobe_exe = os.path.join(self.bin_dir, 'ffprobe' + exe_suffix)
+
+        # Post-procesado: entre todos los procesos no usan más hilos que núcleos hay
+        self.max_processes = max(1, int(max_processes or default_ffmpeg_processes()))
+        self.threads_per_job = max(1, (os.cpu_count() or 1) // self.max_processes)
+        self.hardware = hardware
+        self.capabilities_path = os.path.join(self.bin_dir, CAPABILITIES_FILE)
+        self._capacidades = None
+        self._capacidades_lock = threading.Lock()
+        self._pool = None
+        self._procesos = set()
+        self._pool_lock = threading.Lock()
+        # shutil.which recorre todo el PATH: se busca una sola vez por gestor
+        self._en_path = None
+
+    def _normalizar_arquitectura(self, machine):
+        machine = machine.lower()
+        if machine in ('amd64', 'x86_64', 'x64'):
+            return 'x86_64'
+        if machine in ('arm64', 'aarch64', 'armv8l'):
+            return 'arm64'
+        return machine
+
+    def get_build_name(self):
+        """Nombre del archivo de la build para esta plataforma, o None si no hay una."""
+        return self.BUILDS.get((self.system, self.machine))
+
+    def get_ffmpeg_path(self):
+        """
+        Retorna la ruta del directorio que contiene el ffmpeg local si existe.
+        Si no, retorna None (para que el sistema use el PATH global).
+        """
+        if os.path.exists(self.ffmpeg_exe):
+            return self.bin_dir
+        return None
+
+    def _ffmpeg_del_sistema(self):
+        """Ruta del ffmpeg del PATH (o None), buscada la primera vez y recordada."""
+        if self._en_path is None:
+            self._en_path = shutil.which("ffmpeg") or ""
+        return self._en_path or None
+
+    def is_installed(self):
+        """Verifica si FFmpeg está en la carpeta local o en el sistema."""
+        local_check = os.path.exists(self.ffmpeg_exe)
+        return local_check or self._ffmpeg_del_sistema() is not None
+
+    def get_ffmpeg_binary(self):
+        """Ruta del ejecutable de FFmpeg en uso (el local o el del PATH), o None si no hay."""
+        if os.path.exists(self.ffmpeg_exe):
+            return self.ffmpeg_exe
+        return self._ffmpeg_del_sistema()
+
+    def _ffmpeg(self, ffmpeg, *args, timeout=PROBE_TIMEOUT):
+        return subprocess.run([ffmpeg, '-hide_banner', *args], stdin=subprocess.DEVNULL, capture_output=True,
+                              text=True, errors='replace', timeout=timeout, creationflags=_SIN_VENTANA)
+
+    # --- CAPACIDADES ---
+    def capabilities(self):
+        """
+        Capacidades del FFmpeg en uso: {'ffmpeg', 'version', 'encoders', 'hwaccels',
+        'hw_encoders', 'firma'}, o None si no hay FFmpeg. Se examina una sola vez por
+        binario: el resultado queda en memoria y en CAPABILITIES_FILE junto con la ruta,
+        el tamaño y la fecha del ejecutable, así uno nuevo se vuelve a examinar.
+        """
+        with self._capacidades_lock:
+            ffmpeg = self.get_ffmpeg_binary()
+            if ffmpeg is None:
+                return None
+            st = os.stat(ffmpeg)
+            firma = [os.path.abspath(ffmpeg), st.st_size, st.st_mtime_ns]
+            if self._capacidades is not None and self._capacidades['firma'] == firma:
+                return self._capacidades
+
+            capacidades = self._leer_capacidades()
+            if capacidades is None or capacidades.get('firma') != firma:
+                capacidades = self._examinar(ffmpeg)
+                capacidades['firma'] = firma
+                self._guardar_capacidades(capacidades)
+            self._capacidades = capacidades
+            return capacidades
+
+    def _leer_capacidades(self):
+        try:
+            with open(self.capabilities_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_capacidades(self, capacidades):
+        try:
+            os.makedirs(self.bin_dir, exist_ok=True)
+            tmp_path = self.capabilities_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(capacidades, f, indent=2)
+            os.replace(tmp_path, self.capabilities_path)
+        except OSError as e:
+            # Sin caché en disco se vuelve a examinar en el próximo arranque
+            print(f"No se pudieron guardar las capacidades de FFmpeg: {e}", file=sys.stderr)
+
+    def _examinar(self, ffmpeg):
+        """Corre `ffmpeg -version`, `-encoders` y `-hwaccels` y prueba los codificadores por hardware."""
+        try:
+            version = self._ffmpeg(ffmpeg, '-version').stdout.split('\n', 1)[0].split()
+            _, _, lista = self._ffmpeg(ffmpeg, '-encoders').stdout.partition('------')
+            hwaccels = self._ffmpeg(ffmpeg, '-hwaccels').stdout.splitlines()[1:]
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"No se pudo examinar FFmpeg ({ffmpeg}): {e}", file=sys.stderr)
+            version, lista, hwaccels = [], "", []
+
+        encoders = [linea.split()[1] for linea in lista.splitlines() if len(linea.split()) >= 2]
+        return {
+            'ffmpeg': os.path.abspath(ffmpeg),
+            'version': version[2] if len(version) > 2 and version[1] == 'version' else None,
+            'encoders': encoders,
+            'hwaccels': [linea.strip() for linea in hwaccels if linea.strip()],
+            'hw_encoders': [nombre for nombre in ENCODERS_HARDWARE
+                            if nombre in encoders and self._probar_encoder(ffmpeg, nombre)],
+        }
+
+    def _probar_encoder(self, ffmpeg, nombre):
+        """Codifica un cuadro negro con `nombre`: True si el hardware existe y responde."""
+        opciones_entrada, opciones_salida = ENCODERS_HARDWARE[nombre]
+        try:
+            proceso = self._ffmpeg(ffmpeg, '-loglevel', 'error', *opciones_entrada,
+                                   '-f', 'lavfi', '-i', 'color=c=black:s=256x256:d=0.1', '-frames:v', '1',
+                                   *opciones_salida, '-f', 'null', '-')
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return proceso.returncode == 0
+
+    # --- POST-PROCESADO ---
+    def encoder_video(self):
+        """(opciones de entrada, opciones de salida) del codificador H.264 a usar: por hardware si hay uno que funcione."""
+        capacidades = self.capabilities() or {}
+        if self.hardware:
+            for nombre in capacidades.get('hw_encoders', []):
+                opciones_entrada, opciones_salida = ENCODERS_HARDWARE[nombre]
+                return list(opciones_entrada), list(opciones_salida)
+        return [], ENCODER_SOFTWARE + ['-threads', str(self.threads_per_job)]
+
+    def _requiere_encoder(self, nombre):
+        capacidades = self.capabilities()
+        if capacidades is not None and nombre not in capacidades['encoders']:
+            raise RuntimeError(f"Este FFmpeg no incluye el codificador {nombre}")
+
+    def plan_postproceso(self, perfil, entrada, vcodec=None, acodec=None):
+        """
+        Qué hacer con `entrada` según el perfil: (extensión de salida, opciones antes
+        de '-i', opciones de salida), o None si el archivo ya está como pide el perfil.
+        `vcodec`/`acodec` son las familias de códec de format_planner (None si no se
+        conocen); con ellas, siempre que se pueda se copian los streams en lugar de recodificar.
+        """
+        ext_actual = os.path.splitext(entrada)[1][1:].lower()
+        hilos = ['-threads', str(self.threads_per_job)]
+
+        if perfil == 'none':
+            return None
+
+        if perfil == 'remux' or (perfil == 'transcode' and vcodec in ('avc1', 'h264') and acodec in ('mp4a', 'aacl')):
+            ext = 'mp4' if perfil == 'transcode' else contenedor_para(vcodec, acodec, 'mp4/mkv')
+            if ext == ext_actual:
+                return None
+            opciones = ['-map', '0', '-c', 'copy']
+            return ext, [], opciones + (['-movflags', '+faststart'] if ext == 'mp4' else [])
+
+        if perfil in ('mp3', 'opus'):
+            if ext_actual == perfil:
+                return None
+            if acodec == perfil:
+                audio = ['-c:a', 'copy']
+            elif perfil == 'mp3':
+                self._requiere_encoder('libmp3lame')
+                audio = ['-c:a', 'libmp3lame', '-q:a', '2']
+            else:
+                self._requiere_encoder('libopus')
+                audio = ['-c:a', 'libopus', '-b:a', '128k']
+            return perfil, [], ['-map', '0:a:0', '-vn', '-sn', '-dn'] + audio
+
+        if perfil == 'transcode':
+            opciones_entrada, video = self.encoder_video()
+            audio = ['-c:a', 'copy'] if acodec in ('mp4a', 'aacl') else ['-c:a', 'aac', '-b:a', '160k']
+            return ('mp4', hilos + opciones_entrada,
+                    ['-map', '0:v:0?', '-map', '0:a:0?'] + video + audio + ['-movflags', '+faststart'])
+
+        raise ValueError(f"Perfil de post-procesado desconocido: {perfil} (opciones: {', '.join(PERFILES_POSTPROCESO)})")
+
+    def _ejecutar_perfil(self, perfil, entrada, vcodec, acodec):
+        pasos = self.plan_postproceso(perfil, entrada, vcodec, acodec)
+        if pasos is None:
+            return entrada
+        ffmpeg = self.get_ffmpeg_binary()
+        if ffmpeg is None:
+            raise RuntimeError("FFmpeg no está instalado")
+
+        ext, opciones_entrada, opciones_salida = pasos
+        base = os.path.splitext(entrada)[0]
+        destino = f"{base}.{ext}"
+        # FFmpeg deduce el formato de la extensión: el temporal termina igual que el destino
+        temporal = f"{base}.pp.{ext}"
+        comando = [ffmpeg, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y',
+                   *opciones_entrada, '-i', entrada, *opciones_salida, temporal]
+
+        proceso = subprocess.Popen(comando, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                   text=True, errors='replace', creationflags=_SIN_VENTANA)
+        with self._pool_lock:
+            self._procesos.add(proceso)
+        try:
+            _, stderr = proceso.communicate()
+        finally:
+            with self._pool_lock:
+                self._procesos.discard(proceso)
+
+        if proceso.returncode != 0:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise RuntimeError(f"FFmpeg falló con el perfil '{perfil}': {_ultima_linea(stderr)}")
+        os.replace(temporal, destino)
+        if destino != entrada:
+            os.remove(entrada)
+        return destino
+
+    def submit(self, perfil, entrada, vcodec=None, acodec=None):
+        """
+        Encola el post-procesado de `entrada` con el perfil `perfil` y retorna un Future
+        con la ruta del archivo resultante (que reemplaza al original). Corren a lo sumo
+        `max_processes` a la vez; el resto espera su turno.
+        """
+        if perfil not in PERFILES_POSTPROCESO:
+            raise ValueError(f"Perfil de post-procesado desconocido: {perfil} (opciones: {', '.join(PERFILES_POSTPROCESO)})")
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_processes, thread_name_prefix="ffmpeg")
+            return self._pool.submit(self._ejecutar_perfil, perfil, entrada, vcodec, acodec)
+
+    def postprocesar(self, perfil, entrada, vcodec=None, acodec=None):
+        """Versión bloqueante de submit: retorna la ruta del archivo resultante."""
+        return self.submit(perfil, entrada, vcodec, acodec).result()
+
+    def close(self):
+        """Descarta los post-procesados que no empezaron y termina los procesos de FFmpeg en curso."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            procesos = list(self._procesos)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for proceso in procesos:
+            proceso.terminate()
+
+    # --- DESCARGA ---
+    def _obtener_checksum(self, build_name):
+        """Busca el SHA-256 esperado de la build en el archivo de checksums del release."""
+        response = self.session.get(f"{self.base_url}/{self.CHECKSUMS_FILE}", timeout=30)
+        response.raise_for_status()
+        for linea in response.text.splitlines():
+            partes = linea.split()
+            if len(partes) == 2 and partes[1].lstrip('*') == build_name:
+                return partes[0].lower()
+        raise ValueError(f"No se encontró el checksum de {build_name}")
+
+    def _descargar_archivo(self, url, destino, progress_callback=None):
+        """
+        Descarga `url` en `destino` por bloques. Si ya existe un archivo parcial, pide
+        solo lo que falta con una cabecera Range y sigue escribiendo al final.
+        """
+        inicio = os.path.getsize(destino) if os.path.exists(destino) else 0
+        headers = {'Range': f'bytes={inicio}-'} if inicio else {}
+
+        with self.session.get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 416:
+                # El parcial ya está completo: lo confirma la verificación del checksum
+                return
+            response.raise_for_status()
+            if response.status_code != 206:
+                # El servidor no soporta Range: se empieza de cero
+                inicio = 0
+            total = response.headers.get('Content-Length')
+            total = int(total) + inicio if total else None
+
+            descargado = inicio
+            ultimo_aviso = 0
+            with open(destino, 'ab' if inicio else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    descargado += len(chunk)
+                    ahora = time.monotonic()
+                    if progress_callback and ahora - ultimo_aviso >= 0.5:
+                        ultimo_aviso = ahora
+                        progress_callback(self._texto_progreso(descargado, total))
+            if progress_callback:
+                progress_callback(self._texto_progreso(descargado, total))
+
+    def _texto_progreso(self, descargado, total):
+        mib = descargado / (1024 * 1024)
+        if total:
+            return f"Descargando FFmpeg: {mib:.1f} de {total / (1024 * 1024):.1f} MiB ({descargado * 100 // total}%)"
+        return f"Descargando FFmpeg: {mib:.1f} MiB"
+
+    def _sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for bloque in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(bloque)
+        return digest.hexdigest()
+
+    # --- EXTRACCIÓN ---
+    def _extraer(self, archivo, build_name):
+        """Copia ffmpeg y ffprobe del archivo a 'bin' por bloques, sin cargarlos en memoria."""
+        destinos = {
+            os.path.basename(self.ffmpeg_exe): self.ffmpeg_exe,
+            os.path.basename(self.ffprobe_exe): self.ffprobe_exe,
+        }
+        encontrados = set()
+
+        if build_name.endswith('.zip'):
+            with zipfile.ZipFile(archivo) as zf:
+                for member in zf.infolist():
+                    # Pueden estar en subcarpetas dentro del zip
+                    filename = os.path.basename(member.filename).lower()
+                    if filename in destinos:
+                        with zf.open(member) as f_in:
+                            self._copiar_ejecutable(f_in, destinos[filename])
+                        encontrados.add(filename)
+        else:
+            with tarfile.open(archivo, 'r:*') as tf:
+                for member in tf:
+                    filename = os.path.basename(member.name).lower()
+                    if member.isfile() and filename in destinos:
+                        with tf.extractfile(member) as f_in:
+                            self._copiar_ejecutable(f_in, destinos[filename])
+                        encontrados.add(filename)
+
+        faltantes = set(destinos) - encontrados
+        if faltantes:
+            raise ValueError(f"El archivo descargado no contiene: {', '.join(sorted(faltantes))}")
+
+    def _copiar_ejecutable(self, f_in, destino):
+        tmp_path = destino + ".tmp"
+        with open(tmp_path, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, CHUNK_SIZE)
+        os.chmod(tmp_path, os.stat(tmp_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        os.replace(tmp_path, destino)
+
+    def install_ffmpeg(self, progress_callback=None):
+        """
+        Descarga y extrae ffmpeg en la carpeta local 'bin'.
+        La descarga se guarda en un archivo temporal que se retoma si se interrumpe,
+        y se verifica con el SHA-256 publicado en el release antes de extraerla.
+        """
+        try:
+            build_name = self.get_build_name()
+            if build_name is None:
+                return False, f"No hay una build de FFmpeg para {self.system}/{self.machine}. Instálalo desde tu gestor de paquetes."
+
+            if not os.path.exists(self.bin_dir):
+                os.makedirs(self.bin_dir)
+
+            if progress_callback:
+                progress_callback("Descargando herramientas necesarias (FFmpeg)...")
+
+            checksum = self._obtener_checksum(build_name)
+            archivo = os.path.join(self.bin_dir, build_name + ".part")
+            self._descargar_archivo(f"{self.base_url}/{build_name}", archivo, progress_callback)
+
+            if self._sha256(archivo) != checksum:
+                # Un parcial corrupto no se puede retomar: se borra para empezar de cero la próxima vez
+                os.remove(archivo)
+                return False, "Error al descargar componentes: el archivo descargado está dañado (checksum incorrecto)."
+
+            # Extraer solo los ejecutables necesarios
+            if progress_callback:
+                progress_callback("Instalando componentes...")
+            self._extraer(archivo, build_name)
+            os.remove(archivo)
+
+            return True, "Instalación completada."
+
+        except Exception as e:
+            return False, f"Error al descargar componentes: {str(e)}"
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--probe']:
+        # Capacidades del FFmpeg en uso: python ffmpeg_manager.py --probe
+        capacidades = FFmpegManager().capabilities()
+        print(json.dumps(capacidades, indent=2) if capacidades else "FFmpeg no está instalado")
+        sys.exit(0 if capacidades else 1)
+
+    # Instalación manual: python ffmpeg_manager.py
+    exito, mensaje = FFmpegManager().install_ffmpeg(progress_callback=print)
+    print(mensaje)
+    sys.exit(0 if exito else 1)
@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import threading
+
+# Elección de los formatos a descargar. En lugar de una cadena fija de yt-dlp, se
+# arman todas las combinaciones posibles de cada video (un formato con audio y video,
+# o un video solo + un audio solo), se estima su tamaño y se ordenan según un perfil.
+# Las combinaciones se unen siempre copiando los streams a un contenedor que acepte
+# ambos códecs (mp4, webm o mkv), así FFmpeg nunca recodifica: solo reempaqueta.
+#
+# La decisión se recuerda por canal (códecs, resolución y si hace falta unir) para que
+# todos los videos de un mismo canal o playlist se elijan igual, y se guarda en disco.
+
+# Perfiles disponibles y su descripción para la interfaz
+PERFILES = {
+    'compatible': "Compatible (MP4)",
+    'fastest': "Más rápida",
+    'smallest': "Más liviana",
+    'archive': "Máxima calidad",
+    'audio': "Solo audio",
+}
+DEFAULT_PROFILE = 'compatible'
+
+FORMAT_PLANS_FILE = "format_plans.json"
+# Días que se conserva la decisión tomada para un canal
+DEFAULT_PLAN_TTL_DAYS = 30
+
+# Contenedores a los que se puede unir cada códec copiando los streams (la misma
+# tabla que usa yt-dlp para elegir el contenedor en yt_dlp.utils.get_compatible_ext)
+CODECS_CONTENEDOR = {
+    'mp4': {'av1', 'hevc', 'avc1', 'h264', 'mp4a', 'aacl', 'ec-3', 'ac-4'},
+    'webm': {'av1', 'vp9', 'vp8', 'opus', 'vrbs'},
+}
+# Códecs que abre cualquier reproductor dentro de un mp4
+CODECS_UNIVERSALES = {'avc1', 'h264', 'mp4a', 'aacl'}
+# Calidad por byte de cada códec de video (mayor es mejor)
+RANGO_CODEC_VIDEO = {'av1': 3, 'vp9': 2, 'hevc': 2, 'avc1': 1, 'h264': 1, 'vp8': 0}
+# Con 'fastest', la resolución mínima a la que se baja (o la mayor disponible si es menos)
+ALTURA_RAPIDA = 720
+
+_INF = float('inf')
+
+
+def merge_output_format(perfil):
+    """Valor de 'merge_output_format' para el perfil: el primer contenedor que acepte los dos códecs."""
+    return 'mp4' if perfil == 'compatible' else 'mp4/webm/mkv'
+
+
+def familia_codec(codec):
+    """'avc1.64001F' -> 'avc1', 'vp09.00.40.08' -> 'vp9', 'none' o desconocido -> None."""
+    if not codec or codec == 'none':
+        return None
+    familia = codec.split('.')[0].replace('0', '').lower()
+    return {'hev1': 'hevc', 'hvc1': 'hevc', 'avc3': 'avc1', 'aac': 'mp4a'}.get(familia, familia)
+
+
+def contenedor_para(vcodec, acodec, preferencias):
+    """Contenedor donde yt-dlp une los códecs copiando los streams (None = uno que los acepte a medias)."""
+    codecs = {c for c in (vcodec, acodec) if c}
+    for ext in preferencias.split('/'):
+        if ext == 'mkv' or codecs <= CODECS_CONTENEDOR.get(ext, set()):
+            return ext
+    return None
+
+
+def estimar_tamano(formato, duracion):
+    """Bytes informados por el sitio o, si no hay, estimados con el bitrate y la duración."""
+    tamano = formato.get('filesize') or formato.get('filesize_approx')
+    if tamano:
+        return tamano
+    tbr = formato.get('tbr') or ((formato.get('vbr') or 0) + (formato.get('abr') or 0))
+    if tbr and duracion:
+        return int(tbr * 1000 / 8 * duracion)
+    return None
+
+
+def _descargable(formato):
+    return (formato.get('format_id') is not None and not formato.get('has_drm')
+            and formato.get('ext') != 'mhtml' and formato.get('protocol') != 'mhtml')
+
+
+def candidatos(info, perfil=DEFAULT_PROFILE):
+    """
+    Combinaciones descargables de `info['formats']`: cada formato con audio y video
+    por separado y cada par video solo + audio solo. Retorna una lista de diccionarios
+    {'spec', 'formatos', 'tamano', 'altura', 'fps', 'vcodec', 'acodec', 'tbr', 'abr',
+    'merge', 'contenedor', 'con_video', 'con_audio'} (los códecs son None si no se conocen).
+    """
+    duracion = info.get('duration')
+    preferencias = merge_output_format(perfil)
+    videos, audios, completos = [], [], []
+    for f in info.get('formats') or []:
+        if not _descargable(f):
+            continue
+        if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none'):
+            audios.append(f)
+        elif f.get('acodec') == 'none' and f.get('vcodec') not in (None, 'none'):
+            videos.append(f)
+        elif f.get('vcodec') != 'none' or f.get('acodec') != 'none':
+            completos.append(f)
+
+    def candidato(formatos):
+        video = next((f for f in formatos if f.get('vcodec') != 'none'), None)
+        audio = next((f for f in formatos if f.get('acodec') != 'none'), None)
+        vcodec = familia_codec(video.get('vcodec')) if video else None
+        acodec = familia_codec(audio.get('acodec')) if audio else None
+        tamanos = [estimar_tamano(f, duracion) for f in formatos]
+        merge = len(formatos) > 1
+        return {
+            'spec': '+'.join(f['format_id'] for f in formatos),
+            'formatos': formatos,
+            'tamano': sum(tamanos) if None not in tamanos else None,
+            'altura': (video or {}).get('height') or 0,
+            'fps': (video or {}).get('fps') or 0,
+            'vcodec': vcodec,
+            'acodec': acodec,
+            'tbr': sum(f.get('tbr') or 0 for f in formatos),
+            'abr': (audio or {}).get('abr') or 0,
+            'merge': merge,
+            'contenedor': contenedor_para(vcodec, acodec, preferencias) if merge else formatos[0].get('ext'),
+            'con_video': video is not None,
+            'con_audio': audio is not None,
+        }
+
+    resultado = [candidato([f]) for f in completos + audios]
+    resultado += [candidato([v, a]) for v in videos for a in audios]
+    return resultado
+
+
+def _clave(perfil, c, altura_rapida):
+    """Orden de los candidatos según el perfil (se elige el mayor)."""
+    tamano = c['tamano'] if c['tamano'] is not None else _INF
+    completo = c['con_video'] and c['con_audio']
+    if perfil == 'audio':
+        return (c['con_audio'], not c['con_video'], c['abr'], c['acodec'] in CODECS_UNIVERSALES, -tamano)
+    if perfil == 'smallest':
+        return (completo, -tamano, c['altura'])
+    if perfil == 'fastest':
+        # La resolución mínima aceptable y, desde ahí, lo que menos bytes baje y no haya que unir
+        return (completo, c['altura'] >= altura_rapida, not c['merge'], -tamano)
+    if perfil == 'archive':
+        return (completo, c['altura'], c['fps'], RANGO_CODEC_VIDEO.get(c['vcodec'], 0), c['tbr'], c['abr'])
+    # compatible: un mp4 que se abre en cualquier lado, y dentro de eso la mejor calidad
+    universal = c['vcodec'] in CODECS_UNIVERSALES and c['acodec'] in CODECS_UNIVERSALES
+    return (completo, c['contenedor'] == 'mp4', universal, c['altura'], c['fps'], c['tbr'])
+
+
+def elegir(info, perfil=DEFAULT_PROFILE, patron=None):
+    """
+    Mejor candidato de `info` para el perfil, o None si el video no trae formatos
+    para elegir. Con `patron` (la decisión guardada del canal) se busca primero
+    entre los candidatos que lo cumplen.
+    """
+    lista = candidatos(info, perfil)
+    if len(lista) < 2:
+        return None
+    altura_rapida = min(ALTURA_RAPIDA, max(c['altura'] for c in lista))
+    if patron:
+        iguales = [c for c in lista if _patron(c) == patron]
+        if iguales:
+            return max(iguales, key=lambda c: _clave(perfil, c, altura_rapida))
+    return max(lista, key=lambda c: _clave(perfil, c, altura_rapida))
+
+
+def _patron(c):
+    return {'vcodec': c['vcodec'], 'acodec': c['acodec'], 'altura': c['altura'], 'merge': c['merge']}
+
+
+def format_spec(plan, perfil=DEFAULT_PROFILE):
+    """Cadena 'format' de yt-dlp para un plan de FormatPlanner.plan."""
+    # Si el formato elegido no se puede bajar, yt-dlp sigue con la alternativa
+    return plan['spec'] + ('/bestaudio/best' if perfil == 'audio' else '/bestvideo*+bestaudio/best')
+
+
+def clave_canal(info):
+    canal = info.get('channel_id') or info.get('uploader_id') or info.get('channel_url') or info.get('uploader')
+    if not canal:
+        return None
+    return f"{info.get('extractor_key') or info.get('extractor') or ''}:{canal}"
+
+
+class FormatPlanner:
+    """
+    Planificador de formatos con la decisión de cada canal guardada en `cache_path`
+    (JSON, escritura atómica), válida por `ttl` segundos.
+    """
+
+    def __init__(self, cache_path=FORMAT_PLANS_FILE, ttl=DEFAULT_PLAN_TTL_DAYS * 86400):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._planes = None
+
+    def _cargar(self):
+        if self._planes is None:
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    self._planes = json.load(f)
+            except (OSError, ValueError):
+                self._planes = {}
+        return self._planes
+
+    def _guardar(self):
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._planes, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"No se pudo guardar {self.cache_path}: {e}", file=sys.stderr)
+
+    def patron_guardado(self, info, perfil):
+        canal = clave_canal(info)
+        if canal is None:
+            return None
+        with self._lock:
+            registro = self._cargar().get(f"{canal}:{perfil}")
+        if not registro or time.time() - registro.get('actualizado', 0) > self.ttl:
+            return None
+        return registro['patron']
+
+    def plan(self, info, perfil=DEFAULT_PROFILE):
+        """
+        Decide qué descargar para `info` (un video con 'formats'). Retorna None si no
+        hay nada que elegir, o un diccionario con 'spec' (para el 'format' de yt-dlp),
+        'formatos' (IDs), 'tamano', 'altura', 'vcodec', 'acodec', 'merge',
+        'contenedor' y 'canal' (True si se usó la decisión guardada del canal).
+        """
+        patron = self.patron_guardado(info, perfil)
+        elegido = elegir(info, perfil, patron)
+        if elegido is None:
+            return None
+        nuevo = _patron(elegido)
+        canal = clave_canal(info)
+        if canal is not None and nuevo != patron:
+            with self._lock:
+                self._cargar()[f"{canal}:{perfil}"] = {'patron': nuevo, 'actualizado': time.time()}
+                self._guardar()
+        return {
+            'spec': elegido['spec'],
+            'formatos': [f['format_id'] for f in elegido['formatos']],
+            'tamano': elegido['tamano'],
+            'altura': elegido['altura'] or None,
+            'vcodec': elegido['vcodec'],
+            'acodec': elegido['acodec'],
+            'merge': elegido['merge'],
+            'contenedor': elegido['contenedor'],
+            'canal': patron is not None and nuevo == patron,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._planes = {}
+            self._guardar()
+
+
+if __name__ == "__main__":
+    # Uso: python format_planner.py URL [perfil ...]
+    # Muestra qué elegiría cada perfil para un video, sin descargarlo.
+    import yt_dlp
+    if len(sys.argv) < 2:
+        print("Uso: python format_planner.py URL [perfil ...]", file=sys.stderr)
+        sys.exit(2)
+    perfiles = sys.argv[2:] or list(PERFILES)
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        info = ydl.extract_info(sys.argv[1], download=False, process=False)
+    for perfil in perfiles:
+        elegido = elegir(info, perfil)
+        if elegido is None:
+            print(f"{perfil:>10}: (sin formatos para elegir)")
+            continue
+        tamano = f"{elegido['tamano'] / 1024 / 1024:.1f} MiB" if elegido['tamano'] else "?"
+        print(f"{perfil:>10}: {elegido['spec']:<12} {elegido['altura'] or '-':>5}p "
+              f"{elegido['vcodec'] or '-'}+{elegido['acodec'] or '-'} -> {elegido['contenedor']} "
+              f"{'(une sin recodificar)' if elegido['merge'] else '(un solo archivo)'} {tamano}")
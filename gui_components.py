@@ -4,15 +4,18 @@ import customtkinter as ctk
 from tkinter import filedialog, messagebox, Toplevel
 import threading
 import webbrowser
-from app_logic import AppLogic
+from app_logic import AppLogic, MAIN_JOB
+from format_planner import PERFILES, DEFAULT_PROFILE
+from progress_bus import UI_REFRESH_MS
+from job_dashboard import JobDashboard
 
 class YouTubeDownloaderApp(ctk.CTk):
     def __init__(self):
         super().__init__()
 
         self.title("YouTube Downloader by LiquiDev")
-        self.geometry("700x450")
-        self.minsize(600, 400)
+        self.geometry("760x720")
+        self.minsize(680, 660)
         
         # --- Configurar icono de la ventana ---
         if hasattr(sys, '_MEIPASS'):
@@ -34,7 +37,10 @@ class YouTubeDownloaderApp(ctk.CTk):
 
         # --- Variables ---
         self.entrada_url = ctk.StringVar()
-        self.estado_descarga = ctk.StringVar(value="Listo para descargar.")
+        self.estado_descarga = ctk.StringVar(value="Iniciando...")
+        self.estado_cola = ctk.StringVar(value="Cola vacía.")
+        self.limite_velocidad = ctk.StringVar()
+        self.perfil_formato = ctk.StringVar(value=PERFILES[DEFAULT_PROFILE])
         self.ruta_descarga = ctk.StringVar()
         
         # Variables relacionadas con playlist para el diálogo
@@ -59,18 +65,46 @@ class YouTubeDownloaderApp(ctk.CTk):
             root_window=self,
             cancel_event=self.cancel_event
         )
-        self.app_logic.cargar_configuracion()
-
-        self.ruta_descarga.set(self.app_logic.ruta_descarga_var.get())
-        if not self.ruta_descarga.get():
-            self.ruta_descarga.set(self.app_logic.get_user_videos_dir())
 
         self.create_widgets()
-        self.app_logic.progress_bar_widget = self.progress_bar
-        
+
+        # El progreso llega por el bus y se vuelca en la interfaz a ritmo fijo
+        self._progress_version = 0
+        self.after(UI_REFRESH_MS, self._refrescar_progreso)
+
+        # La ventana se muestra primero; el motor (yt-dlp, config.ini, cola) se arma en segundo plano
+        self.after_idle(lambda: self.app_logic.iniciar_motor(on_ready=self._motor_listo))
+
         # Configurar la función de cierre de la ventana
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    def _motor_listo(self):
+        """Con el motor ya creado: carga la configuración guardada y arranca la cola."""
+        try:
+            self.app_logic.engine
+        except RuntimeError as e:
+            self.estado_descarga.set(str(e))
+            messagebox.showerror("Error", str(e))
+            return
+
+        # Los controles que usan el motor quedan deshabilitados hasta aquí (ver create_widgets)
+        for control in self._controles_motor():
+            control.configure(state="normal")
+
+        self.app_logic.cargar_configuracion()
+        if not self.ruta_descarga.get():
+            self.ruta_descarga.set(self.app_logic.get_user_videos_dir())
+        self.limite_velocidad.set(self.app_logic.get_limite_velocidad())
+        self.perfil_formato.set(self.app_logic.get_perfil_formato())
+        if self.estado_descarga.get() == "Iniciando...":
+            self.estado_descarga.set("Listo para descargar.")
+
+        # La cola retoma los trabajos pendientes que quedaron de la sesión anterior
+        self.actualizar_estado_cola(self.app_logic.download_queue.resumen())
+        self.app_logic.iniciar_cola()
+        # Los canales y playlists suscritos se siguen sincronizando mientras la ventana está abierta
+        self.app_logic.iniciar_suscripciones()
+
     def create_widgets(self):
         # --- Frame Principal de Entrada ---
         frame_entrada = ctk.CTkFrame(self, corner_radius=10)
@@ -115,13 +149,55 @@ class YouTubeDownloaderApp(ctk.CTk):
         self.button_cancelar = ctk.CTkButton(frame_botones_accion, text="Cancelar", command=self.cancelar_descarga, font=ctk.CTkFont(size=16, weight="bold"), corner_radius=10, hover_color="#c0392b", state="disabled")
         self.button_cancelar.grid(row=0, column=1, padx=(5, 0), sticky="ew")
 
-        # --- Barra de Progreso y Estado ---
-        self.progress_bar = ctk.CTkProgressBar(self, orientation="horizontal", progress_color="#1F6AA5", corner_radius=8)
-        self.progress_bar.pack(pady=(0, 5), padx=20, fill="x")
-        self.progress_bar.set(0)
+        # --- Cola de Descargas ---
+        frame_cola = ctk.CTkFrame(self, fg_color="transparent")
+        frame_cola.pack(pady=(0, 10), padx=20, fill="x")
+        frame_cola.grid_columnconfigure(4, weight=1)
+
+        self.button_encolar = ctk.CTkButton(frame_cola, text="Añadir a cola", command=self.encolar_urls, width=110, corner_radius=8)
+        self.button_encolar.grid(row=0, column=0, padx=(0, 5), sticky="w")
+
+        self.button_cargar_lista = ctk.CTkButton(frame_cola, text="Cargar lista...", command=self.encolar_archivo, width=110, corner_radius=8)
+        self.button_cargar_lista.grid(row=0, column=1, padx=(0, 5), sticky="w")
+
+        self.button_reintentar = ctk.CTkButton(frame_cola, text="Reintentar fallidos", command=self.reintentar_fallidos, width=130, corner_radius=8)
+        self.button_reintentar.grid(row=0, column=2, padx=(0, 5), sticky="w")
+
+        self.button_suscribir = ctk.CTkButton(frame_cola, text="Suscribirse", command=self.suscribir_urls, width=100, corner_radius=8)
+        self.button_suscribir.grid(row=0, column=3, padx=(0, 10), sticky="w")
+
+        self.label_cola = ctk.CTkLabel(frame_cola, textvariable=self.estado_cola, font=ctk.CTkFont(size=12), anchor="w")
+        self.label_cola.grid(row=0, column=4, sticky="ew")
 
-        self.label_estado = ctk.CTkLabel(self, textvariable=self.estado_descarga, font=ctk.CTkFont(size=12), text_color="#3498db")
-        self.label_estado.pack(pady=(0, 10), padx=20, fill="x")
+        # --- Límite de velocidad (se aplica en caliente a todas las descargas) ---
+        frame_velocidad = ctk.CTkFrame(self, fg_color="transparent")
+        frame_velocidad.pack(pady=(0, 10), padx=20, fill="x")
+
+        label_velocidad = ctk.CTkLabel(frame_velocidad, text="Velocidad máxima:", font=ctk.CTkFont(size=12, weight="bold"))
+        label_velocidad.grid(row=0, column=0, padx=(0, 5), sticky="w")
+
+        self.entry_velocidad = ctk.CTkEntry(frame_velocidad, textvariable=self.limite_velocidad, placeholder_text="Sin límite (ej. 2M, 500K)", width=180, corner_radius=8)
+        self.entry_velocidad.grid(row=0, column=1, padx=(0, 5), sticky="w")
+        self.entry_velocidad.bind("<Return>", lambda event: self.aplicar_limite_velocidad())
+
+        self.button_velocidad = ctk.CTkButton(frame_velocidad, text="Aplicar", command=self.aplicar_limite_velocidad, width=80, corner_radius=8)
+        self.button_velocidad.grid(row=0, column=2, sticky="w")
+
+        # --- Perfil de formato (qué calidad y contenedor se eligen en las próximas descargas) ---
+        label_formato = ctk.CTkLabel(frame_velocidad, text="Formato:", font=ctk.CTkFont(size=12, weight="bold"))
+        label_formato.grid(row=0, column=3, padx=(20, 5), sticky="w")
+
+        self.menu_formato = ctk.CTkOptionMenu(frame_velocidad, variable=self.perfil_formato, values=list(PERFILES.values()),
+                                              command=self.app_logic.ajustar_perfil_formato, width=160, corner_radius=8)
+        self.menu_formato.grid(row=0, column=4, sticky="w")
+
+        # Sin el motor, estos controles bloquearían la ventana hasta que termine de crearse
+        for control in self._controles_motor():
+            control.configure(state="disabled")
+
+        # --- Panel de trabajos: estado, velocidad total y una fila por descarga ---
+        self.dashboard = JobDashboard(self, self.app_logic.progress_bus, self.estado_descarga, self.nombre_trabajo)
+        self.dashboard.pack(pady=(0, 10), padx=20, fill="x")
 
         # --- Footer SIMPLIFICADO ---
         frame_footer = ctk.CTkFrame(self, fg_color="transparent")
@@ -134,6 +210,11 @@ class YouTubeDownloaderApp(ctk.CTk):
     def open_link(self, url):
         webbrowser.open_new(url)
 
+    def _controles_motor(self):
+        """Controles que llaman al motor desde el hilo de la interfaz (se habilitan en _motor_listo)."""
+        return (self.button_examinar, self.button_encolar, self.button_cargar_lista, self.button_reintentar,
+                self.button_suscribir, self.entry_velocidad, self.button_velocidad, self.menu_formato)
+
     def iniciar_descarga_hilo(self):
         url = self.entrada_url.get()
         if not url:
@@ -144,17 +225,86 @@ class YouTubeDownloaderApp(ctk.CTk):
         self.cancel_event.clear()
         threading.Thread(target=self._check_and_download, args=(url,)).start()
 
+    def encolar_urls(self):
+        carpeta = self.ruta_descarga.get()
+        if not carpeta:
+            messagebox.showwarning("Advertencia", "Por favor, selecciona una carpeta de destino.")
+            return
+        agregadas = self.app_logic.encolar_urls(self.entrada_url.get(), carpeta)
+        if agregadas == 0:
+            messagebox.showwarning("Advertencia", "No se encontraron URLs válidas para añadir a la cola.")
+            return
+        self.entrada_url.set("")
+
+    def encolar_archivo(self):
+        carpeta = self.ruta_descarga.get()
+        if not carpeta:
+            messagebox.showwarning("Advertencia", "Por favor, selecciona una carpeta de destino.")
+            return
+        path = filedialog.askopenfilename(filetypes=[("Listas de URLs", "*.txt *.csv"), ("Todos los archivos", "*.*")])
+        if not path:
+            return
+        try:
+            agregadas = self.app_logic.encolar_archivo(path, carpeta)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Error", f"No se pudo leer el archivo: {e}")
+            return
+        if agregadas == 0:
+            messagebox.showwarning("Advertencia", "El archivo no contiene URLs válidas.")
+
+    def suscribir_urls(self):
+        carpeta = self.ruta_descarga.get()
+        if not carpeta:
+            messagebox.showwarning("Advertencia", "Por favor, selecciona una carpeta de destino.")
+            return
+        if self.app_logic.suscribir_urls(self.entrada_url.get(), carpeta) == 0:
+            messagebox.showwarning("Advertencia", "No se encontraron URLs válidas para suscribirse.")
+            return
+        self.entrada_url.set("")
+
+    def aplicar_limite_velocidad(self):
+        # <Return> en el campo llega aunque esté deshabilitado
+        if not self.app_logic.motor_listo:
+            return
+        if self.app_logic.ajustar_limite_velocidad(self.limite_velocidad.get()):
+            self.limite_velocidad.set(self.app_logic.get_limite_velocidad())
+
+    def reintentar_fallidos(self):
+        self.app_logic.reintentar_fallidos()
+
+    def actualizar_estado_cola(self, resumen):
+        self.estado_cola.set(
+            f"Cola: {resumen['pending']} pendientes, {resumen['running']} en curso, "
+            f"{resumen['done']} completados, {resumen['error']} con error")
+
+    def _refrescar_progreso(self):
+        # La línea de estado sigue a la descarga de la ventana; el resto lo dibuja el panel
+        self._progress_version, cambios = self.app_logic.progress_bus.changes_since(self._progress_version)
+        for state in cambios:
+            if state.job_id == MAIN_JOB:
+                self.estado_descarga.set(self.app_logic.texto_estado(state))
+        self.after(UI_REFRESH_MS, self._refrescar_progreso)
+
+    def nombre_trabajo(self, job_id, state):
+        """Texto de la fila de un trabajo en el panel."""
+        if job_id == MAIN_JOB:
+            return f"Descarga: {state.title}" if state is not None and state.title else "Descarga"
+        return self.app_logic.nombre_trabajo(job_id, state)
+
     def cancelar_descarga(self):
         self.cancel_event.set()
-        self.estado_descarga.set("Cancelando descarga...")
+        self.app_logic.publicar_estado("Cancelando descarga...")
         self.deshabilitar_interfaz(cancelando=True)
 
     def on_closing(self):
         if self.button_descargar.cget("state") == "disabled" and not self.cancel_event.is_set():
             if messagebox.askyesno("Cerrar aplicación", "¿Estás seguro de que quieres cerrar la aplicación? La descarga en curso se cancelará."):
                 self.cancelar_descarga()
+                self.app_logic.cerrar()
                 self.destroy()
         else:
+            # Los trabajos de la cola que queden a medias se retoman al volver a abrir
+            self.app_logic.cerrar()
             self.destroy()
 
     def _check_and_download(self, url):
@@ -164,7 +314,7 @@ class YouTubeDownloaderApp(ctk.CTk):
 
         if self.cancel_event.is_set():
             self.after(0, self.habilitar_interfaz)
-            self.after(0, lambda: self.estado_descarga.set("Descarga cancelada."))
+            self.app_logic.publicar_estado("Descarga cancelada.")
             return
 
         if is_playlist:
@@ -176,7 +326,7 @@ class YouTubeDownloaderApp(ctk.CTk):
                 self._run_download_task()
             else:
                 self.after(0, self.habilitar_interfaz)
-                self.after(0, lambda: self.estado_descarga.set("Descarga de playlist cancelada."))
+                self.app_logic.publicar_estado("Descarga de playlist cancelada.")
         else:
             self.app_logic.es_playlist_var.set(False)
             self._run_download_task()
@@ -242,7 +392,12 @@ class PlaylistConfirmationDialog(ctk.CTkToplevel):
         self.grid_rowconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=0)
 
-        label_message = ctk.CTkLabel(self, text=f"¡Atención! Has pegado el link de una playlist con {self.num_videos} videos.\n\n¿Deseas continuar con la descarga de todos los videos?",
+        if self.num_videos is None:
+            # Playlist larga que se lista página a página: el total se conoce al recorrerla
+            cantidad = "una playlist cuyo tamaño se calculará durante la descarga"
+        else:
+            cantidad = f"una playlist con {self.num_videos} videos"
+        label_message = ctk.CTkLabel(self, text=f"¡Atención! Has pegado el link de {cantidad}.\n\n¿Deseas continuar con la descarga de todos los videos?",
                                      font=ctk.CTkFont(size=14, weight="bold"), wraplength=350, justify="center")
         label_message.pack(pady=20, padx=20, fill="both", expand=True)
 
@@ -0,0 +1,428 @@
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from download_queue import PENDIENTE, EN_CURSO, COMPLETADO, FALLIDO
+
+# Reparto de descargas entre varias máquinas. Un coordinador divide cada playlist en
+# una tarea por video y las publica en un broker; los workers (uno o más procesos por
+# máquina, ver distributed_worker.py) toman tareas con un lease que renuevan mientras
+# descargan. Si un worker se cae, su lease vence y la tarea vuelve a quedar pendiente
+# para otro.
+#
+# Hay dos backends con la misma interfaz:
+#   - SQLiteBroker: un archivo SQLite; los bloqueos de archivo de SQLite serializan a
+#     los procesos. Sirve en una máquina o en una carpeta compartida con bloqueos que
+#     funcionen (no sobre NFS sin locks).
+#   - RedisBroker: cualquier servidor que hable el protocolo de Redis (Redis, Valkey,
+#     KeyDB...) a través de un cliente con la API de redis-py; para pruebas locales se
+#     le puede pasar un sustituto en memoria con esa API (p. ej. fakeredis).
+# abrir_broker(url) elige según la URL: 'sqlite:///ruta.db' (o una ruta) y 'redis://...'.
+
+BROKER_FILE = "job_broker.sqlite3"
+
+# Segundos que dura un lease si el worker no lo renueva (el worker renueva cada tercio)
+DEFAULT_LEASE_SECONDS = 120
+
+# Veces que se entrega una tarea (leases vencidos y errores transitorios incluidos)
+# antes de darla por fallida
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Mensaje de las tareas que agotaron sus intentos porque el worker dejó de responder
+LEASE_VENCIDO = "El worker dejó de renovar el lease"
+
+
+def nueva_tarea(lote, url, carpeta, subcarpeta="", titulo=None, video=None, indice=None):
+    """
+    Tarea de descarga de un video. `carpeta` es la carpeta de destino del coordinador
+    y `subcarpeta` la de la playlist dentro de ella; `video` es la clave del archivo de
+    descargas ("extractor id") si se conoce.
+    """
+    return {
+        'id': uuid.uuid4().hex,
+        'lote': lote,
+        'url': url,
+        'carpeta': carpeta,
+        'subcarpeta': subcarpeta,
+        'titulo': titulo,
+        'video': video,
+        'indice': indice,
+    }
+
+
+def _resumen_vacio():
+    return {PENDIENTE: 0, EN_CURSO: 0, COMPLETADO: 0, FALLIDO: 0}
+
+
+class SQLiteBroker:
+    """
+    Broker sobre un archivo SQLite. Cada hilo usa su propia conexión; tomar una tarea
+    es una transacción BEGIN IMMEDIATE, así dos workers nunca reciben la misma.
+    """
+
+    def __init__(self, path=BROKER_FILE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max(1, int(max_attempts))
+        self._local = threading.local()
+        with self._transaccion() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS tareas (
+                    id TEXT PRIMARY KEY, lote TEXT, estado TEXT, datos TEXT,
+                    intentos INTEGER DEFAULT 0, worker TEXT, lease_hasta REAL,
+                    progreso REAL, mensaje TEXT, error TEXT, creado REAL, actualizado REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS tareas_estado ON tareas (estado)")
+            db.execute("CREATE INDEX IF NOT EXISTS tareas_lote ON tareas (lote)")
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # isolation_level=None: las transacciones se abren a mano (BEGIN IMMEDIATE)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaccion(self):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _tarea(self, fila):
+        tarea = json.loads(fila['datos'])
+        for campo in ('estado', 'intentos', 'worker', 'lease_hasta', 'progreso', 'mensaje', 'error'):
+            tarea[campo] = fila[campo]
+        return tarea
+
+    # --- Coordinador ---
+    def publicar(self, tareas):
+        """Agrega tareas pendientes (ver nueva_tarea)."""
+        ahora = time.time()
+        with self._transaccion() as db:
+            db.executemany(
+                "INSERT INTO tareas (id, lote, estado, datos, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?)",
+                [(t['id'], t['lote'], PENDIENTE, json.dumps(t, ensure_ascii=False), ahora, ahora) for t in tareas])
+
+    def resumen(self, lote=None):
+        """Cantidad de tareas en cada estado (de un lote, o de todas)."""
+        conteo = _resumen_vacio()
+        consulta = "SELECT estado, COUNT(*) FROM tareas" + (" WHERE lote = ?" if lote else "") + " GROUP BY estado"
+        for estado, cantidad in self._db().execute(consulta, (lote,) if lote else ()):
+            conteo[estado] = cantidad
+        return conteo
+
+    def tareas(self, lote=None, estado=None):
+        condiciones, valores = [], []
+        if lote:
+            condiciones.append("lote = ?")
+            valores.append(lote)
+        if estado:
+            condiciones.append("estado = ?")
+            valores.append(estado)
+        consulta = "SELECT * FROM tareas" + (" WHERE " + " AND ".join(condiciones) if condiciones else "") + " ORDER BY rowid"
+        return [self._tarea(fila) for fila in self._db().execute(consulta, valores)]
+
+    def reintentar_fallidos(self, lote=None):
+        """Vuelve a dejar pendientes las tareas fallidas, con todos sus intentos. Retorna cuántas."""
+        with self._transaccion() as db:
+            cursor = db.execute(
+                "UPDATE tareas SET estado = ?, intentos = 0, error = NULL, actualizado = ? WHERE estado = ?"
+                + (" AND lote = ?" if lote else ""),
+                (PENDIENTE, time.time(), FALLIDO) + ((lote,) if lote else ()))
+            return cursor.rowcount
+
+    # --- Workers ---
+    def tomar(self, worker, lease=DEFAULT_LEASE_SECONDS):
+        """
+        Entrega la tarea pendiente más antigua (o una cuyo lease venció) al worker
+        `worker` con un lease de `lease` segundos. Retorna la tarea o None.
+        """
+        ahora = time.time()
+        with self._transaccion() as db:
+            # Las de workers caídos que ya no tienen intentos quedan fallidas
+            db.execute("UPDATE tareas SET estado = ?, error = ?, actualizado = ? "
+                       "WHERE estado = ? AND lease_hasta < ? AND intentos >= ?",
+                       (FALLIDO, LEASE_VENCIDO, ahora, EN_CURSO, ahora, self.max_attempts))
+            fila = db.execute("SELECT id FROM tareas WHERE estado = ? OR (estado = ? AND lease_hasta < ?) "
+                              "ORDER BY rowid LIMIT 1", (PENDIENTE, EN_CURSO, ahora)).fetchone()
+            if fila is None:
+                return None
+            db.execute("UPDATE tareas SET estado = ?, worker = ?, lease_hasta = ?, intentos = intentos + 1, "
+                       "progreso = NULL, mensaje = NULL, actualizado = ? WHERE id = ?",
+                       (EN_CURSO, worker, ahora + lease, ahora, fila['id']))
+            return self._tarea(db.execute("SELECT * FROM tareas WHERE id = ?", (fila['id'],)).fetchone())
+
+    def _del_worker(self, tarea):
+        # Una tarea sigue siendo del worker mientras nadie más la haya tomado
+        return "id = ? AND worker = ? AND intentos = ? AND estado = ?", (tarea['id'], tarea['worker'], tarea['intentos'], EN_CURSO)
+
+    def renovar(self, tarea, lease=DEFAULT_LEASE_SECONDS, progreso=None, mensaje=None):
+        """Extiende el lease e informa el progreso. Retorna False si la tarea ya no es de este worker."""
+        condicion, valores = self._del_worker(tarea)
+        ahora = time.time()
+        with self._transaccion() as db:
+            cursor = db.execute(f"UPDATE tareas SET lease_hasta = ?, progreso = ?, mensaje = ?, actualizado = ? WHERE {condicion}",
+                                (ahora + lease, progreso, mensaje, ahora) + valores)
+            return cursor.rowcount == 1
+
+    def completar(self, tarea, error=None, reintentar=False):
+        """
+        Cierra la tarea: completada, o con `error` fallida (o pendiente otra vez si
+        `reintentar` y le quedan intentos). Retorna False si ya no era de este worker.
+        """
+        condicion, valores = self._del_worker(tarea)
+        if error is None:
+            estado = COMPLETADO
+        elif reintentar and tarea['intentos'] < self.max_attempts:
+            estado = PENDIENTE
+        else:
+            estado = FALLIDO
+        with self._transaccion() as db:
+            cursor = db.execute(f"UPDATE tareas SET estado = ?, error = ?, progreso = ?, lease_hasta = NULL, actualizado = ? "
+                                f"WHERE {condicion}",
+                                (estado, error, 1.0 if error is None else None, time.time()) + valores)
+            return cursor.rowcount == 1
+
+    def liberar(self, tarea):
+        """Devuelve la tarea a pendiente sin gastar un intento (el worker se detiene)."""
+        condicion, valores = self._del_worker(tarea)
+        with self._transaccion() as db:
+            cursor = db.execute(f"UPDATE tareas SET estado = ?, intentos = intentos - 1, lease_hasta = NULL, actualizado = ? "
+                                f"WHERE {condicion}", (PENDIENTE, time.time()) + valores)
+            return cursor.rowcount == 1
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class RedisBroker:
+    """
+    Broker sobre un servidor compatible con Redis. `client` es un cliente con la API
+    de redis-py creado con decode_responses=True. Claves (con `prefijo`):
+      {p}:tarea:<id>   hash con la tarea (los datos en JSON y un campo por estado)
+      {p}:lote:<lote>  set con los IDs del lote
+      {p}:lotes        set con los lotes
+      {p}:pendientes   sorted set de IDs pendientes por orden de publicación
+      {p}:leases       sorted set de "id|worker|intento" por vencimiento del lease
+    Los cambios de estado son transacciones WATCH/MULTI, sin scripts Lua, para que
+    funcionen también con servidores y sustitutos que no los tienen.
+    """
+
+    def __init__(self, client, prefijo="ytdl", max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.client = client
+        self.prefijo = prefijo
+        self.max_attempts = max(1, int(max_attempts))
+
+    @classmethod
+    def desde_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("El broker Redis necesita el paquete 'redis' (pip install redis).")
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    def _clave(self, *partes):
+        return ":".join((self.prefijo,) + partes)
+
+    def _token(self, tarea):
+        return f"{tarea['id']}|{tarea['worker']}|{tarea['intentos']}"
+
+    def _tarea(self, campos):
+        if not campos:
+            return None
+        tarea = json.loads(campos['datos'])
+        tarea['estado'] = campos.get('estado')
+        tarea['intentos'] = int(campos.get('intentos') or 0)
+        tarea['worker'] = campos.get('worker') or None
+        tarea['lease_hasta'] = float(campos['lease_hasta']) if campos.get('lease_hasta') else None
+        tarea['progreso'] = float(campos['progreso']) if campos.get('progreso') else None
+        tarea['mensaje'] = campos.get('mensaje') or None
+        tarea['error'] = campos.get('error') or None
+        return tarea
+
+    def _transaccion(self, vigilar, funcion):
+        """Corre `funcion(pipe)` vigilando `vigilar` y la repite si otro cliente cambió esas claves."""
+        from redis.exceptions import WatchError
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*vigilar)
+                    return funcion(pipe)
+                except WatchError:
+                    continue
+
+    # --- Coordinador ---
+    def publicar(self, tareas):
+        if not tareas:
+            return
+        # Un contador compartido da el orden de publicación (varios coordinadores a la vez)
+        primero = self.client.incrby(self._clave('orden'), len(tareas)) - len(tareas)
+        pipe = self.client.pipeline()
+        for orden, tarea in enumerate(tareas, primero):
+            pipe.hset(self._clave('tarea', tarea['id']), mapping={
+                'datos': json.dumps(tarea, ensure_ascii=False), 'lote': tarea['lote'], 'estado': PENDIENTE,
+                'intentos': 0, 'orden': orden})
+            pipe.sadd(self._clave('lote', tarea['lote']), tarea['id'])
+            pipe.sadd(self._clave('lotes'), tarea['lote'])
+            pipe.zadd(self._clave('pendientes'), {tarea['id']: orden})
+        pipe.execute()
+
+    def _ids(self, lote=None):
+        if lote:
+            return sorted(self.client.smembers(self._clave('lote', lote)))
+        lotes = self.client.smembers(self._clave('lotes'))
+        return sorted(i for l in lotes for i in self.client.smembers(self._clave('lote', l)))
+
+    def tareas(self, lote=None, estado=None):
+        pipe = self.client.pipeline()
+        for tarea_id in self._ids(lote):
+            pipe.hgetall(self._clave('tarea', tarea_id))
+        filas = sorted((campos for campos in pipe.execute() if campos), key=lambda campos: float(campos.get('orden') or 0))
+        tareas = [self._tarea(campos) for campos in filas]
+        return [t for t in tareas if estado is None or t['estado'] == estado]
+
+    def resumen(self, lote=None):
+        conteo = _resumen_vacio()
+        pipe = self.client.pipeline()
+        for tarea_id in self._ids(lote):
+            pipe.hget(self._clave('tarea', tarea_id), 'estado')
+        for estado in pipe.execute():
+            if estado:
+                conteo[estado] = conteo.get(estado, 0) + 1
+        return conteo
+
+    def reintentar_fallidos(self, lote=None):
+        cantidad = 0
+        for tarea in self.tareas(lote, FALLIDO):
+            clave = self._clave('tarea', tarea['id'])
+
+            def reabrir(pipe):
+                if pipe.hget(clave, 'estado') != FALLIDO:
+                    pipe.unwatch()
+                    return 0
+                orden = float(pipe.hget(clave, 'orden') or 0)
+                pipe.multi()
+                pipe.hset(clave, mapping={'estado': PENDIENTE, 'intentos': 0, 'error': ""})
+                pipe.zadd(self._clave('pendientes'), {tarea['id']: orden})
+                pipe.execute()
+                return 1
+            cantidad += self._transaccion([clave], reabrir)
+        return cantidad
+
+    # --- Workers ---
+    def _recuperar_vencidos(self, ahora):
+        """Vuelve a dejar pendientes (o fallidas, sin intentos) las tareas con el lease vencido."""
+        leases = self._clave('leases')
+        for token in self.client.zrangebyscore(leases, '-inf', ahora, start=0, num=100):
+            tarea_id, _, intentos = token.split('|')
+            clave = self._clave('tarea', tarea_id)
+
+            def recuperar(pipe):
+                score = pipe.zscore(leases, token)
+                if score is None or score >= ahora:
+                    pipe.unwatch()
+                    return
+                orden = float(pipe.hget(clave, 'orden') or 0)
+                pipe.multi()
+                pipe.zrem(leases, token)
+                if int(intentos) >= self.max_attempts:
+                    pipe.hset(clave, mapping={'estado': FALLIDO, 'error': LEASE_VENCIDO})
+                else:
+                    pipe.hset(clave, mapping={'estado': PENDIENTE, 'worker': ""})
+                    pipe.zadd(self._clave('pendientes'), {tarea_id: orden})
+                pipe.execute()
+            self._transaccion([leases], recuperar)
+
+    def tomar(self, worker, lease=DEFAULT_LEASE_SECONDS):
+        ahora = time.time()
+        self._recuperar_vencidos(ahora)
+        pendientes = self._clave('pendientes')
+
+        def reservar(pipe):
+            ids = pipe.zrange(pendientes, 0, 0)
+            if not ids:
+                pipe.unwatch()
+                return None
+            tarea_id = ids[0]
+            clave = self._clave('tarea', tarea_id)
+            intentos = int(pipe.hget(clave, 'intentos') or 0) + 1
+            pipe.multi()
+            pipe.zrem(pendientes, tarea_id)
+            pipe.zadd(self._clave('leases'), {f"{tarea_id}|{worker}|{intentos}": ahora + lease})
+            pipe.hset(clave, mapping={'estado': EN_CURSO, 'worker': worker, 'intentos': intentos,
+                                      'lease_hasta': ahora + lease, 'progreso': "", 'mensaje': ""})
+            pipe.execute()
+            return tarea_id
+        tarea_id = self._transaccion([pendientes], reservar)
+        return self._tarea(self.client.hgetall(self._clave('tarea', tarea_id))) if tarea_id else None
+
+    def renovar(self, tarea, lease=DEFAULT_LEASE_SECONDS, progreso=None, mensaje=None):
+        hasta = time.time() + lease
+        # Solo se actualiza si el lease sigue existiendo (XX): si venció y se recuperó, no vuelve
+        if not self.client.zadd(self._clave('leases'), {self._token(tarea): hasta}, xx=True, ch=True):
+            return False
+        self.client.hset(self._clave('tarea', tarea['id']), mapping={
+            'lease_hasta': hasta, 'progreso': "" if progreso is None else progreso, 'mensaje': mensaje or ""})
+        return True
+
+    def _cerrar(self, tarea, campos, pendiente=False):
+        leases = self._clave('leases')
+        token = self._token(tarea)
+        clave = self._clave('tarea', tarea['id'])
+
+        def cerrar(pipe):
+            if pipe.zscore(leases, token) is None:
+                pipe.unwatch()
+                return False
+            orden = float(pipe.hget(clave, 'orden') or 0)
+            pipe.multi()
+            pipe.zrem(leases, token)
+            pipe.hset(clave, mapping=dict(campos, lease_hasta=""))
+            if pendiente:
+                pipe.zadd(self._clave('pendientes'), {tarea['id']: orden})
+            pipe.execute()
+            return True
+        return self._transaccion([leases], cerrar)
+
+    def completar(self, tarea, error=None, reintentar=False):
+        if error is None:
+            return self._cerrar(tarea, {'estado': COMPLETADO, 'progreso': 1.0, 'error': ""})
+        if reintentar and tarea['intentos'] < self.max_attempts:
+            return self._cerrar(tarea, {'estado': PENDIENTE, 'error': error}, pendiente=True)
+        return self._cerrar(tarea, {'estado': FALLIDO, 'error': error})
+
+    def liberar(self, tarea):
+        return self._cerrar(tarea, {'estado': PENDIENTE, 'intentos': tarea['intentos'] - 1}, pendiente=True)
+
+    def close(self):
+        self.client.close()
+
+
+def abrir_broker(url, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Broker según la URL: 'redis://', 'rediss://' o 'unix://' para Redis; 'sqlite:///ruta' o una ruta para SQLite."""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBroker.desde_url(url, max_attempts=max_attempts)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteBroker(url or BROKER_FILE, max_attempts=max_attempts)
+
+
+if __name__ == "__main__":
+    # python job_broker.py URL_DEL_BROKER [LOTE]   (resumen de las tareas)
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python job_broker.py URL_DEL_BROKER [LOTE]", file=sys.stderr)
+        sys.exit(2)
+    broker = abrir_broker(sys.argv[1])
+    print(json.dumps(broker.resumen(sys.argv[2] if len(sys.argv) == 3 else None)))
+    broker.close()
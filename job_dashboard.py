@@ -0,0 +1,238 @@
+import sys
+import time
+import tkinter as tk
+import customtkinter as ctk
+from progress_bus import format_speed, format_eta
+from progress_history import ERROR
+
+# Panel con una fila por trabajo (la descarga de la ventana y cada trabajo de la cola):
+# título, barra, velocidad de los últimos segundos como sparkline, velocidad y tiempo
+# restante. Solo existen VISIBLE_ROWS filas de widgets, que se reutilizan para los
+# trabajos que caen en la parte visible de la lista: con cientos de trabajos la
+# interfaz crea y redibuja lo mismo que con seis.
+
+VISIBLE_ROWS = 6
+# Cada cuánto se toma una muestra y se redibuja el panel (más lento que el estado)
+DASHBOARD_REFRESH_MS = 500
+# Muestras que entran en cada sparkline (30 s con una muestra cada medio segundo)
+SPARKLINE_SAMPLES = 60
+SPARK_WIDTH = 120
+SPARK_HEIGHT = 22
+SPARK_COLOR = "#1F6AA5"
+ERROR_COLOR = "#c0392b"
+
+
+def puntos_sparkline(valores, ancho, alto, capacidad=SPARKLINE_SAMPLES):
+    """
+    Coordenadas (x0, y0, x1, y1, ...) de la sparkline, pegada al borde derecho y
+    escalada al máximo de `valores`. Siempre hay al menos dos puntos.
+    """
+    valores = list(valores)[-capacidad:]
+    if len(valores) < 2:
+        valores = [0.0] * (2 - len(valores)) + valores
+    maximo = max(valores) or 1.0
+    paso = ancho / max(capacidad - 1, 1)
+    x0 = ancho - paso * (len(valores) - 1)
+    puntos = []
+    for i, valor in enumerate(valores):
+        puntos.append(x0 + i * paso)
+        puntos.append(alto - 2 - (valor / maximo) * (alto - 4))
+    return puntos
+
+
+class _Sparkline:
+    """Canvas con una sola línea que se mueve con coords() (no se recrea en cada refresco)."""
+
+    def __init__(self, master, fondo, ancho=SPARK_WIDTH, alto=SPARK_HEIGHT):
+        self.ancho = ancho
+        self.alto = alto
+        self.canvas = tk.Canvas(master, width=ancho, height=alto, highlightthickness=0, bd=0, bg=fondo)
+        self._linea = self.canvas.create_line(0, alto - 2, ancho, alto - 2, fill=SPARK_COLOR, width=1.5)
+
+    def dibujar(self, valores, color=SPARK_COLOR):
+        self.canvas.coords(self._linea, *puntos_sparkline(valores, self.ancho, self.alto))
+        self.canvas.itemconfigure(self._linea, fill=color)
+
+
+class _FilaTrabajo:
+    """Widgets de una fila visible del panel; `mostrar` la apunta a otro trabajo."""
+
+    def __init__(self, master, fondo, on_click):
+        self.job_id = None
+        self.frame = ctk.CTkFrame(master, fg_color="transparent")
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.label_titulo = ctk.CTkLabel(self.frame, text="", anchor="w", font=ctk.CTkFont(size=12))
+        self._color_texto = self.label_titulo.cget("text_color")
+        self.label_titulo.grid(row=0, column=0, padx=(5, 5), sticky="ew")
+        self.barra = ctk.CTkProgressBar(self.frame, width=110, progress_color=SPARK_COLOR, corner_radius=6)
+        self.barra.grid(row=0, column=1, padx=(0, 5))
+        self.barra.set(0)
+        self.sparkline = _Sparkline(self.frame, fondo)
+        self.sparkline.canvas.grid(row=0, column=2, padx=(0, 5))
+        self.label_velocidad = ctk.CTkLabel(self.frame, text="", width=170, anchor="e", font=ctk.CTkFont(size=11))
+        self.label_velocidad.grid(row=0, column=3, padx=(0, 5))
+
+        for widget in (self.frame, self.label_titulo, self.label_velocidad, self.sparkline.canvas):
+            widget.bind("<Button-1>", lambda event: on_click(self.job_id))
+
+    def mostrar(self, job_id, nombre, detalle, seleccionada):
+        self.job_id = job_id
+        state = detalle['state']
+        ultima = detalle['logs'][-1] if detalle['logs'] else None
+        con_error = (state is not None and state.status == 'error') or (ultima is not None and ultima.nivel == ERROR)
+
+        fraccion = state.fraction() if state is not None else None
+        if detalle['activo']:
+            velocidad = format_speed(detalle['velocidad']) if detalle['velocidad'] else "—"
+            texto = f"{velocidad}  ETA {format_eta(detalle['eta'])}"
+        else:
+            fraccion = fraccion if con_error else 1.0
+            texto = ("Con error" if con_error else "Terminado") + f" en {format_eta(detalle['duracion'])}"
+
+        marca = "▶ " if seleccionada else ""
+        self.label_titulo.configure(text=f"{marca}{nombre}", text_color=ERROR_COLOR if con_error else self._color_texto)
+        self.barra.set(fraccion or 0.0)
+        self.sparkline.dibujar(detalle['velocidades'], ERROR_COLOR if con_error else SPARK_COLOR)
+        self.label_velocidad.configure(text=texto)
+        self.frame.grid()
+
+    def ocultar(self):
+        self.job_id = None
+        self.frame.grid_remove()
+
+
+class JobDashboard(ctk.CTkFrame):
+    """
+    Panel de trabajos alimentado por el bus de progreso (ver ProgressBus.sample,
+    jobs y detail). Arriba, el estado de la descarga de la ventana (`estado_var`) y
+    la velocidad total; en el medio, la lista virtualizada; abajo, el historial
+    (estados y errores) del trabajo elegido con un clic.
+
+    `nombre_de(job_id, state)` da el texto de cada fila.
+    """
+
+    def __init__(self, master, progress_bus, estado_var, nombre_de, **kwargs):
+        super().__init__(master, corner_radius=10, **kwargs)
+        self.progress_bus = progress_bus
+        self.nombre_de = nombre_de
+        self._ids = []
+        self._offset = 0
+        self._seleccionado = None
+        self._log_mostrado = None
+        fondo = self._apply_appearance_mode(self.cget("fg_color"))
+        self.grid_columnconfigure(0, weight=1)
+
+        # --- Estado de la descarga de la ventana y velocidad total ---
+        self.label_estado = ctk.CTkLabel(self, textvariable=estado_var, font=ctk.CTkFont(size=12), text_color="#3498db", anchor="w")
+        self.label_estado.grid(row=0, column=0, columnspan=2, padx=10, pady=(8, 0), sticky="ew")
+
+        frame_total = ctk.CTkFrame(self, fg_color="transparent")
+        frame_total.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="ew")
+        frame_total.grid_columnconfigure(0, weight=1)
+        self.label_total = ctk.CTkLabel(frame_total, text="Sin trabajos.", anchor="w", font=ctk.CTkFont(size=12, weight="bold"))
+        self.label_total.grid(row=0, column=0, sticky="ew")
+        self.sparkline_total = _Sparkline(frame_total, fondo, ancho=SPARK_WIDTH * 2)
+        self.sparkline_total.canvas.grid(row=0, column=1, padx=(0, 5))
+
+        # --- Lista de trabajos (filas reutilizadas) ---
+        frame_lista = ctk.CTkFrame(self, fg_color="transparent")
+        frame_lista.grid(row=2, column=0, padx=(10, 0), sticky="nsew")
+        frame_lista.grid_columnconfigure(0, weight=1)
+        self.filas = []
+        for i in range(VISIBLE_ROWS):
+            fila = _FilaTrabajo(frame_lista, fondo, self._seleccionar)
+            fila.frame.grid(row=i, column=0, sticky="ew")
+            fila.ocultar()
+            self.filas.append(fila)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._desplazar)
+        self.scrollbar.grid(row=2, column=1, padx=(0, 5), sticky="ns")
+
+        for widget in [frame_lista] + [w for fila in self.filas for w in (fila.frame, fila.label_titulo, fila.label_velocidad)]:
+            widget.bind("<MouseWheel>", self._rueda)
+            widget.bind("<Button-4>", self._rueda)
+            widget.bind("<Button-5>", self._rueda)
+
+        # --- Historial del trabajo elegido ---
+        self.texto_log = ctk.CTkTextbox(self, height=80, font=ctk.CTkFont(size=11), corner_radius=8)
+        self.texto_log.grid(row=3, column=0, columnspan=2, padx=10, pady=(5, 10), sticky="ew")
+        self.texto_log.insert("end", "Haz clic en un trabajo para ver su historial.")
+        self.texto_log.configure(state="disabled")
+
+        self.after(DASHBOARD_REFRESH_MS, self._refrescar)
+
+    # --- Desplazamiento ---
+    def _mover(self, offset):
+        self._offset = max(0, min(offset, len(self._ids) - VISIBLE_ROWS))
+        self._dibujar()
+
+    def _desplazar(self, accion, *args):
+        if accion == 'moveto':
+            self._mover(round(float(args[0]) * len(self._ids)))
+        elif accion == 'scroll':
+            paso = VISIBLE_ROWS if len(args) > 1 and args[1] == 'pages' else 1
+            self._mover(self._offset + int(args[0]) * paso)
+
+    def _rueda(self, event):
+        if sys.platform.startswith("win"):
+            delta = -int(event.delta / 120)
+        elif sys.platform == "darwin":
+            delta = -event.delta
+        else:
+            delta = -1 if event.num == 4 else 1
+        self._mover(self._offset + delta)
+
+    def _seleccionar(self, job_id):
+        if job_id is not None:
+            self._seleccionado = job_id
+            self._log_mostrado = None
+            self._dibujar()
+
+    # --- Refresco ---
+    def _refrescar(self):
+        self.progress_bus.sample()
+        self._dibujar()
+        self.after(DASHBOARD_REFRESH_MS, self._refrescar)
+
+    def _dibujar(self):
+        trabajos = self.progress_bus.jobs()
+        self._ids = [job_id for job_id, _ in trabajos]
+        activos = sum(1 for _, activo in trabajos if activo)
+        self._offset = max(0, min(self._offset, len(self._ids) - VISIBLE_ROWS))
+
+        total, historial = self.progress_bus.throughput(SPARKLINE_SAMPLES * 2)
+        if self._ids:
+            self.label_total.configure(text=f"Total: {format_speed(total) if total else '0 B/s'} | "
+                                            f"{activos} activo(s), {len(self._ids) - activos} terminado(s)")
+        self.sparkline_total.dibujar(historial)
+
+        for i, fila in enumerate(self.filas):
+            indice = self._offset + i
+            detalle = self.progress_bus.detail(self._ids[indice], SPARKLINE_SAMPLES) if indice < len(self._ids) else None
+            if detalle is None:
+                fila.ocultar()
+                continue
+            job_id = self._ids[indice]
+            fila.mostrar(job_id, self.nombre_de(job_id, detalle['state']), detalle, job_id == self._seleccionado)
+
+        if self._ids:
+            n = len(self._ids)
+            self.scrollbar.set(self._offset / n, min(self._offset + VISIBLE_ROWS, n) / n)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._mostrar_log()
+
+    def _mostrar_log(self):
+        if self._seleccionado is None:
+            return
+        detalle = self.progress_bus.detail(self._seleccionado, 1)
+        if detalle is None or detalle['version_log'] == self._log_mostrado:
+            return
+        self._log_mostrado = detalle['version_log']
+        lineas = [f"{time.strftime('%H:%M:%S', time.localtime(linea.tiempo))} "
+                  f"{'[error] ' if linea.nivel == ERROR else ''}{linea.texto}" for linea in detalle['logs']]
+        self.texto_log.configure(state="normal")
+        self.texto_log.delete("1.0", "end")
+        self.texto_log.insert("end", "\n".join(lineas) or "Sin mensajes todavía.")
+        self.texto_log.see("end")
+        self.texto_log.configure(state="disabled")
@@ -1,10 +1,17 @@
-import customtkinter as ctk
-from gui_components import YouTubeDownloaderApp
-
-# --- Configuración de CustomTkinter (global) ---
-ctk.set_appearance_mode("System")  # "System" (default), "Dark", "Light"
-ctk.set_default_color_theme("blue")  # "blue" (default), "green", "dark-blue"
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Modo sin interfaz (CLI / daemon): no se importa customtkinter ni tkinter
+        from cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    import customtkinter as ctk
+    from gui_components import YouTubeDownloaderApp
+
+    # --- Configuración de CustomTkinter (global) ---
+    ctk.set_appearance_mode("System")  # "System" (default), "Dark", "Light"
+    ctk.set_default_color_theme("blue")  # "blue" (default), "green", "dark-blue"
+
     app = YouTubeDownloaderApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
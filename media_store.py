@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no hay reflinks
+    fcntl = None
+
+# Almacén de medios sin duplicados. El mismo video suele llegar por varias playlists y
+# cada una tiene su carpeta (carpeta_destino/titulo_playlist/), así que se bajaba y se
+# guardaba una vez por playlist. El almacén guarda un solo archivo por video y formato
+# (extractor + ID + perfil de formatos y de post-procesado) y las carpetas de las
+# playlists reciben enlaces a él. Como la clave se conoce antes de bajar un solo byte
+# (alcanza con la entrada plana de la playlist), un video que ya está en el almacén no
+# se vuelve a descargar: solo se enlaza en la carpeta nueva.
+
+MEDIA_STORE_INDEX = "media_store.jsonl"
+
+# Formas de poner el archivo del almacén en la carpeta de la playlist
+HARDLINK = "hardlink"
+REFLINK = "reflink"
+SYMLINK = "symlink"
+COPY = "copy"
+AUTO = "auto"
+
+# Lo que se prueba con cada opción de 'media_store_link', en orden. La copia es el
+# último recurso (otro disco, un sistema de archivos sin enlaces): no ahorra espacio
+# pero sí la descarga.
+MODOS_ENLACE = {
+    AUTO: (HARDLINK, REFLINK, SYMLINK, COPY),
+    HARDLINK: (HARDLINK, COPY),
+    REFLINK: (REFLINK, COPY),
+    SYMLINK: (SYMLINK, COPY),
+}
+
+# ioctl de Linux que clona un archivo compartiendo sus bloques (btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def _reflink(origen, destino):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink no disponible en este sistema")
+    with open(origen, 'rb') as src, open(destino, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def crear_enlace(origen, destino, modo):
+    """Crea `destino` a partir de `origen` con el modo indicado. Retorna False si el sistema no lo permite."""
+    try:
+        if modo == HARDLINK:
+            os.link(origen, destino)
+        elif modo == SYMLINK:
+            os.symlink(os.path.abspath(origen), destino)
+        elif modo == REFLINK:
+            _reflink(origen, destino)
+        else:
+            shutil.copy2(origen, destino)
+        return True
+    except OSError:
+        # Un reflink o una copia que falló a mitad no tiene que quedar como archivo válido
+        if modo in (REFLINK, COPY) and os.path.lexists(destino):
+            os.remove(destino)
+        return False
+
+
+def clave_de(vid_id, formato):
+    """Clave de un archivo del almacén: el ID del archivo de descargas ("extractor id") y el formato."""
+    return f"{vid_id} {formato}"
+
+
+class MediaStore:
+    """
+    Archivos descargados guardados una sola vez por clave (ver clave_de) bajo `raiz`,
+    con un índice JSONL (una línea por archivo guardado, compactado al cargar).
+
+    `guardar` incorpora un archivo recién descargado y lo deja enlazado donde estaba;
+    `enlazar` pone un archivo ya guardado en otra carpeta. `link` elige cómo se
+    enlaza (ver MODOS_ENLACE).
+    """
+
+    def __init__(self, raiz, link=AUTO):
+        self.raiz = os.path.abspath(raiz)
+        self.modos = MODOS_ENLACE.get(link, MODOS_ENLACE[AUTO])
+        self.path = os.path.join(self.raiz, MEDIA_STORE_INDEX)
+        self._lock = threading.Lock()
+        self._archivos = {}  # clave -> registro
+        os.makedirs(self.raiz, exist_ok=True)
+        self._cargar()
+
+    # --- Persistencia ---
+    def _cargar(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        # Última línea truncada por un corte: se descarta
+                        continue
+                    if registro.get('borrado'):
+                        self._archivos.pop(registro['clave'], None)
+                    else:
+                        self._archivos[registro['clave']] = registro
+        self._compactar()
+
+    def _compactar(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for registro in self._archivos.values():
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _escribir(self, registro):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _ruta_blob(self, clave, ext):
+        # Dos niveles para no juntar cientos de miles de archivos en una carpeta
+        digest = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+        return os.path.join(self.raiz, digest[:2], digest + ext)
+
+    # --- Consultas ---
+    def ruta_de(self, vid_id, formato):
+        """Ruta del archivo guardado con esa clave, o None. Si lo borraron a mano, se olvida."""
+        clave = clave_de(vid_id, formato)
+        with self._lock:
+            registro = self._archivos.get(clave)
+            if registro is None:
+                return None
+            blob = os.path.join(self.raiz, registro['blob'])
+            if os.path.exists(blob):
+                return blob
+            del self._archivos[clave]
+            self._escribir({'clave': clave, 'borrado': True})
+            return None
+
+    def enlazar(self, vid_id, formato, carpeta):
+        """
+        Pone en `carpeta` (con el nombre con el que se descargó) el archivo guardado con
+        esa clave. Retorna la ruta creada, o None si no está en el almacén.
+        """
+        blob = self.ruta_de(vid_id, formato)
+        if blob is None:
+            return None
+        with self._lock:
+            nombre = self._archivos[clave_de(vid_id, formato)]['nombre']
+        destino = os.path.join(carpeta, nombre)
+        if os.path.lexists(destino):
+            # Ya estaba (esta misma playlist, repetida): no hay nada que hacer
+            return destino
+        os.makedirs(carpeta, exist_ok=True)
+        if not any(crear_enlace(blob, destino, modo) for modo in self.modos):
+            return None
+        return destino
+
+    def resumen(self):
+        """Cantidad de archivos guardados y bytes que ocupan."""
+        with self._lock:
+            registros = list(self._archivos.values())
+        return {'files': len(registros), 'bytes': sum(r['size'] for r in registros)}
+
+    # --- Altas ---
+    def _reemplazar_por_enlace(self, blob, path):
+        """Deja en `path` un enlace a `blob` (si `path` existe, se reemplaza de una vez)."""
+        tmp = path + ".store.tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        for modo in self.modos:
+            if crear_enlace(blob, tmp, modo):
+                os.replace(tmp, path)
+                return
+        raise OSError(f"No se pudo enlazar {blob} en {path}")
+
+    def guardar(self, vid_id, formato, path, format_id=None):
+        """
+        Incorpora al almacén el archivo descargado `path` y lo deja enlazado en su lugar.
+        Si otro trabajo ya guardó la misma clave (dos playlists a la vez), `path` pasa a
+        ser un enlace al archivo guardado. Retorna la ruta en el almacén.
+        """
+        clave = clave_de(vid_id, formato)
+        blob = self._ruta_blob(clave, os.path.splitext(path)[1])
+        with self._lock:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if os.path.exists(blob):
+                if not os.path.samefile(blob, path):
+                    self._reemplazar_por_enlace(blob, path)
+            elif not any(crear_enlace(path, blob, modo) for modo in self.modos if modo in (HARDLINK, REFLINK)):
+                # Sin enlaces duros ni clones: el archivo se muda al almacén y vuelve como enlace
+                shutil.move(path, blob)
+                self._reemplazar_por_enlace(blob, path)
+
+            registro = {
+                'clave': clave,
+                'blob': os.path.relpath(blob, self.raiz),
+                'nombre': os.path.basename(path),
+                'size': os.path.getsize(blob),
+                'format_id': format_id,
+                'guardado': time.time(),
+            }
+            self._archivos[clave] = registro
+            self._escribir(registro)
+        return blob
+
+
+if __name__ == "__main__":
+    # python media_store.py CARPETA_DEL_ALMACEN   (cantidad de archivos y tamaño)
+    if len(sys.argv) != 2:
+        print("Uso: python media_store.py CARPETA_DEL_ALMACEN", file=sys.stderr)
+        sys.exit(2)
+    print(json.dumps(MediaStore(sys.argv[1]).resumen()))
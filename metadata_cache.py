@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+METADATA_CACHE_DIR = "metadata_cache"
+
+# Las URLs de los formatos de YouTube caducan a las pocas horas, así que por defecto
+# la información se conserva una hora ('metadata_cache_ttl' en config.ini).
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 2000
+
+# Parámetros de seguimiento que no cambian el contenido de la URL
+_PARAMS_IGNORADOS = {'si', 'feature', 'pp', 'ab_channel', 'app', 'start_radio'}
+
+
+def canonical_url(url):
+    """
+    Normaliza una URL para usarla como clave: esquema y dominio en minúsculas, sin
+    fragmento, sin parámetros de seguimiento y con la query ordenada.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host == 'youtu.be' and parts.path.strip('/'):
+        # Enlace corto: se convierte al formato largo equivalente
+        query = [('v', parts.path.strip('/'))] + parse_qsl(parts.query)
+        host, path = 'youtube.com', '/watch'
+    else:
+        query = parse_qsl(parts.query)
+        path = parts.path.rstrip('/') or '/'
+    query = sorted((k, v) for k, v in query if k not in _PARAMS_IGNORADOS and not k.startswith('utm_'))
+    return urlunsplit((parts.scheme.lower() or 'https', host, path, urlencode(query), ''))
+
+
+class MetadataCache:
+    """
+    Caché en disco de los resultados de extract_info, con caducidad (TTL) y
+    desalojo LRU. Se indexa por URL canónica (listados de playlists y videos) y
+    por extractor + ID de video (diccionarios de info de cada video).
+
+    Cada entrada es un archivo JSON; la fecha de modificación del archivo guarda
+    el último acceso para reconstruir el orden LRU al reiniciar.
+    """
+
+    def __init__(self, cache_dir=METADATA_CACHE_DIR, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # clave hasheada -> ruta del archivo, del más viejo al más reciente
+        self._cargar_indice()
+
+    def _cargar_indice(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        archivos = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                archivos.append((entry.stat().st_mtime, entry.name[:-5], entry.path))
+        for _, nombre, path in sorted(archivos):
+            self._index[nombre] = path
+
+    def _nombre(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _leer(self, key):
+        nombre = self._nombre(key)
+        with self._lock:
+            path = self._index.get(nombre)
+            if path is None:
+                return None
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    registro = json.load(f)
+            except (OSError, ValueError):
+                self._borrar(nombre)
+                return None
+            if self.ttl is not None and time.time() - registro.get('stored_at', 0) > self.ttl:
+                self._borrar(nombre)
+                return None
+            self._index.move_to_end(nombre)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return registro['data']
+
+    def _escribir(self, key, data):
+        nombre = self._nombre(key)
+        path = os.path.join(self.cache_dir, nombre + '.json')
+        registro = {'key': key, 'stored_at': time.time(), 'data': data}
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(registro, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._index[nombre] = path
+            self._index.move_to_end(nombre)
+            while len(self._index) > self.max_entries:
+                self._borrar(next(iter(self._index)))
+
+    def _borrar(self, nombre):
+        path = self._index.pop(nombre, None)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # --- API pública ---
+    def get_url(self, url):
+        """Retorna la info guardada para la URL (playlist plana o video), o None."""
+        data = self._leer('url:' + canonical_url(url))
+        if data is not None and 'ref' in data:
+            return self._leer(data['ref'])
+        return data
+
+    def put_url(self, url, info):
+        """
+        Guarda la info de una URL. Los videos se guardan por ID y la URL solo apunta
+        a esa entrada, para no duplicar el diccionario en disco.
+        """
+        if info.get('_type', 'video') == 'video' and info.get('id'):
+            video_key = self.put_video(info)
+            self._escribir('url:' + canonical_url(url), {'ref': video_key})
+        else:
+            self._escribir('url:' + canonical_url(url), info)
+
+    def get_video(self, extractor_key, video_id):
+        """Retorna el diccionario de info de un video, o None."""
+        if not video_id:
+            return None
+        return self._leer(f"video:{extractor_key or ''}:{video_id}")
+
+    def put_video(self, info):
+        """Guarda el diccionario de info completo de un video y retorna su clave."""
+        key = f"video:{info.get('extractor_key') or ''}:{info['id']}"
+        self._escribir(key, info)
+        return key
+
+    def clear(self):
+        with self._lock:
+            for nombre in list(self._index):
+                self._borrar(nombre)
@@ -0,0 +1,298 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from yt_dlp.utils import DownloadCancelled
+
+# Telemetría del motor de descargas: tiempos por etapa (clasificación de la URL,
+# extracción, descarga, post-procesado, limpieza), contadores (bytes, reintentos,
+# errores) y, opcionalmente, perfiles de CPU y memoria por trabajo.
+#
+# Salidas (todas opcionales, ver config.ini / cli.py):
+# - un log JSON por líneas con cada evento ('metrics_log');
+# - un archivo de texto en formato Prometheus ('metrics_file'), útil con el
+#   "textfile collector" de node_exporter;
+# - un endpoint HTTP /metrics en 127.0.0.1 ('metrics_port').
+
+PREFIX = "ytdl"
+# Límites de los buckets del histograma de duraciones (segundos)
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+def _etiquetas(labels):
+    if not labels:
+        return ""
+    partes = []
+    for clave, valor in sorted(labels):
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+class _Histograma:
+    __slots__ = ('cuentas', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.cuentas = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observar(self, valor):
+        self.count += 1
+        self.sum += valor
+        self.max = max(self.max, valor)
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite:
+                self.cuentas[i] += 1
+
+
+class Metrics:
+    """
+    Registro de métricas compartido por todos los hilos del motor.
+
+    `medir(etapa, job_id)` es un context manager que cronometra un bloque, lo
+    agrega al histograma de la etapa y escribe el evento en el log JSON; si el
+    bloque lanza una excepción se cuenta como error de esa etapa (las
+    cancelaciones se registran aparte). `count` suma a un contador.
+    """
+
+    def __init__(self, log_path=None, prometheus_path=None):
+        self.log_path = log_path or None
+        self.prometheus_path = prometheus_path or None
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histogramas = {}
+            self._contadores = {}
+            self.inicio = time.time()
+
+    # --- Registro ---
+    def count(self, nombre, valor=1, **labels):
+        clave = (nombre, tuple(sorted(labels.items())))
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observe(self, etapa, segundos, job_id=None, resultado="ok", **campos):
+        clave = (etapa, resultado)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = _Histograma()
+            histograma.observar(segundos)
+        self.event("stage", stage=etapa, job=job_id, seconds=round(segundos, 6), result=resultado, **campos)
+
+    @contextmanager
+    def medir(self, etapa, job_id=None, **campos):
+        """Cronometra el bloque; el diccionario que entrega acepta campos extra para el evento."""
+        inicio = time.perf_counter()
+        resultado = "ok"
+        try:
+            yield campos
+        except DownloadCancelled:
+            resultado = "cancelled"
+            raise
+        except BaseException as e:
+            resultado = "error"
+            campos['error'] = str(e)[:500]
+            self.count("errors", stage=etapa)
+            raise
+        finally:
+            # El bloque puede marcar el resultado él mismo (p. ej. errores que yt-dlp no lanza)
+            resultado = campos.pop('result', resultado)
+            if resultado == "error" and 'error' not in campos:
+                self.count("errors", stage=etapa)
+            self.observe(etapa, time.perf_counter() - inicio, job_id, resultado, **campos)
+
+    def event(self, tipo, **campos):
+        """Escribe una línea en el log JSON (si está activado)."""
+        if not self.log_path:
+            return
+        registro = {'ts': round(time.time(), 3), 'event': tipo}
+        registro.update((k, v) for k, v in campos.items() if v is not None)
+        linea = json.dumps(registro, ensure_ascii=False, default=str)
+        with self._log_lock:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(linea + '\n')
+            except OSError:
+                # La telemetría nunca debe interrumpir una descarga
+                pass
+
+    # --- Exportación ---
+    def snapshot(self):
+        """Resumen como diccionario: {'stages': {...}, 'counters': {...}}."""
+        with self._lock:
+            etapas = {}
+            for (etapa, resultado), h in sorted(self._histogramas.items()):
+                etapas.setdefault(etapa, {})[resultado] = {
+                    'count': h.count, 'total_s': round(h.sum, 4), 'max_s': round(h.max, 4)}
+            contadores = {}
+            for (nombre, labels), valor in sorted(self._contadores.items()):
+                contadores[nombre + _etiquetas(labels)] = valor
+        return {'stages': etapas, 'counters': contadores}
+
+    def render_prometheus(self):
+        lineas = []
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+        if histogramas:
+            nombre = f"{PREFIX}_stage_duration_seconds"
+            lineas.append(f"# HELP {nombre} Duración de cada etapa de las descargas.")
+            lineas.append(f"# TYPE {nombre} histogram")
+            for (etapa, resultado), h in histogramas:
+                labels = (('result', resultado), ('stage', etapa))
+                for limite, cuenta in zip(BUCKETS, h.cuentas):
+                    lineas.append(f"{nombre}_bucket{_etiquetas(labels + (('le', limite),))} {cuenta}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(labels + (('le', '+Inf'),))} {h.count}")
+                lineas.append(f"{nombre}_sum{_etiquetas(labels)} {h.sum:.6f}")
+                lineas.append(f"{nombre}_count{_etiquetas(labels)} {h.count}")
+        tipos_declarados = set()
+        for (nombre, labels), valor in contadores:
+            completo = f"{PREFIX}_{nombre}_total"
+            if completo not in tipos_declarados:
+                tipos_declarados.add(completo)
+                lineas.append(f"# TYPE {completo} counter")
+            lineas.append(f"{completo}{_etiquetas(labels)} {valor}")
+        lineas.append(f"# TYPE {PREFIX}_start_time_seconds gauge")
+        lineas.append(f"{PREFIX}_start_time_seconds {self.inicio:.3f}")
+        return "\n".join(lineas) + "\n"
+
+    def flush(self):
+        """Reescribe el archivo Prometheus (si está configurado) de forma atómica."""
+        if not self.prometheus_path:
+            return
+        tmp_path = self.prometheus_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            print(f"No se pudo escribir {self.prometheus_path}: {e}")
+
+    def serve(self, port, host="127.0.0.1"):
+        """Sirve /metrics en un hilo en segundo plano. Retorna el servidor (para cerrarlo con shutdown())."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+# --- PERFILES POR TRABAJO ---
+class JobProfiler:
+    """
+    Perfil de CPU (cProfile) y memoria (tracemalloc) de un trabajo.
+
+    cProfile solo ve el hilo donde se activa: el hilo del trabajo se perfila al
+    entrar al context manager y cada hilo auxiliar (los de una playlist en
+    paralelo) con `with profiler.hilo():`; al terminar se combinan todos.
+    tracemalloc es global al proceso, así que con varios trabajos a la vez el
+    resumen de memoria incluye lo que asignaron los demás.
+
+    Deja en `out_dir`: <job>-<fecha>.prof (abrir con pstats o snakeviz),
+    un .txt con las funciones más costosas y un .mem.txt con las líneas que más memoria asignaron.
+    """
+
+    _tracemalloc_usuarios = 0
+    _tracemalloc_lock = threading.Lock()
+
+    def __init__(self, job_id, out_dir, top=30):
+        self.job_id = job_id
+        self.out_dir = out_dir
+        self.top = top
+        self._lock = threading.Lock()
+        self._perfiles = []
+        self._perfil_principal = None
+
+    def __enter__(self):
+        with JobProfiler._tracemalloc_lock:
+            if JobProfiler._tracemalloc_usuarios == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            JobProfiler._tracemalloc_usuarios += 1
+        self._perfil_principal = self._activar()
+        return self
+
+    def _activar(self):
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Ya hay otro perfilador activo en este hilo
+            return None
+        with self._lock:
+            self._perfiles.append(perfil)
+        return perfil
+
+    @contextmanager
+    def hilo(self):
+        perfil = self._activar()
+        try:
+            yield
+        finally:
+            if perfil is not None:
+                perfil.disable()
+
+    def __exit__(self, *exc):
+        if self._perfil_principal is not None:
+            self._perfil_principal.disable()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        actual, pico = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with JobProfiler._tracemalloc_lock:
+            JobProfiler._tracemalloc_usuarios -= 1
+            if JobProfiler._tracemalloc_usuarios == 0:
+                tracemalloc.stop()
+        try:
+            self._guardar(snapshot, actual, pico)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil de {self.job_id}: {e}")
+        return False
+
+    def _guardar(self, snapshot, actual, pico):
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.job_id}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+        with self._lock:
+            perfiles = list(self._perfiles)
+        if perfiles:
+            stats = pstats.Stats(perfiles[0])
+            for perfil in perfiles[1:]:
+                stats.add(perfil)
+            stats.dump_stats(base + ".prof")
+            texto = io.StringIO()
+            pstats.Stats(base + ".prof", stream=texto).sort_stats('cumulative').print_stats(self.top)
+            with open(base + ".txt", 'w', encoding='utf-8') as f:
+                f.write(f"Hilos perfilados: {len(perfiles)}\n")
+                f.write(texto.getvalue())
+
+        if snapshot is not None:
+            with open(base + ".mem.txt", 'w', encoding='utf-8') as f:
+                f.write(f"Memoria trazada al terminar: {actual / 1024 / 1024:.1f} MiB, pico: {pico / 1024 / 1024:.1f} MiB\n\n")
+                for estadistica in snapshot.statistics('lineno')[:self.top]:
+                    f.write(f"{estadistica}\n")
@@ -0,0 +1,110 @@
+import threading
+import requests
+import yt_dlp
+from requests.adapters import HTTPAdapter
+
+# Capa de red compartida por todo el motor. Cada YoutubeDL arma por su cuenta un
+# RequestDirector (los manejadores HTTP de yt-dlp, con su sesión de requests y su pool
+# de conexiones) y lo cierra al terminar: cada verificación, descarga o video de una
+# playlist abría conexiones TCP/TLS nuevas y perdía las cookies de la anterior.
+# SharedSession arma un solo director y un solo cookiejar y los presta a todas las
+# instancias, así las conexiones keep-alive se reutilizan entre trabajos. Para lo que
+# no pasa por yt-dlp (la descarga de FFmpeg) hay una sesión de requests, también con pool.
+
+# Conexiones que se conservan abiertas por servidor. Tiene que alcanzar para todas las
+# que se usan a la vez contra un mismo sitio (videos en paralelo x segmentos por
+# video); las que sobran se cierran al terminar en lugar de volver al pool.
+DEFAULT_POOL_SIZE = 32
+
+# Opciones de YoutubeDL que cambian cómo se arma el director. Una instancia con otros
+# valores (un proxy, otras cookies) sigue usando su propio director.
+PARAMS_DE_RED = (
+    'http_headers', 'proxy', 'nocheckcertificate', 'socket_timeout', 'source_address',
+    'legacyserverconnect', 'impersonate', 'client_certificate', 'client_certificate_key',
+    'client_certificate_password', 'cookiefile', 'cookiesfrombrowser', 'debug_printtraffic',
+    'compat_opts', 'enable_file_urls',
+)
+
+
+class _DirectorPrestado:
+    """El director compartido visto desde una instancia de YoutubeDL: YoutubeDL.close() no lo cierra."""
+
+    def __init__(self, director):
+        self._director = director
+
+    def close(self):
+        pass
+
+    def __getattr__(self, nombre):
+        return getattr(self._director, nombre)
+
+
+class SharedSession:
+    """
+    Red compartida con ciclo de vida propio: se crea con el motor y se cierra con
+    `close()`. `attach(ydl)` conecta una instancia de YoutubeDL y `http` es la
+    sesión de requests para el resto de las descargas.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        self.pool_size = max(1, int(pool_size))
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.http.mount('https://', adapter)
+        self.http.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._base = None
+        self._director = None
+        self._clave = None
+        self.closed = False
+
+    def _clave_de(self, ydl):
+        return [ydl.params.get(param) for param in PARAMS_DE_RED]
+
+    def _iniciar(self):
+        # Instancia de referencia: fija las opciones de red y es dueña del director y del cookiejar
+        self._base = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True})
+        self._director = self._base._request_director
+        self._ampliar_pool(self._director)
+        self._clave = self._clave_de(self._base)
+
+    def _ampliar_pool(self, director):
+        """El manejador de requests crea sus sesiones con 10 conexiones por servidor: se agrandan a `pool_size`."""
+        handler = director.handlers.get('Requests')
+        if handler is None:
+            return
+        crear = handler._create_instance
+
+        def crear_con_pool(**kwargs):
+            sesion = crear(**kwargs)
+            for adapter in set(sesion.adapters.values()):
+                adapter.init_poolmanager(self.pool_size, self.pool_size)
+            return sesion
+        handler._create_instance = crear_con_pool
+
+    def attach(self, ydl):
+        """
+        Hace que `ydl` use el director y el cookiejar compartidos y la retorna. Si sus
+        opciones de red son distintas (o la sesión ya se cerró) la deja como está.
+        """
+        with self._lock:
+            if self.closed:
+                return ydl
+            if self._director is None:
+                self._iniciar()
+            if self._clave_de(ydl) != self._clave:
+                return ydl
+        propio = ydl.__dict__.pop('_request_director', None)
+        if propio is not None:
+            propio.close()
+        ydl.__dict__['cookiejar'] = self._base.cookiejar
+        ydl.__dict__['_request_director'] = _DirectorPrestado(self._director)
+        return ydl
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            base, self._base, self._director = self._base, None, None
+        if base is not None:
+            base.close()
+        self.http.close()
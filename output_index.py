@@ -0,0 +1,379 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from resume_manifest import manifest_path, is_partial
+
+# Archivos de salida sin listar carpetas. Antes, al terminar cada trabajo se recorría
+# toda la carpeta de destino buscando temporales: en carpetas con decenas de miles de
+# archivos eso costaba segundos por trabajo, aunque el trabajo hubiera bajado uno solo.
+#
+# JobFiles junta, desde los hooks de yt-dlp, los archivos que toca un trabajo (los
+# finales, los .part y sus compañeros); la limpieza mira solo esos. OutputIndex es un
+# índice persistente y opcional del árbol de salida (qué archivos finales y qué
+# temporales hay en cada carpeta) que se actualiza con los mismos archivos: sirve para
+# barrer parciales abandonados y para encontrar duplicados sin recorrer el disco.
+
+OUTPUT_INDEX_FILE = "output_index.jsonl"
+
+# Temporales de FFmpeg junto al archivo final: 'x.temp.mp4' (la unión de yt-dlp) y
+# 'x.pp.mp3' (los perfiles de ffmpeg_manager). Si el post-procesado falla quedan sueltos.
+MARCAS_TEMPORALES = ('temp', 'pp')
+
+# Tipos de archivo en el índice
+FINAL = "final"
+PARCIAL = "partial"
+
+# Bytes del principio y del final de un archivo con los que se arma su huella rápida
+HUELLA_BYTES = 64 * 1024
+
+
+def es_temporal_ffmpeg(path):
+    """
+    True si el nombre de `path` tiene la forma de un temporal de FFmpeg ('x.temp.mp4',
+    'x.pp.mp3'). Un video titulado "Intro.temp" también la tiene: para borrar se usan
+    los temporales derivados de cada archivo final (ver JobFiles.temporales_ffmpeg).
+    """
+    base = os.path.splitext(path)[0]
+    return os.path.splitext(base)[1][1:] in MARCAS_TEMPORALES
+
+
+def huella(path, size):
+    """SHA-1 del primer y el último bloque de HUELLA_BYTES: distingue archivos del mismo tamaño sin leerlos enteros."""
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(HUELLA_BYTES))
+        if size > 2 * HUELLA_BYTES:
+            f.seek(-HUELLA_BYTES, os.SEEK_END)
+            digest.update(f.read(HUELLA_BYTES))
+    return digest.hexdigest()
+
+
+class JobFiles:
+    """
+    Archivos que tocó un trabajo, anotados por sus hooks de progreso y de post-procesado
+    (se registran en cada YoutubeDL del trabajo). `rutas()` agrega los compañeros que
+    yt-dlp y FFmpeg crean con nombres derivados, para limpiar sin listar la carpeta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._archivos = {}    # ruta -> (extractor, ID) del video
+        self._fragmentos = {}  # ruta del .part -> último fragmento visto
+        self._vistos = set()   # nombres tal como llegan en los hooks (el hook corre muchas veces por archivo)
+
+    def _anotar(self, path, info):
+        self._vistos.add(path)
+        self._archivos[os.path.abspath(path)] = (info.get('extractor_key'), info.get('id'))
+
+    def hook_progreso(self, d):
+        info = d.get('info_dict') or {}
+        with self._lock:
+            for clave in ('filename', 'tmpfilename'):
+                if d.get(clave) and d[clave] not in self._vistos:
+                    self._anotar(d[clave], info)
+            if d.get('tmpfilename') and d.get('fragment_index'):
+                tmp = os.path.abspath(d['tmpfilename'])
+                self._fragmentos[tmp] = max(self._fragmentos.get(tmp, 0), d['fragment_index'])
+
+    def hook_postproceso(self, d):
+        # Antes y después de cada paso: así quedan el archivo unido y el que deja cada perfil
+        info = d.get('info_dict') or {}
+        if info.get('filepath'):
+            with self._lock:
+                self._anotar(info['filepath'], info)
+
+    def videos(self):
+        """Ruta -> (extractor, ID) de cada archivo anotado."""
+        with self._lock:
+            return dict(self._archivos)
+
+    def rutas(self):
+        """
+        Rutas anotadas más las que podrían haber quedado con ellas: el manifiesto y los
+        fragmentos de cada .part, el .part y el .ytdl de cada archivo final y los
+        temporales de FFmpeg. Puede incluir rutas que no existen.
+        """
+        with self._lock:
+            archivos = list(self._archivos)
+            fragmentos = dict(self._fragmentos)
+        rutas = set(archivos)
+        for path in archivos:
+            if path.endswith('.part'):
+                rutas.add(manifest_path(path))
+                rutas.update(f"{path}-Frag{n}" for n in range(1, fragmentos.get(path, 0) + 1))
+            elif not is_partial(os.path.basename(path)):
+                rutas.update((path + '.part', manifest_path(path + '.part'), path + '.ytdl'))
+                base, ext = os.path.splitext(path)
+                rutas.update(f"{base}.{marca}{ext}" for marca in MARCAS_TEMPORALES)
+        return rutas
+
+    def temporales_ffmpeg(self):
+        """
+        Temporales de FFmpeg que pudieron quedar junto a los archivos finales anotados
+        ('x.temp.mp4' y 'x.pp.mp4' de 'x.mp4'). Nunca incluye un archivo anotado, aunque
+        su título termine en ".temp" o ".pp". Puede incluir rutas que no existen.
+        """
+        with self._lock:
+            archivos = set(self._archivos)
+        temporales = set()
+        for path in archivos:
+            if not is_partial(os.path.basename(path)):
+                base, ext = os.path.splitext(path)
+                temporales.update(f"{base}.{marca}{ext}" for marca in MARCAS_TEMPORALES)
+        return temporales - archivos
+
+
+class OutputIndex:
+    """
+    Índice persistente de los archivos de las carpetas de salida: ruta, tipo (final o
+    temporal), tamaño, fecha y, si se sabe, el video (extractor + ID).
+
+    Igual que la cola de descargas, es un journal JSONL: cada cambio agrega una línea y
+    al abrirlo se compacta a una por archivo. Se actualiza con `actualizar(rutas)`
+    (cuesta lo que la cantidad de rutas, no lo que el tamaño de la carpeta). Cada
+    carpeta se lista completa una sola vez, la primera vez que se consulta, para
+    conocer lo que ya había; `escanear` vuelve a recorrer un árbol para corregirlo.
+    Como siempre se puede reconstruir desde el disco, las escrituras no se sincronizan.
+    """
+
+    def __init__(self, path=OUTPUT_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._archivos = {}            # ruta -> registro
+        self._parciales = {}           # carpeta -> rutas de temporales
+        self._carpetas = set()         # carpetas ya listadas
+        self._cargar()
+
+    # --- Persistencia ---
+    def _cargar(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        # Última línea truncada por un corte: se descarta
+                        continue
+                    if 'carpeta' in registro:
+                        self._carpetas.add(registro['carpeta'])
+                    elif registro.get('borrado'):
+                        self._quitar(registro['path'])
+                    else:
+                        self._poner(registro)
+        self._compactar()
+
+    def _compactar(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for carpeta in self._carpetas:
+                f.write(json.dumps({'carpeta': carpeta}, ensure_ascii=False) + "\n")
+            for registro in self._archivos.values():
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _escribir(self, registros):
+        if registros:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(registro, ensure_ascii=False) + "\n" for registro in registros)
+
+    def _poner(self, registro):
+        self._archivos[registro['path']] = registro
+        if registro['tipo'] == PARCIAL:
+            self._parciales.setdefault(os.path.dirname(registro['path']), set()).add(registro['path'])
+
+    def _quitar(self, path):
+        registro = self._archivos.pop(path, None)
+        if registro is not None and registro['tipo'] == PARCIAL:
+            self._parciales.get(os.path.dirname(path), set()).discard(path)
+        return registro
+
+    # --- Actualización ---
+    def _registro(self, path, stat, video=None):
+        anterior = self._archivos.get(path) or {}
+        if not video or not video[1]:
+            video = (anterior.get('extractor'), anterior.get('video_id'))
+        extractor, video_id = video
+        # Un archivo que un trabajo anotó con su video es final aunque se llame 'x.temp.mp4'
+        temporal = is_partial(os.path.basename(path)) or (es_temporal_ffmpeg(path) and not video_id)
+        registro = {
+            'path': path,
+            'tipo': PARCIAL if temporal else FINAL,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'extractor': extractor,
+            'video_id': video_id,
+            # Los enlaces duros (y los simbólicos, que stat sigue) comparten el inodo del original
+            'inodo': [stat.st_dev, stat.st_ino],
+        }
+        # La huella se conserva mientras el archivo no cambie
+        if anterior.get('huella') and (anterior['size'], anterior['mtime']) == (stat.st_size, stat.st_mtime):
+            registro['huella'] = anterior['huella']
+        return registro
+
+    def actualizar(self, rutas, videos=None):
+        """
+        Vuelve a mirar en el disco `rutas` (y solo esas): agrega o actualiza las que
+        existen y quita las que ya no. `videos` es un diccionario ruta -> (extractor, ID).
+        """
+        videos = videos or {}
+        cambios = []
+        with self._lock:
+            for path in rutas:
+                path = os.path.abspath(path)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    if self._quitar(path) is not None:
+                        cambios.append({'path': path, 'borrado': True})
+                    continue
+                registro = self._registro(path, stat, videos.get(path))
+                if registro != self._archivos.get(path):
+                    self._poner(registro)
+                    cambios.append(registro)
+            self._escribir(cambios)
+
+    def escanear(self, raiz, recursivo=True):
+        """
+        Recorre `raiz` (y sus subcarpetas si `recursivo`) y deja el índice igual al disco.
+        Retorna la cantidad de archivos encontrados.
+        """
+        raiz = os.path.abspath(raiz)
+        carpetas = [raiz]
+        vistos = set()
+        listadas = []
+        while carpetas:
+            carpeta = carpetas.pop()
+            try:
+                entradas = list(os.scandir(carpeta))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            listadas.append(carpeta)
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    if recursivo:
+                        carpetas.append(entrada.path)
+                elif entrada.is_file():
+                    vistos.add(entrada.path)
+
+        with self._lock:
+            if recursivo:
+                prefijo = raiz.rstrip(os.sep) + os.sep
+                anteriores = {path for path in self._archivos if path.startswith(prefijo)}
+            else:
+                anteriores = {path for path in self._archivos if os.path.dirname(path) == raiz}
+        self.actualizar(vistos | anteriores)
+        with self._lock:
+            nuevas = [carpeta for carpeta in listadas if carpeta not in self._carpetas]
+            self._carpetas.update(nuevas)
+            self._escribir([{'carpeta': carpeta} for carpeta in nuevas])
+        return len(vistos)
+
+    # --- Consultas ---
+    def parciales(self, carpeta):
+        """
+        Rutas de los temporales de `carpeta`, para barrer los abandonados sin listarla.
+        La primera vez que se pregunta por una carpeta se la lista una vez.
+        """
+        carpeta = os.path.abspath(carpeta)
+        with self._lock:
+            conocida = carpeta in self._carpetas
+        if not conocida:
+            self.escanear(carpeta, recursivo=False)
+        with self._lock:
+            return list(self._parciales.get(carpeta, ()))
+
+    def duplicados(self, excluir=()):
+        """
+        Grupos de archivos finales repetidos: el mismo video (extractor + ID) guardado
+        en más de una ruta, o archivos del mismo tamaño con la misma huella. Retorna una
+        lista de listas de rutas. Solo se leen (dos bloques) los archivos de igual tamaño.
+
+        Las rutas que son enlaces a un mismo archivo (como las que deja el almacén de
+        medios en cada playlist) cuentan una sola vez, y las que están dentro de alguna
+        carpeta de `excluir` (el almacén mismo) no se cuentan.
+        """
+        prefijos = tuple(os.path.abspath(carpeta).rstrip(os.sep) + os.sep for carpeta in excluir)
+        with self._lock:
+            finales = [dict(r) for r in self._archivos.values()
+                       if r['tipo'] == FINAL and not (prefijos and r['path'].startswith(prefijos))]
+
+        # Una ruta por archivo físico
+        por_inodo = {}
+        for registro in finales:
+            inodo = registro.get('inodo')
+            if inodo is None:
+                # Registros de antes de guardar el inodo
+                try:
+                    stat = os.stat(registro['path'])
+                except OSError:
+                    continue
+                inodo = [stat.st_dev, stat.st_ino]
+            anterior = por_inodo.get(tuple(inodo))
+            if anterior is None or registro['path'] < anterior['path']:
+                por_inodo[tuple(inodo)] = registro
+        finales = list(por_inodo.values())
+
+        grupos = []
+        por_video, por_tamano = {}, {}
+        for registro in finales:
+            if registro['video_id']:
+                por_video.setdefault((registro['extractor'], registro['video_id']), []).append(registro['path'])
+            por_tamano.setdefault(registro['size'], []).append(registro)
+        grupos.extend(sorted(paths) for paths in por_video.values() if len(paths) > 1)
+        ya_agrupados = {path for grupo in grupos for path in grupo}
+
+        calculadas = []
+        for size, registros in por_tamano.items():
+            if len(registros) < 2 or not size:
+                continue
+            por_huella = {}
+            for registro in registros:
+                if not registro.get('huella'):
+                    try:
+                        registro['huella'] = huella(registro['path'], size)
+                    except OSError:
+                        continue
+                    calculadas.append(registro)
+                por_huella.setdefault(registro['huella'], []).append(registro['path'])
+            for paths in por_huella.values():
+                if len(paths) > 1 and not set(paths) <= ya_agrupados:
+                    grupos.append(sorted(paths))
+
+        # Las huellas calculadas quedan guardadas para la próxima consulta
+        with self._lock:
+            guardar = []
+            for registro in calculadas:
+                actual = self._archivos.get(registro['path'])
+                if actual is not None and (actual['size'], actual['mtime']) == (registro['size'], registro['mtime']):
+                    actual['huella'] = registro['huella']
+                    guardar.append(actual)
+            self._escribir(guardar)
+        return grupos
+
+    def resumen(self):
+        """Cantidad de archivos finales y temporales indexados."""
+        with self._lock:
+            finales = sum(1 for r in self._archivos.values() if r['tipo'] == FINAL)
+            return {FINAL: finales, PARCIAL: len(self._archivos) - finales}
+
+
+if __name__ == "__main__":
+    # python output_index.py scan CARPETA...   (indexa o corrige el índice)
+    # python output_index.py duplicates [ALMACEN...]   (lista los duplicados indexados,
+    #                                                 sin contar las carpetas ALMACEN)
+    if len(sys.argv) < 2 or sys.argv[1] not in ('scan', 'duplicates'):
+        print("Uso: python output_index.py scan CARPETA... | duplicates [ALMACEN...]", file=sys.stderr)
+        sys.exit(2)
+    indice = OutputIndex()
+    if sys.argv[1] == 'scan':
+        for carpeta in sys.argv[2:]:
+            inicio = time.perf_counter()
+            total = indice.escanear(carpeta)
+            print(f"{carpeta}: {total} archivos en {time.perf_counter() - inicio:.1f} s")
+        print(json.dumps(indice.resumen()))
+    else:
+        for grupo in indice.duplicados(excluir=sys.argv[2:]):
+            print("\n".join(grupo) + "\n")
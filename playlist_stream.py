@@ -0,0 +1,92 @@
+import itertools
+import threading
+from yt_dlp.utils import LazyList, PagedList
+
+# Entradas de una playlist obtenidas a medida que se recorren. Los canales con miles
+# de videos se listan página por página, así la descarga empieza con la primera
+# página en lugar de esperar el listado completo.
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class PlaylistStream:
+    """
+    Envuelve las entradas planas de una playlist de yt-dlp: una lista ya completa,
+    una PagedList (páginas que se piden por índice) o un generador.
+
+    `entradas(inicio, fin)` recorre solo el rango pedido (1-based, fin inclusivo):
+    con PagedList no se piden las páginas fuera del rango y con un generador se deja
+    de consumir al llegar a `fin`. `vistos` cuenta las entradas obtenidas hasta ahora
+    y `total` es el tamaño conocido o estimado (None si el sitio no lo informa).
+
+    `ydl` es la instancia que hizo la extracción; se mantiene abierta mientras se
+    piden páginas y se cierra con `close`. Si la playlist se recorre completa se
+    llama a `on_complete(entradas)` (para guardarla en la caché de metadatos).
+    """
+
+    def __init__(self, entries, total=None, ydl=None, on_complete=None):
+        if entries is None:
+            entries = []
+        elif not isinstance(entries, (list, PagedList, LazyList)):
+            # LazyList guarda lo ya consumido: el generador se puede recorrer más de una vez
+            entries = LazyList(entries)
+        self._entries = entries
+        self._ydl = ydl
+        self._on_complete = on_complete
+        self._lock = threading.Lock()
+        self.vistos = 0
+        self.completo = isinstance(self._entries, list)
+        self.total = len(self._entries) if self.completo else total
+
+    @property
+    def es_lazy(self):
+        return not isinstance(self._entries, list)
+
+    def _rango_paginado(self, inicio, fin):
+        # Se piden bloques alineados a las páginas del sitio: una petición por página
+        tam = getattr(self._entries, '_pagesize', None) or DEFAULT_PAGE_SIZE
+        posicion = inicio
+        while fin is None or posicion < fin:
+            hasta = (posicion // tam + 1) * tam
+            if fin is not None:
+                hasta = min(hasta, fin)
+            bloque = self._entries.getslice(posicion, hasta)
+            yield from bloque
+            if len(bloque) < hasta - posicion:
+                return
+            posicion = hasta
+
+    def _fuente(self, inicio, fin):
+        # inicio y fin en índices de Python (0-based, fin exclusivo)
+        if isinstance(self._entries, list):
+            return iter(self._entries[inicio:fin])
+        if isinstance(self._entries, PagedList):
+            return self._rango_paginado(inicio, fin)
+        return itertools.islice(self._entries, inicio, fin)
+
+    def entradas(self, playlist_start=None, playlist_end=None):
+        """Genera (índice, entrada) del rango pedido, obteniendo las páginas a medida que hacen falta."""
+        inicio = (playlist_start or 1) - 1
+        recorridas = []
+        indice = inicio
+        for indice, entry in enumerate(self._fuente(inicio, playlist_end), inicio + 1):
+            with self._lock:
+                self.vistos += 1
+            if self.es_lazy and inicio == 0:
+                recorridas.append(entry)
+            yield indice, entry
+
+        if self.es_lazy and (playlist_end is None or indice < playlist_end):
+            # Se agotó la fuente: ahora sí se conoce el total
+            with self._lock:
+                self.completo = True
+                if indice > inicio or inicio == 0:
+                    self.total = indice
+            if inicio == 0 and self._on_complete:
+                self._on_complete(recorridas)
+            self.close()
+
+    def close(self):
+        if self._ydl is not None:
+            self._ydl.close()
+            self._ydl = None
@@ -0,0 +1,212 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import PostProcessingError
+from segmented_download import SegmentedYoutubeDL
+from format_planner import familia_codec
+from download_archive import archive_id
+
+# Post-procesado en segundo plano: mientras FFmpeg une/embebe un video, el hilo de
+# descarga ya empieza con el siguiente de la playlist.
+
+
+def default_postprocess_workers():
+    return os.cpu_count() or 2
+
+
+class PostProcessPipeline:
+    """
+    Pool de post-procesado con contrapresión. Cada video descargado queda "en espera"
+    (sus archivos .fNNN sin unir) hasta que un hilo del pool lo procesa; si ya hay
+    `max_pending` videos en espera, `submit` bloquea al hilo de descarga para que el
+    espacio temporal en disco no crezca sin límite.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers or default_postprocess_workers()
+        self.max_pending = max_pending or 2 * self.max_workers
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="postproceso")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._futures = set()
+        self.errors = []
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(1 for future in self._futures if not future.done())
+
+    def submit(self, fn, *args):
+        self._slots.acquire()
+
+        def tarea():
+            try:
+                return fn(*args)
+            except Exception as e:
+                with self._lock:
+                    self.errors.append(e)
+                print(f"Error en el post-procesado: {e}", file=sys.stderr)
+                raise
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(tarea)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.add(future)
+        return future
+
+    def wait(self):
+        """Espera a que terminen todos los post-procesados enviados. Retorna los errores."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        return list(self.errors)
+
+    def cancel_pending(self):
+        """Descarta los post-procesados que todavía no empezaron (los archivos quedan sin unir)."""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            if future.cancel():
+                self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class PipelinedYoutubeDL(SegmentedYoutubeDL):
+    """
+    YoutubeDL que, si recibe un `pipeline`, manda el post-procesado (merge, embebidos y
+    movimiento final) a ese pool en lugar de ejecutarlo en el hilo de descarga. El ID
+    del video se agrega al archivo de descargas recién cuando su post-procesado termina bien.
+
+    Con `format_plan(info)` y sin 'format' en los parámetros, la cadena de formatos de
+    cada video la decide esa función (ver format_planner); si retorna None se usa la de yt-dlp.
+
+    Con `media_lookup(info)`, los videos para los que retorna True (ya estaban en el
+    almacén de medios y se enlazaron) se omiten como si figuraran en el archivo de descargas.
+
+    `close` (al salir del `with`) no espera el post-procesado enviado: la instancia se
+    cierra de verdad cuando termina el último, así el hilo de descarga sigue con otro video.
+    """
+
+    def __init__(self, params=None, pipeline=None, format_plan=None, media_lookup=None, **kwargs):
+        super().__init__(params, **kwargs)
+        self.pipeline = pipeline
+        self.format_plan = format_plan
+        self.media_lookup = media_lookup
+        self._pp_futures = {}
+        self._pp_enviados = []
+        self._pp_lock = threading.Lock()
+
+    def in_download_archive(self, info_dict):
+        # Antes que el archivo de descargas: un video ya bajado para otra playlist se enlaza aquí
+        if self.media_lookup is not None and self.media_lookup(info_dict):
+            return True
+        return super().in_download_archive(info_dict)
+
+    def _default_format_spec(self, info_dict, *args, **kwargs):
+        spec = self.format_plan(info_dict) if self.format_plan is not None else None
+        return spec or super()._default_format_spec(info_dict, *args, **kwargs)
+
+    def post_process(self, filename, info, files_to_move=None):
+        if self.pipeline is None:
+            return super().post_process(filename, info, files_to_move)
+
+        # Copia para el hilo de post-procesado: process_info sigue usando `info` mientras tanto
+        info_pp = dict(info)
+        info_pp['__postprocessors'] = list(info.get('__postprocessors') or [])
+        future = self.pipeline.submit(super().post_process, filename, info_pp, dict(files_to_move or {}))
+        self._pp_enviados.append(future)
+        vid_id = self._make_archive_id(info)
+        if vid_id:
+            self._pp_futures[vid_id] = future
+
+        info['filepath'] = filename
+        return info
+
+    def record_download_archive(self, info_dict):
+        future = self._pp_futures.pop(self._make_archive_id(info_dict), None)
+        if future is None:
+            return super().record_download_archive(info_dict)
+
+        def registrar(f):
+            if not f.cancelled() and f.exception() is None:
+                SegmentedYoutubeDL.record_download_archive(self, info_dict)
+        future.add_done_callback(registrar)
+
+    def close(self):
+        # Los post-procesados en cola usan esta instancia (red, cookies, hooks de cierre)
+        pendientes = [future for future in self._pp_enviados if not future.done()]
+        if not pendientes:
+            return super().close()
+        restantes = [len(pendientes)]
+
+        def cerrar_al_terminar(future):
+            with self._pp_lock:
+                restantes[0] -= 1
+                ultimo = restantes[0] == 0
+            if ultimo:
+                SegmentedYoutubeDL.close(self)
+        for future in pendientes:
+            future.add_done_callback(cerrar_al_terminar)
+
+
+class FFmpegProfilePP(PostProcessor):
+    """
+    Post-procesador de yt-dlp que pasa el archivo final de cada video por un perfil de
+    FFmpegManager (reempaquetar, extraer el audio o recodificar). El trabajo corre en
+    el pool de procesos del gestor: los hilos de post-procesado esperan ahí su turno,
+    así varios videos se procesan a la vez sin lanzar más FFmpeg de los que admite la CPU.
+    """
+
+    def __init__(self, ffmpeg_manager, perfil, downloader=None):
+        super().__init__(downloader)
+        self.ffmpeg_manager = ffmpeg_manager
+        self.perfil = perfil
+
+    def run(self, info):
+        entrada = info['filepath']
+        try:
+            salida = self.ffmpeg_manager.postprocesar(self.perfil, entrada, familia_codec(info.get('vcodec')),
+                                                      familia_codec(info.get('acodec')))
+        except (OSError, RuntimeError, CancelledError) as e:
+            raise PostProcessingError(f"Post-procesado '{self.perfil}': {str(e) or 'cancelado'}")
+        if salida != entrada:
+            self.to_screen(f'Perfil "{self.perfil}": {salida}')
+            info['filepath'] = salida
+            info['ext'] = os.path.splitext(salida)[1][1:]
+        return [], info
+
+
+class StoreMediaPP(PostProcessor):
+    """
+    Post-procesador de yt-dlp (después de mover el archivo a su lugar) que incorpora
+    cada video terminado al almacén de medios con la clave `formato`, dejando en la
+    carpeta de la playlist un enlace al archivo guardado.
+    """
+
+    def __init__(self, media_store, formato, downloader=None):
+        super().__init__(downloader)
+        self.media_store = media_store
+        self.formato = formato
+
+    def run(self, info):
+        vid_id = archive_id(info)
+        path = info.get('filepath')
+        if vid_id is None or not path or not os.path.isfile(path):
+            return [], info
+        try:
+            blob = self.media_store.guardar(vid_id, self.formato, path, info.get('format_id'))
+        except OSError as e:
+            # El video ya está descargado: sin almacén, queda como un archivo común
+            self.report_warning(f"No se pudo guardar en el almacén de medios: {e}")
+            return [], info
+        self.write_debug(f"Guardado en el almacén: {blob}")
+        return [], info
@@ -0,0 +1,253 @@
+import time
+import threading
+from collections import OrderedDict
+from progress_history import JobHistory, RingBuffer, DEFAULT_SAMPLES, SAMPLE_SECONDS, MAX_FINISHED, INFO, ERROR
+
+# Frecuencia con la que la interfaz consume el bus (15 Hz)
+UI_REFRESH_MS = 66
+
+# Identificador del trabajo interactivo (el que se lanza con el botón "Descargar") en el bus de progreso
+MAIN_JOB = "main"
+
+
+class ProgressState:
+    """Último estado conocido de un trabajo. Solo guarda valores crudos; el texto se arma al mostrarlo."""
+
+    __slots__ = ('job_id', 'status', 'message', 'title', 'downloaded_bytes', 'total_bytes',
+                 'speed', 'eta', 'playlist_index', 'playlist_count', 'progress', 'version')
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = 'info'
+        self.message = ""
+        self.title = None
+        self.downloaded_bytes = None
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+        self.playlist_index = None
+        self.playlist_count = None
+        self.progress = None
+        self.version = 0
+
+    def copy(self):
+        nuevo = ProgressState(self.job_id)
+        for campo in self.__slots__:
+            setattr(nuevo, campo, getattr(self, campo))
+        return nuevo
+
+    def fraction(self):
+        """Fracción completada (0.0 - 1.0), o None si no se conoce."""
+        if self.progress is not None:
+            return self.progress
+        if self.total_bytes and self.downloaded_bytes is not None:
+            return min(self.downloaded_bytes / self.total_bytes, 1.0)
+        return None
+
+
+class ProgressBus:
+    """
+    Canal de progreso entre los hilos de descarga y quien los muestre.
+
+    Los productores (hooks de yt-dlp) solo sobrescriben el estado del trabajo bajo
+    un lock, sin tocar Tk. Los consumidores (el temporizador de la interfaz o un
+    runner sin interfaz) leen a su ritmo los trabajos que cambiaron, de modo que
+    cientos de callbacks por segundo se resumen en una actualización por refresco.
+
+    Además guarda un historial acotado por trabajo (ver progress_history): los bytes
+    leídos (`add_bytes`), los mensajes de estado y errores, y las muestras que toma
+    `sample()`, que llama quien muestra el historial a su ritmo. Al terminar un
+    trabajo su historial se conserva entre los últimos MAX_FINISHED.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._states = {}
+        self._version = 0
+        self._historias = {}
+        self._terminados = OrderedDict()
+        self._ultima_muestra = None
+        # Velocidad total de todos los trabajos, una muestra por sample()
+        self._tiempos_total = RingBuffer(DEFAULT_SAMPLES)
+        self._velocidad_total = RingBuffer(DEFAULT_SAMPLES)
+
+    def _historia(self, job_id):
+        historia = self._historias.get(job_id)
+        if historia is None:
+            # Un trabajo que vuelve (reintento de la cola) sigue con su historial
+            historia = self._terminados.pop(job_id, None) or JobHistory(job_id)
+            historia.fin = historia.final = None
+            self._historias[job_id] = historia
+        return historia
+
+    def _agregar_terminado(self, historia):
+        self._terminados[historia.job_id] = historia
+        while len(self._terminados) > MAX_FINISHED:
+            self._terminados.popitem(last=False)
+
+    def publish(self, job_id, **fields):
+        """Actualiza los campos indicados del estado de un trabajo."""
+        with self._cond:
+            state = self._states.get(job_id)
+            if state is None:
+                state = self._states[job_id] = ProgressState(job_id)
+            anterior = (state.status, state.message, state.title)
+            for campo, valor in fields.items():
+                setattr(state, campo, valor)
+            self._registrar_log(self._historia(job_id), state, anterior, fields)
+            self._version += 1
+            state.version = self._version
+            self._cond.notify_all()
+
+    def _registrar_log(self, historia, state, anterior, fields):
+        # Al historial van los errores y los mensajes sueltos (los que no traen el valor
+        # de la barra: los de avance cambian decenas de veces por segundo)
+        status, message, title = anterior
+        if state.status == 'error':
+            if (status, message) != ('error', state.message):
+                historia.log(state.message or "Error desconocido", ERROR)
+        elif state.status == 'finished':
+            if status != 'finished' or title != state.title:
+                historia.log(f"Descargado: {state.title or 'video'}")
+        elif 'message' in fields and state.message and fields.get('progress') is None and message != state.message:
+            historia.log(state.message)
+
+    def add_bytes(self, job_id, nbytes):
+        """Cuenta bytes leídos de la red por un trabajo (la velocidad sale de acá en cada muestra)."""
+        with self._cond:
+            # Lecturas que llegan justo después de terminar no reabren el trabajo
+            historia = self._historias.get(job_id) or self._terminados.get(job_id) or self._historia(job_id)
+            historia.bytes_totales += nbytes
+
+    def log(self, job_id, texto, nivel=INFO):
+        """Agrega una línea al historial del trabajo (también si ya terminó)."""
+        with self._cond:
+            historia = self._historias.get(job_id) or self._terminados.get(job_id)
+            if historia is None:
+                # Un trabajo que falló antes de publicar nada: queda directamente como terminado
+                historia = JobHistory(job_id)
+                historia.fin = time.monotonic()
+                self._agregar_terminado(historia)
+            historia.log(texto, nivel)
+            self._version += 1
+            self._cond.notify_all()
+
+    def sample(self):
+        """
+        Toma una muestra de cada trabajo activo y de la velocidad total. Las llamadas a
+        menos de medio SAMPLE_SECONDS de la anterior no hacen nada (varios consumidores).
+        """
+        ahora = time.monotonic()
+        with self._cond:
+            if self._ultima_muestra is not None and ahora - self._ultima_muestra < SAMPLE_SECONDS / 2:
+                return
+            self._ultima_muestra = ahora
+            total = 0.0
+            for job_id, historia in self._historias.items():
+                historia.muestrear(ahora, self._states.get(job_id))
+                total += historia.velocidad()
+            self._tiempos_total.append(ahora)
+            self._velocidad_total.append(total)
+
+    def jobs(self):
+        """
+        (job_id, activo) de los trabajos con historial: primero los activos, en el orden
+        en que aparecieron, y después los terminados, del más reciente al más viejo.
+        """
+        with self._cond:
+            return [(job_id, True) for job_id in self._historias] + [(job_id, False) for job_id in reversed(self._terminados)]
+
+    def detail(self, job_id, muestras=None):
+        """
+        Copia de lo que se sabe de un trabajo: 'state' (el último), 'activo',
+        'velocidad', 'eta', 'velocidades' (las últimas `muestras`), 'logs' y
+        'version_log' (cambia cuando llega una línea). None si no hay historial.
+        """
+        with self._cond:
+            historia = self._historias.get(job_id)
+            activo = historia is not None
+            if historia is None:
+                historia = self._terminados.get(job_id)
+                if historia is None:
+                    return None
+            state = self._states.get(job_id) if activo else historia.final
+            state = state.copy() if state is not None else None
+            return {
+                'state': state,
+                'activo': activo,
+                'velocidad': historia.velocidad() if activo else 0.0,
+                'eta': historia.eta(state) if activo else None,
+                'velocidades': historia.velocidades.valores(muestras),
+                'bytes': historia.bytes_totales,
+                'duracion': (historia.fin or time.monotonic()) - historia.inicio,
+                'logs': list(historia.logs),
+                'version_log': historia.version_log,
+            }
+
+    def throughput(self, muestras=None):
+        """(velocidad total actual en bytes/s, últimas `muestras` de la velocidad total)."""
+        with self._cond:
+            return self._velocidad_total.ultimo(0.0), self._velocidad_total.valores(muestras)
+
+    def changes_since(self, version):
+        """Retorna (versión actual, copias de los estados modificados después de `version`)."""
+        with self._cond:
+            cambios = [state.copy() for state in self._states.values() if state.version > version]
+            return self._version, cambios
+
+    def wait(self, version, timeout=None):
+        """Bloquea hasta que haya cambios posteriores a `version` (para consumidores sin interfaz)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > version, timeout=timeout)
+            return self._version
+
+    def get(self, job_id):
+        with self._cond:
+            state = self._states.get(job_id)
+            return state.copy() if state else None
+
+    def remove(self, job_id):
+        with self._cond:
+            state = self._states.pop(job_id, None)
+            historia = self._historias.pop(job_id, None)
+            if historia is None:
+                return
+            historia.final = state
+            historia.fin = time.monotonic()
+            self._agregar_terminado(historia)
+            self._version += 1
+            self._cond.notify_all()
+
+
+def format_speed(speed):
+    if not speed:
+        return "N/A"
+    for unidad in ("B/s", "KiB/s", "MiB/s", "GiB/s"):
+        if speed < 1024 or unidad == "GiB/s":
+            return f"{speed:.2f}{unidad}"
+        speed /= 1024
+
+
+def format_eta(eta):
+    if eta is None:
+        return "N/A"
+    minutos, segundos = divmod(int(eta), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos:02d}:{segundos:02d}"
+
+
+def describe(state):
+    """Arma el texto de estado que se muestra al usuario a partir de un ProgressState."""
+    playlist_info = ""
+    if state.playlist_index and state.playlist_count:
+        playlist_info = f" ({state.playlist_index} de {state.playlist_count})"
+
+    if state.status == 'downloading':
+        fraccion = state.fraction()
+        p = f"{fraccion * 100:.1f}%" if fraccion is not None else "N/A"
+        return f"Descargando{playlist_info}: '{state.title or '...'}' - {p} a {format_speed(state.speed)} ETA: {format_eta(state.eta)}"
+    if state.status == 'finished':
+        return f"Post-procesando '{state.title or 'video'}'{playlist_info} (esto puede tardar)..."
+    if state.status == 'error':
+        return f"Error durante la descarga: {state.message or 'Desconocido'}"
+    return state.message
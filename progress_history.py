@@ -0,0 +1,149 @@
+import math
+import time
+from array import array
+from collections import deque
+
+# Historial acotado de cada trabajo: muestras de velocidad y avance, y las últimas
+# líneas de estado o error. Con cientos de trabajos a la vez la memoria queda fija:
+# cada trabajo tiene búferes circulares de tamaño fijo y de los terminados solo se
+# conservan los últimos MAX_FINISHED.
+
+# Muestras por trabajo (con una muestra cada SAMPLE_SECONDS, dos minutos de historia)
+DEFAULT_SAMPLES = 240
+SAMPLE_SECONDS = 0.5
+# Líneas de estado y errores por trabajo
+DEFAULT_LOG_LINES = 50
+# Trabajos terminados cuyo historial se conserva (los más viejos se descartan)
+MAX_FINISHED = 100
+# Muestras con las que se estima el tiempo restante a partir de la fracción completada
+ETA_WINDOW = 20
+
+INFO = "info"
+ERROR = "error"
+
+
+class RingBuffer:
+    """
+    Búfer circular de números sobre un array de tamaño fijo: al llenarse, cada valor
+    nuevo pisa el más viejo. `valores()` los retorna del más viejo al más nuevo.
+    """
+
+    __slots__ = ('_datos', '_inicio', '_cantidad')
+
+    def __init__(self, capacidad, typecode='d'):
+        self._datos = array(typecode, [0]) * max(1, capacidad)
+        self._inicio = 0
+        self._cantidad = 0
+
+    @property
+    def capacidad(self):
+        return len(self._datos)
+
+    def __len__(self):
+        return self._cantidad
+
+    def append(self, valor):
+        capacidad = len(self._datos)
+        if self._cantidad < capacidad:
+            self._datos[(self._inicio + self._cantidad) % capacidad] = valor
+            self._cantidad += 1
+        else:
+            self._datos[self._inicio] = valor
+            self._inicio = (self._inicio + 1) % capacidad
+
+    def ultimo(self, default=None):
+        if not self._cantidad:
+            return default
+        return self._datos[(self._inicio + self._cantidad - 1) % len(self._datos)]
+
+    def valores(self, n=None):
+        """Los últimos `n` valores (todos por defecto), del más viejo al más nuevo."""
+        n = self._cantidad if n is None else min(n, self._cantidad)
+        capacidad = len(self._datos)
+        desde = (self._inicio + self._cantidad - n) % capacidad
+        if desde + n <= capacidad:
+            return self._datos[desde:desde + n].tolist()
+        return (self._datos[desde:] + self._datos[:desde + n - capacidad]).tolist()
+
+
+class LogLine:
+    """Una línea del historial de un trabajo."""
+
+    __slots__ = ('tiempo', 'nivel', 'texto')
+
+    def __init__(self, tiempo, nivel, texto):
+        self.tiempo = tiempo
+        self.nivel = nivel
+        self.texto = texto
+
+    def __repr__(self):
+        return f"LogLine({self.nivel!r}, {self.texto!r})"
+
+
+class JobHistory:
+    """
+    Muestras de un trabajo (instante, bytes/s, fracción completada; NaN si no se
+    conoce) y sus últimas líneas de estado. Los bytes los cuenta quien lee de la red
+    (`bytes_totales`); cada `muestrear` convierte lo leído desde la anterior en velocidad.
+    """
+
+    __slots__ = ('job_id', 'tiempos', 'velocidades', 'fracciones', 'logs', 'bytes_totales',
+                 '_bytes_muestra', 'inicio', 'fin', 'final', 'version_log')
+
+    def __init__(self, job_id, muestras=DEFAULT_SAMPLES, lineas=DEFAULT_LOG_LINES):
+        self.job_id = job_id
+        self.tiempos = RingBuffer(muestras)
+        self.velocidades = RingBuffer(muestras)
+        self.fracciones = RingBuffer(muestras)
+        self.logs = deque(maxlen=lineas)
+        self.bytes_totales = 0
+        self._bytes_muestra = 0
+        self.inicio = time.monotonic()
+        self.fin = None
+        self.final = None  # último estado (ProgressState) al terminar el trabajo
+        self.version_log = 0
+
+    def log(self, texto, nivel=INFO):
+        self.logs.append(LogLine(time.time(), nivel, texto))
+        self.version_log += 1
+
+    def muestrear(self, ahora, state):
+        """Agrega una muestra con lo leído desde la anterior (o la velocidad que informa yt-dlp)."""
+        anterior = self.tiempos.ultimo()
+        leidos = self.bytes_totales - self._bytes_muestra
+        self._bytes_muestra = self.bytes_totales
+        if anterior is not None and leidos:
+            velocidad = leidos / max(ahora - anterior, 1e-3)
+        elif state is not None and state.status == 'downloading' and state.speed:
+            # Descargas que no pasan por la red compartida (por ejemplo, con FFmpeg)
+            velocidad = state.speed
+        else:
+            velocidad = 0.0
+        fraccion = state.fraction() if state is not None else None
+        self.tiempos.append(ahora)
+        self.velocidades.append(velocidad)
+        self.fracciones.append(math.nan if fraccion is None else fraccion)
+
+    def velocidad(self):
+        return self.velocidades.ultimo(0.0)
+
+    def eta(self, state):
+        """
+        Segundos restantes: los de yt-dlp si los informa, o si no la pendiente de la
+        fracción completada en las últimas muestras (sirve para playlists enteras).
+        """
+        if state is None:
+            return None
+        if state.status == 'downloading' and state.eta is not None:
+            return state.eta
+        fracciones = self.fracciones.valores(ETA_WINDOW)
+        tiempos = self.tiempos.valores(ETA_WINDOW)
+        puntos = [(t, f) for t, f in zip(tiempos, fracciones) if not math.isnan(f)]
+        if len(puntos) < 2:
+            return None
+        (t0, f0), (t1, f1) = puntos[0], puntos[-1]
+        if f1 >= 1.0:
+            return 0
+        if f1 <= f0 or t1 <= t0:
+            return None
+        return (1.0 - f1) * (t1 - t0) / (f1 - f0)
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+
+# Descargas a medio terminar. Cada archivo parcial (.part) tiene al lado un manifiesto
+# JSON (<archivo>.part.resume.json) con la URL, el formato y cuánto se descargó: en
+# las descargas por segmentos, el rango y los bytes escritos de cada segmento; en las
+# de fragmentos (DASH/HLS), el índice del último fragmento. Al repetir la misma URL,
+# yt-dlp y SegmentedHttpFD continúan el parcial en lugar de empezar de cero.
+#
+# Los parciales solo se borran cuando quedan abandonados: más viejos que una edad
+# máxima, o los más viejos primero si entre todos superan un presupuesto de espacio.
+
+MANIFEST_SUFFIX = ".resume.json"
+DEFAULT_MAX_AGE_DAYS = 7
+# Un parcial modificado hace menos de esto puede estar descargándose ahora (p. ej. un
+# trabajo de la cola en la misma carpeta): nunca se borra
+MIN_IDLE_SECONDS = 120
+
+
+def manifest_path(tmpfilename):
+    return tmpfilename + MANIFEST_SUFFIX
+
+
+def load_manifest(tmpfilename):
+    """Retorna el manifiesto del parcial, o None si no existe o está dañado."""
+    try:
+        with open(manifest_path(tmpfilename), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(tmpfilename, data):
+    """Guarda el manifiesto de forma atómica (un corte nunca deja un JSON a medias)."""
+    path = manifest_path(tmpfilename)
+    tmp_path = path + ".tmp"
+    data = dict(data, updated=time.time())
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"No se pudo guardar {path}: {e}", file=sys.stderr)
+
+
+def remove_manifest(tmpfilename):
+    try:
+        os.remove(manifest_path(tmpfilename))
+    except FileNotFoundError:
+        pass
+
+
+def _base_parcial(nombre):
+    """
+    Nombre del .part al que pertenece un temporal de yt-dlp (.part con los datos,
+    .ytdl con el estado de los fragmentos, .part-FragN, el manifiesto), o None.
+    """
+    if nombre.endswith(MANIFEST_SUFFIX):
+        return nombre[:-len(MANIFEST_SUFFIX)]
+    if nombre.endswith(".ytdl"):
+        return nombre[:-len(".ytdl")] + ".part"
+    if nombre.endswith(".part"):
+        return nombre
+    if ".part-Frag" in nombre:
+        return nombre.split(".part-Frag", 1)[0] + ".part"
+    return None
+
+
+def is_partial(nombre):
+    """True si `nombre` es un temporal de una descarga (.part, .ytdl, fragmento o manifiesto)."""
+    return _base_parcial(nombre) is not None
+
+
+def group_partials(paths):
+    """
+    Agrupa por descarga los temporales de yt-dlp que haya entre `paths` (los demás
+    archivos y los que ya no existen se ignoran). Retorna una lista de diccionarios
+    {'part', 'files', 'size', 'mtime', 'manifest'} (mtime = el archivo más reciente del grupo).
+    """
+    grupos = {}
+    for path in paths:
+        carpeta, nombre = os.path.split(path)
+        base = _base_parcial(nombre)
+        if base is None:
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        grupo = grupos.setdefault(os.path.join(carpeta, base), {'part': os.path.join(carpeta, base), 'files': [], 'size': 0, 'mtime': 0})
+        grupo['files'].append(path)
+        grupo['size'] += stat.st_size
+        grupo['mtime'] = max(grupo['mtime'], stat.st_mtime)
+    for grupo in grupos.values():
+        grupo['manifest'] = load_manifest(grupo['part'])
+    return list(grupos.values())
+
+
+def find_partials(carpeta):
+    """Agrupa los temporales de `carpeta` por descarga (ver group_partials). Lista toda la carpeta."""
+    try:
+        entradas = list(os.scandir(carpeta))
+    except FileNotFoundError:
+        return []
+    return group_partials(entrada.path for entrada in entradas if _base_parcial(entrada.name) and entrada.is_file())
+
+
+def prune_partials(carpeta, max_age=None, max_bytes=None, now=None, min_idle=MIN_IDLE_SECONDS):
+    """
+    Borra los parciales abandonados de `carpeta`: los que no se tocan hace más de
+    `max_age` segundos y, si el total sigue superando `max_bytes`, los más viejos
+    hasta quedar por debajo. None (o 0) desactiva cada criterio. Retorna los grupos borrados.
+    """
+    return prune_groups(find_partials(carpeta), max_age, max_bytes, now, min_idle)
+
+
+def prune_groups(grupos, max_age=None, max_bytes=None, now=None, min_idle=MIN_IDLE_SECONDS):
+    """Como prune_partials, pero sobre grupos ya armados (find_partials o group_partials)."""
+    now = time.time() if now is None else now
+    grupos = sorted(grupos, key=lambda g: g['mtime'])
+    inactivos = [g for g in grupos if now - g['mtime'] >= min_idle]
+    # Un manifiesto sin datos al lado es de una descarga que ya terminó o se borró
+    borrar = [g for g in inactivos if (max_age and now - g['mtime'] > max_age)
+              or all(path.endswith(MANIFEST_SUFFIX) for path in g['files'])]
+    if max_bytes:
+        restantes = [g for g in grupos if g not in borrar]
+        total = sum(g['size'] for g in restantes)
+        for grupo in restantes:
+            if total <= max_bytes:
+                break
+            if grupo not in inactivos:
+                continue
+            borrar.append(grupo)
+            total -= grupo['size']
+
+    for grupo in borrar:
+        for path in grupo['files']:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return borrar
@@ -0,0 +1,127 @@
+import re
+import time
+import random
+import socket
+import http.client
+from yt_dlp.networking.exceptions import HTTPError, TransportError, IncompleteRead
+from yt_dlp.utils import (DownloadError, DownloadCancelled, ExtractorError, GeoRestrictedError,
+                          UnsupportedError, ContentTooShortError, PostProcessingError)
+
+# Reintentos con espera exponencial. Los errores se clasifican en transitorios (cortes
+# de red, timeouts, HTTP 5xx/429) y permanentes (video privado o eliminado, HTTP 404,
+# sitio no soportado): solo los transitorios se reintentan. Las esperas usan "full
+# jitter" (un valor al azar entre 0 y el tope exponencial) para que varios hilos que
+# fallaron a la vez no vuelvan a pegarle al servidor todos juntos.
+
+TRANSITORIO = "transient"
+PERMANENTE = "permanent"
+
+DEFAULT_RETRIES = 4
+# Reintentos de yt-dlp dentro de un mismo archivo (cada uno continúa desde el byte o
+# fragmento donde se cortó). Desde la API de yt-dlp el valor por defecto es 0, no el 10 de su CLI.
+DEFAULT_FRAGMENT_RETRIES = 10
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+# Códigos HTTP que suelen resolverse solos al rato
+HTTP_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+
+# Fragmentos de los mensajes de yt-dlp cuando el error original ya no está disponible
+MENSAJES_TRANSITORIOS = (
+    'timed out', 'timeout', 'connection reset', 'connection aborted', 'connection refused',
+    'remote end closed', 'temporary failure in name resolution', 'network is unreachable',
+    'incomplete read', 'incompleteread', 'unable to download video data', 'bad gateway',
+    'service unavailable', 'gateway time', 'too many requests', 'conexión cerrada',
+    'more expected',
+)
+HTTP_ERROR_RE = re.compile(r'http error (\d{3})')
+
+
+def _causas(exc):
+    """Recorre la excepción y las que la originaron (yt-dlp las envuelve en varias capas)."""
+    vistas = set()
+    while exc is not None and id(exc) not in vistas:
+        vistas.add(id(exc))
+        yield exc
+        siguiente = None
+        if isinstance(exc, DownloadError) and exc.exc_info and exc.exc_info[1] is not exc:
+            siguiente = exc.exc_info[1]
+        elif isinstance(exc, ExtractorError) and isinstance(exc.cause, BaseException):
+            siguiente = exc.cause
+        exc = siguiente or exc.__cause__ or exc.__context__
+
+
+def clasificar_error(exc):
+    """Retorna TRANSITORIO si vale la pena reintentar `exc`, o PERMANENTE si no."""
+    for causa in _causas(exc):
+        if isinstance(causa, (DownloadCancelled, GeoRestrictedError, UnsupportedError, PostProcessingError)):
+            return PERMANENTE
+        if isinstance(causa, HTTPError):
+            return TRANSITORIO if causa.status in HTTP_TRANSITORIOS else PERMANENTE
+        if isinstance(causa, ExtractorError) and causa.expected and causa.cause is None:
+            # Errores "esperados" del extractor: video privado, eliminado, con restricción de edad...
+            return PERMANENTE
+        if isinstance(causa, (TransportError, IncompleteRead, ContentTooShortError, http.client.IncompleteRead,
+                              ConnectionError, TimeoutError, socket.timeout, socket.gaierror)):
+            return TRANSITORIO
+    mensaje = str(exc).lower()
+    codigo = HTTP_ERROR_RE.search(mensaje)
+    if codigo:
+        return TRANSITORIO if int(codigo.group(1)) in HTTP_TRANSITORIOS else PERMANENTE
+    if any(fragmento in mensaje for fragmento in MENSAJES_TRANSITORIOS):
+        return TRANSITORIO
+    return PERMANENTE
+
+
+def es_transitorio(exc):
+    return clasificar_error(exc) == TRANSITORIO
+
+
+class RetryPolicy:
+    """
+    Política de reintentos: hasta `retries` reintentos (además del primer intento)
+    con una espera de `uniform(0, min(backoff_max, backoff_base * 2 ** n))` antes del
+    reintento n (0-based).
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX):
+        self.retries = max(0, int(retries))
+        self.backoff_base = max(0.0, float(backoff_base))
+        self.backoff_max = max(0.0, float(backoff_max))
+
+    def espera(self, n):
+        """Segundos a esperar antes del reintento `n` (0 = el primero)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** n)))
+
+    def reintentable(self, exc, reintento):
+        """True si después de `reintento` reintentos ya hechos corresponde otro para `exc`."""
+        return reintento < self.retries and es_transitorio(exc)
+
+    def sleep_functions(self):
+        """Valor para 'retry_sleep_functions' de yt-dlp: misma espera en HTTP, fragmentos y extractores."""
+        espera = lambda n: self.espera(n)
+        return {'http': espera, 'fragment': espera, 'extractor': espera}
+
+    def ejecutar(self, fn, cancel_event=None, on_retry=None):
+        """
+        Llama a `fn()` y la repite mientras falle con un error transitorio. Antes de
+        cada reintento llama a `on_retry(error, reintento, espera)` y espera (la espera
+        se corta si se activa `cancel_event`). Relanza el último error.
+        """
+        reintento = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not self.reintentable(e, reintento):
+                    raise
+                if cancel_event is not None and cancel_event.is_set():
+                    raise
+                segundos = self.espera(reintento)
+                reintento += 1
+                if on_retry:
+                    on_retry(e, reintento, segundos)
+                if cancel_event is None:
+                    time.sleep(segundos)
+                elif cancel_event.wait(segundos):
+                    raise
@@ -0,0 +1,391 @@
+import os
+import sys
+import time
+import threading
+import urllib.request
+import yt_dlp
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.utils import determine_protocol
+from retry_policy import es_transitorio
+from resume_manifest import load_manifest, save_manifest, remove_manifest
+
+# Descarga de un archivo por partes (rangos de bytes) usando varias conexiones a la vez.
+# Cada parte se escribe directamente en su posición de un archivo preasignado, así no
+# hay que unir pedazos al final.
+
+DEFAULT_CONNECTIONS = 4
+# Por debajo de este tamaño no compensa abrir varias conexiones
+DEFAULT_MIN_SIZE = 8 * 1024 * 1024
+MIN_SEGMENT_SIZE = 1024 * 1024
+READ_SIZE = 256 * 1024
+# Cada cuántos segundos se actualiza el manifiesto de reanudación de una descarga en curso
+MANIFEST_INTERVAL = 1.0
+
+
+class SegmentedDownloadError(Exception):
+    pass
+
+
+def datos_manifiesto(info):
+    """Campos del manifiesto de reanudación que identifican la descarga."""
+    return {
+        'url': info.get('webpage_url') or info.get('original_url') or info.get('url'),
+        'id': info.get('id'),
+        'extractor_key': info.get('extractor_key'),
+        'title': info.get('title'),
+        'format_id': info.get('format_id'),
+    }
+
+
+def _urllib_opener(url, headers):
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30)
+
+
+def _content_range_total(value):
+    """Extrae el tamaño total de una cabecera 'Content-Range: bytes a-b/total'."""
+    if not value or '/' not in value:
+        return None
+    total = value.rsplit('/', 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def probe_range_support(url, headers=None, opener=_urllib_opener):
+    """
+    Pide el primer byte con una cabecera Range. Retorna el tamaño total si el
+    servidor responde 206 con Content-Range (acepta rangos), o None si no.
+    """
+    response = opener(url, dict(headers or {}, Range='bytes=0-0'))
+    try:
+        if getattr(response, 'status', None) != 206:
+            return None
+        # Con el byte pedido leído, la conexión vuelve al pool (con datos sin leer se descarta)
+        response.read(1)
+        return _content_range_total(response.headers.get('Content-Range'))
+    finally:
+        response.close()
+
+
+class SegmentedDownload:
+    """
+    Descarga `url` en `path` dividiendo [0, total_size) en `connections` rangos.
+
+    `opener(url, headers)` abre la conexión (por defecto urllib; desde yt-dlp se usa
+    su propio urlopen para respetar cookies y proxies). `run` bloquea hasta terminar,
+    llamando a `on_progress(descargado, total)` cada `interval` segundos; si
+    on_progress lanza una excepción (p. ej. una cancelación) se detienen todas las
+    conexiones y la excepción se propaga.
+
+    Con `resume` (la lista de `segment_state` de una ejecución anterior) se continúa
+    el archivo existente: cada segmento sigue desde los bytes que ya tenía escritos.
+    """
+
+    def __init__(self, url, path, total_size, connections=DEFAULT_CONNECTIONS, headers=None, opener=_urllib_opener,
+                 retries=0, sleep_func=None, on_retry=None, resume=None):
+        self.url = url
+        self.path = path
+        self.total_size = total_size
+        self.headers = dict(headers or {})
+        self.opener = opener
+        # Cada segmento se reintenta por separado desde el byte donde se cortó
+        self.retries = retries
+        self.sleep_func = sleep_func
+        self.on_retry = on_retry
+
+        self._lock = threading.Lock()
+        if resume:
+            self.segments = [(inicio, fin) for inicio, fin, _ in resume]
+            self._descargado = [descargado for _, _, descargado in resume]
+        else:
+            self.segments = self._dividir(total_size, max(1, connections))
+            self._descargado = [0] * len(self.segments)
+        self.resumed = bool(resume)
+        self._stop = threading.Event()
+        self._errores = []
+
+    def _dividir(self, total, connections):
+        connections = max(1, min(connections, total // MIN_SEGMENT_SIZE or 1))
+        tamano = total // connections
+        segmentos = []
+        for i in range(connections):
+            inicio = i * tamano
+            fin = total - 1 if i == connections - 1 else inicio + tamano - 1
+            segmentos.append((inicio, fin))
+        return segmentos
+
+    @property
+    def downloaded(self):
+        with self._lock:
+            return sum(self._descargado)
+
+    def segment_state(self):
+        """[[inicio, fin, bytes escritos], ...] para el manifiesto de reanudación."""
+        with self._lock:
+            return [[inicio, fin, descargado] for (inicio, fin), descargado in zip(self.segments, self._descargado)]
+
+    def _preasignar(self):
+        # Archivo del tamaño final (disperso donde el sistema de archivos lo permite)
+        with open(self.path, 'wb') as f:
+            f.truncate(self.total_size)
+
+    def _leer_rango(self, indice, inicio, fin):
+        response = self.opener(self.url, dict(self.headers, Range=f'bytes={inicio}-{fin}'))
+        try:
+            if getattr(response, 'status', None) != 206:
+                raise SegmentedDownloadError(f"El servidor no respetó el rango {inicio}-{fin}")
+            with open(self.path, 'r+b') as f:
+                f.seek(inicio)
+                restante = fin - inicio + 1
+                while restante > 0 and not self._stop.is_set():
+                    bloque = response.read(min(READ_SIZE, restante))
+                    if not bloque:
+                        raise SegmentedDownloadError(f"Conexión cerrada en el rango {inicio}-{fin}")
+                    f.write(bloque)
+                    restante -= len(bloque)
+                    with self._lock:
+                        self._descargado[indice] += len(bloque)
+        finally:
+            response.close()
+
+    def _descargar_segmento(self, indice):
+        inicio, fin = self.segments[indice]
+        reintento = 0
+        while True:
+            with self._lock:
+                desde = inicio + self._descargado[indice]
+            if desde > fin:
+                return
+            try:
+                self._leer_rango(indice, desde, fin)
+                return
+            except Exception as e:
+                if self._stop.is_set() or reintento >= self.retries or not es_transitorio(e):
+                    self._errores.append(e)
+                    self._stop.set()
+                    return
+                espera = self.sleep_func(n=reintento) if self.sleep_func else 0
+                reintento += 1
+                if self.on_retry:
+                    self.on_retry(e, reintento, self.retries)
+                if self._stop.wait(espera or 0):
+                    return
+
+    def run(self, on_progress=None, interval=0.2):
+        if not self.resumed:
+            self._preasignar()
+        hilos = [threading.Thread(target=self._descargar_segmento, args=(i,), name=f"segmento-{i}", daemon=True)
+                 for i in range(len(self.segments))]
+        for hilo in hilos:
+            hilo.start()
+
+        try:
+            while True:
+                vivos = [hilo for hilo in hilos if hilo.is_alive()]
+                if not vivos:
+                    break
+                vivos[0].join(interval)
+                if on_progress:
+                    on_progress(self.downloaded, self.total_size)
+        except BaseException:
+            self._stop.set()
+            for hilo in hilos:
+                hilo.join()
+            raise
+
+        if self._errores:
+            raise self._errores[0]
+        if self.downloaded != self.total_size:
+            raise SegmentedDownloadError(f"Descarga incompleta: {self.downloaded} de {self.total_size} bytes")
+
+
+class SegmentedHttpFD(HttpFD):
+    """
+    Downloader de yt-dlp para descargas HTTP directas con varias conexiones. Si el
+    servidor no acepta rangos o el archivo es chico, usa el HttpFD normal.
+    """
+
+    def __init__(self, ydl, params, connections=DEFAULT_CONNECTIONS, min_size=DEFAULT_MIN_SIZE):
+        super().__init__(ydl, params)
+        self.connections = connections
+        self.min_size = min_size
+
+    def _abrir(self, url, headers):
+        return self.ydl.urlopen(Request(url, headers=headers))
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        headers = info_dict.get('http_headers') or {}
+        try:
+            total = probe_range_support(url, headers, self._abrir)
+        except Exception:
+            total = None
+        if not total or total < self.min_size:
+            return super().real_download(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        resume = None
+        if os.path.exists(tmpfilename) and self.params.get('continuedl', True):
+            manifiesto = load_manifest(tmpfilename)
+            if manifiesto and manifiesto.get('segments') and manifiesto.get('total_bytes') == total \
+                    and os.path.getsize(tmpfilename) == total:
+                resume = manifiesto['segments']
+            elif os.path.getsize(tmpfilename) < total and not manifiesto:
+                # Parcial de una descarga con una sola conexión: HttpFD lo continúa
+                return super().real_download(filename, info_dict)
+            # Un parcial sin manifiesto válido no se puede continuar: se empieza de cero
+
+        def on_retry(error, reintento, reintentos):
+            self.report_warning(f"Segmento interrumpido ({error}). Reintentando desde donde quedó ({reintento}/{reintentos})...")
+
+        descarga = SegmentedDownload(url, tmpfilename, total, self.connections, headers, self._abrir,
+                                     retries=self.params.get('retries') or 0,
+                                     sleep_func=(self.params.get('retry_sleep_functions') or {}).get('http'),
+                                     on_retry=on_retry, resume=resume)
+        inicial = descarga.downloaded
+        datos = dict(datos_manifiesto(info_dict), total_bytes=total)
+        if resume:
+            self.to_screen(f"[download] Continuando {tmpfilename} desde {inicial * 100 // total}%")
+        self.report_destination(filename)
+        inicio = time.time()
+        ultimo_guardado = [0.0]
+
+        def guardar_manifiesto():
+            save_manifest(tmpfilename, dict(datos, downloaded_bytes=descarga.downloaded, segments=descarga.segment_state()))
+            ultimo_guardado[0] = time.monotonic()
+
+        def on_progress(descargado, total_bytes):
+            # El primero se guarda enseguida: el archivo preasignado ya tiene el tamaño
+            # final y sin manifiesto no se sabría qué le falta
+            if not ultimo_guardado[0] or time.monotonic() - ultimo_guardado[0] >= MANIFEST_INTERVAL:
+                guardar_manifiesto()
+            elapsed = time.time() - inicio
+            speed = (descargado - inicial) / elapsed if elapsed > 0 else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': descargado,
+                'total_bytes': total_bytes,
+                'tmpfilename': tmpfilename,
+                'filename': filename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (total_bytes - descargado) / speed if speed else None,
+                '_segmented': True,
+            }, info_dict)
+
+        try:
+            descarga.run(on_progress)
+        except BaseException:
+            # Cancelación, error o cierre: se deja anotado lo escrito para continuar después
+            if os.path.exists(tmpfilename):
+                guardar_manifiesto()
+            raise
+
+        remove_manifest(tmpfilename)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'elapsed': time.time() - inicio,
+        }, info_dict)
+        return True
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL que descarga los formatos HTTP directos con SegmentedHttpFD. Los
+    formatos por fragmentos (DASH/HLS) siguen con los downloaders de yt-dlp, que
+    ya bajan varios fragmentos a la vez con 'concurrent_fragment_downloads'.
+    Con `throttle`, cada bloque leído de la red se descuenta del límite de velocidad.
+    """
+
+    def __init__(self, params=None, connections=DEFAULT_CONNECTIONS, min_size=DEFAULT_MIN_SIZE, throttle=None, **kwargs):
+        super().__init__(params, **kwargs)
+        self.segment_connections = connections
+        self.segment_min_size = min_size
+        # throttle(nbytes) se llama tras cada lectura de red (límite de velocidad del trabajo)
+        self.throttle = throttle
+        self._manifiestos = {}
+        self._manifiestos_lock = threading.Lock()
+        self.add_progress_hook(self._hook_manifiesto)
+
+    def _hook_manifiesto(self, d):
+        """
+        Manifiesto de reanudación de las descargas que no van por segmentos (HttpFD y
+        DASH/HLS): yt-dlp las continúa con su .part/.ytdl, el manifiesto dice de qué
+        URL y formato son y cuánto llevan. SegmentedHttpFD escribe el suyo.
+        """
+        if d.get('_segmented'):
+            return
+        if d['status'] == 'finished':
+            if d.get('filename') and not self.params.get('nopart'):
+                remove_manifest(d.get('tmpfilename') or d['filename'] + '.part')
+            return
+        tmpfilename = d.get('tmpfilename')
+        if d['status'] != 'downloading' or not tmpfilename or tmpfilename == '-':
+            return
+        ahora = time.monotonic()
+        with self._manifiestos_lock:
+            if ahora - self._manifiestos.get(tmpfilename, 0) < MANIFEST_INTERVAL:
+                return
+            self._manifiestos[tmpfilename] = ahora
+        save_manifest(tmpfilename, dict(
+            datos_manifiesto(d.get('info_dict') or {}),
+            downloaded_bytes=d.get('downloaded_bytes'),
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            fragment_index=d.get('fragment_index'),
+            fragment_count=d.get('fragment_count'),
+        ))
+
+    def urlopen(self, req):
+        response = super().urlopen(req)
+        if self.throttle is not None:
+            # Todos los downloaders (HTTP, por segmentos, DASH/HLS) leen con urlopen
+            leer = response.read
+            throttle = self.throttle
+
+            def read(amt=None):
+                data = leer(amt)
+                if data:
+                    throttle(len(data))
+                return data
+            response.read = read
+        return response
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if not info.get('url'):
+            self.raise_no_formats(info, True)
+        # Solo se reemplaza el HttpFD que elegiría yt-dlp: el resto (externos como
+        # 'external_downloader', DASH/HLS, directos, pruebas) sigue igual
+        if subtitle or test or name == '-' or info.get('is_live') or self.segment_connections <= 1 \
+                or determine_protocol(info) not in ('http', 'https') \
+                or get_suitable_downloader(info, self.params, to_stdout=False) is not HttpFD:
+            return super().dl(name, info, subtitle, test)
+
+        # Mismo armado que YoutubeDL.dl, cambiando solo el downloader
+        fd = SegmentedHttpFD(self, self.params, self.segment_connections, self.segment_min_size)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+
+
+if __name__ == "__main__":
+    # Comparación rápida contra un servidor que acepte rangos:
+    #   python segmented_download.py http://127.0.0.1:8000/archivo.bin 1 2 4 8
+    url = sys.argv[1]
+    total = probe_range_support(url)
+    if not total:
+        sys.exit("El servidor no acepta rangos de bytes.")
+    destino = "segmented_benchmark.tmp"
+    for conexiones in [int(n) for n in sys.argv[2:]] or [1, DEFAULT_CONNECTIONS]:
+        inicio = time.time()
+        SegmentedDownload(url, destino, total, conexiones).run()
+        duracion = time.time() - inicio
+        print(f"{conexiones} conexión(es): {total / duracion / (1024 * 1024):.1f} MiB/s ({duracion:.2f} s)")
+    os.remove(destino)
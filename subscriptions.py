@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import threading
+
+# Suscripciones: canales y playlists que se vuelven a revisar solos cada cierto tiempo.
+# Cada revisión (sondeo) pide solo las primeras páginas del listado, hasta encontrar
+# videos ya vistos, y encola los nuevos: una sincronización continua que cuesta una o
+# dos peticiones por canal en lugar de volver a recorrer el canal entero.
+
+SUBSCRIPTIONS_FILE = "subscriptions.jsonl"
+# IDs ya vistos de cada suscripción ("id_suscripcion extractor id" por línea)
+SUBSCRIPTIONS_SEEN_FILE = "subscriptions_seen.txt"
+
+# Segundos entre dos sondeos de una suscripción ('subscription_interval' en config.ini)
+DEFAULT_INTERVAL = 6 * 3600
+
+# Videos ya vistos seguidos tras los que se deja de recorrer el listado. Más de uno
+# tolera un video viejo que reaparece arriba (vuelto a publicar, fijado)
+STOP_AFTER_SEEN = 5
+
+# Espera antes de repetir un sondeo que falló: se duplica con cada fallo seguido, sin
+# pasar del intervalo de la suscripción (un corte de red no cuesta un intervalo entero)
+RETRY_BACKOFF = 60
+
+# Espera máxima del planificador entre dos revisiones de la lista (toma las altas y
+# los cambios de hora sin depender de que lo despierten)
+MAX_SLEEP = 300
+
+
+def desfase(sub_id, ventana):
+    """
+    Segundos (dentro de `ventana`) en que cae el sondeo de una suscripción. Sale de
+    su ID, así se reparten parejo y cada una conserva su lugar entre reinicios.
+    """
+    ventana = int(ventana)
+    if ventana <= 0:
+        return 0
+    return int(hashlib.sha1(sub_id.encode('utf-8')).hexdigest()[:8], 16) % ventana
+
+
+class SubscriptionList:
+    """
+    Lista persistente de suscripciones: URL, carpeta de destino, perfil de formato e
+    intervalo de cada una, más el momento del próximo sondeo.
+
+    Se guarda como JSON por líneas (una por suscripción, la última gana, compactado
+    al cargar) igual que el journal de la cola. Los IDs ya vistos van aparte, en un
+    archivo al que solo se agregan líneas (puede tener miles por canal); al cargarlo
+    se reescribe sin los de las suscripciones que ya no existen.
+    """
+
+    def __init__(self, path=SUBSCRIPTIONS_FILE, seen_path=None):
+        self.path = path
+        self.seen_path = seen_path or os.path.join(os.path.dirname(path), SUBSCRIPTIONS_SEEN_FILE)
+        self._lock = threading.Lock()
+        self._subs = None
+        self._vistos = None
+
+    # --- Persistencia ---
+    def _cargar(self):
+        if self._subs is None:
+            subs = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for linea in f:
+                        linea = linea.strip()
+                        if not linea:
+                            continue
+                        try:
+                            registro = json.loads(linea)
+                        except ValueError:
+                            # Última línea truncada por un corte: se descarta
+                            continue
+                        if registro.get('borrado'):
+                            subs.pop(registro['id'], None)
+                        else:
+                            subs[registro['id']] = registro
+            self._subs = subs
+            self._compactar()
+        return self._subs
+
+    def _compactar(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for registro in self._subs.values():
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"No se pudo guardar {self.path}: {e}", file=sys.stderr)
+
+    def _escribir(self, registro):
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"No se pudo guardar {self.path}: {e}", file=sys.stderr)
+
+    def _cargar_vistos(self):
+        if self._vistos is None:
+            subs = self._cargar()
+            vistos = {}
+            lineas = 0
+            if os.path.exists(self.seen_path):
+                with open(self.seen_path, 'r', encoding='utf-8') as f:
+                    for linea in f:
+                        lineas += 1
+                        partes = linea.strip().split(' ', 1)
+                        if len(partes) == 2 and partes[0] in subs:
+                            vistos.setdefault(partes[0], set()).add(partes[1])
+            self._vistos = vistos
+            if lineas != sum(len(ids) for ids in vistos.values()):
+                self._compactar_vistos()
+        return self._vistos
+
+    def _compactar_vistos(self):
+        tmp_path = self.seen_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for sub_id, ids in self._vistos.items():
+                    f.write("".join(f"{sub_id} {vid_id}\n" for vid_id in ids))
+            os.replace(tmp_path, self.seen_path)
+        except OSError as e:
+            print(f"No se pudo guardar {self.seen_path}: {e}", file=sys.stderr)
+
+    # --- API pública ---
+    def __len__(self):
+        with self._lock:
+            return len(self._cargar())
+
+    def entries(self):
+        with self._lock:
+            return [dict(sub) for sub in self._cargar().values()]
+
+    def get(self, sub_id):
+        with self._lock:
+            sub = self._cargar().get(sub_id)
+            return dict(sub) if sub is not None else None
+
+    def buscar(self, clave):
+        """Suscripción con ese ID (o prefijo del ID) o esa URL, o None."""
+        with self._lock:
+            for sub in self._cargar().values():
+                if clave in (sub['id'], sub['url']) or (len(clave) >= 6 and sub['id'].startswith(clave)):
+                    return dict(sub)
+        return None
+
+    def add(self, url, carpeta, perfil, intervalo=None, solo_nuevos=False, completo=False):
+        """
+        Agrega una suscripción (o actualiza la que ya tenga esa URL) y la retorna.
+        Con `solo_nuevos`, el primer sondeo marca como vistos los videos que ya están
+        en el listado en lugar de encolarlos. Con `completo`, cada sondeo recorre el
+        listado entero (playlists que agregan los videos al final en lugar de arriba).
+        """
+        with self._lock:
+            subs = self._cargar()
+            anterior = next((s for s in subs.values() if s['url'] == url), None)
+            registro = dict(anterior) if anterior else {
+                'id': uuid.uuid4().hex,
+                'url': url,
+                'titulo': None,
+                'creado': time.time(),
+                'ultimo_sondeo': None,
+                'error': None,
+                'solo_nuevos': solo_nuevos,
+                # La primera sincronización no espera su lugar en la ventana
+                'proximo': time.time(),
+            }
+            registro.update(carpeta=carpeta, perfil=perfil, intervalo=intervalo, completo=completo)
+            subs[registro['id']] = registro
+            self._escribir(registro)
+            return dict(registro)
+
+    def update(self, sub_id, **campos):
+        """Cambia campos de una suscripción. Retorna False si ya no existe."""
+        with self._lock:
+            sub = self._cargar().get(sub_id)
+            if sub is None:
+                return False
+            sub.update(campos)
+            self._escribir(sub)
+            return True
+
+    def remove(self, sub_id):
+        """
+        Quita una suscripción. Sus IDs vistos ya no se usan (otra suscripción a la misma
+        URL tiene otro ID) y salen del archivo la próxima vez que se carga.
+        """
+        with self._lock:
+            if self._cargar().pop(sub_id, None) is None:
+                return False
+            self._escribir({'id': sub_id, 'borrado': True})
+            return True
+
+    def seen(self, sub_id):
+        """IDs ya vistos de la suscripción (una copia)."""
+        with self._lock:
+            return set(self._cargar_vistos().get(sub_id, ()))
+
+    def mark_seen(self, sub_id, vid_ids):
+        """Registra IDs vistos; se escriben de una vez al final del archivo."""
+        with self._lock:
+            vistos = self._cargar_vistos().setdefault(sub_id, set())
+            nuevos = [vid_id for vid_id in dict.fromkeys(vid_ids) if vid_id not in vistos]
+            if not nuevos:
+                return
+            directorio = os.path.dirname(self.seen_path)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            with open(self.seen_path, 'a', encoding='utf-8') as f:
+                f.write("".join(f"{sub_id} {vid_id}\n" for vid_id in nuevos))
+                f.flush()
+                os.fsync(f.fileno())
+            vistos.update(nuevos)
+
+
+class SubscriptionScheduler:
+    """
+    Hilo que sondea cada suscripción de `suscripciones` cuando le toca, de a una.
+
+    `sondear(sub)` hace el sondeo y lanza una excepción si falla. Cada suscripción se
+    vuelve a sondear `intervalo` segundos (el suyo o el de este planificador) después
+    del anterior; si falló, bastante antes (ver RETRY_BACKOFF). Las que están atrasadas al arrancar (la aplicación estuvo cerrada)
+    no salen todas juntas: cada una cae en su lugar de `ventana` (ver desfase).
+    """
+
+    def __init__(self, suscripciones, sondear, intervalo=DEFAULT_INTERVAL, ventana=None):
+        self.suscripciones = suscripciones
+        self.sondear = sondear
+        self.intervalo = intervalo
+        self.ventana = intervalo if ventana is None else ventana
+        self.stop_event = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo = None
+
+    def start(self):
+        """Arranca el hilo (no bloquea)."""
+        if self._hilo is not None:
+            return
+        self.stop_event.clear()
+        ahora = time.time()
+        for sub in self.suscripciones.entries():
+            if sub['ultimo_sondeo'] is not None and sub['proximo'] <= ahora:
+                self.suscripciones.update(sub['id'], proximo=ahora + desfase(sub['id'], self.ventana))
+        self._hilo = threading.Thread(target=self._loop, name="suscripciones", daemon=True)
+        self._hilo.start()
+
+    def stop(self, wait=False):
+        self.stop_event.set()
+        self._despertar.set()
+        if wait and self._hilo is not None:
+            self._hilo.join()
+        self._hilo = None
+
+    def despertar(self):
+        """Revisa la lista ya (una suscripción nueva se sondea sin esperar)."""
+        self._despertar.set()
+
+    def _intervalo_de(self, sub):
+        return sub.get('intervalo') or self.intervalo
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            self._despertar.clear()
+            ahora = time.time()
+            vencidas = sorted((s for s in self.suscripciones.entries() if s['proximo'] <= ahora),
+                              key=lambda s: s['proximo'])
+            for sub in vencidas:
+                if self.stop_event.is_set():
+                    return
+                self._sondear(sub)
+
+            proximos = [s['proximo'] for s in self.suscripciones.entries()]
+            espera = min(proximos) - time.time() if proximos else MAX_SLEEP
+            self._despertar.wait(min(max(espera, 1), MAX_SLEEP))
+
+    def _sondear(self, sub):
+        error = None
+        try:
+            self.sondear(sub)
+        except Exception as e:
+            error = str(e)[:500]
+            print(f"No se pudo sincronizar {sub['url']}: {error}", file=sys.stderr)
+
+        ahora = time.time()
+        intervalo = self._intervalo_de(sub)
+        if error is not None:
+            # Se reintenta pronto, esperando el doble con cada fallo seguido
+            fallos = sub.get('fallos', 0)
+            proximo = ahora + min(RETRY_BACKOFF * 2 ** fallos, intervalo)
+            self.suscripciones.update(sub['id'], proximo=proximo, ultimo_sondeo=ahora, error=error, fallos=fallos + 1)
+            return
+
+        # El próximo sondeo conserva el lugar en la ventana: se salta los intervalos
+        # que pasaron mientras tanto en lugar de correrse a "ahora"
+        proximo = sub['proximo'] + intervalo
+        if proximo <= ahora:
+            proximo += ((ahora - proximo) // intervalo + 1) * intervalo
+        self.suscripciones.update(sub['id'], proximo=proximo, ultimo_sondeo=ahora, error=None, fallos=0)
+
+
+if __name__ == "__main__":
+    # python subscriptions.py [ARCHIVO]   (lista las suscripciones, una por línea)
+    path = sys.argv[1] if len(sys.argv) > 1 else SUBSCRIPTIONS_FILE
+    for sub in SubscriptionList(path).entries():
+        print(json.dumps(sub, ensure_ascii=False))
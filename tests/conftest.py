@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# Las pruebas importan los módulos de la raíz del repositorio, igual que main.py y cli.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def carpeta_temporal(tmp_path, monkeypatch):
+    """
+    Cada prueba corre en su propia carpeta: la cola, la lista de fallidos, config.ini y
+    los demás archivos del motor se guardan en el directorio actual.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+import pytest
+from bandwidth import BandwidthManager, parse_rate, format_rate, ACTIVE_WINDOW
+
+
+def _activar(manager, *job_ids):
+    # Leer 0 bytes marca al trabajo como activo sin gastar saldo
+    for job_id in job_ids:
+        manager.consume(job_id, 0)
+
+
+def test_parse_rate():
+    assert parse_rate(None) == 0 and parse_rate("") == 0 and parse_rate("0") == 0
+    assert parse_rate("500K") == 500 * 1024
+    assert parse_rate("2M") == 2 * 1024 * 1024
+    assert parse_rate("1048576") == 1048576
+    with pytest.raises(ValueError):
+        parse_rate("rápido")
+    assert format_rate(0) == "sin límite" and format_rate(2 * 1024 * 1024) == "2.0 MiB/s"
+
+
+def test_reparto_por_peso():
+    manager = BandwidthManager(global_rate=1000)
+    _activar(manager, "a", "b")
+    manager.configure_job("b", weight=3)
+
+    assert (manager.job_rate("a"), manager.job_rate("b")) == (250, 750)
+
+
+def test_el_limite_propio_cede_el_sobrante():
+    manager = BandwidthManager(global_rate=1000)
+    _activar(manager, "a", "b", "c")
+    manager.configure_job("b", weight=3)
+    manager.configure_job("c", rate=100)
+
+    # c no usa más de 100; los 900 restantes se reparten 1:3 entre a y b
+    assert manager.job_rate("c") == 100
+    assert (manager.job_rate("a"), manager.job_rate("b")) == (225, 675)
+
+    # Un límite propio mayor que su parte no cambia nada
+    manager.configure_job("c", rate=10_000)
+    assert [manager.job_rate(j) for j in "abc"] == [200, 600, 200]
+
+
+def test_los_inactivos_no_se_llevan_parte():
+    manager = BandwidthManager(global_rate=1000)
+    _activar(manager, "a", "b")
+    assert manager.job_rate("a") == 500
+
+    # b dejó de leer hace más de la ventana: a se queda con todo
+    manager._trabajos["b"].ultima_lectura -= 2 * ACTIVE_WINDOW
+    manager.set_global_rate(1000)
+    assert (manager.job_rate("a"), manager.job_rate("b")) == (1000, 0)
+
+    manager.remove_job("a")
+    _activar(manager, "b")
+    assert manager.job_rate("b") == 1000
+
+
+def test_sin_limite_global_cada_uno_usa_el_suyo():
+    manager = BandwidthManager(default_job_rate=300)
+    _activar(manager, "a", "b")
+    manager.configure_job("b", rate=0)
+    assert (manager.job_rate("a"), manager.job_rate("b")) == (300, 0)
+
+    # Cambiar el límite por defecto solo afecta a los que lo usaban
+    manager.set_default_job_rate(500)
+    assert (manager.job_rate("a"), manager.job_rate("b")) == (500, 0)
+
+
+def test_consume_respeta_la_tasa():
+    manager = BandwidthManager(global_rate=100_000)
+    inicio = time.monotonic()
+    # Media segundo de ráfaga y el resto al ritmo de la tasa
+    for _ in range(10):
+        manager.consume("a", 10_000)
+    assert time.monotonic() - inicio >= 0.4
+
+
+def test_consume_se_corta_al_cancelar():
+    manager = BandwidthManager(global_rate=1000)
+    cancelar = threading.Event()
+    cancelar.set()
+    inicio = time.monotonic()
+    manager.consume("a", 1_000_000, cancelar)
+    assert time.monotonic() - inicio < 1
+
+
+def test_limite_global_en_una_descarga_del_origen_falso(carpeta_temporal):
+    from benchmark import FakeOrigin, BenchmarkEngine, BenchmarkStats
+    tamano = 256 * 1024
+    origen = FakeOrigin(2, tamano).start()
+    engine = BenchmarkEngine(BenchmarkStats())
+    destino = str(carpeta_temporal / "descargas")
+    try:
+        engine.ajustar_limites_velocidad(global_rate=512 * 1024, guardar=False)
+        inicio = time.monotonic()
+        fallidos = engine.descargar(f"{origen.base_url}/playlist", destino, threading.Event())
+        duracion = time.monotonic() - inicio
+    finally:
+        origen.stop()
+        engine.cerrar()
+
+    assert not fallidos
+    assert sorted(os.listdir(os.path.join(destino, "Benchmark"))) == ["Video_1.mp4", "Video_2.mp4"]
+    # 512 KiB a 512 KiB/s, menos la ráfaga inicial de cada trabajo
+    assert duracion >= 0.4
@@ -0,0 +1,37 @@
+import cli
+from download_queue import DownloadQueue, FALLIDO
+
+
+class _Motor:
+    """Lo que _esperar_cola usa del motor: la cola y cómo arrancarla y detenerla."""
+
+    def __init__(self, cola):
+        self.download_queue = cola
+
+    def iniciar_cola(self):
+        self.download_queue.start()
+
+    def detener_cola(self, wait=False):
+        self.download_queue.stop(wait)
+
+
+def _runner(job, stop_event):
+    if "roto" in job['url']:
+        raise RuntimeError("HTTP Error 404: Not Found")
+
+
+def test_esperar_cola_ignora_los_fallidos_de_sesiones_anteriores(carpeta_temporal, monkeypatch):
+    monkeypatch.setattr(cli, "QUEUE_POLL_SECONDS", 0.01)
+    path = str(carpeta_temporal / "cola.jsonl")
+    cola = DownloadQueue(_runner, path)
+    [viejo] = cola.add_urls(["http://origen/roto"], "/descargas")
+    assert cli._esperar_cola(_Motor(cola)) == 1
+    assert cola.jobs[viejo]['estado'] == FALLIDO
+
+    # Otra invocación: el fallido sigue en el journal pero no es de esta tanda
+    cola = DownloadQueue(_runner, path)
+    cola.add_urls(["http://origen/1"], "/descargas")
+    assert cli._esperar_cola(_Motor(cola)) == 0
+
+    cola.add_urls(["http://origen/roto/2"], "/descargas")
+    assert cli._esperar_cola(_Motor(cola)) == 1
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import pytest
+from download_queue import PENDIENTE, COMPLETADO
+from dead_letter import DeadLetterList
+
+
+def _escribir(path, registros, cola=""):
+    """Journal con `registros` y, al final, `cola` (una línea cortada a la mitad)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(registro) + "\n" for registro in registros)
+        f.write(cola)
+
+
+def _lineas(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+
+def test_lista_de_fallidos_con_linea_truncada(carpeta_temporal):
+    path = str(carpeta_temporal / "fallidos.jsonl")
+    _escribir(path, [
+        {'url': "http://origen/1", 'carpeta': "/d", 'error': "x", 'tipo': "permanent", 'intentos': 1},
+        {'url': "http://origen/2", 'carpeta': "/d", 'error': "y", 'tipo': "transient", 'intentos': 1},
+    ], cola='{"url": "http://origen/3", "carp')
+
+    fallidos = DeadLetterList(path)
+    assert [e['url'] for e in fallidos.entries()] == ["http://origen/1", "http://origen/2"]
+
+    fallidos.add("http://origen/2", "/d", "z", "transient")
+    assert fallidos.remove(["http://origen/1"]) == 1
+    # remove compacta: queda una línea por URL, sin la truncada
+    registros = _lineas(path)
+    assert [(r['url'], r['intentos']) for r in registros] == [("http://origen/2", 2)]
+
+
+@pytest.fixture
+def origen_con_un_video_roto():
+    from benchmark import FakeOrigin
+
+    class Origen(FakeOrigin):
+        def _atender(self, handler):
+            if handler.path.startswith('/media/2.mp4'):
+                return handler.send_error(404)
+            return super()._atender(handler)
+
+    origen = Origen(3, 64 * 1024).start()
+    yield origen
+    origen.stop()
+
+
+def test_playlist_de_la_cola_con_una_entrada_fallida(carpeta_temporal, origen_con_un_video_roto):
+    # El motor del benchmark: mismo camino de la cola, con el extractor y el origen locales
+    from benchmark import BenchmarkEngine, BenchmarkStats
+    engine = BenchmarkEngine(BenchmarkStats())
+    destino = str(carpeta_temporal / "descargas")
+    playlist = f"{origen_con_un_video_roto.base_url}/playlist"
+    roto = f"{origen_con_un_video_roto.base_url}/watch/2"
+    [job_id] = engine.download_queue.add_urls([playlist], destino)
+    try:
+        engine.iniciar_cola()
+        limite = time.monotonic() + 60
+        while engine.download_queue.resumen()[COMPLETADO] < 1 and time.monotonic() < limite:
+            time.sleep(0.05)
+        engine.detener_cola(wait=True)
+
+        # La entrada rota queda en la lista de fallidos; el trabajo de la playlist se
+        # completa con la cuenta de las que fallaron
+        job = engine.download_queue.jobs[job_id]
+        assert job['estado'] == COMPLETADO and job['entradas_fallidas'] == 1
+        assert [e['url'] for e in engine.dead_letter.entries()] == [roto]
+        assert sorted(os.listdir(os.path.join(destino, "Benchmark"))) == ["Video_1.mp4", "Video_3.mp4"]
+
+        # Reintentar encola solo la entrada, no la playlist entera otra vez
+        assert engine.reintentar_fallidos() == 1
+        assert [j['url'] for j in engine.download_queue.jobs.values() if j['estado'] == PENDIENTE] == [roto]
+    finally:
+        engine.cerrar(wait=True)
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import threading
+from download_queue import DownloadQueue, PENDIENTE, EN_CURSO, COMPLETADO, FALLIDO
+from retry_policy import RetryPolicy
+
+
+def _escribir(path, registros, cola=""):
+    """Journal con `registros` y, al final, `cola` (una línea cortada a la mitad)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(registro) + "\n" for registro in registros)
+        f.write(cola)
+
+
+def _lineas(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+
+
+def _job(job_id, estado, hace=0, **campos):
+    momento = time.time() - hace
+    return dict({'id': job_id, 'url': f"http://origen/{job_id}", 'carpeta': "/descargas", 'estado': estado,
+                 'intentos': 0, 'error': None, 'creado': momento, 'actualizado': momento}, **campos)
+
+
+def test_cola_descarta_la_ultima_linea_truncada_y_compacta(carpeta_temporal):
+    path = str(carpeta_temporal / "cola.jsonl")
+    _escribir(path, [
+        _job('a', PENDIENTE),
+        _job('b', PENDIENTE),
+        _job('b', EN_CURSO, intentos=1),
+        _job('c', FALLIDO, error="HTTP Error 404"),
+    ], cola='{"id": "a", "estado": "do')
+
+    cola = DownloadQueue(lambda job, stop_event: None, path)
+
+    assert {job_id: job['estado'] for job_id, job in cola.jobs.items()} == {'a': PENDIENTE, 'b': PENDIENTE, 'c': FALLIDO}
+    # El que quedó 'running' por un corte se retoma
+    assert list(cola._pendientes) == ['a', 'b']
+    assert cola.jobs['b']['intentos'] == 1
+    # Una línea por trabajo y todas JSON válido
+    assert sorted(registro['id'] for registro in _lineas(path)) == ['a', 'b', 'c']
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_cola_descarta_los_completados_viejos(carpeta_temporal):
+    path = str(carpeta_temporal / "cola.jsonl")
+    semana = 7 * 24 * 3600
+    _escribir(path, [
+        _job('viejo', COMPLETADO, hace=2 * semana),
+        _job('nuevo', COMPLETADO, hace=60),
+        _job('fallido_viejo', FALLIDO, hace=2 * semana),
+        _job('pendiente_viejo', PENDIENTE, hace=2 * semana),
+    ])
+
+    cola = DownloadQueue(lambda job, stop_event: None, path, done_retention=semana)
+    assert sorted(cola.jobs) == ['fallido_viejo', 'nuevo', 'pendiente_viejo']
+    assert sorted(registro['id'] for registro in _lineas(path)) == ['fallido_viejo', 'nuevo', 'pendiente_viejo']
+
+    # 0 conserva todos
+    _escribir(path, [_job('viejo', COMPLETADO, hace=2 * semana)])
+    assert list(DownloadQueue(lambda job, stop_event: None, path, done_retention=0).jobs) == ['viejo']
+
+
+def test_cola_retoma_lo_pendiente_al_reabrir(carpeta_temporal):
+    path = str(carpeta_temporal / "cola.jsonl")
+    hechos = []
+    cola = DownloadQueue(lambda job, stop_event: hechos.append(job['url']), path)
+    ids = cola.add_urls(["http://origen/1", "http://origen/2"], "/descargas")
+    # Un corte a mitad de la escritura de la última línea
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"id": "%s", "estado": "done"' % ids[1])
+
+    cola = DownloadQueue(lambda job, stop_event: hechos.append(job['url']), path)
+    cola.start()
+    limite = time.monotonic() + 10
+    while cola.resumen()[COMPLETADO] < 2 and time.monotonic() < limite:
+        time.sleep(0.01)
+    cola.stop(wait=True)
+    assert sorted(hechos) == ["http://origen/1", "http://origen/2"]
+    assert {registro['estado'] for registro in DownloadQueue(None, path).jobs.values()} == {COMPLETADO}
+
+
+def _esperar(condicion, segundos=10):
+    limite = time.monotonic() + segundos
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_start_retoma_el_trabajo_interrumpido_por_stop(carpeta_temporal):
+    path = str(carpeta_temporal / "cola.jsonl")
+    empezado = threading.Event()
+    corridas = []
+
+    def runner(job, stop_event):
+        corridas.append(job['id'])
+        if len(corridas) == 1:
+            empezado.set()
+            stop_event.wait()
+            raise RuntimeError("cancelado")
+
+    cola = DownloadQueue(runner, path, max_concurrent=1)
+    [job_id] = cola.add_urls(["http://origen/1"], "/descargas")
+    cola.start()
+    assert empezado.wait(10)
+    cola.stop(wait=True)
+    assert cola.jobs[job_id]['estado'] == EN_CURSO
+
+    cola.start()
+    assert _esperar(lambda: cola.jobs[job_id]['estado'] == COMPLETADO)
+    cola.stop(wait=True)
+    assert corridas == [job_id, job_id]
+
+
+def test_start_retoma_el_reintento_que_vencio_con_la_cola_detenida(carpeta_temporal):
+    path = str(carpeta_temporal / "cola.jsonl")
+    corridas = []
+
+    def runner(job, stop_event):
+        corridas.append(job['id'])
+        if len(corridas) == 1:
+            raise RuntimeError("HTTP Error 503: Service Unavailable")
+
+    cola = DownloadQueue(runner, path, max_concurrent=1, retry_policy=RetryPolicy(retries=2, backoff_base=0.2, backoff_max=0.2))
+    [job_id] = cola.add_urls(["http://origen/1"], "/descargas")
+    cola.start()
+    assert _esperar(lambda: len(corridas) == 1 and cola.jobs[job_id]['estado'] == PENDIENTE)
+    cola.stop(wait=True)
+    # El timer del reintento vence con la cola detenida y no lo vuelve a encolar
+    time.sleep(0.4)
+    assert job_id not in cola._pendientes
+
+    cola.start()
+    assert _esperar(lambda: cola.jobs[job_id]['estado'] == COMPLETADO)
+    cola.stop(wait=True)
+    assert corridas == [job_id, job_id]
@@ -0,0 +1,162 @@
+import io
+import os
+import re
+import hashlib
+import tarfile
+import zipfile
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from ffmpeg_manager import FFmpegManager
+
+LINUX = "ffmpeg-master-latest-linux64-gpl.tar.xz"
+WINDOWS = "ffmpeg-master-latest-win64-gpl.zip"
+
+
+class ServidorDeBuilds:
+    """Stand-in local del release de FFmpeg: sirve `archivos` y acepta Range."""
+
+    def __init__(self, archivos):
+        self.archivos = archivos
+        self.rangos = []
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                servidor._atender(self)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _atender(self, handler):
+        datos = self.archivos.get(handler.path.lstrip('/'))
+        if datos is None:
+            return handler.send_error(404)
+        rango = re.fullmatch(r'bytes=(\d+)-', handler.headers.get('Range') or '')
+        self.rangos.append(handler.headers.get('Range'))
+        inicio = int(rango.group(1)) if rango else 0
+        if inicio >= len(datos):
+            handler.send_response(416)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        handler.send_response(206 if rango else 200)
+        handler.send_header('Content-Length', str(len(datos) - inicio))
+        if rango:
+            handler.send_header('Content-Range', f'bytes {inicio}-{len(datos) - 1}/{len(datos)}')
+        handler.end_headers()
+        handler.wfile.write(datos[inicio:])
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _tar_xz(ejecutables):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:xz') as tf:
+        for nombre, contenido in ejecutables.items():
+            info = tarfile.TarInfo(f"ffmpeg-master-latest-linux64-gpl/bin/{nombre}")
+            info.size = len(contenido)
+            tf.addfile(info, io.BytesIO(contenido))
+    return buffer.getvalue()
+
+
+def _zip(ejecutables):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for nombre, contenido in ejecutables.items():
+            zf.writestr(f"ffmpeg-master-latest-win64-gpl/bin/{nombre}", contenido)
+    return buffer.getvalue()
+
+
+def _checksums(**builds):
+    return "".join(f"{hashlib.sha256(datos).hexdigest()}  {nombre}\n" for nombre, datos in builds.items()).encode()
+
+
+@pytest.fixture
+def builds():
+    # Ejecutables con datos al azar, para que el archivo no se comprima a casi nada
+    ejecutables = {'ffmpeg': os.urandom(256 * 1024), 'ffprobe': os.urandom(128 * 1024)}
+    linux = _tar_xz(ejecutables)
+    windows = _zip({f"{nombre}.exe": datos for nombre, datos in ejecutables.items()})
+    servidor = ServidorDeBuilds({
+        LINUX: linux,
+        WINDOWS: windows,
+        FFmpegManager.CHECKSUMS_FILE: _checksums(**{LINUX: linux, WINDOWS: windows}),
+    })
+    yield servidor, ejecutables
+    servidor.stop()
+
+
+def _manager(servidor, carpeta, system='Linux', machine='x86_64'):
+    return FFmpegManager(bin_dir=str(carpeta / "bin"), base_url=servidor.base_url, system=system, machine=machine)
+
+
+def _leer(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_build_segun_la_plataforma(carpeta_temporal):
+    assert FFmpegManager(system='Linux', machine='aarch64').get_build_name() == "ffmpeg-master-latest-linuxarm64-gpl.tar.xz"
+    assert FFmpegManager(system='Windows', machine='AMD64').get_build_name() == WINDOWS
+    assert FFmpegManager(system='Darwin', machine='arm64').get_build_name() is None
+
+    ok, mensaje = FFmpegManager(bin_dir=str(carpeta_temporal / "bin"), system='Darwin', machine='arm64').install_ffmpeg()
+    assert not ok and "darwin/arm64" in mensaje
+
+
+def test_instala_la_build_de_linux(builds, carpeta_temporal):
+    servidor, ejecutables = builds
+    manager = _manager(servidor, carpeta_temporal)
+    avisos = []
+
+    ok, mensaje = manager.install_ffmpeg(avisos.append)
+    assert ok, mensaje
+    assert _leer(manager.ffmpeg_exe) == ejecutables['ffmpeg']
+    assert _leer(manager.ffprobe_exe) == ejecutables['ffprobe']
+    assert os.access(manager.ffmpeg_exe, os.X_OK)
+    # El archivo descargado se borra después de extraer
+    assert sorted(os.listdir(manager.bin_dir)) == ["ffmpeg", "ffprobe"]
+    assert any(aviso.startswith("Descargando FFmpeg:") and "(100%)" in aviso for aviso in avisos)
+
+
+def test_instala_la_build_de_windows(builds, carpeta_temporal):
+    servidor, ejecutables = builds
+    manager = _manager(servidor, carpeta_temporal, system='Windows', machine='AMD64')
+
+    ok, mensaje = manager.install_ffmpeg()
+    assert ok, mensaje
+    assert manager.ffmpeg_exe.endswith("ffmpeg.exe")
+    assert _leer(manager.ffprobe_exe) == ejecutables['ffprobe']
+
+
+def test_retoma_la_descarga_interrumpida(builds, carpeta_temporal):
+    servidor, _ = builds
+    manager = _manager(servidor, carpeta_temporal)
+    os.makedirs(manager.bin_dir)
+    mitad = len(servidor.archivos[LINUX]) // 2
+    with open(os.path.join(manager.bin_dir, LINUX + ".part"), 'wb') as f:
+        f.write(servidor.archivos[LINUX][:mitad])
+
+    ok, mensaje = manager.install_ffmpeg()
+    assert ok, mensaje
+    # Solo se pidió lo que faltaba del archivo
+    assert servidor.rangos[-1] == f"bytes={mitad}-"
+    assert not os.path.exists(os.path.join(manager.bin_dir, LINUX + ".part"))
+
+
+def test_checksum_incorrecto_descarta_el_parcial(builds, carpeta_temporal):
+    servidor, _ = builds
+    servidor.archivos[FFmpegManager.CHECKSUMS_FILE] = _checksums(**{LINUX: b"otra cosa"})
+    manager = _manager(servidor, carpeta_temporal)
+
+    ok, mensaje = manager.install_ffmpeg()
+    assert not ok and "checksum" in mensaje
+    assert not os.path.exists(manager.ffmpeg_exe)
+    assert not os.path.exists(os.path.join(manager.bin_dir, LINUX + ".part"))
@@ -0,0 +1,102 @@
+from format_planner import FormatPlanner, elegir, candidatos, estimar_tamano, familia_codec, format_spec
+
+MB = 1000 * 1000
+
+
+def _formato(format_id, ext, vcodec, acodec, altura=None, tamano=None, tbr=None, abr=None, **campos):
+    return dict({'format_id': format_id, 'ext': ext, 'vcodec': vcodec, 'acodec': acodec, 'height': altura,
+                 'fps': 30 if altura else None, 'filesize': tamano, 'tbr': tbr, 'abr': abr, 'protocol': 'https'},
+                **campos)
+
+
+def _video(video_id="v1", canal="canal1", alturas=(360, 720, 1080)):
+    formatos = [
+        _formato('sb0', 'mhtml', 'none', 'none', protocol='mhtml'),
+        _formato('18', 'mp4', 'avc1.42001E', 'mp4a.40.2', 360, 10 * MB, 600),
+        _formato('140', 'm4a', 'none', 'mp4a.40.2', tamano=3 * MB, tbr=128, abr=128),
+        _formato('251', 'webm', 'none', 'opus', tamano=3.5 * MB, tbr=160, abr=160),
+    ]
+    if 720 in alturas:
+        formatos.append(_formato('136', 'mp4', 'avc1.4d401f', 'none', 720, 20 * MB, 1500))
+    if 1080 in alturas:
+        formatos += [
+            _formato('137', 'mp4', 'avc1.640028', 'none', 1080, 50 * MB, 4000),
+            _formato('248', 'webm', 'vp9', 'none', 1080, 40 * MB, 3000),
+            _formato('399', 'mp4', 'av01.0.08M.08', 'none', 1080, 30 * MB, 2500),
+            _formato('drm', 'mp4', 'avc1.640028', 'none', 1080, 60 * MB, 6000, has_drm=True),
+        ]
+    return {'id': video_id, 'extractor_key': 'Benchmark', 'channel_id': canal, 'duration': 300, 'formats': formatos}
+
+
+def test_familia_codec_y_tamano_estimado():
+    assert familia_codec('avc1.64001F') == 'avc1'
+    assert familia_codec('vp09.00.40.08') == 'vp9'
+    assert familia_codec('av01.0.08M.08') == 'av1'
+    assert familia_codec('hvc1.1.6.L93') == 'hevc'
+    assert familia_codec('none') is None and familia_codec(None) is None
+
+    assert estimar_tamano({'filesize': 5}, 100) == 5
+    assert estimar_tamano({'filesize_approx': 7}, 100) == 7
+    assert estimar_tamano({'tbr': 800}, 100) == 10 * MB
+    assert estimar_tamano({'vbr': 700, 'abr': 100}, 100) == 10 * MB
+    assert estimar_tamano({}, 100) is None
+
+
+def test_candidatos_excluye_storyboards_y_drm():
+    specs = {c['spec'] for c in candidatos(_video())}
+    assert not any('sb0' in spec or 'drm' in spec for spec in specs)
+    assert {'18', '140', '251', '137+140', '399+251'} <= specs
+
+    union = next(c for c in candidatos(_video(), 'archive') if c['spec'] == '399+251')
+    assert union['merge'] and union['contenedor'] == 'webm' and union['tamano'] == 33.5 * MB
+
+
+def test_puntaje_de_cada_perfil():
+    info = _video()
+    assert elegir(info, 'compatible')['spec'] == '137+140'
+    assert elegir(info, 'archive')['spec'] == '399+251'
+    assert elegir(info, 'smallest')['spec'] == '18'
+    # Lo más liviano desde 720p
+    assert elegir(info, 'fastest')['spec'] == '136+140'
+    assert elegir(info, 'audio')['spec'] == '251'
+
+    # Si el video no llega a 720p, 'fastest' se conforma con lo más alto que haya
+    assert elegir(_video(alturas=(360,)), 'fastest')['spec'] == '18'
+
+
+def test_compatible_siempre_en_mp4():
+    info = _video()
+    # Sin el video avc1 de 1080p, lo mejor que se abre en cualquier lado es 720p
+    info['formats'] = [f for f in info['formats'] if f['format_id'] != '137']
+    elegido = elegir(info, 'compatible')
+    assert elegido['spec'] == '136+140' and elegido['contenedor'] == 'mp4'
+
+
+def test_sin_formatos_para_elegir():
+    assert elegir({'formats': []}) is None
+    assert elegir({'formats': [_formato('18', 'mp4', 'avc1', 'mp4a', 360)]}) is None
+
+
+def test_format_spec_deja_una_alternativa():
+    plan = {'spec': '137+140'}
+    assert format_spec(plan) == '137+140/bestvideo*+bestaudio/best'
+    assert format_spec({'spec': '251'}, 'audio') == '251/bestaudio/best'
+
+
+def test_decision_del_canal(carpeta_temporal):
+    path = str(carpeta_temporal / "planes.json")
+    planner = FormatPlanner(path)
+    # El primer video del canal solo llega a 720p: esa decisión se guarda
+    primero = planner.plan(_video("v1", alturas=(360, 720)), 'compatible')
+    assert primero['spec'] == '136+140' and not primero['canal']
+
+    # Los siguientes del canal se eligen igual aunque tengan 1080p
+    segundo = FormatPlanner(path).plan(_video("v2"), 'compatible')
+    assert segundo['spec'] == '136+140' and segundo['canal']
+    # Otro canal o perfil no comparte la decisión
+    assert FormatPlanner(path).plan(_video("v3", canal="canal2"), 'compatible')['spec'] == '137+140'
+    assert FormatPlanner(path).plan(_video("v4"), 'archive')['spec'] == '399+251'
+
+    # Vencida, se vuelve a elegir
+    vencida = FormatPlanner(path, ttl=-1).plan(_video("v5"), 'compatible')
+    assert vencida['spec'] == '137+140' and not vencida['canal']
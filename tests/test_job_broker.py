@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+import pytest
+from download_queue import PENDIENTE, EN_CURSO, COMPLETADO, FALLIDO
+from job_broker import SQLiteBroker, RedisBroker, nueva_tarea, LEASE_VENCIDO
+
+
+def _redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisBroker(fakeredis.FakeRedis(decode_responses=True), max_attempts=2)
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def broker(request, carpeta_temporal):
+    if request.param == 'sqlite':
+        broker = SQLiteBroker(str(carpeta_temporal / "broker.sqlite3"), max_attempts=2)
+    else:
+        broker = _redis()
+    yield broker
+    broker.close()
+
+
+def _publicar(broker, cantidad, lote="lote"):
+    tareas = [nueva_tarea(lote, f"http://origen/watch/{i}", "/descargas", "Playlist", f"Video {i}", f"x v{i}", i)
+              for i in range(1, cantidad + 1)]
+    broker.publicar(tareas)
+    return tareas
+
+
+def test_tomar_entrega_en_orden_y_una_sola_vez(broker):
+    tareas = _publicar(broker, 2)
+
+    primera = broker.tomar("w1", lease=60)
+    segunda = broker.tomar("w2", lease=60)
+
+    assert [primera['id'], segunda['id']] == [t['id'] for t in tareas]
+    assert primera['estado'] == EN_CURSO and primera['worker'] == "w1" and primera['intentos'] == 1
+    assert primera['url'] == "http://origen/watch/1" and primera['subcarpeta'] == "Playlist"
+    assert broker.tomar("w3", lease=60) is None
+    assert broker.resumen("lote")[EN_CURSO] == 2
+
+
+def test_renovar_y_completar(broker):
+    _publicar(broker, 1)
+    tarea = broker.tomar("w1", lease=60)
+
+    assert broker.renovar(tarea, lease=60, progreso=0.5, mensaje="Descargando")
+    en_curso = broker.tareas("lote")[0]
+    assert en_curso['progreso'] == 0.5 and en_curso['mensaje'] == "Descargando"
+
+    assert broker.completar(tarea)
+    assert broker.resumen("lote")[COMPLETADO] == 1
+    # Ya cerrada: ni se renueva ni se vuelve a completar
+    assert not broker.renovar(tarea, lease=60)
+    assert not broker.completar(tarea)
+
+
+def test_completar_con_error_reintenta_hasta_agotar_intentos(broker):
+    _publicar(broker, 1)
+
+    tarea = broker.tomar("w1", lease=60)
+    assert broker.completar(tarea, "HTTP Error 503", reintentar=True)
+    assert broker.tareas("lote")[0]['estado'] == PENDIENTE
+
+    tarea = broker.tomar("w1", lease=60)
+    assert tarea['intentos'] == 2
+    assert broker.completar(tarea, "HTTP Error 503", reintentar=True)
+    fallida = broker.tareas("lote")[0]
+    assert fallida['estado'] == FALLIDO and fallida['error'] == "HTTP Error 503"
+
+    assert broker.reintentar_fallidos("lote") == 1
+    assert broker.tomar("w1", lease=60)['intentos'] == 1
+
+
+def test_liberar_no_gasta_un_intento(broker):
+    _publicar(broker, 1)
+    tarea = broker.tomar("w1", lease=60)
+
+    assert broker.liberar(tarea)
+    assert broker.tareas("lote")[0]['estado'] == PENDIENTE
+    assert not broker.completar(tarea)
+    assert broker.tomar("w2", lease=60)['intentos'] == 1
+
+
+def test_lease_vencido_pasa_a_otro_worker(broker):
+    _publicar(broker, 1)
+    tarea = broker.tomar("w1", lease=0.05)
+    time.sleep(0.1)
+
+    otra = broker.tomar("w2", lease=60)
+    assert otra['id'] == tarea['id'] and otra['worker'] == "w2" and otra['intentos'] == 2
+    # El primer worker ya no puede renovar ni informar el resultado
+    assert not broker.renovar(tarea, lease=60)
+    assert not broker.completar(tarea)
+    assert broker.completar(otra)
+    assert broker.resumen("lote")[COMPLETADO] == 1
+
+
+def test_lease_vencido_sin_intentos_queda_fallida(broker):
+    _publicar(broker, 1)
+    broker.tomar("w1", lease=0.05)
+    time.sleep(0.1)
+    broker.tomar("w2", lease=0.05)
+    time.sleep(0.1)
+
+    assert broker.tomar("w3", lease=60) is None
+    fallida = broker.tareas("lote")[0]
+    assert fallida['estado'] == FALLIDO and fallida['error'] == LEASE_VENCIDO
+
+
+def test_workers_concurrentes_no_comparten_tareas(carpeta_temporal):
+    path = str(carpeta_temporal / "broker.sqlite3")
+    tareas = _publicar(SQLiteBroker(path), 40)
+    tomadas = []
+    lock = threading.Lock()
+
+    def worker(nombre):
+        broker = SQLiteBroker(path)
+        while True:
+            tarea = broker.tomar(nombre, lease=60)
+            if tarea is None:
+                break
+            with lock:
+                tomadas.append(tarea['id'])
+            broker.completar(tarea)
+        broker.close()
+
+    hilos = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert sorted(tomadas) == sorted(t['id'] for t in tareas)
+
+
+def test_worker_descarga_una_playlist_del_origen_falso(carpeta_temporal):
+    # Coordinador y worker con el extractor y el servidor locales del benchmark
+    from benchmark import FakeOrigin, BenchmarkEngine, BenchmarkStats
+    origen = FakeOrigin(3, 64 * 1024).start()
+    engine = BenchmarkEngine(BenchmarkStats())
+    broker = SQLiteBroker(str(carpeta_temporal / "broker.sqlite3"))
+    destino = str(carpeta_temporal / "descargas")
+    try:
+        lote, publicadas = engine.publicar_en_broker(broker, f"{origen.base_url}/playlist", destino)
+        assert publicadas == 3
+
+        worker = engine.crear_worker(broker, worker_id="w1", slots=2)
+        worker.start()
+        limite = time.monotonic() + 60
+        while broker.resumen(lote)[COMPLETADO] < 3 and time.monotonic() < limite:
+            time.sleep(0.1)
+        worker.stop(wait=True)
+        assert broker.resumen(lote)[COMPLETADO] == 3
+    finally:
+        broker.close()
+        origen.stop()
+        engine.cerrar()
+
+    assert sorted(os.listdir(os.path.join(destino, "Benchmark"))) == ["Video_1.mp4", "Video_2.mp4", "Video_3.mp4"]
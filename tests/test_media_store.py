@@ -0,0 +1,122 @@
+import os
+import threading
+from media_store import MediaStore, crear_enlace, clave_de, MEDIA_STORE_INDEX, HARDLINK, SYMLINK, COPY
+
+
+def _crear(path, contenido=b"video" * 1000):
+    with open(path, 'wb') as f:
+        f.write(contenido)
+    return str(path)
+
+
+def _mismo_archivo(a, b):
+    return os.path.samefile(a, b) and not os.path.islink(a) and not os.path.islink(b)
+
+
+def test_guardar_deja_un_enlace_en_su_lugar(carpeta_temporal):
+    almacen = MediaStore(str(carpeta_temporal / "almacen"))
+    descargado = _crear(carpeta_temporal / "Video_1.mp4")
+
+    blob = almacen.guardar("benchmark v1", "compatible", descargado, format_id="18")
+    assert blob.startswith(almacen.raiz) and blob.endswith(".mp4")
+    assert _mismo_archivo(blob, descargado)
+    assert almacen.ruta_de("benchmark v1", "compatible") == blob
+    assert almacen.ruta_de("benchmark v1", "archive") is None
+    assert almacen.resumen() == {'files': 1, 'bytes': 5000}
+
+
+def test_enlazar_en_otra_carpeta(carpeta_temporal):
+    almacen = MediaStore(str(carpeta_temporal / "almacen"))
+    blob = almacen.guardar("benchmark v1", "compatible", _crear(carpeta_temporal / "Video_1.mp4"))
+
+    destino = almacen.enlazar("benchmark v1", "compatible", str(carpeta_temporal / "Otra playlist"))
+    assert destino == str(carpeta_temporal / "Otra playlist" / "Video_1.mp4")
+    assert _mismo_archivo(destino, blob)
+    # Repetido: se deja el que ya estaba
+    assert almacen.enlazar("benchmark v1", "compatible", str(carpeta_temporal / "Otra playlist")) == destino
+    assert almacen.enlazar("benchmark v2", "compatible", str(carpeta_temporal / "Otra playlist")) is None
+
+
+def test_guardar_la_misma_clave_dos_veces(carpeta_temporal):
+    # Dos playlists bajaron el mismo video a la vez: la segunda copia pasa a ser un enlace
+    almacen = MediaStore(str(carpeta_temporal / "almacen"))
+    (carpeta_temporal / "a").mkdir()
+    (carpeta_temporal / "b").mkdir()
+    primero = _crear(carpeta_temporal / "a" / "Video_1.mp4")
+    segundo = _crear(carpeta_temporal / "b" / "Video_1.mp4")
+
+    blob = almacen.guardar("benchmark v1", "compatible", primero)
+    assert almacen.guardar("benchmark v1", "compatible", segundo) == blob
+    assert _mismo_archivo(segundo, blob) and _mismo_archivo(primero, blob)
+    assert not os.path.exists(segundo + ".store.tmp")
+    assert almacen.resumen()['files'] == 1
+
+
+def test_archivo_borrado_a_mano_se_olvida(carpeta_temporal):
+    raiz = str(carpeta_temporal / "almacen")
+    almacen = MediaStore(raiz)
+    descargado = _crear(carpeta_temporal / "Video_1.mp4")
+    blob = almacen.guardar("benchmark v1", "compatible", descargado)
+    os.remove(blob)
+
+    assert almacen.ruta_de("benchmark v1", "compatible") is None
+    assert MediaStore(raiz).resumen()['files'] == 0
+
+
+def test_indice_con_linea_truncada(carpeta_temporal):
+    raiz = str(carpeta_temporal / "almacen")
+    almacen = MediaStore(raiz)
+    blob = almacen.guardar("benchmark v1", "compatible", _crear(carpeta_temporal / "Video_1.mp4"))
+    with open(os.path.join(raiz, MEDIA_STORE_INDEX), 'a', encoding='utf-8') as f:
+        f.write('{"clave": "%s", "blo' % clave_de("benchmark v2", "compatible"))
+
+    almacen = MediaStore(raiz)
+    assert almacen.ruta_de("benchmark v1", "compatible") == blob
+    with open(os.path.join(raiz, MEDIA_STORE_INDEX), 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+
+
+def test_modo_symlink(carpeta_temporal):
+    almacen = MediaStore(str(carpeta_temporal / "almacen"), link=SYMLINK)
+    descargado = _crear(carpeta_temporal / "Video_1.mp4")
+    blob = almacen.guardar("benchmark v1", "compatible", descargado)
+
+    # Sin enlaces duros el archivo se muda al almacén y vuelve como enlace simbólico
+    assert os.path.islink(descargado) and os.path.realpath(descargado) == blob
+    destino = almacen.enlazar("benchmark v1", "compatible", str(carpeta_temporal / "b"))
+    assert os.path.islink(destino) and os.path.realpath(destino) == blob
+
+
+def test_crear_enlace(carpeta_temporal):
+    origen = _crear(carpeta_temporal / "origen.mp4")
+    assert crear_enlace(origen, str(carpeta_temporal / "duro.mp4"), HARDLINK)
+    assert crear_enlace(origen, str(carpeta_temporal / "copia.mp4"), COPY)
+    assert not os.path.samefile(origen, carpeta_temporal / "copia.mp4")
+    # El destino ya existe: el sistema no lo permite
+    assert not crear_enlace(origen, str(carpeta_temporal / "duro.mp4"), HARDLINK)
+
+
+def test_segunda_playlist_se_enlaza_sin_descargar(carpeta_temporal):
+    from benchmark import FakeOrigin, BenchmarkEngine, BenchmarkStats
+    origen = FakeOrigin(2, 64 * 1024).start()
+    engine = BenchmarkEngine(BenchmarkStats())
+    engine.media_store = MediaStore(str(carpeta_temporal / "almacen"))
+    playlist = f"{origen.base_url}/playlist"
+    try:
+        assert not engine.descargar(playlist, str(carpeta_temporal / "a"), threading.Event())
+        origen.reset()
+        assert not engine.descargar(playlist, str(carpeta_temporal / "b"), threading.Event())
+        pedidos = origen.peticiones
+    finally:
+        origen.stop()
+        engine.cerrar()
+
+    for nombre in ("Video_1.mp4", "Video_2.mp4"):
+        a = carpeta_temporal / "a" / "Benchmark" / nombre
+        b = carpeta_temporal / "b" / "Benchmark" / nombre
+        assert _mismo_archivo(a, b)
+    assert engine.media_store.resumen()['files'] == 2
+    # La segunda vez la playlist sale de la caché de metadatos y los videos del almacén:
+    # el origen no recibe ni un pedido
+    assert engine.metrics.snapshot()['counters'].get('media_store_hits') == 2
+    assert pedidos == 0
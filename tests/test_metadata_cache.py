@@ -0,0 +1,86 @@
+import os
+import time
+from metadata_cache import MetadataCache, canonical_url
+
+
+def _info(video_id):
+    return {'_type': 'video', 'id': video_id, 'extractor_key': 'Benchmark', 'title': f"Video {video_id}"}
+
+
+def test_canonical_url():
+    assert canonical_url("https://www.YouTube.com/watch?v=abc&feature=share&utm_source=x#t=10") == \
+        "https://youtube.com/watch?v=abc"
+    assert canonical_url("https://youtu.be/abc?t=5") == canonical_url("https://youtube.com/watch?t=5&v=abc")
+    assert canonical_url("http://origen/playlist/") == "http://origen/playlist"
+
+
+def test_video_por_url_y_por_id(carpeta_temporal):
+    cache = MetadataCache(str(carpeta_temporal / "cache"))
+    cache.put_url("http://origen/watch/1?si=abc", _info("v1"))
+
+    assert cache.get_url("http://origen/watch/1")['title'] == "Video v1"
+    assert cache.get_video('Benchmark', "v1")['id'] == "v1"
+    # La URL solo apunta a la entrada del video: dos archivos, uno con el diccionario
+    assert len(os.listdir(carpeta_temporal / "cache")) == 2
+
+    playlist = {'_type': 'playlist', 'id': "p", 'entries': [{'url': "http://origen/watch/1"}]}
+    cache.put_url("http://origen/playlist", playlist)
+    assert cache.get_url("http://origen/playlist") == playlist
+    assert cache.get_url("http://origen/otra") is None and cache.get_video('Benchmark', None) is None
+
+
+def test_caducidad(carpeta_temporal):
+    cache = MetadataCache(str(carpeta_temporal / "cache"), ttl=0.2)
+    cache.put_video(_info("v1"))
+    assert cache.get_video('Benchmark', "v1") is not None
+
+    time.sleep(0.3)
+    assert cache.get_video('Benchmark', "v1") is None
+    # La entrada vencida se borra del disco
+    assert os.listdir(carpeta_temporal / "cache") == []
+
+
+def test_desalojo_lru(carpeta_temporal):
+    cache = MetadataCache(str(carpeta_temporal / "cache"), max_entries=3)
+    for video_id in ("v1", "v2", "v3"):
+        cache.put_video(_info(video_id))
+    # Leer v1 lo vuelve el más reciente: el próximo en salir es v2
+    assert cache.get_video('Benchmark', "v1")
+    cache.put_video(_info("v4"))
+
+    assert cache.get_video('Benchmark', "v2") is None
+    assert all(cache.get_video('Benchmark', v) for v in ("v1", "v3", "v4"))
+    assert len(os.listdir(carpeta_temporal / "cache")) == 3
+
+
+def test_orden_lru_se_reconstruye_al_reiniciar(carpeta_temporal):
+    carpeta = str(carpeta_temporal / "cache")
+    cache = MetadataCache(carpeta, max_entries=3)
+    for video_id in ("v1", "v2", "v3"):
+        cache.put_video(_info(video_id))
+    # El último acceso queda en la fecha de modificación de cada archivo
+    ahora = time.time()
+    for video_id, edad in (("v1", 10), ("v2", 20), ("v3", 30)):
+        path = os.path.join(carpeta, cache._nombre(f"video:Benchmark:{video_id}") + ".json")
+        os.utime(path, (ahora - edad, ahora - edad))
+
+    cache = MetadataCache(carpeta, max_entries=3)
+    cache.put_video(_info("v4"))
+    # v3 se guardó último pero tiene el acceso más viejo
+    assert cache.get_video('Benchmark', "v3") is None
+    assert all(cache.get_video('Benchmark', v) for v in ("v1", "v2", "v4"))
+
+
+def test_entrada_danada_cuenta_como_ausente(carpeta_temporal):
+    cache = MetadataCache(str(carpeta_temporal / "cache"))
+    cache.put_video(_info("v1"))
+    [archivo] = os.listdir(carpeta_temporal / "cache")
+    with open(carpeta_temporal / "cache" / archivo, 'w', encoding='utf-8') as f:
+        f.write('{"key": "video:Benchmark:v1", "da')
+
+    assert cache.get_video('Benchmark', "v1") is None
+    assert os.listdir(carpeta_temporal / "cache") == []
+
+    cache.put_video(_info("v2"))
+    cache.clear()
+    assert os.listdir(carpeta_temporal / "cache") == []
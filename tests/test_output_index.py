@@ -0,0 +1,78 @@
+import os
+from output_index import JobFiles, OutputIndex, FINAL, PARCIAL
+
+
+def _crear(path, contenido=b"x" * 1024):
+    with open(path, 'wb') as f:
+        f.write(contenido)
+    return str(path)
+
+
+def _anotar_descarga(archivos, final, video_id):
+    info = {'extractor_key': 'Benchmark', 'id': video_id}
+    archivos.hook_progreso({'status': 'downloading', 'tmpfilename': final + '.part', 'filename': final, 'info_dict': info})
+    archivos.hook_progreso({'status': 'finished', 'filename': final, 'info_dict': info})
+    archivos.hook_postproceso({'status': 'finished', 'info_dict': dict(info, filepath=final)})
+
+
+def test_temporales_ffmpeg_no_incluye_titulos_que_terminan_en_temp(carpeta_temporal):
+    archivos = JobFiles()
+    intro = str(carpeta_temporal / "Intro.temp.mp4")
+    leccion = str(carpeta_temporal / "Lesson_3.pp.mp4")
+    _anotar_descarga(archivos, intro, "v1")
+    _anotar_descarga(archivos, leccion, "v2")
+
+    temporales = archivos.temporales_ffmpeg()
+    assert intro not in temporales and leccion not in temporales
+    assert str(carpeta_temporal / "Intro.temp.temp.mp4") in temporales
+    assert str(carpeta_temporal / "Lesson_3.pp.pp.mp4") in temporales
+
+
+def test_limpieza_conserva_el_final_y_borra_sus_temporales(carpeta_temporal):
+    from benchmark import BenchmarkEngine, BenchmarkStats
+    engine = BenchmarkEngine(BenchmarkStats())
+    try:
+        final = _crear(carpeta_temporal / "Intro.temp.mp4")
+        union = _crear(carpeta_temporal / "Intro.temp.temp.mp4")
+        perfil = _crear(carpeta_temporal / "Intro.temp.pp.mp4")
+        ajeno = _crear(carpeta_temporal / "Otro.temp.mp4")
+        _anotar_descarga(engine._archivos_de("j"), final, "v1")
+
+        engine._limpiar_archivos_temporales(str(carpeta_temporal), job_id="j")
+    finally:
+        engine.cerrar()
+
+    assert os.path.exists(final)
+    assert not os.path.exists(union) and not os.path.exists(perfil)
+    # Lo que no es de este trabajo no se toca
+    assert os.path.exists(ajeno)
+
+
+def test_indice_clasifica_por_video_anotado(carpeta_temporal):
+    indice = OutputIndex(str(carpeta_temporal / "indice.jsonl"))
+    final = _crear(carpeta_temporal / "Intro.temp.mp4")
+    suelto = _crear(carpeta_temporal / "Video.temp.mp4")
+    parte = _crear(carpeta_temporal / "Video.mp4.part")
+
+    indice.actualizar([final, suelto, parte], {final: ('Benchmark', 'v1')})
+    assert indice.resumen() == {FINAL: 1, PARCIAL: 2}
+    assert sorted(indice.parciales(str(carpeta_temporal))) == sorted([suelto, parte])
+
+
+def test_duplicados_no_cuenta_enlaces_al_mismo_archivo(carpeta_temporal):
+    almacen = carpeta_temporal / "almacen"
+    for carpeta in (almacen, carpeta_temporal / "a", carpeta_temporal / "b"):
+        carpeta.mkdir()
+    blob = _crear(almacen / "blob.mp4", os.urandom(200 * 1024))
+    os.link(blob, carpeta_temporal / "a" / "x.mp4")
+    os.link(blob, carpeta_temporal / "b" / "x.mp4")
+
+    indice = OutputIndex(str(carpeta_temporal / "indice.jsonl"))
+    indice.escanear(str(carpeta_temporal))
+    assert indice.duplicados() == []
+
+    with open(blob, 'rb') as f:
+        copia = _crear(carpeta_temporal / "b" / "copia.mp4", f.read())
+    indice.escanear(str(carpeta_temporal))
+    assert len(indice.duplicados(excluir=[str(almacen)])) == 1
+    assert copia in indice.duplicados(excluir=[str(almacen)])[0]
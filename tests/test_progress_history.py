@@ -0,0 +1,85 @@
+import math
+from progress_history import RingBuffer, JobHistory, MAX_FINISHED, ERROR
+from progress_bus import ProgressBus
+
+
+def test_ring_buffer_antes_de_llenarse():
+    buffer = RingBuffer(4)
+    assert len(buffer) == 0 and buffer.ultimo() is None and buffer.valores() == []
+
+    for valor in (1, 2, 3):
+        buffer.append(valor)
+    assert len(buffer) == 3 and buffer.capacidad == 4
+    assert buffer.valores() == [1, 2, 3]
+    assert buffer.valores(2) == [2, 3]
+    assert buffer.ultimo() == 3
+
+
+def test_ring_buffer_da_la_vuelta():
+    buffer = RingBuffer(4)
+    for valor in range(1, 11):
+        buffer.append(valor)
+
+    # Solo quedan los últimos cuatro, del más viejo al más nuevo
+    assert len(buffer) == 4
+    assert buffer.valores() == [7, 8, 9, 10]
+    assert buffer.ultimo() == 10
+    # Los últimos n cruzan el final del array interno
+    for n in range(5):
+        assert buffer.valores(n) == [7, 8, 9, 10][4 - n:]
+    assert buffer.valores(100) == [7, 8, 9, 10]
+
+
+def test_ring_buffer_en_cada_posicion_de_inicio():
+    for total in range(1, 12):
+        buffer = RingBuffer(5, 'i')
+        for valor in range(total):
+            buffer.append(valor)
+        esperado = list(range(total))[-5:]
+        assert buffer.valores() == esperado
+        assert buffer.valores(3) == esperado[-3:]
+
+
+def test_ring_buffer_capacidad_minima():
+    buffer = RingBuffer(0)
+    buffer.append(1.5)
+    buffer.append(2.5)
+    assert buffer.capacidad == 1 and buffer.valores() == [2.5]
+
+
+def test_job_history_muestras_y_log_acotados():
+    historia = JobHistory("j", muestras=3, lineas=2)
+    for i in range(5):
+        historia.bytes_totales += 1000
+        historia.muestrear(float(i), None)
+        historia.log(f"linea {i}")
+
+    assert len(historia.velocidades) == 3
+    assert historia.velocidades.valores() == [1000.0, 1000.0, 1000.0]
+    assert all(math.isnan(f) for f in historia.fracciones.valores())
+    assert [linea.texto for linea in historia.logs] == ["linea 3", "linea 4"]
+    assert historia.version_log == 5
+
+
+def test_progress_bus_conserva_solo_los_ultimos_terminados():
+    bus = ProgressBus()
+    for i in range(MAX_FINISHED + 10):
+        bus.publish(f"j{i}", status='downloading', message="Descargando")
+        bus.remove(f"j{i}")
+
+    trabajos = bus.jobs()
+    assert len(trabajos) == MAX_FINISHED
+    # Del más reciente al más viejo; los diez primeros se descartaron
+    assert trabajos[0] == (f"j{MAX_FINISHED + 9}", False)
+    assert trabajos[-1] == ("j10", False)
+    assert bus.detail("j0") is None
+
+
+def test_progress_bus_log_de_un_trabajo_que_no_publico():
+    bus = ProgressBus()
+    bus.log("j", "Falló la extracción", ERROR)
+
+    assert bus.jobs() == [("j", False)]
+    detalle = bus.detail("j")
+    assert not detalle['activo']
+    assert [(linea.nivel, linea.texto) for linea in detalle['logs']] == [(ERROR, "Falló la extracción")]
@@ -0,0 +1,82 @@
+import os
+from resume_manifest import (save_manifest, load_manifest, remove_manifest, manifest_path, is_partial,
+                             group_partials, find_partials, prune_groups, prune_partials, MIN_IDLE_SECONDS)
+
+AHORA = 1_000_000_000
+DIA = 24 * 3600
+
+
+def _crear(path, tamano, hace):
+    with open(path, 'wb') as f:
+        f.write(b"x" * tamano)
+    os.utime(path, (AHORA - hace, AHORA - hace))
+    return str(path)
+
+
+def test_manifiesto_ida_y_vuelta(carpeta_temporal):
+    parcial = str(carpeta_temporal / "video.mp4.part")
+    assert load_manifest(parcial) is None
+
+    save_manifest(parcial, {'url': "http://origen/watch/1", 'segments': [[0, 9, 5]]})
+    datos = load_manifest(parcial)
+    assert datos['url'] == "http://origen/watch/1" and datos['segments'] == [[0, 9, 5]] and datos['updated']
+    assert not os.path.exists(manifest_path(parcial) + ".tmp")
+
+    # Un manifiesto dañado cuenta como ausente
+    with open(manifest_path(parcial), 'w', encoding='utf-8') as f:
+        f.write('{"url": "http://or')
+    assert load_manifest(parcial) is None
+    remove_manifest(parcial)
+    remove_manifest(parcial)
+    assert not os.path.exists(manifest_path(parcial))
+
+
+def test_agrupa_los_temporales_de_cada_descarga(carpeta_temporal):
+    assert all(is_partial(nombre) for nombre in ("a.mp4.part", "a.mp4.ytdl", "a.mp4.part-Frag3", "a.mp4.part.resume.json"))
+    assert not is_partial("a.mp4") and not is_partial("a.part.mp4")
+
+    for nombre in ("a.mp4.part", "a.mp4.ytdl", "a.mp4.part-Frag3", "b.webm.part", "final.mp4"):
+        _crear(carpeta_temporal / nombre, 10, 0)
+    save_manifest(str(carpeta_temporal / "a.mp4.part"), {'url': "http://origen/watch/1"})
+
+    grupos = {os.path.basename(g['part']): g for g in find_partials(str(carpeta_temporal))}
+    assert sorted(grupos) == ["a.mp4.part", "b.webm.part"]
+    assert len(grupos["a.mp4.part"]['files']) == 4 and grupos["a.mp4.part"]['size'] >= 30
+    assert grupos["a.mp4.part"]['manifest']['url'] == "http://origen/watch/1"
+    assert grupos["b.webm.part"]['manifest'] is None
+
+
+def test_prune_groups_por_edad(carpeta_temporal):
+    viejo = _crear(carpeta_temporal / "viejo.mp4.part", 10, 10 * DIA)
+    nuevo = _crear(carpeta_temporal / "nuevo.mp4.part", 10, DIA)
+
+    borrados = prune_groups(group_partials([viejo, nuevo]), max_age=7 * DIA, now=AHORA)
+    assert [g['part'] for g in borrados] == [viejo]
+    assert not os.path.exists(viejo) and os.path.exists(nuevo)
+
+
+def test_prune_groups_por_espacio_borra_los_mas_viejos(carpeta_temporal):
+    paths = [_crear(carpeta_temporal / f"{n}.mp4.part", 100, n * DIA) for n in (1, 2, 3, 4)]
+
+    borrados = prune_groups(group_partials(paths), max_bytes=250, now=AHORA)
+    assert sorted(g['part'] for g in borrados) == sorted(paths[2:])
+    assert [os.path.exists(p) for p in paths] == [True, True, False, False]
+
+
+def test_prune_groups_no_toca_lo_que_se_esta_descargando(carpeta_temporal):
+    activo = _crear(carpeta_temporal / "activo.mp4.part", 500, MIN_IDLE_SECONDS // 2)
+    viejo = _crear(carpeta_temporal / "viejo.mp4.part", 100, 10 * DIA)
+
+    # Aunque el activo sea el que hace pasar el presupuesto, solo se puede borrar el viejo
+    borrados = prune_groups(group_partials([activo, viejo]), max_age=7 * DIA, max_bytes=200, now=AHORA)
+    assert [g['part'] for g in borrados] == [viejo]
+    assert os.path.exists(activo)
+
+
+def test_prune_groups_borra_manifiestos_huerfanos(carpeta_temporal):
+    parcial = str(carpeta_temporal / "terminado.mp4.part")
+    save_manifest(parcial, {'url': "http://origen/watch/1"})
+    os.utime(manifest_path(parcial), (AHORA - DIA, AHORA - DIA))
+
+    assert len(prune_partials(str(carpeta_temporal), now=AHORA)) == 1
+    assert not os.path.exists(manifest_path(parcial))
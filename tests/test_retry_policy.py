@@ -0,0 +1,94 @@
+import io
+import socket
+import threading
+import pytest
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError, DownloadCancelled, ExtractorError, UnsupportedError
+from retry_policy import RetryPolicy, clasificar_error, TRANSITORIO, PERMANENTE
+
+
+def _http(status):
+    return HTTPError(Response(io.BytesIO(b""), "http://origen/media/1.mp4", {}, status=status))
+
+
+def _falla_con(error, llamadas=None):
+    def fn():
+        if llamadas is not None:
+            llamadas.append(1)
+        raise error
+    return fn
+
+
+def _envuelto(causa):
+    """Como llega desde yt-dlp: un DownloadError con el error del extractor dentro."""
+    try:
+        raise ExtractorError("Unable to download webpage", cause=causa)
+    except ExtractorError as e:
+        return DownloadError(f"ERROR: {e}", exc_info=(type(e), e, None))
+
+
+@pytest.mark.parametrize("error, tipo", [
+    (_http(503), TRANSITORIO),
+    (_http(429), TRANSITORIO),
+    (_http(404), PERMANENTE),
+    (_http(403), PERMANENTE),
+    (TransportError("Connection reset by peer"), TRANSITORIO),
+    (ConnectionResetError(), TRANSITORIO),
+    (socket.timeout("timed out"), TRANSITORIO),
+    (ExtractorError("Private video", expected=True), PERMANENTE),
+    (UnsupportedError("http://origen/otra"), PERMANENTE),
+    (DownloadCancelled(), PERMANENTE),
+])
+def test_clasificar_error_por_tipo(error, tipo):
+    assert clasificar_error(error) == tipo
+
+
+def test_clasificar_error_busca_la_causa_envuelta():
+    assert clasificar_error(_envuelto(_http(502))) == TRANSITORIO
+    assert clasificar_error(_envuelto(_http(410))) == PERMANENTE
+
+
+def test_clasificar_error_por_mensaje_sin_causa():
+    assert clasificar_error(DownloadError("ERROR: HTTP Error 504: Gateway Timeout")) == TRANSITORIO
+    assert clasificar_error(DownloadError("ERROR: HTTP Error 404: Not Found")) == PERMANENTE
+    assert clasificar_error(DownloadError("ERROR: Got server HTTP error: Connection reset by peer")) == TRANSITORIO
+    assert clasificar_error(DownloadError("ERROR: Video unavailable")) == PERMANENTE
+
+
+def test_espera_acotada_por_el_tope():
+    politica = RetryPolicy(retries=3, backoff_base=1.0, backoff_max=5.0)
+    for n in range(10):
+        assert 0 <= politica.espera(n) <= min(5.0, 2 ** n)
+
+
+def test_ejecutar_reintenta_solo_los_transitorios():
+    politica = RetryPolicy(retries=2, backoff_base=0.0, backoff_max=0.0)
+    llamadas = []
+
+    def falla_dos_veces():
+        llamadas.append(1)
+        if len(llamadas) < 3:
+            raise _http(503)
+        return "ok"
+
+    assert politica.ejecutar(falla_dos_veces) == "ok" and len(llamadas) == 3
+
+    llamadas.clear()
+    with pytest.raises(HTTPError):
+        politica.ejecutar(_falla_con(_http(404), llamadas))
+    assert len(llamadas) == 1
+
+
+def test_ejecutar_se_corta_al_cancelar():
+    politica = RetryPolicy(retries=5, backoff_base=30.0, backoff_max=30.0)
+    cancelar = threading.Event()
+    reintentos = []
+
+    def on_retry(error, reintento, espera):
+        reintentos.append(reintento)
+        cancelar.set()
+
+    with pytest.raises(HTTPError):
+        politica.ejecutar(_falla_con(_http(503)), cancel_event=cancelar, on_retry=on_retry)
+    assert reintentos == [1]
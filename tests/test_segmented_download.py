@@ -0,0 +1,114 @@
+import os
+import pytest
+from benchmark import FakeOrigin, BLOCK
+from segmented_download import SegmentedDownload, SegmentedHttpFD, SegmentedYoutubeDL, probe_range_support
+from resume_manifest import load_manifest, save_manifest, manifest_path
+
+MIB = 1024 * 1024
+
+
+class _Origen(FakeOrigin):
+    """Origen que anota los rangos pedidos por cada conexión."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rangos = []
+
+    def _atender(self, handler):
+        if handler.path.startswith('/media/'):
+            with self._lock:
+                self.rangos.append(handler.headers.get('Range'))
+        return super()._atender(handler)
+
+
+@pytest.fixture
+def origen():
+    origen = _Origen(1, 4 * MIB, rate=2 * MIB).start()
+    yield origen
+    origen.stop()
+
+
+def _esperado(tamano):
+    return (BLOCK * (tamano // len(BLOCK) + 1))[:tamano]
+
+
+def _contenido(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class _Corte(Exception):
+    pass
+
+
+def _cortar_con_algo_descargado(descargado, total):
+    if descargado >= MIB:
+        raise _Corte()
+
+
+def test_probe_range_support(origen):
+    assert probe_range_support(f"{origen.base_url}/media/1.mp4") == 4 * MIB
+
+
+def test_descarga_por_segmentos(origen, carpeta_temporal):
+    destino = str(carpeta_temporal / "video.mp4")
+    descarga = SegmentedDownload(f"{origen.base_url}/media/1.mp4", destino, 4 * MIB, connections=4)
+    descarga.run()
+
+    assert len(descarga.segments) == 4 and descarga.downloaded == 4 * MIB
+    assert sorted(origen.rangos) == sorted(f"bytes={inicio}-{fin}" for inicio, fin in descarga.segments)
+    assert _contenido(destino) == _esperado(4 * MIB)
+
+
+def test_segmentos_reintentan_desde_donde_se_cortaron(carpeta_temporal):
+    origen = _Origen(1, 4 * MIB, fault_rate=0.3, seed=3).start()
+    try:
+        destino = str(carpeta_temporal / "video.mp4")
+        SegmentedDownload(f"{origen.base_url}/media/1.mp4", destino, 4 * MIB, connections=4, retries=20).run()
+    finally:
+        origen.stop()
+    assert origen.fallas
+    assert _contenido(destino) == _esperado(4 * MIB)
+
+
+def test_continua_desde_el_manifiesto(origen, carpeta_temporal):
+    url = f"{origen.base_url}/media/1.mp4"
+    parcial = str(carpeta_temporal / "video.mp4.part")
+    primera = SegmentedDownload(url, parcial, 4 * MIB, connections=4)
+    with pytest.raises(_Corte):
+        primera.run(_cortar_con_algo_descargado, interval=0.05)
+    save_manifest(parcial, {'url': url, 'total_bytes': 4 * MIB, 'segments': primera.segment_state()})
+    escritos = primera.downloaded
+    assert 0 < escritos < 4 * MIB
+
+    origen.rangos.clear()
+    estado = load_manifest(parcial)['segments']
+    segunda = SegmentedDownload(url, parcial, 4 * MIB, connections=4, resume=estado)
+    assert segunda.downloaded == escritos
+    segunda.run()
+
+    # Cada segmento se pidió solo desde el primer byte que le faltaba
+    assert sorted(origen.rangos) == sorted(f"bytes={inicio + hecho}-{fin}" for inicio, fin, hecho in estado if inicio + hecho <= fin)
+    assert _contenido(parcial) == _esperado(4 * MIB)
+
+
+def test_downloader_de_yt_dlp_continua_el_parcial(origen, carpeta_temporal):
+    url = f"{origen.base_url}/media/1.mp4"
+    final = str(carpeta_temporal / "video.mp4")
+    parcial = final + ".part"
+    primera = SegmentedDownload(url, parcial, 4 * MIB, connections=4)
+    with pytest.raises(_Corte):
+        primera.run(_cortar_con_algo_descargado, interval=0.05)
+    estado = primera.segment_state()
+    save_manifest(parcial, {'url': url, 'total_bytes': 4 * MIB, 'segments': estado})
+
+    origen.rangos.clear()
+    ydl = SegmentedYoutubeDL({'quiet': True, 'noprogress': True}, connections=4, min_size=MIB)
+    fd = SegmentedHttpFD(ydl, ydl.params, connections=4, min_size=MIB)
+    assert fd.download(final, {'url': url, 'id': "v1", 'ext': "mp4", 'http_headers': {}})
+
+    # Un pedido de un byte para ver si acepta rangos y el resto solo lo que faltaba
+    assert origen.rangos[0] == "bytes=0-0"
+    assert sorted(origen.rangos[1:]) == sorted(f"bytes={inicio + hecho}-{fin}" for inicio, fin, hecho in estado if inicio + hecho <= fin)
+    assert _contenido(final) == _esperado(4 * MIB)
+    assert not os.path.exists(parcial) and not os.path.exists(manifest_path(parcial))
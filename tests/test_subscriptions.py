@@ -0,0 +1,27 @@
+import json
+from subscriptions import SubscriptionList
+
+
+def _lineas(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+
+def test_suscripciones_con_linea_truncada_y_vistos_compactados(carpeta_temporal):
+    path = str(carpeta_temporal / "subs.jsonl")
+    suscripciones = SubscriptionList(path)
+    uno = suscripciones.add("http://origen/canal1", "/d", "best")
+    dos = suscripciones.add("http://origen/canal2", "/d", "best")
+    suscripciones.mark_seen(uno['id'], ["v1", "v2"])
+    suscripciones.mark_seen(dos['id'], ["v3"])
+    suscripciones.remove(dos['id'])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"id": "%s", "titulo": "Can' % uno['id'])
+
+    suscripciones = SubscriptionList(path)
+    assert [sub['id'] for sub in suscripciones.entries()] == [uno['id']]
+    assert len(_lineas(path)) == 1
+    assert suscripciones.seen(uno['id']) == {"v1", "v2"}
+    # Los IDs de la suscripción quitada salen del archivo
+    with open(suscripciones.seen_path, 'r', encoding='utf-8') as f:
+        assert sorted(f.read().split()) == sorted([uno['id'], uno['id'], "v1", "v2"])